@@ -1,6 +1,6 @@
 from argparse import ArgumentParser, Namespace
 from configparser import ConfigParser
-from typing import Optional, Any, Sequence, List, Dict
+from typing import Optional, Any, Sequence, List, Dict, AsyncGenerator
 from datetime import datetime, timedelta
 import logging
 from asyncio import create_task, gather, wait, Queue, CancelledError, Task, sleep
@@ -36,6 +36,9 @@ from .backend import (
     batch_gen,
     BSTableType,
     ACCOUNTS_Q_MAX,
+    ACCOUNTS_BATCH,
+    BackgroundCount,
+    split_range,
 )
 from .models import BSAccount, StatsTypes, BSBlitzRelease
 
@@ -1378,16 +1381,25 @@ async def cmd_import(db: Backend, args: Namespace) -> bool:
         ) is None:
             raise ValueError(f"Could not init {import_backend} to import accounts from")
 
-        message("Counting accounts to import ...")
-        N: int = await db.accounts_count(
-            regions=regions, inactive=OptAccountsInactive.both, sample=args.sample
+        # start with an estimate and refine the total in the background
+        N: BackgroundCount = BackgroundCount(
+            import_db.accounts_count(
+                regions=regions, inactive=OptAccountsInactive.both, sample=args.sample
+            ),
+            estimate=await import_db.estimated_count(BSTableType.Accounts),
         )
-
-        with alive_bar(N, title="Importing accounts ", enrich_print=False) as bar:
+        read: int = 0
+        with alive_bar(
+            None, title="Importing accounts ", enrich_print=False, manual=True
+        ) as bar:
             async for account in import_db.accounts_export(sample=args.sample):
                 await accountQ.put(account)
-                bar()
+                read += 1
+                if read % 1000 == 0:
+                    bar(N.progress(read))
                 stats.log("read")
+            bar(1)
+        N.cancel()
 
         await accountQ.join()
         write_worker.cancel()
@@ -1630,11 +1642,10 @@ async def create_accountQ(
                         stats.log("errors")
 
         elif args.file is not None:
-            async for account in BSAccount.import_file(args.file):
-                if account.region in regions:
-                    if args.file.lower().endswith(".txt"):
-                        if (a := await db.account_get(account.id)) is not None:
-                            account = a
+            async for account_batch in accounts_read_file(
+                db, args.file, regions=regions
+            ):
+                for account in account_batch:
                     await accountQ.put(account)
                     debug(f"account put to queue: id={account.id}")
                     stats.log("read")
@@ -1697,25 +1708,15 @@ async def create_accountQ_batch(
                     stats.log("errors", len(accounts))
 
         elif args.file is not None:
-            accounts = list()
-            async for account in BSAccount.import_file(args.file):
+            async for accounts in accounts_read_file(
+                db, args.file, regions={region}, batch=batch
+            ):
                 try:
-                    if account.region == region:
-                        if args.file.lower().endswith(".txt"):
-                            if (a := await db.account_get(account.id)) is not None:
-                                account = a
-                        accounts.append(account)
-                        if len(accounts) == batch:
-                            await accountQ.put(accounts)
-                            stats.log("read", batch)
-                            accounts = list()
+                    await accountQ.put(accounts)
+                    stats.log("read", len(accounts))
                 except Exception as err:
-                    error(f"Could not add account to the queue: {err}")
-                    stats.log("errors")
-
-            if len(accounts) > 0:
-                await accountQ.put(accounts)
-                stats.log("read", len(accounts))
+                    error(f"Could not add accounts to the queue: {err}")
+                    stats.log("errors", len(accounts))
         else:
             # message('counting accounts...')
             # start = time()
@@ -1760,25 +1761,38 @@ async def create_accountQ_active(
     release: BSBlitzRelease,
     regions: set[Region],
     randomize: bool = True,
+    partitions: int = 1,
+    id_range: range | None = None,
 ) -> EventCounter:
-    """Add accounts active during a release to accountQ"""
+    """Add accounts active during a release to accountQ. With randomize=True
+    each region's account id range is read in 'partitions' parallel queries"""
     debug("starting")
     stats: EventCounter = EventCounter("accounts")
     try:
         if randomize:
             workers: List[Task] = list()
             for r in regions:
-                workers.append(
-                    create_task(
-                        create_accountQ_active(
-                            db, accountQ, release, regions={r}, randomize=False
+                for part in split_range(r.id_range, partitions):
+                    workers.append(
+                        create_task(
+                            create_accountQ_active(
+                                db,
+                                accountQ,
+                                release,
+                                regions={r},
+                                randomize=False,
+                                id_range=part,
+                            )
                         )
                     )
-                )
             await stats.gather_stats(workers, merge_child=False, cancel=False)
         else:
             async for account_id in db.tank_stats_unique(
-                "account_id", int, release=release, regions=regions
+                "account_id",
+                int,
+                release=release,
+                regions=regions,
+                id_range=id_range,
             ):
                 try:
                     await accountQ.put(BSAccount(id=account_id))
@@ -1897,14 +1911,38 @@ async def accounts_read_from_db(
 ) -> List[BSAccount]:
     """Read DB versions of "skeleton" accounts from DB"""
     res: List[BSAccount] = list()
+    db_accounts: Dict[int, BSAccount] = await db.accounts_get_many(
+        [acc.id for acc in accounts]
+    )
     for acc in accounts:
-        if (account_db := await db.account_get(account_id=acc.id)) is not None:
+        if (account_db := db_accounts.get(acc.id)) is not None:
             res.append(account_db)
         elif not db_only:
             res.append(acc)
     return res
 
 
+async def accounts_read_file(
+    db: Backend,
+    filename: str,
+    regions: set[Region] | None = None,
+    batch: int = ACCOUNTS_BATCH,
+) -> AsyncGenerator[List[BSAccount], None]:
+    """Read accounts from a file in batches. Accounts in .txt files are
+    ID-only "skeletons" and are replaced with their DB versions"""
+    debug("starting")
+    read_db: bool = filename.lower().endswith(".txt")
+    accounts: List[BSAccount] = list()
+    async for account in BSAccount.import_file(filename):
+        if regions is None or account.region in regions:
+            accounts.append(account)
+            if len(accounts) == batch:
+                yield await accounts_read_from_db(db, accounts) if read_db else accounts
+                accounts = list()
+    if len(accounts) > 0:
+        yield await accounts_read_from_db(db, accounts) if read_db else accounts
+
+
 async def accounts_parse_args(
     db: Backend,
     args: Namespace,
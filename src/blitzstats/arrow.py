@@ -8,10 +8,11 @@ import logging
 
 from os import makedirs
 from os.path import isfile, dirname
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Mapping, Sequence, get_args
 from enum import Enum, IntEnum
 import os.path
 from bson.objectid import ObjectId
+from pydantic import BaseModel
 
 from asyncio import CancelledError
 
@@ -83,10 +84,81 @@ def create_schema(
     return schema
 
 
+def schema_defaults(model: type[BaseModel], schema: pa.Schema) -> List[Any]:
+    """Return the default values of the model fields of the schema's columns.
+    Column names are field names of nested models separated by '.'.
+    Columns without a default get None"""
+    defaults: List[Any] = list()
+    for field in schema:
+        default: Any = None
+        sub_model: type[BaseModel] | None = model
+        for name in field.name.split("."):
+            if sub_model is None or name not in sub_model.model_fields:
+                default = None
+                break
+            info = sub_model.model_fields[name]
+            default = None
+            if not info.is_required():
+                default = info.get_default(call_default_factory=True)
+            sub_model = None
+            for tp in (info.annotation, *get_args(info.annotation)):
+                if isinstance(tp, type) and issubclass(tp, BaseModel):
+                    sub_model = tp
+                    break
+        if isinstance(default, Enum):
+            default = default.value
+        defaults.append(default)
+    return defaults
+
+
+def record_batch_from_docs(
+    docs: Sequence[Mapping[str, Any]],
+    schema: pa.Schema,
+    paths: List[List[str]] | None = None,
+    defaults: List[Any] | None = None,
+) -> pa.RecordBatch:
+    """Build a record batch of 'schema' from (nested) documents without pandas.
+    'paths' are the keys of the schema's fields in the documents.
+    Default is the field name split by '.'. 'defaults' are used for keys
+    missing from the documents, see schema_defaults()"""
+    if paths is None:
+        paths = [field.name.split(".") for field in schema]
+    if defaults is None:
+        defaults = [None] * len(schema)
+    columns: List[pa.Array] = list()
+    for field, path, default in zip(schema, paths, defaults):
+        values: List[Any] = list()
+        for doc in docs:
+            value: Any = doc
+            for key in path:
+                if isinstance(value, Mapping) and key in value:
+                    value = value[key]
+                else:
+                    value = default
+                    break
+            values.append(value)
+        value_type: pa.DataType = field.type
+        if pa.types.is_dictionary(value_type):
+            value_type = value_type.value_type
+        if pa.types.is_string(value_type):
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def record_batches(
+    data: pd.DataFrame | pa.Table, schema: pa.Schema
+) -> List[pa.RecordBatch]:
+    """Convert a data frame or a table into record batches of 'schema'"""
+    if isinstance(data, pa.Table):
+        return data.to_batches()
+    return [pa.RecordBatch.from_pandas(data, schema)]
+
+
 async def data_writer(
     basedir: str,
     filename: str,
-    dataQ: AsyncQueue[pd.DataFrame],
+    dataQ: AsyncQueue[pd.DataFrame | pa.Table],
     export_format: str,
     schema: pa.Schema,
     force: bool = False,
@@ -108,10 +180,11 @@ async def data_writer(
         if export_format == "parquet":
             with pq.ParquetWriter(export_file, schema, compression="lz4") as writer:
                 while True:
-                    batch = pa.RecordBatch.from_pandas(await dataQ.get(), schema)
+                    batches = record_batches(await dataQ.get(), schema)
                     try:
-                        writer.write_batch(batch)
-                        stats.log("rows written", batch.num_rows)
+                        for batch in batches:
+                            writer.write_batch(batch)
+                            stats.log("rows written", batch.num_rows)
                     except Exception as err:
                         error(f"{err}")
                     dataQ.task_done()
@@ -126,9 +199,33 @@ async def data_writer(
     return stats
 
 
+def dataset_write(
+    data: pa.Table | List[pa.RecordBatch],
+    basedir: str,
+    basename: str,
+    export_format: str,
+    partitioning: ds.Partitioning,
+    schema: pa.Schema,
+) -> None:
+    """Write data as new fragment(s) into a partitioned dataset.
+    Existing fragments are left untouched"""
+    assert (
+        export_format in EXPORT_DATA_FORMATS
+    ), f"export format has to be one of: {', '.join(EXPORT_DATA_FORMATS)}"
+    ds.write_dataset(
+        data,
+        base_dir=basedir,
+        basename_template=basename + "-{i}." + export_format,
+        format=export_format,
+        partitioning=partitioning,
+        schema=schema,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
 async def dataset_writer(
     basedir: str,
-    dataQ: AsyncQueue[pd.DataFrame],
+    dataQ: AsyncQueue[pd.DataFrame | pa.Table],
     export_format: str,
     partioning: ds.Partitioning,
     schema: pa.schema,
@@ -147,29 +244,26 @@ async def dataset_writer(
 
         # batch 	: pa.RecordBatch = pa.RecordBatch.from_pandas(await dataQ.get())
         # schema 	: pa.Schema 	 = batch.schema
-        batch: pa.RecordBatch
+        batches: List[pa.RecordBatch]
         # part: ds.Partitioning = ds.partitioning(schema=schema)
         dfs: List[pa.RecordBatch] = list()
         rows: int = 0
         i: int = 0
         try:
             while True:
-                batch = pa.RecordBatch.from_pandas(await dataQ.get(), schema)
+                batches = record_batches(await dataQ.get(), schema)
                 try:
-                    rows += batch.num_rows
-                    dfs.append(batch)
+                    rows += sum(batch.num_rows for batch in batches)
+                    dfs.extend(batches)
                     if rows > EXPORT_WRITE_BATCH:
                         debug(f"writing {rows} rows")
-                        ds.write_dataset(
+                        dataset_write(
                             dfs,
-                            base_dir=basedir,
-                            basename_template=f"part-{i}"
-                            + "-{i}."
-                            + f"{export_format}",
-                            format=export_format,
+                            basedir=basedir,
+                            basename=f"part-{i}",
+                            export_format=export_format,
                             partitioning=partioning,
                             schema=schema,
-                            existing_data_behavior="overwrite_or_ignore",
                         )
                         stats.log("stats written", rows)
                         rows = 0
@@ -184,14 +278,13 @@ async def dataset_writer(
             debug("cancelled")
 
         if len(dfs) > 0:
-            ds.write_dataset(
+            dataset_write(
                 dfs,
-                base_dir=basedir,
-                basename_template=f"part-{i}" + "-{i}." + f"{export_format}",
-                format=export_format,
+                basedir=basedir,
+                basename=f"part-{i}",
+                export_format=export_format,
                 partitioning=partioning,
                 schema=schema,
-                existing_data_behavior="overwrite_or_ignore",
             )
             stats.log("stats written", rows)
 
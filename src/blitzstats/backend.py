@@ -3,11 +3,24 @@ from configparser import ConfigParser
 from argparse import Namespace, ArgumentParser
 from abc import ABC, abstractmethod
 from os.path import isfile
-from typing import Optional, Any, Sequence, AsyncGenerator, TypeVar, Type, List, Dict
+from typing import (
+    Optional,
+    Any,
+    Awaitable,
+    Sequence,
+    Iterable,
+    AsyncGenerator,
+    TypeVar,
+    Type,
+    List,
+    Dict,
+)
 from datetime import datetime
+from time import monotonic
 from enum import StrEnum, IntEnum
-from asyncio import Queue, CancelledError
+from asyncio import Queue, QueueEmpty, CancelledError, Task, create_task, gather
 from pydantic import Field
+import pyarrow as pa  # type: ignore
 
 from pydantic_exportables import JSONExportable
 
@@ -18,11 +31,13 @@ from blitzmodels.wg_api import TankStat, PlayerAchievementsMaxSeries
 from pyutils import EventCounter, IterableQueue, QueueDone
 from pyutils.utils import is_alphanum
 
+from .arrow import record_batch_from_docs, schema_defaults
 from .models import (
     BSAccount,
     BSBlitzRelease,
     StatsTypes,
     BSReplay,
+    BSStats,
     BSTank,
 )
 
@@ -41,7 +56,22 @@ WG_ACCOUNT_ID_MAX: int = int(31e8)
 MAX_RETRIES: int = 3
 MIN_UPDATE_INTERVAL: int = 3  # days
 ACCOUNTS_Q_MAX: int = 5000
+ACCOUNTS_BATCH: int = 1000
 TANK_STATS_BATCH: int = 1000
+ACCOUNTS_UPDATE_BATCH: int = 1000
+BULK_BATCH_BYTES: int = 32 * 1024 * 1024
+BULK_BATCH: int = 10000
+ACCOUNTS_UPDATE_INTERVAL: float = 10  # seconds
+SCAN_CHECKPOINT_INTERVAL: int = 1000
+# tank stat fields needed to remap release
+TANK_STATS_REMAP_FIELDS: List[str] = [
+    "id",
+    "account_id",
+    "tank_id",
+    "region",
+    "last_battle_time",
+    "release",
+]
 
 A = TypeVar("A")
 
@@ -79,6 +109,85 @@ def get_sub_type(name: str, parent: type[T]) -> Optional[type[T]]:
     return None
 
 
+def split_range(id_range: range, n: int) -> List[range]:
+    """Split range into 'n' contiguous, disjoint ranges of roughly equal size"""
+    assert n > 0, "'n' must be > 0"
+    step: int = -(-len(id_range) // n)  # ceil
+    return [
+        range(start, min(start + step, id_range.stop))
+        for start in range(id_range.start, id_range.stop, max(step, 1))
+    ]
+
+
+def split_range_at(id_range: range, points: Sequence[int]) -> List[range]:
+    """Split range into contiguous, disjoint ranges at 'points'"""
+    bounds: List[int] = sorted(
+        {p for p in points if id_range.start < p < id_range.stop}
+    )
+    bounds = [id_range.start] + bounds + [id_range.stop]
+    return [range(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def add_args_bulk_mode(parser: ArgumentParser) -> None:
+    """Add bulk import arguments"""
+    parser.add_argument(
+        "--bulk-mode",
+        action="store_true",
+        default=False,
+        help="bulk import for one-off migrations: relaxed write concern, large batches",
+    )
+    parser.add_argument(
+        "--write-concern",
+        type=str,
+        default="1",
+        metavar="W",
+        help="write concern ('w') in bulk mode (default: 1)",
+    )
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        default=False,
+        help="wait for journal commit in bulk mode",
+    )
+    parser.add_argument(
+        "--batch-mb",
+        type=int,
+        default=BULK_BATCH_BYTES // (1024 * 1024),
+        metavar="MB",
+        help=f"insert batch size in MB in bulk mode (default: {BULK_BATCH_BYTES // (1024 * 1024)})",
+    )
+    parser.add_argument(
+        "--drop-indexes",
+        action="store_true",
+        default=False,
+        help="drop secondary indexes before bulk import and rebuild them afterwards",
+    )
+
+
+def add_args_resume(parser: ArgumentParser) -> None:
+    """Add argument for resuming interrupted backend scans"""
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="keep resume tokens of long backend scans in DIR and continue interrupted scans from them",
+    )
+
+
+def read_args_bulk_mode(args: Namespace) -> Dict[str, Any] | None:
+    """Read bulk mode arguments as Backend.set_bulk_mode() kwargs"""
+    if not args.bulk_mode:
+        return None
+    w: int | str = args.write_concern
+    if args.write_concern.isdigit():
+        w = int(args.write_concern)
+    return {
+        "write_concern": {"w": w, "j": args.journal},
+        "batch_bytes": args.batch_mb * 1024 * 1024,
+    }
+
+
 ##############################################
 #
 ## OptAccountsInactive()
@@ -134,6 +243,7 @@ class BSTableType(StrEnum):
     PlayerAchievements = "PlayerAchievements"
     EventLog = "EventLog"
     AccountLog = "AccountLog"
+    Stats = "Stats"
 
 
 class ErrorLogType(IntEnum):
@@ -186,6 +296,38 @@ async def batch_gen(
         yield res
 
 
+class BackgroundCount:
+    """Run a count in the background. 'total' is the estimate
+    until the count has finished"""
+
+    def __init__(self, count: Awaitable[int], estimate: int = -1):
+        self.total: int = estimate
+        self._task: Task = create_task(self._count(count))
+
+    async def _count(self, count: Awaitable[int]) -> None:
+        try:
+            if (total := await count) >= 0:
+                self.total = total
+                debug(f"count finished: {total}")
+        except CancelledError:
+            debug("Cancelled")
+        except Exception as err:
+            error(f"{err}")
+
+    @property
+    def done(self) -> bool:
+        return self._task.done()
+
+    def progress(self, done: int) -> float:
+        """Return progress as a fraction for alive_bar(manual=True)"""
+        if self.total <= 0:
+            return 0
+        return min(done / self.total, 1)
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+
 class Backend(ABC):
     """Abstract class for a backend (mongo, postgres, files)"""
 
@@ -210,6 +352,7 @@ class Backend(ABC):
         self._T: Dict[BSTableType, str] = dict()
         self._Tr: Dict[str, BSTableType] = dict()
         self._M: Dict[BSTableType, type[JSONExportable]] = dict()
+        self._bulk_batch_bytes: int = BULK_BATCH_BYTES
 
         # default tables
         self.set_table(BSTableType.Accounts, "Accounts")
@@ -220,6 +363,7 @@ class Backend(ABC):
         self.set_table(BSTableType.EventLog, "EventLog")
         self.set_table(BSTableType.TankStats, "TankStats")
         self.set_table(BSTableType.PlayerAchievements, "PlayerAchievements")
+        self.set_table(BSTableType.Stats, "Stats")
 
         # set default models
         self.set_model(BSTableType.Accounts, BSAccount)
@@ -230,6 +374,7 @@ class Backend(ABC):
         self.set_model(BSTableType.EventLog, EventLog)
         self.set_model(BSTableType.TankStats, TankStat)
         self.set_model(BSTableType.PlayerAchievements, PlayerAchievementsMaxSeries)
+        self.set_model(BSTableType.Stats, BSStats)
 
         if config is not None and "BACKEND" in config.sections():
             configBackend = config["BACKEND"]
@@ -245,6 +390,7 @@ class Backend(ABC):
             )
             self.set_table(BSTableType.AccountLog, configBackend.get("t_account_log"))
             self.set_table(BSTableType.EventLog, configBackend.get("t_error_log"))
+            self.set_table(BSTableType.Stats, configBackend.get("t_stats"))
 
             self.set_model(BSTableType.Accounts, configBackend.get("m_accounts"))
             self.set_model(BSTableType.Tankopedia, configBackend.get("m_tankopedia"))
@@ -257,6 +403,7 @@ class Backend(ABC):
             )
             self.set_model(BSTableType.AccountLog, configBackend.get("m_account_log"))
             self.set_model(BSTableType.EventLog, configBackend.get("m_event_log"))
+            self.set_model(BSTableType.Stats, configBackend.get("m_stats"))
 
     @abstractmethod
     def debug(self) -> None:
@@ -328,6 +475,27 @@ class Backend(ABC):
             error(f"Error creating backend {driver}: {err}")
         return None
 
+    @classmethod
+    def create_worker(
+        cls, backend_config: Dict[str, Any], threads: int
+    ) -> Optional["Backend"]:
+        """Create a backend in a (forked) worker process from Backend.config.
+        Connection pool is sized for 'threads' concurrent async tasks"""
+        debug(f"starting: threads={threads}")
+        backend_config = dict(backend_config)
+        if (backend := cls.get(backend_config["driver"])) is not None:
+            backend_config["db_config"] = backend.worker_db_config(
+                backend_config.get("db_config"), threads
+            )
+        return cls.create(**backend_config)
+
+    @classmethod
+    def worker_db_config(
+        cls, db_config: Dict[str, Any] | None, threads: int
+    ) -> Dict[str, Any] | None:
+        """Adjust db_config for a worker process running 'threads' async tasks"""
+        return db_config
+
     @classmethod
     def create_import_backend(
         cls,
@@ -435,7 +603,7 @@ class Backend(ABC):
 
     @classmethod
     def list_available(cls) -> List[str]:
-        return ["mongodb"]
+        return list(cls._backends.keys())
 
     @property
     def cache_valid(self) -> int:
@@ -455,6 +623,40 @@ class Backend(ABC):
         """Init backend and indexes"""
         raise NotImplementedError
 
+    async def estimated_count(self, table_type: BSTableType) -> int:
+        """Return a fast estimate of the number of documents in a table.
+        Returns -1 if the backend cannot estimate"""
+        return -1
+
+    async def compact(self, tables: List[str] = [tt.value for tt in BSTableType]) -> bool:  # type: ignore
+        """Compact backend storage. Not needed by most backends"""
+        message(f"{self.driver} backend does not support compaction")
+        return False
+
+    def set_bulk_mode(
+        self,
+        write_concern: Dict[str, Any] | None = None,
+        batch_bytes: int = BULK_BATCH_BYTES,
+    ) -> None:
+        """Configure the backend for one-off bulk imports: relaxed write concern
+        and large insert batches of 'batch_bytes'. Backends ignore unsupported options"""
+        debug(f"write_concern={write_concern}, batch_bytes={batch_bytes}")
+        self._bulk_batch_bytes = batch_bytes
+
+    def bulk_batch_size(self, objs: Sequence[JSONExportable]) -> int:
+        """Number of objects per bulk insert batch estimated from 'objs'"""
+        return BULK_BATCH
+
+    async def indexes_drop(self, table_type: BSTableType) -> bool:
+        """Drop secondary indexes of a table before a bulk import"""
+        message(f"{self.driver} backend does not support dropping indexes")
+        return False
+
+    async def indexes_rebuild(self, table_type: BSTableType) -> bool:
+        """Rebuild the indexes of a table after a bulk import"""
+        message(f"{self.driver} backend does not support rebuilding indexes")
+        return False
+
     def list_config(self, tables: List[str] = [tt.value for tt in BSTableType]) -> bool:  # type: ignore
         """List backend config. Call super().list_config() in implementation backend"""
 
@@ -671,6 +873,10 @@ class Backend(ABC):
     def table_error_log(self) -> str:
         return self.get_table(BSTableType.EventLog)
 
+    @property
+    def table_stats(self) -> str:
+        return self.get_table(BSTableType.Stats)
+
     @property
     def model_accounts(self) -> type[JSONExportable]:
         return self.get_model(BSTableType.Accounts)
@@ -707,6 +913,10 @@ class Backend(ABC):
     def model_error_log(self) -> type[JSONExportable]:
         return self.get_model(BSTableType.EventLog)
 
+    @property
+    def model_stats(self) -> type[JSONExportable]:
+        return self.get_model(BSTableType.Stats)
+
     # ----------------------------------------
     # Objects
     # ----------------------------------------
@@ -734,6 +944,79 @@ class Backend(ABC):
         raise NotImplementedError
         yield [Any]
 
+    def set_scan_resume(self, dirname: str | None, scan: str | None = None) -> bool:
+        """Keep resume tokens of long scans in 'dirname' and continue
+        interrupted scans from them. 'scan' separates concurrent scans of a table"""
+        message(f"{self.driver} backend does not support resuming scans")
+        return False
+
+    def scan_checkpoint(self, table_type: BSTableType, last: Any) -> None:
+        """Save 'last' as the resume token of the running scan of 'table_type'.
+        Call once every object up to 'last' (by _id) has been processed"""
+        return None
+
+    def raw_copy_supported(self, source: "Backend", table_type: BSTableType) -> bool:
+        """True if the documents exported with source.objs_export_raw() can be
+        inserted as is with objs_insert_raw()"""
+        return False
+
+    async def objs_export_raw(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[Any], None]:
+        """Export documents in the backend's native format without decoding them"""
+        async for objs in self.objs_export(
+            table_type, pipeline=pipeline, sample=sample, batch=batch
+        ):
+            yield objs
+
+    async def objs_insert_raw(
+        self, table_type: BSTableType, objs: Sequence[Any], force: bool = False
+    ) -> tuple[int, int]:
+        """Insert documents exported with objs_export_raw() as is.
+        Returns the number of documents inserted and not inserted"""
+        raise NotImplementedError
+
+    async def split_points(
+        self,
+        table_type: BSTableType,
+        n: int,
+        field: str = "_id",
+        exact: bool = False,
+        pipeline: List[Dict[str, Any]] = list(),
+    ) -> List[Any]:
+        """Return up to n-1 sorted values of 'field' that split the objects
+        matching 'pipeline' into 'n' parts of roughly equal size. Values are
+        sampled unless exact=True. Returns an empty list if the backend
+        does not support partitioning"""
+        return list()
+
+    async def objs_export_partitioned(
+        self,
+        table_type: BSTableType,
+        partitions: int = 1,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+        batch: int = 0,
+        raw: bool = False,
+    ) -> AsyncGenerator[List[Any], None]:
+        """Export raw objects reading 'partitions' disjoint ranges of the table
+        concurrently. The batches of the partitions are yielded as they arrive.
+        Falls back to objs_export() / objs_export_raw()"""
+        if raw:
+            async for objs in self.objs_export_raw(
+                table_type, pipeline=pipeline, sample=sample, batch=batch
+            ):
+                yield objs
+        else:
+            async for objs in self.objs_export(
+                table_type, pipeline=pipeline, sample=sample, batch=batch
+            ):
+                yield objs
+
     # ----------------------------------------
     # accounts
     # ----------------------------------------
@@ -749,6 +1032,19 @@ class Backend(ABC):
         """Get account from backend"""
         raise NotImplementedError
 
+    async def accounts_get_many(
+        self, ids: Iterable[int], batch: int = ACCOUNTS_BATCH
+    ) -> Dict[int, BSAccount]:
+        """Get accounts by ids. Returns a dict of account_id: account for
+        accounts found in the backend. Backends may query 'batch' ids at a time"""
+        debug("starting")
+        res: Dict[int, BSAccount] = dict()
+        account: BSAccount | None
+        for account_id in ids:
+            if (account := await self.account_get(account_id=account_id)) is not None:
+                res[account_id] = account
+        return res
+
     @abstractmethod
     async def account_update(
         self,
@@ -779,8 +1075,10 @@ class Backend(ABC):
         dist: OptAccountsDistributed | None = None,
         sample: float = 0,
         cache_valid: float = 0,
+        fields: Sequence[str] | None = None,
     ) -> AsyncGenerator[BSAccount, None]:
-        """Get accounts from backend"""
+        """Get accounts from backend. 'fields' limits the fields fetched: backends
+        supporting it return partial, unvalidated objects with only 'fields' set"""
         raise NotImplementedError
         yield BSAccount(id=-1)
 
@@ -821,30 +1119,90 @@ class Backend(ABC):
         """Store accounts to the backend. Returns number of accounts inserted and not inserted"""
         raise NotImplementedError
 
+    async def accounts_update(
+        self, updates: Dict[int, Dict[str, Any]]
+    ) -> tuple[int, int]:
+        """Set fields of many accounts. 'updates' maps account_id to a dict of
+        field values. Accounts not in the backend are not added since their
+        region is not known. Returns the number of accounts updated and not found"""
+        debug("starting")
+        updated: int = 0
+        not_found: int = 0
+        account: BSAccount | None
+        db_accounts: Dict[int, BSAccount] = await self.accounts_get_many(updates.keys())
+        for account_id, update in updates.items():
+            try:
+                if (account := db_accounts.get(account_id)) is None:
+                    not_found += 1
+                    continue
+                for field, value in update.items():
+                    setattr(account, field, value)
+                await self.account_insert(account=account, force=True)
+                updated += 1
+            except Exception as err:
+                error(f"could not update account_id={account_id}: {err}")
+        return updated, not_found
+
+    async def accounts_upsert(
+        self, accounts: Sequence[BSAccount]
+    ) -> tuple[int, int, int]:
+        """Replace or insert accounts. Returns number of accounts added, updated and unchanged.
+        Backends that cannot tell inserts from updates report all written accounts as added"""
+        debug("starting")
+        added: int = 0
+        for account in accounts:
+            if await self.account_insert(account, force=True):
+                added += 1
+        return added, 0, 0
+
     async def accounts_insert_worker(
-        self, accountQ: Queue[BSAccount], force: bool = False
+        self,
+        accountQ: Queue[BSAccount],
+        force: bool = False,
+        batch: int = ACCOUNTS_BATCH,
     ) -> EventCounter:
-        """insert/replace accounts. force=None: insert, force=True/False: upsert=force"""
+        """insert/replace accounts in batches of max 'batch' accounts.
+        force=False: insert, force=True: upsert"""
         debug(f"starting, force={force}")
         stats: EventCounter = EventCounter("accounts insert")
+        accounts: List[BSAccount]
+        added: int
+        updated: int
+        unchanged: int
+        done: bool = False
         try:
-            while True:
-                account = await accountQ.get()
+            while not done:
+                accounts = [await accountQ.get()]
+                try:
+                    while len(accounts) < batch:
+                        accounts.append(accountQ.get_nowait())
+                except QueueEmpty:
+                    pass
+                except QueueDone:
+                    done = True
                 try:
                     debug(
-                        f"Trying to insert account_id={account.id} into {self.backend}.{self.table_accounts}"
+                        f"Trying to insert {len(accounts)} accounts into {self.backend}.{self.table_accounts}"
                     )
-                    await self.account_insert(account, force=force)
                     if force:
-                        stats.log("added/updated")
+                        added, updated, unchanged = await self.accounts_upsert(accounts)
+                        stats.log("added", added)
+                        stats.log("updated", updated)
+                        stats.log("unchanged", unchanged)
+                        stats.log(
+                            "not added/updated",
+                            len(accounts) - added - updated - unchanged,
+                        )
                     else:
-                        stats.log("added")
-
+                        added, _ = await self.accounts_insert(accounts)
+                        stats.log("added", added)
+                        stats.log("not added", len(accounts) - added)
                 except Exception as err:
                     debug(f"Error: {err}")
-                    stats.log("not added/updated")
+                    stats.log("not added/updated", len(accounts))
                 finally:
-                    accountQ.task_done()
+                    for _ in accounts:
+                        accountQ.task_done()
         except QueueDone:
             # IterableQueue() support
             pass
@@ -988,9 +1346,9 @@ class Backend(ABC):
     # replay fields that can be searched: protagonist, battle_start_timestamp, account_id, vehicle_tier
     @abstractmethod
     async def replays_get(
-        self, since: int = 0, **summary_fields
+        self, since: int = 0, fields: Sequence[str] | None = None, **summary_fields
     ) -> AsyncGenerator[BSReplay, None]:
-        """Get replays from backed"""
+        """Get replays from backed. See accounts_get() for 'fields'"""
         raise NotImplementedError
         yield BSReplay()
 
@@ -1081,6 +1439,14 @@ class Backend(ABC):
         """Store tank stats to the backend. Returns number of stats inserted and not inserted"""
         raise NotImplementedError
 
+    async def tank_stats_upsert(
+        self, tank_stats: Sequence[TankStat]
+    ) -> tuple[int, int, int]:
+        """Replace or insert tank stats. Returns number of stats added, updated and unchanged.
+        Backends that cannot tell inserts from updates report all written stats as added"""
+        added, not_added = await self.tank_stats_insert(tank_stats, force=True)
+        return added, 0, not_added
+
     @abstractmethod
     async def tank_stats_get(
         self,
@@ -1091,8 +1457,11 @@ class Backend(ABC):
         missing: str | None = None,
         since: int = 0,
         sample: float = 0,
+        fields: Sequence[str] | None = None,
+        id_range: range | None = None,
     ) -> AsyncGenerator[TankStat, None]:
-        """Return tank stats from the backend"""
+        """Return tank stats from the backend. See accounts_get() for 'fields'.
+        'id_range' filters by account_id"""
         raise NotImplementedError
         yield TankStat()
 
@@ -1106,6 +1475,44 @@ class Backend(ABC):
         raise NotImplementedError
         yield list()
 
+    async def tank_stats_get_arrow(
+        self,
+        schema: pa.Schema,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        tanks: Sequence[BSTank] | None = None,
+        batch: int = TANK_STATS_BATCH,
+    ) -> AsyncGenerator[pa.RecordBatch, None]:
+        """Return tank stats as Arrow record batches of 'schema'"""
+        debug("starting")
+        datas: List[Dict[str, Any]] = list()
+        defaults: List[Any] = schema_defaults(TankStat, schema)
+        async for tank_stat in self.tank_stats_get(
+            release=release, regions=regions, tanks=tanks
+        ):
+            datas.append(tank_stat.obj_src())
+            if len(datas) >= batch:
+                yield record_batch_from_docs(datas, schema, defaults=defaults)
+                datas = list()
+        if len(datas) > 0:
+            yield record_batch_from_docs(datas, schema, defaults=defaults)
+
+    async def tank_stats_export_career_arrow(
+        self,
+        schema: pa.Schema,
+        account: BSAccount,
+        release: BSBlitzRelease,
+    ) -> AsyncGenerator[pa.RecordBatch, None]:
+        """Return the latest tank stats of an account as Arrow record batches of 'schema'"""
+        debug("starting")
+        defaults: List[Any] = schema_defaults(TankStat, schema)
+        async for tank_stats in self.tank_stats_export_career(
+            account=account, release=release
+        ):
+            yield record_batch_from_docs(
+                [ts.obj_src() for ts in tank_stats], schema, defaults=defaults
+            )
+
     @abstractmethod
     async def tank_stats_count(
         self,
@@ -1147,6 +1554,63 @@ class Backend(ABC):
         raise NotImplementedError
         yield TankStat()
 
+    async def tank_stats_prune(
+        self,
+        tank: BSTank,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        commit: bool = False,
+        sample: int = 0,
+    ) -> tuple[int, int]:
+        """Delete duplicate tank stats keeping the latest one. commit=False only counts
+        the duplicates. Returns the number of duplicates found and deleted"""
+        debug("starting")
+        found: int = 0
+        deleted: int = 0
+        async for dup in self.tank_stats_duplicates(
+            tank, release, regions, sample=sample
+        ):
+            found += 1
+            if commit and await self.tank_stat_delete(
+                account_id=dup.account_id,
+                tank_id=dup.tank_id,
+                last_battle_time=dup.last_battle_time,
+            ):
+                deleted += 1
+        return found, deleted
+
+    async def tank_stats_remap_release(
+        self,
+        release: BSBlitzRelease,
+        after: int = 0,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        commit: bool = False,
+        source: BSBlitzRelease | None = None,
+    ) -> tuple[int, int]:
+        """Set 'release' of the tank stats with after < last_battle_time <= release.cut_off
+        and a different release. 'source' limits the update to tank stats of that
+        release. commit=False only counts the tank stats to update.
+        Returns the number of tank stats matched and modified"""
+        debug("starting")
+        matched: int = 0
+        modified: int = 0
+        async for ts in self.tank_stats_get(
+            release=source,
+            regions=regions,
+            accounts=accounts,
+            since=after + 1,
+            fields=TANK_STATS_REMAP_FIELDS,
+        ):
+            if ts.last_battle_time > release.cut_off or ts.release == release.release:
+                continue
+            matched += 1
+            if commit:
+                ts.release = release.release
+                if await self.tank_stat_update(ts, fields=["release"]):
+                    modified += 1
+        return matched, modified
+
     @abstractmethod
     async def tank_stats_unique(
         self,
@@ -1156,8 +1620,9 @@ class Backend(ABC):
         regions: set[Region] = Region.API_regions(),
         account: BSAccount | None = None,
         tank: BSTank | None = None,
+        id_range: range | None = None,
     ) -> AsyncGenerator[A, None]:
-        """Return unique values of field"""
+        """Return unique values of field. 'id_range' filters by account_id"""
         raise NotImplementedError
         yield
 
@@ -1169,13 +1634,16 @@ class Backend(ABC):
         regions: set[Region] = Region.API_regions(),
         account: BSAccount | None = None,
         tank: BSTank | None = None,
+        id_range: range | None = None,
     ) -> int:
         """Return count of unique values of field. **args see tank_stats_unique()"""
         raise NotImplementedError
 
     async def tank_stats_get_worker(
-        self, tank_statsQ: Queue[TankStat], **getargs
+        self, tank_statsQ: Queue[TankStat], partitions: int = 1, **getargs
     ) -> EventCounter:
+        """Read tank stats to tank_statsQ. partitions > 1 reads disjoint account_id
+        ranges concurrently if the backend supports split_points()"""
         debug("starting")
         stats: EventCounter = EventCounter("tank stats")
         try:
@@ -1183,9 +1651,30 @@ class Backend(ABC):
                 debug("tank_stats_get_worker(): producer added")
                 await tank_statsQ.add_producer()
 
-            async for ts in self.tank_stats_get(**getargs):
-                await tank_statsQ.put(ts)
-                stats.log("queued")
+            id_ranges: List[range] = list()
+            if (
+                partitions > 1
+                and getargs.get("accounts") is None
+                and getargs.get("sample", 0) < 1
+            ):
+                if points := await self._tank_stats_split_points(
+                    partitions, **getargs
+                ):
+                    # the first and the last partitions are open-ended
+                    id_ranges = split_range_at(range(0, 2**63 - 1), points)
+
+            if len(id_ranges) > 1:
+                debug(f"reading {len(id_ranges)} partitions")
+                await gather(
+                    *[
+                        self._tank_stats_get_partition(
+                            tank_statsQ, stats, id_range=part, **getargs
+                        )
+                        for part in id_ranges
+                    ]
+                )
+            else:
+                await self._tank_stats_get_partition(tank_statsQ, stats, **getargs)
 
             if type(tank_statsQ) is IterableQueue:
                 await tank_statsQ.finish()
@@ -1197,6 +1686,18 @@ class Backend(ABC):
             error(f"{err}")
         return stats
 
+    async def _tank_stats_split_points(self, n: int, **getargs) -> List[Any]:
+        """Return account_ids that split the tank stats returned by
+        tank_stats_get(**getargs) into 'n' parts, see split_points()"""
+        return await self.split_points(BSTableType.TankStats, n, field="account_id")
+
+    async def _tank_stats_get_partition(
+        self, tank_statsQ: Queue[TankStat], stats: EventCounter, **getargs
+    ) -> None:
+        async for ts in self.tank_stats_get(**getargs):
+            await tank_statsQ.put(ts)
+            stats.log("queued")
+
     async def tank_stats_insert_worker(
         self, tank_statsQ: Queue[List[TankStat]], force: bool = False
     ) -> EventCounter:
@@ -1204,6 +1705,8 @@ class Backend(ABC):
         stats: EventCounter = EventCounter("tank-stats insert")
         try:
             added: int
+            updated: int
+            unchanged: int
             not_added: int
             read: int
             while True:
@@ -1216,11 +1719,20 @@ class Backend(ABC):
                     debug(
                         f"Trying to insert {read} tank stats into {self.backend}.{self.table_tank_stats}"
                     )
-                    added, not_added = await self.tank_stats_insert(
-                        tank_stats, force=force
-                    )
-                    stats.log("added", added)
-                    stats.log("not added", not_added)
+                    if force:
+                        added, updated, unchanged = await self.tank_stats_upsert(
+                            tank_stats
+                        )
+                        stats.log("added", added)
+                        stats.log("updated", updated)
+                        stats.log("unchanged", unchanged)
+                        stats.log("not added", read - added - updated - unchanged)
+                    else:
+                        added, not_added = await self.tank_stats_insert(
+                            tank_stats, force=force
+                        )
+                        stats.log("added", added)
+                        stats.log("not added", not_added)
                 except Exception as err:
                     debug(f"Error: {err}")
                     stats.log("errors", read)
@@ -1271,8 +1783,9 @@ class Backend(ABC):
         accounts: Sequence[BSAccount] | None = None,
         since: int = 0,
         sample: float = 0,
+        fields: Sequence[str] | None = None,
     ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
-        """Return player achievements from the backend"""
+        """Return player achievements from the backend. See accounts_get() for 'fields'"""
         raise NotImplementedError
         yield PlayerAchievementsMaxSeries()
 
@@ -1317,6 +1830,28 @@ class Backend(ABC):
         raise NotImplementedError
         yield PlayerAchievementsMaxSeries()
 
+    async def player_achievements_prune(
+        self,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        commit: bool = False,
+        sample: int = 0,
+    ) -> tuple[int, int]:
+        """Delete duplicate player achievements keeping the latest one. commit=False only
+        counts the duplicates. Returns the number of duplicates found and deleted"""
+        debug("starting")
+        found: int = 0
+        deleted: int = 0
+        async for dup in self.player_achievements_duplicates(
+            release, regions, sample=sample
+        ):
+            found += 1
+            if commit and await self.player_achievement_delete(
+                account=BSAccount(id=dup.account_id), added=dup.added
+            ):
+                deleted += 1
+        return found, deleted
+
     async def player_achievements_insert_worker(
         self,
         player_achievementsQ: Queue[List[PlayerAchievementsMaxSeries]],
@@ -1338,8 +1873,10 @@ class Backend(ABC):
                         debug(
                             f"Trying to insert {read} player achievements into {self.backend}.{self.table_player_achievements}"
                         )
-                        for pa in player_achievements:
-                            if await self.player_achievement_insert(pa, force=True):
+                        for player_achievement in player_achievements:
+                            if await self.player_achievement_insert(
+                                player_achievement, force=True
+                            ):
                                 stats.log("stats added/updated")
                             else:
                                 stats.log("stats not updated")
@@ -1363,6 +1900,44 @@ class Backend(ABC):
             error(f"{err}")
         return stats
 
+    # ----------------------------------------
+    # Stats
+    # ----------------------------------------
+
+    async def stats_get(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        tanks: Sequence[BSTank] | None = None,
+    ) -> AsyncGenerator[BSStats, None]:
+        """Return stats summaries from the backend. Yields nothing
+        if the backend does not maintain the Stats table"""
+        debug(f"{self.backend}: stats summaries not supported")
+        return
+        yield BSStats(stats_type=stats_type, release="", region=Region.eu)
+
+    async def stats_rebuild(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        tanks: Sequence[BSTank] | None = None,
+    ) -> int:
+        """Rebuild stats summaries from the stats tables.
+        Returns the number of summaries written or -1 if not supported"""
+        message(f"{self.driver} backend does not support stats summaries")
+        return -1
+
+    async def stats_invalidate(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+    ) -> None:
+        """Mark stats summaries not built before writes the summaries do not track"""
+        return None
+
     # ----------------------------------------
     # EventLog
     # ----------------------------------------
@@ -1507,3 +2082,113 @@ class Backend(ABC):
         except Exception as err:
             error(f"{err}")
         return stats
+
+
+##############################################
+#
+## AccountsUpdateBuffer()
+#
+##############################################
+
+
+class AccountsUpdateBuffer:
+    """Collect account field updates and write them to the backend in bulk
+    with Backend.accounts_update() every 'batch' accounts or 'interval' seconds"""
+
+    def __init__(
+        self,
+        db: Backend,
+        batch: int = ACCOUNTS_UPDATE_BATCH,
+        interval: float = ACCOUNTS_UPDATE_INTERVAL,
+    ):
+        assert batch > 0, "'batch' must be > 0"
+        self._db: Backend = db
+        self._batch: int = batch
+        self.interval: float = interval
+        self._updates: Dict[int, Dict[str, Any]] = dict()
+        self._last_flush: float = monotonic()
+        self.updated: int = 0
+        self.not_found: int = 0
+
+    def __len__(self) -> int:
+        return len(self._updates)
+
+    @property
+    def due(self) -> bool:
+        """True if the buffer should be flushed"""
+        return len(self._updates) >= self._batch or (
+            len(self._updates) > 0
+            and monotonic() - self._last_flush >= self.interval
+        )
+
+    async def update(self, account_id: int, update: Dict[str, Any]) -> None:
+        """Add field updates of an account. Flushes the buffer if due"""
+        if account_id in self._updates:
+            self._updates[account_id].update(update)
+        else:
+            self._updates[account_id] = update
+        if self.due:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write collected updates to the backend"""
+        self._last_flush = monotonic()
+        if len(self._updates) == 0:
+            return None
+        updates: Dict[int, Dict[str, Any]] = self._updates
+        self._updates = dict()
+        debug(f"flushing updates of {len(updates)} accounts")
+        updated, not_found = await self._db.accounts_update(updates)
+        self.updated += updated
+        self.not_found += not_found
+
+
+##############################################
+#
+## ScanProgress()
+#
+##############################################
+
+
+class ScanProgress:
+    """Track objects of a resumable scan that are processed out of order and
+    save the scan's resume token with Backend.scan_checkpoint() every 'interval'
+    objects. The token is the last object of which all preceding objects
+    have been processed"""
+
+    def __init__(
+        self,
+        db: Backend,
+        table_type: BSTableType,
+        interval: int = SCAN_CHECKPOINT_INTERVAL,
+    ):
+        assert interval > 0, "'interval' must be > 0"
+        self._db: Backend = db
+        self._table_type: BSTableType = table_type
+        self._interval: int = interval
+        self._pending: Dict[Any, bool] = dict()  # in scan order
+        self._done: int = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, idx: Any) -> None:
+        """Add an object read from the scan"""
+        self._pending[idx] = False
+
+    def done(self, idx: Any) -> None:
+        """Mark an object processed. Saves the resume token if due"""
+        if idx not in self._pending:
+            return None
+        self._pending[idx] = True
+        last: Any | None = None
+        while len(self._pending) > 0:
+            first: Any = next(iter(self._pending))
+            if not self._pending[first]:
+                break
+            del self._pending[first]
+            last = first
+            self._done += 1
+        if last is not None and self._done >= self._interval:
+            self._db.scan_checkpoint(self._table_type, last)
+            self._done = 0
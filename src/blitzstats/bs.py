@@ -25,7 +25,11 @@ from importlib.metadata import version, PackageNotFoundError
 # sys.path.insert(0, dirname(dirname(realpath(__file__))))
 
 from blitzstats.backend import Backend
+from blitzstats.cachedbackend import CachedBackend
 from blitzstats.mongobackend import MongoBackend  # noqa
+from blitzstats.sqlitebackend import SQLiteBackend  # noqa
+from blitzstats.filesbackend import FilesBackend  # noqa
+from blitzstats.memorybackend import MemoryBackend  # noqa
 from blitzstats import accounts
 from blitzstats import replays
 from blitzstats import releases
@@ -260,7 +264,7 @@ async def main() -> int:
         debug("arguments given:")
         debug(str(args))
 
-        backend: Backend | None = Backend.create(args.backend, config=config)
+        backend: Backend | None = CachedBackend.wrap(args.backend, config=config)
         assert backend is not None, "Could not initialize backend"
 
         if yappi is not None and args.profile > 0:
@@ -293,6 +297,9 @@ async def main() -> int:
         else:
             parser.print_help()
 
+        if isinstance(backend, CachedBackend):
+            verbose(backend.cache_stats.print(do_print=False, clean=True))
+
         if yappi is not None and args.profile > 0:
             print("Stopping profiling")
             yappi.stop()
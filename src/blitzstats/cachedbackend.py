@@ -0,0 +1,318 @@
+from configparser import ConfigParser
+from collections import OrderedDict
+from typing import (
+    Optional,
+    Any,
+    Iterable,
+    Sequence,
+    Hashable,
+    TypeVar,
+    Dict,
+    List,
+)
+from time import monotonic
+import logging
+
+from pydantic import BaseModel
+from pyutils import EventCounter
+
+from .backend import Backend, ACCOUNTS_BATCH
+from .models import BSAccount, BSBlitzRelease, BSTank
+
+# Setup logging
+logger = logging.getLogger()
+error = logger.error
+message = logger.warning
+verbose = logger.info
+debug = logger.debug
+
+# Constants
+CACHE_SIZE: int = 0  # disabled
+CACHE_TTL: float = 5 * 60  # seconds
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class CachedBackend(Backend):
+    """Read-through cache for point lookups (releases, tankopedia, accounts)
+    of any registered backend. Entries are evicted in LRU order when the cache
+    is full or after 'cache_ttl' seconds and invalidated by the matching
+    insert/update/delete calls.
+
+    Use CachedBackend.wrap() to create a cached version of a backend"""
+
+    _classes: Dict[type[Backend], type["CachedBackend"]] = dict()
+
+    def __init__(
+        self,
+        config: ConfigParser | None = None,
+        cache_size: int | None = None,
+        cache_ttl: float | None = None,
+        **kwargs,
+    ):
+        super().__init__(config=config, **kwargs)
+        self._cache_size: int = CACHE_SIZE
+        self._cache_ttl: float = CACHE_TTL
+        if config is not None and "BACKEND" in config.sections():
+            configBackend = config["BACKEND"]
+            self._cache_size = configBackend.getint("cache_size", self._cache_size)
+            self._cache_ttl = configBackend.getfloat("cache_ttl", self._cache_ttl)
+        if cache_size is not None:
+            self._cache_size = cache_size
+        if cache_ttl is not None:
+            self._cache_ttl = cache_ttl
+        self._cache: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._cache_stats: EventCounter = EventCounter(f"cache: {self.driver}")
+
+    @classmethod
+    def wrap(
+        cls,
+        driver: str,
+        config: ConfigParser | None = None,
+        cache_size: int | None = None,
+        cache_ttl: float | None = None,
+        **kwargs,
+    ) -> Optional[Backend]:
+        """Create a backend of 'driver' with a read-through cache.
+        Returns a plain backend if the cache is disabled (cache_size = 0)"""
+        debug("starting")
+        try:
+            if cache_size is None and config is not None and "BACKEND" in config:
+                cache_size = config["BACKEND"].getint("cache_size", CACHE_SIZE)
+            if not cache_size:
+                return Backend.create(driver, config=config, **kwargs)
+            if (backend := Backend.get(driver)) is None:
+                raise ValueError(f"Backend not implemented: {driver}")
+            if backend not in cls._classes:
+                cls._classes[backend] = type(
+                    f"Cached{backend.__name__}", (cls, backend), {}
+                )
+            return cls._classes[backend](
+                config=config, cache_size=cache_size, cache_ttl=cache_ttl, **kwargs
+            )
+        except Exception as err:
+            error(f"Could not create cached backend {driver}: {err}")
+        return None
+
+    @property
+    def cache_stats(self) -> EventCounter:
+        return self._cache_stats
+
+    def cache_clear(self) -> None:
+        """Clear the cache"""
+        self._cache.clear()
+
+    def _cache_get(self, key: Hashable) -> Any | None:
+        """Get a copy of a cached value or None"""
+        try:
+            expires, value = self._cache[key]
+            if monotonic() < expires:
+                self._cache.move_to_end(key)
+                self._cache_stats.log("hits")
+                return value.model_copy() if isinstance(value, BaseModel) else value
+            del self._cache[key]
+            self._cache_stats.log("expired")
+        except KeyError:
+            pass
+        self._cache_stats.log("misses")
+        return None
+
+    def _cache_put(self, key: Hashable, value: M | None) -> M | None:
+        """Store a copy of a value in the cache and return the value"""
+        if value is None or self._cache_size <= 0:
+            return value
+        self._cache[key] = (monotonic() + self._cache_ttl, value.model_copy())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+            self._cache_stats.log("evictions")
+        return value
+
+    def _cache_invalidate(self, *keys: Hashable) -> None:
+        for key in keys:
+            if self._cache.pop(key, None) is not None:
+                self._cache_stats.log("invalidated")
+
+    def _cache_invalidate_releases(self) -> None:
+        """Releases depend on each other so all are invalidated"""
+        self._cache_invalidate(
+            *[key for key in self._cache.keys() if key[0] == "release"]
+        )
+
+    ########################################################
+    #
+    # accounts
+    #
+    ########################################################
+
+    async def account_get(self, account_id: int) -> BSAccount | None:
+        if (account := self._cache_get(("account", account_id))) is not None:
+            return account
+        return self._cache_put(
+            ("account", account_id), await super().account_get(account_id)
+        )
+
+    async def accounts_get_many(
+        self, ids: Iterable[int], batch: int = ACCOUNTS_BATCH
+    ) -> Dict[int, BSAccount]:
+        res: Dict[int, BSAccount] = dict()
+        missing: List[int] = list()
+        account: BSAccount | None
+        for account_id in ids:
+            if (account := self._cache_get(("account", account_id))) is not None:
+                res[account_id] = account
+            else:
+                missing.append(account_id)
+        if len(missing) > 0:
+            for account_id, account in (
+                await super().accounts_get_many(missing, batch=batch)
+            ).items():
+                res[account_id] = account
+                self._cache_put(("account", account_id), account)
+        return res
+
+    async def account_insert(self, account: BSAccount, force: bool = False) -> bool:
+        try:
+            return await super().account_insert(account, force=force)
+        finally:
+            self._cache_invalidate(("account", account.id))
+
+    async def account_update(
+        self,
+        account: BSAccount,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        try:
+            return await super().account_update(account, update=update, fields=fields)
+        finally:
+            self._cache_invalidate(("account", account.id))
+
+    async def account_delete(self, account_id: int) -> bool:
+        try:
+            return await super().account_delete(account_id)
+        finally:
+            self._cache_invalidate(("account", account_id))
+
+    async def accounts_insert(self, accounts: Sequence[BSAccount]) -> tuple[int, int]:
+        try:
+            return await super().accounts_insert(accounts)
+        finally:
+            self._cache_invalidate(*[("account", account.id) for account in accounts])
+
+    async def accounts_update(
+        self, updates: Dict[int, Dict[str, Any]]
+    ) -> tuple[int, int]:
+        # the generic accounts_update() reads the accounts before writing them
+        self._cache_invalidate(*[("account", account_id) for account_id in updates])
+        try:
+            return await super().accounts_update(updates)
+        finally:
+            self._cache_invalidate(*[("account", account_id) for account_id in updates])
+
+    async def accounts_upsert(
+        self, accounts: Sequence[BSAccount]
+    ) -> tuple[int, int, int]:
+        try:
+            return await super().accounts_upsert(accounts)
+        finally:
+            self._cache_invalidate(*[("account", account.id) for account in accounts])
+
+    ########################################################
+    #
+    # releases
+    #
+    ########################################################
+
+    async def release_get(self, release: str) -> BSBlitzRelease | None:
+        key: tuple[str, str, str] = ("release", "get", release)
+        if (rel := self._cache_get(key)) is not None:
+            return rel
+        return self._cache_put(key, await super().release_get(release))
+
+    async def release_get_latest(self) -> BSBlitzRelease | None:
+        if (rel := self._cache_get(("release", "latest"))) is not None:
+            return rel
+        return self._cache_put(
+            ("release", "latest"), await super().release_get_latest()
+        )
+
+    async def release_get_current(self) -> BSBlitzRelease | None:
+        if (rel := self._cache_get(("release", "current"))) is not None:
+            return rel
+        return self._cache_put(
+            ("release", "current"), await super().release_get_current()
+        )
+
+    async def release_get_next(self, release: BSBlitzRelease) -> BSBlitzRelease | None:
+        key: tuple[str, str, str] = ("release", "next", release.release)
+        if (rel := self._cache_get(key)) is not None:
+            return rel
+        return self._cache_put(key, await super().release_get_next(release))
+
+    async def release_get_previous(
+        self, release: BSBlitzRelease
+    ) -> BSBlitzRelease | None:
+        key: tuple[str, str, str] = ("release", "previous", release.release)
+        if (rel := self._cache_get(key)) is not None:
+            return rel
+        return self._cache_put(key, await super().release_get_previous(release))
+
+    async def release_insert(
+        self, release: BSBlitzRelease, force: bool = False
+    ) -> bool:
+        try:
+            return await super().release_insert(release, force=force)
+        finally:
+            self._cache_invalidate_releases()
+
+    async def release_update(
+        self,
+        release: BSBlitzRelease,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        try:
+            return await super().release_update(release, update=update, fields=fields)
+        finally:
+            self._cache_invalidate_releases()
+
+    async def release_delete(self, release: str) -> bool:
+        try:
+            return await super().release_delete(release)
+        finally:
+            self._cache_invalidate_releases()
+
+    ########################################################
+    #
+    # tankopedia
+    #
+    ########################################################
+
+    async def tankopedia_get(self, tank_id: int) -> BSTank | None:
+        if (tank := self._cache_get(("tank", tank_id))) is not None:
+            return tank
+        return self._cache_put(("tank", tank_id), await super().tankopedia_get(tank_id))
+
+    async def tankopedia_insert(self, tank: BSTank, force: bool = True) -> bool:
+        try:
+            return await super().tankopedia_insert(tank, force=force)
+        finally:
+            self._cache_invalidate(("tank", tank.tank_id))
+
+    async def tankopedia_update(
+        self,
+        tank: BSTank,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        try:
+            return await super().tankopedia_update(tank, update=update, fields=fields)
+        finally:
+            self._cache_invalidate(("tank", tank.tank_id))
+
+    async def tankopedia_delete(self, tank: BSTank) -> bool:
+        try:
+            return await super().tankopedia_delete(tank)
+        finally:
+            self._cache_invalidate(("tank", tank.tank_id))
@@ -0,0 +1,2185 @@
+from configparser import ConfigParser
+from argparse import Namespace, ArgumentParser
+from datetime import datetime
+from enum import Enum
+from os import makedirs, remove, replace, walk
+from os.path import isfile, join as path_join
+from time import time_ns
+from typing import (
+    Optional,
+    Any,
+    Iterable,
+    Iterator,
+    Sequence,
+    AsyncGenerator,
+    TypeVar,
+    cast,
+    Callable,
+    Dict,
+    List,
+)
+import logging
+
+from asyncio import Lock, to_thread
+from bson import ObjectId, json_util
+from pydantic import ValidationError
+
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.dataset as ds  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+from pydantic_exportables import (
+    JSONExportable,
+    AliasMapper,
+    Idx,
+    PyObjectId,
+)
+from pyutils.utils import epoch_now
+from pyutils import awrap
+
+from blitzmodels import (
+    Region,
+    TankStat,
+    PlayerAchievementsMaxSeries,
+    EnumNation,
+    EnumVehicleTier,
+)
+
+from .arrow import dataset_write, EXPORT_DATA_FORMATS, DEFAULT_EXPORT_DATA_FORMAT
+from .backend import (
+    Backend,
+    OptAccountsDistributed,
+    OptAccountsInactive,
+    BSTableType,
+    EventLog,
+    A,
+)
+from .models import (
+    BSAccount,
+    BSBlitzRelease,
+    StatsTypes,
+    BSReplay,
+    BSTank,
+    EnumVehicleTypeInt,
+)
+
+# Setup logging
+logger = logging.getLogger()
+error = logger.error
+message = logger.warning
+verbose = logger.info
+debug = logger.debug
+
+# Constants
+FILES_BATCH_SIZE: int = 10000
+FILES_SCHEMA_FILE: str = "_common_metadata"
+
+# Tables stored as partitioned datasets. Rest are stored as JSON files
+FILES_PARTITIONS: Dict[BSTableType, List[str]] = {
+    BSTableType.Accounts: ["region"],
+    BSTableType.TankStats: ["region", "release"],
+    BSTableType.PlayerAchievements: ["region", "release"],
+}
+
+D = TypeVar("D", bound="JSONExportable")
+OutJSONExportable = TypeVar("OutJSONExportable", bound="JSONExportable")
+
+
+##############################################
+#
+# Utils
+#
+##############################################
+
+
+def _key(idx: Idx) -> Any:
+    """Convert document index into a dataset key"""
+    if isinstance(idx, ObjectId):
+        return str(idx)
+    return idx
+
+
+def _to_row(obj: Any) -> Any:
+    """Convert a document into a form Arrow can store"""
+    if isinstance(obj, dict):
+        return {k: _to_row(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_to_row(v) for v in obj]
+    elif isinstance(obj, ObjectId):
+        return str(obj)
+    elif isinstance(obj, Enum):
+        return obj.value
+    return obj
+
+
+def _from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a dataset row back to a document. Drops null fields
+    since fragments written earlier may lack fields added later"""
+    return {
+        k: _from_row(v) if isinstance(v, dict) else v
+        for k, v in row.items()
+        if v is not None
+    }
+
+
+def _next_batch(batches: Iterator[pa.RecordBatch]) -> pa.RecordBatch | None:
+    return next(batches, None)
+
+
+##############################################
+#
+# class FilesBackend(Backend)
+#
+##############################################
+
+
+class FilesBackend(Backend):
+    """Backend storing TankStats, PlayerAchievements and Accounts as
+    Hive-partitioned Parquet datasets (region/release). Other tables
+    are small and stored as JSON files.
+
+    Inserts append new fragments to the dataset. Run 'setup compact'
+    to merge the fragments of a partition into a single file."""
+
+    driver: str = "files"
+
+    def __init__(
+        self,
+        config: ConfigParser | None = None,
+        db_config: Dict[str, Any] | None = None,
+        database: str | None = None,
+        table_config: Dict[BSTableType, str] | None = None,
+        model_config: Dict[BSTableType, type[JSONExportable]] | None = None,
+        **kwargs,
+    ):
+        """Init files backend from config file and CLI args
+        CLI arguments overide settings in the config file"""
+
+        debug("starting")
+        try:
+            super().__init__(
+                config=config, db_config=db_config, database=database, **kwargs
+            )
+
+            files_rc: Dict[str, Any] = dict()
+            self._write_lock: Lock = Lock()
+            self._docs: Dict[BSTableType, Dict[Any, Dict[str, Any]]] = dict()
+
+            # defaults
+            files_rc["path"] = "./data"
+            files_rc["format"] = DEFAULT_EXPORT_DATA_FORMAT
+            files_rc["compression"] = "lz4"
+            files_rc["batch"] = FILES_BATCH_SIZE
+
+            if config is not None and "FILES" in config.sections():
+                configFiles = config["FILES"]
+                self._database = configFiles.get("database", self.database)
+                files_rc["path"] = configFiles.get("path", files_rc["path"])
+                files_rc["format"] = configFiles.get("format", files_rc["format"])
+                files_rc["compression"] = configFiles.get(
+                    "compression", files_rc["compression"]
+                )
+                files_rc["batch"] = configFiles.getint("batch", files_rc["batch"])
+
+                self.set_table(BSTableType.Accounts, configFiles.get("t_accounts"))
+                self.set_table(BSTableType.Tankopedia, configFiles.get("t_tankopedia"))
+                self.set_table(BSTableType.Releases, configFiles.get("t_releases"))
+                self.set_table(BSTableType.Replays, configFiles.get("t_replays"))
+                self.set_table(BSTableType.TankStats, configFiles.get("t_tank_stats"))
+                self.set_table(
+                    BSTableType.PlayerAchievements,
+                    configFiles.get("t_player_achievements"),
+                )
+                self.set_table(BSTableType.AccountLog, configFiles.get("t_account_log"))
+                self.set_table(BSTableType.EventLog, configFiles.get("t_error_log"))
+                self.set_table(BSTableType.Stats, configFiles.get("t_stats"))
+
+                self.set_model(BSTableType.Accounts, configFiles.get("m_accounts"))
+                self.set_model(BSTableType.Tankopedia, configFiles.get("m_tankopedia"))
+                self.set_model(BSTableType.Releases, configFiles.get("m_releases"))
+                self.set_model(BSTableType.Replays, configFiles.get("m_replays"))
+                self.set_model(BSTableType.TankStats, configFiles.get("m_tank_stats"))
+                self.set_model(
+                    BSTableType.PlayerAchievements,
+                    configFiles.get("m_player_achievements"),
+                )
+                self.set_model(BSTableType.AccountLog, configFiles.get("m_account_log"))
+                self.set_model(BSTableType.EventLog, configFiles.get("m_event_log"))
+                self.set_model(BSTableType.Stats, configFiles.get("m_stats"))
+
+            if db_config is not None:
+                kwargs = db_config | kwargs
+            kwargs = files_rc | kwargs
+            # remove unset kwargs
+            kwargs = {k: v for k, v in kwargs.items() if v is not None}
+
+            assert (
+                kwargs["format"] in EXPORT_DATA_FORMATS
+            ), f"format has to be one of: {', '.join(EXPORT_DATA_FORMATS)}"
+
+            self.set_database(database)
+            self._db_config = kwargs
+            self.config_tables(table_config=table_config)
+            self.config_models(model_config=model_config)
+
+            debug(
+                "config: "
+                + ", ".join(["{0}={1}".format(k, str(v)) for k, v in kwargs.items()])
+            )
+        except Exception as err:
+            error(f"Error initializing files backend: {err}")
+            raise err
+
+    def debug(self) -> None:
+        """Print out debug info"""
+        print(f"###### DEBUG {self.driver} ######")
+        print(f"DB path: {self.basedir}")
+        print(f"Format: {self.format}")
+
+    def copy(self, **kwargs) -> Optional["Backend"]:
+        """Create a copy of the backend"""
+        try:
+            debug("starting")
+
+            database: str = self.database
+            if "database" in kwargs.keys():
+                database = kwargs["database"]
+                del kwargs["database"]
+
+            return FilesBackend(
+                config=None,
+                db_config=self.db_config,
+                database=database,
+                table_config=self.table_config,
+                model_config=self.model_config,
+                **kwargs,
+            )
+        except Exception as err:
+            error(f"Error creating copy: {err}")
+        return None
+
+    @property
+    def basedir(self) -> str:
+        return path_join(self.db_config["path"], self.database)
+
+    @property
+    def format(self) -> str:
+        return self.db_config["format"]
+
+    @property
+    def batch(self) -> int:
+        return self.db_config["batch"]
+
+    async def test(self) -> bool:
+        try:
+            debug(f"testing access: {self.basedir}")
+            await to_thread(makedirs, self.basedir, exist_ok=True)
+            debug(f"access succeeded: {self.backend}")
+            return True
+        except Exception as err:
+            error(f"Error accessing: {self.backend}: {err}")
+        return False
+
+    @classmethod
+    def add_args_import(
+        cls, parser: ArgumentParser, config: Optional[ConfigParser] = None
+    ) -> bool:
+        """Add argument parser for import backend"""
+        try:
+            debug("starting")
+            super().add_args_import(parser=parser, config=config)
+
+            parser.add_argument(
+                "--path",
+                metavar="PATH",
+                type=str,
+                default=None,
+                dest="import_path",
+                help="Directory to import from. Uses current backend as default",
+            )
+            parser.add_argument(
+                "--database",
+                metavar="DATABASE",
+                type=str,
+                default=None,
+                dest="import_database",
+                help="Database to use. Uses current database as default",
+            )
+            parser.add_argument(
+                "--table",
+                metavar="TABLE",
+                type=str,
+                default=None,
+                dest="import_table",
+                help="Table to import from. Uses current database as default",
+            )
+            return True
+        except Exception as err:
+            error(f"{err}")
+        return False
+
+    @classmethod
+    def read_args(
+        cls, args: Namespace, driver: str, importdb: bool = False
+    ) -> Dict[str, Any]:
+        debug("starting")
+        if driver != cls.driver:
+            raise ValueError(f"calling {cls}.read_args() for {driver} backend")
+        kwargs: Dict[str, Any] = Backend.read_args_helper(
+            args, ["path", "database"], importdb=importdb
+        )
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        debug(f"args={kwargs}")
+        return kwargs
+
+    @property
+    def backend(self) -> str:
+        return f"{self.driver}://{self.basedir}"
+
+    def __eq__(self, __o: object) -> bool:
+        return (
+            __o is not None
+            and isinstance(__o, FilesBackend)
+            and self.basedir == __o.basedir
+        )
+
+    async def init(self, tables: List[str] = [tt.name for tt in BSTableType]) -> bool:  # type: ignore
+        """Init files backend: create directories"""
+        try:
+            debug("starting")
+            for table in tables:
+                try:
+                    table_type: BSTableType = BSTableType(table)
+                    if table_type in FILES_PARTITIONS:
+                        await to_thread(makedirs, self._path(table_type), exist_ok=True)
+                    else:
+                        await to_thread(makedirs, self.basedir, exist_ok=True)
+                    message(f"Table created: {self.table_uri(table_type)}")
+                except Exception as err:
+                    error(f"{self.backend}: Could not init table: {err}")
+            return True
+        except Exception as err:
+            error(f"Error initializing {self.backend}: {err}")
+        return False
+
+    async def compact(
+        self, tables: List[str] = [tt.name for tt in BSTableType]
+    ) -> bool:  # type: ignore
+        """Merge dataset fragments into a single file per partition"""
+        debug("starting")
+        res: bool = True
+        for table in tables:
+            try:
+                table_type: BSTableType = BSTableType(table)
+                if table_type not in FILES_PARTITIONS:
+                    continue
+                async with self._write_lock:
+                    merged: int = await to_thread(self._compact, table_type)
+                message(f"{self.table_uri(table_type)}: compacted {merged} partitions")
+            except Exception as err:
+                error(f"{self.backend}: Could not compact table {table}: {err}")
+                res = False
+        return res
+
+    ########################################################
+    #
+    # FilesBackend(): datasets
+    #
+    ########################################################
+
+    def _path(self, table_type: BSTableType) -> str:
+        """Path of a table's dataset directory or JSON file"""
+        if table_type in FILES_PARTITIONS:
+            return path_join(self.basedir, self.get_table(table_type))
+        return path_join(self.basedir, f"{self.get_table(table_type)}.json")
+
+    def _alias(self, table_type: BSTableType) -> Callable:
+        return AliasMapper(self.get_model(table_type)).alias
+
+    def _partitioning(self, table_type: BSTableType) -> ds.Partitioning:
+        alias: Callable = self._alias(table_type)
+        return ds.partitioning(
+            pa.schema([(alias(f), pa.string()) for f in FILES_PARTITIONS[table_type]]),
+            flavor="hive",
+        )
+
+    def _schema(self, table_type: BSTableType) -> pa.Schema | None:
+        """Read the dataset's schema. The schema is unified over all
+        the fragments and stored when new data is appended"""
+        if isfile(schema_file := path_join(self._path(table_type), FILES_SCHEMA_FILE)):
+            return pq.read_schema(schema_file)
+        return None
+
+    def _dataset(self, table_type: BSTableType) -> ds.Dataset | None:
+        """Open dataset or return None if the dataset does not exist"""
+        if (schema := self._schema(table_type)) is None:
+            return None
+        return ds.dataset(
+            self._path(table_type),
+            schema=schema,
+            format=self.format,
+            partitioning=self._partitioning(table_type),
+        )
+
+    def _append(self, table_type: BSTableType, docs: List[Dict[str, Any]]) -> int:
+        """Write documents as a new fragment into the dataset"""
+        if len(docs) == 0:
+            return 0
+        path: str = self._path(table_type)
+        makedirs(path, exist_ok=True)
+        schema: pa.Schema = pa.Table.from_pylist(docs).schema
+        if (old_schema := self._schema(table_type)) is not None:
+            schema = pa.unify_schemas(
+                [old_schema, schema], promote_options="permissive"
+            )
+        table: pa.Table = pa.Table.from_pylist(docs, schema=schema)
+        if old_schema is None or not schema.equals(old_schema):
+            pq.write_metadata(schema, path_join(path, FILES_SCHEMA_FILE))
+        dataset_write(
+            table,
+            basedir=path,
+            basename=f"part-{time_ns()}",
+            export_format=self.format,
+            partitioning=self._partitioning(table_type),
+            schema=schema,
+        )
+        return table.num_rows
+
+    def _writer(
+        self, path: str, schema: pa.Schema
+    ) -> pq.ParquetWriter | pa.ipc.RecordBatchFileWriter:
+        """Open a file writer for the configured format. Arrow IPC files
+        support only lz4 and zstd compression"""
+        compression: str | None = self.db_config["compression"]
+        if self.format == "arrow":
+            if compression not in ["lz4", "zstd"]:
+                compression = None
+            return pa.ipc.new_file(
+                path, schema, options=pa.ipc.IpcWriteOptions(compression=compression)
+            )
+        return pq.ParquetWriter(path, schema, compression=compression)
+
+    def _remove(self, table_type: BSTableType, filter: ds.Expression) -> int:
+        """Remove rows matching filter by rewriting the fragments.
+        The filter cannot refer to partition fields"""
+        if (dataset := self._dataset(table_type)) is None:
+            return 0
+        removed: int = 0
+        for fragment in dataset.get_fragments():
+            table: pa.Table = fragment.to_table()
+            keep: pa.Table = table.filter(~filter)
+            if (n := table.num_rows - keep.num_rows) == 0:
+                continue
+            removed += n
+            if keep.num_rows == 0:
+                remove(fragment.path)
+            else:
+                with self._writer(fragment.path + ".tmp", keep.schema) as writer:
+                    writer.write_table(keep)
+                replace(fragment.path + ".tmp", fragment.path)
+        return removed
+
+    def _compact(self, table_type: BSTableType) -> int:
+        """Merge fragments of each partition into a single file"""
+        if (schema := self._schema(table_type)) is None:
+            return 0
+        alias: Callable = self._alias(table_type)
+        partitions: List[str] = [alias(f) for f in FILES_PARTITIONS[table_type]]
+        physical: pa.Schema = pa.schema(
+            [field for field in schema if field.name not in partitions]
+        )
+        merged: int = 0
+        for dirpath, _, filenames in walk(self._path(table_type)):
+            fragments: List[str] = [
+                path_join(dirpath, f)
+                for f in filenames
+                if f.endswith(f".{self.format}")
+            ]
+            if len(fragments) < 2:
+                continue
+            debug(f"compacting {len(fragments)} fragments in {dirpath}")
+            compacted: str = path_join(
+                dirpath, f"part-{time_ns()}-compact.{self.format}"
+            )
+            with self._writer(compacted + ".tmp", physical) as writer:
+                for batch in ds.dataset(
+                    fragments, schema=physical, format=self.format
+                ).to_batches(batch_size=self.batch):
+                    writer.write_batch(batch)
+            replace(compacted + ".tmp", compacted)
+            for fragment in fragments:
+                remove(fragment)
+            merged += 1
+        return merged
+
+    async def _batches(
+        self,
+        table_type: BSTableType,
+        filter: ds.Expression | None = None,
+        columns: List[str] | None = None,
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[pa.RecordBatch, None]:
+        """Scan a dataset in a thread. 0 < sample < 1 is a Bernoulli sample,
+        sample >= 1 returns approximately 'sample' random rows"""
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        if (dataset := self._dataset(table_type)) is None:
+            return
+        if batch == 0:
+            batch = self.batch
+        limit: int = 0
+        if sample >= 1:
+            limit = int(sample)
+            total: int = await to_thread(dataset.count_rows, filter=filter)
+            sample = min(1, sample / total) if total > 0 else 1
+        batches: Iterator[pa.RecordBatch] = iter(
+            dataset.to_batches(filter=filter, columns=columns, batch_size=batch)
+        )
+        rows: int = 0
+        while (record := await to_thread(_next_batch, batches)) is not None:
+            if 0 < sample < 1:
+                record = record.filter(pc.less(pc.random(record.num_rows), sample))
+            if limit > 0 and rows + record.num_rows > limit:
+                record = record.slice(0, limit - rows)
+            if record.num_rows > 0:
+                rows += record.num_rows
+                yield record
+            if limit > 0 and rows >= limit:
+                break
+
+    async def _docs_get(
+        self,
+        table_type: BSTableType,
+        filter: ds.Expression | None = None,
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[Dict[str, Any]], None]:
+        """Return raw documents from a dataset in batches"""
+        async for record in self._batches(
+            table_type, filter=filter, sample=sample, batch=batch
+        ):
+            yield [_from_row(row) for row in record.to_pylist()]
+
+    async def _count(
+        self, table_type: BSTableType, filter: ds.Expression | None = None
+    ) -> int:
+        if (dataset := self._dataset(table_type)) is None:
+            return 0
+        return await to_thread(dataset.count_rows, filter=filter)
+
+    ########################################################
+    #
+    # FilesBackend(): JSON tables
+    #
+    ########################################################
+
+    def _docs_load(self, table_type: BSTableType) -> Dict[Any, Dict[str, Any]]:
+        """Load a JSON table into memory"""
+        if table_type not in self._docs:
+            docs: Dict[Any, Dict[str, Any]] = dict()
+            if isfile(filename := self._path(table_type)):
+                with open(filename, "r", encoding="utf-8") as f:
+                    for i, doc in enumerate(json_util.loads(f.read())):
+                        docs[_key(doc["_id"]) if "_id" in doc else i] = doc
+            self._docs[table_type] = docs
+        return self._docs[table_type]
+
+    def _docs_save(self, table_type: BSTableType) -> None:
+        """Write a JSON table to disk"""
+        makedirs(self.basedir, exist_ok=True)
+        filename: str = self._path(table_type)
+        with open(filename + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(list(self._docs_load(table_type).values())))
+        replace(filename + ".tmp", filename)
+
+    async def _docs_all(self, table_type: BSTableType) -> List[Dict[str, Any]]:
+        return list((await to_thread(self._docs_load, table_type)).values())
+
+    ########################################################
+    #
+    # FilesBackend(): generic datas_funcs
+    #
+    ########################################################
+
+    def _filter_id(self, table_type: BSTableType, idxs: Iterable[Idx]) -> ds.Expression:
+        return ds.field("_id").isin([_key(idx) for idx in idxs])
+
+    def _filter_partitions(
+        self, table_type: BSTableType, docs: Iterable[Dict[str, Any]]
+    ) -> ds.Expression | None:
+        """Filter for the partitions the documents belong to. Used to prune
+        fragments when scanning. None if a document lacks a partition field"""
+        filter: ds.Expression | None = None
+        alias: Callable = self._alias(table_type)
+        for field in FILES_PARTITIONS[table_type]:
+            values: set[Any] = {_to_row(doc.get(alias(field))) for doc in docs}
+            if None in values:
+                return None
+            expr: ds.Expression = ds.field(alias(field)).isin(
+                [str(value) for value in values]
+            )
+            filter = expr if filter is None else filter & expr
+        return filter
+
+    async def _data_insert(self, table_type: BSTableType, obj: JSONExportable) -> bool:
+        """Generic method to insert an object of data_type"""
+        added, _ = await self._datas_insert(table_type, [obj])
+        return added == 1
+
+    async def _data_get(
+        self, table_type: BSTableType, idx: Idx
+    ) -> JSONExportable | None:
+        """Get document in its native data type"""
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            if table_type in FILES_PARTITIONS:
+                async for docs in self._docs_get(
+                    table_type, filter=self._filter_id(table_type, [idx])
+                ):
+                    for doc in docs:
+                        return model.parse_obj(doc)
+            elif (
+                doc := (await to_thread(self._docs_load, table_type)).get(_key(idx))
+            ) is not None:
+                return model.parse_obj(doc)
+        except Exception as err:
+            error(f"Error getting _id={idx} from {self.table_uri(table_type)}: {err}")
+        return None
+
+    async def _data_replace(
+        self, table_type: BSTableType, obj: JSONExportable, upsert: bool = False
+    ) -> bool:
+        """Generic method to replace an object of data_type"""
+        try:
+            debug("starting")
+            model: type[JSONExportable] = self.get_model(table_type)
+            if (data := model.transform(obj)) is None:
+                raise ValueError(f"could not transform obj: _id={obj.index}")
+            idx: Any = _key(data.index)
+            async with self._write_lock:
+                if table_type in FILES_PARTITIONS:
+                    removed: int = await to_thread(
+                        self._remove, table_type, self._filter_id(table_type, [idx])
+                    )
+                    if removed == 0 and not upsert:
+                        return False
+                    await to_thread(self._append, table_type, [_to_row(data.obj_db())])
+                else:
+                    docs: Dict[Any, Dict[str, Any]] = await to_thread(
+                        self._docs_load, table_type
+                    )
+                    if idx not in docs and not upsert:
+                        return False
+                    docs[idx] = data.obj_db()
+                    await to_thread(self._docs_save, table_type)
+            return True
+        except Exception as err:
+            error(f"could not replace obj in {self.table_uri(table_type)}: {err}")
+        return False
+
+    async def _data_update(
+        self,
+        table_type: BSTableType,
+        idx: Idx | None = None,
+        obj: JSONExportable | None = None,
+        update: dict | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Generic method to update an object of data_type"""
+        debug("starting")
+        model: type[JSONExportable] = self.get_model(table_type)
+
+        if obj is not None:
+            if (data := model.transform(obj)) is None:
+                raise ValueError(f"Could not transform {type(obj)} to {model}: {obj}")
+
+            if idx is None:
+                idx = data.index
+
+            if update is not None:
+                pass
+            elif fields is not None:
+                update = data.dict(include=set(fields))
+            else:
+                raise ValueError("'update', 'obj' and 'fields' cannot be all None")
+
+        elif idx is None or update is None:
+            raise ValueError("'update' is required with 'idx'")
+
+        if (current := await self._data_get(table_type, idx)) is None:
+            return False
+        doc: Dict[str, Any] = current.obj_db()
+        doc.update(AliasMapper(model).map(update.items()))
+        return await self._data_replace(table_type, model.parse_obj(doc))
+
+    async def _data_delete(self, table_type: BSTableType, idx: Idx) -> bool:
+        """Delete a document"""
+        try:
+            async with self._write_lock:
+                if table_type in FILES_PARTITIONS:
+                    return (
+                        await to_thread(
+                            self._remove,
+                            table_type,
+                            self._filter_id(table_type, [idx]),
+                        )
+                        > 0
+                    )
+                docs: Dict[Any, Dict[str, Any]] = await to_thread(
+                    self._docs_load, table_type
+                )
+                if docs.pop(_key(idx), None) is None:
+                    return False
+                await to_thread(self._docs_save, table_type)
+                return True
+        except Exception as err:
+            debug(
+                f"Error while deleting _id={idx} from {self.table_uri(table_type)}: {err}"
+            )
+        return False
+
+    async def _datas_insert(
+        self, table_type: BSTableType, objs: Sequence[D], force: bool = False
+    ) -> tuple[int, int]:
+        """Store data to the backend. Existing documents are replaced
+        if force=True. Returns the number of added and not added"""
+        debug("starting")
+        added: int = 0
+        not_added: int = 0
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            datas: Dict[Any, Dict[str, Any]] = {
+                _key(data.index): data.obj_db() for data in model.transform_many(objs)
+            }
+            not_added = len(objs) - len(datas)
+            async with self._write_lock:
+                if table_type in FILES_PARTITIONS:
+                    filter: ds.Expression = self._filter_id(table_type, datas.keys())
+                    if force:
+                        await to_thread(self._remove, table_type, filter)
+                    elif (dataset := self._dataset(table_type)) is not None:
+                        # documents with the same _id share the partition
+                        if (
+                            partitions := self._filter_partitions(
+                                table_type, datas.values()
+                            )
+                        ) is not None:
+                            filter = filter & partitions
+                        exists: pa.Table = await to_thread(
+                            dataset.to_table, columns=["_id"], filter=filter
+                        )
+                        for idx in exists.column("_id").to_pylist():
+                            if datas.pop(idx, None) is not None:
+                                not_added += 1
+                    added = await to_thread(
+                        self._append,
+                        table_type,
+                        [_to_row(doc) for doc in datas.values()],
+                    )
+                else:
+                    docs: Dict[Any, Dict[str, Any]] = await to_thread(
+                        self._docs_load, table_type
+                    )
+                    for idx, doc in datas.items():
+                        if force or idx not in docs:
+                            docs[idx] = doc
+                            added += 1
+                        else:
+                            not_added += 1
+                    if added > 0:
+                        await to_thread(self._docs_save, table_type)
+        except Exception as err:
+            error(
+                f"Unknown error when adding entries to {self.table_uri(table_type)}: {err}"
+            )
+        debug(f"added={added}, not_added={not_added}")
+        return added, not_added
+
+    async def _datas_export(
+        self,
+        table_type: BSTableType,
+        in_type: type[D],
+        out_type: type[OutJSONExportable],
+        sample: float = 0,
+    ) -> AsyncGenerator[OutJSONExportable, None]:
+        """Export data"""
+        try:
+            debug(f"starting export from: {self.table_uri(table_type)}")
+            async for obj in self.obj_export(table_type, sample=sample):
+                try:
+                    if (res := out_type.from_obj(obj, in_type)) is not None:
+                        yield res
+                except Exception as err:
+                    error(
+                        f"Could not export object={obj} type={in_type} to type={out_type}"
+                    )
+                    error(f"{err}: {obj}")
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    async def _datas_get(
+        self,
+        table_type: BSTableType,
+        filter: ds.Expression | None = None,
+        sample: float = 0,
+    ) -> AsyncGenerator[JSONExportable, None]:
+        """Get objects from a dataset"""
+        model: type[JSONExportable] = self.get_model(table_type)
+        try:
+            async for docs in self._docs_get(table_type, filter=filter, sample=sample):
+                for doc in docs:
+                    try:
+                        yield model.parse_obj(doc)
+                    except ValidationError as err:
+                        error(
+                            f"Could not validate {model} ob={doc} from {self.table_uri(table_type)}: {err}"
+                        )
+        except Exception as err:
+            error(f"Failed to get data from {self.table_uri(table_type)}: {err}")
+
+    async def _datas_count(
+        self,
+        table_type: BSTableType,
+        filter: ds.Expression | None = None,
+        sample: float = 0,
+    ) -> int:
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        try:
+            total: int = await self._count(table_type, filter)
+            if sample == 0:
+                return total
+            if sample < 1:
+                return int(total * sample)
+            else:
+                return int(min(total, sample))
+        except Exception as err:
+            error(f"Error counting documents in {self.table_uri(table_type)}: {err}")
+        return -1
+
+    async def _datas_unique(
+        self,
+        table_type: BSTableType,
+        field: str,
+        field_type: type[A],
+        filter: ds.Expression | None = None,
+    ) -> AsyncGenerator[A, None]:
+        """Return unique values of 'field'"""
+        try:
+            debug("starting")
+            if (dataset := self._dataset(table_type)) is None:
+                return
+            column: str = self._alias(table_type)(field)
+            table: pa.Table = await to_thread(
+                dataset.to_table, columns=[column], filter=filter
+            )
+            for value in pc.unique(table.column(column)).to_pylist():
+                yield cast(A, value)
+        except Exception as err:
+            error(
+                f"Error getting unique values from {self.table_uri(table_type)}: {err}"
+            )
+
+    async def _datas_unique_count(
+        self,
+        table_type: BSTableType,
+        field: str,
+        filter: ds.Expression | None = None,
+    ) -> int:
+        """Return the number of unique values of 'field'"""
+        try:
+            debug("starting")
+            if (dataset := self._dataset(table_type)) is None:
+                return 0
+            column: str = self._alias(table_type)(field)
+            table: pa.Table = await to_thread(
+                dataset.to_table, columns=[column], filter=filter
+            )
+            return pc.count_distinct(table.column(column)).as_py()
+        except Exception as err:
+            error(f"Error counting documents in {self.table_uri(table_type)}: {err}")
+        return -1
+
+    async def _datas_duplicates(
+        self,
+        table_type: BSTableType,
+        filter: ds.Expression,
+        partition: str,
+        order: str,
+        sample: int = 0,
+    ) -> AsyncGenerator[JSONExportable, None]:
+        """Return all but the latest document per 'partition'"""
+        if (dataset := self._dataset(table_type)) is None:
+            return
+        alias: Callable = self._alias(table_type)
+        table: pa.Table = await to_thread(
+            dataset.to_table,
+            columns=["_id", alias(partition), alias(order)],
+            filter=filter,
+        )
+        table = table.sort_by(
+            [(alias(partition), "ascending"), (alias(order), "descending")]
+        )
+        dups: List[Any] = list()
+        prev: Any = None
+        for idx, part in zip(
+            table.column("_id").to_pylist(), table.column(alias(partition)).to_pylist()
+        ):
+            if part == prev:
+                dups.append(idx)
+                if sample > 0 and len(dups) >= sample:
+                    break
+            prev = part
+        if len(dups) > 0:
+            async for obj in self._datas_get(
+                table_type, filter=self._filter_id(table_type, dups)
+            ):
+                yield obj
+
+    async def obj_export(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+    ) -> AsyncGenerator[Any, None]:
+        """Export raw documents. Aggregation pipelines are not supported"""
+        async for objs in self.objs_export(
+            table_type, pipeline=pipeline, sample=sample
+        ):
+            for obj in objs:
+                yield obj
+
+    async def objs_export(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[Any], None]:
+        """Export raw documents as a list. Aggregation pipelines are not supported"""
+        try:
+            debug("starting")
+            if len(pipeline) > 0:
+                raise ValueError(f"{self.driver} does not support pipelines")
+            if table_type in FILES_PARTITIONS:
+                async for docs in self._docs_get(
+                    table_type, sample=sample, batch=batch
+                ):
+                    yield docs
+            else:
+                yield await self._docs_all(table_type)
+            debug(f"finished exporting {table_type}")
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    ########################################################
+    #
+    # FilesBackend(): account
+    #
+    ########################################################
+
+    async def account_insert(self, account: BSAccount, force: bool = False) -> bool:
+        """Store account to the backend. Returns False
+        if the account was not added"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Accounts, obj=account, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Accounts, obj=account)
+
+    async def account_get(self, account_id: int) -> BSAccount | None:
+        """Get account from backend"""
+        debug("starting")
+        if (
+            res := await self._data_get(BSTableType.Accounts, idx=account_id)
+        ) is not None:
+            return BSAccount.from_obj(res, self.model_accounts)
+        return None
+
+    async def account_update(
+        self,
+        account: BSAccount,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an account in the backend. Returns False
+        if the account was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Accounts, obj=account, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating account (id={account.id}) into {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+        return False
+
+    async def account_delete(self, account_id: int) -> bool:
+        """Delete account from the backend"""
+        debug("starting")
+        return await self._data_delete(BSTableType.Accounts, idx=account_id)
+
+    def _mk_filter_accounts(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        id_range: range | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.auto,
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        cache_valid: float = 0,
+    ) -> ds.Expression:
+        """Build dataset filter for accounts. Same semantics as
+        MongoBackend._mk_pipeline_accounts(). 'dist' is checked by the caller"""
+        debug("starting")
+        alias: Callable = self._alias(BSTableType.Accounts)
+        filter: ds.Expression = ds.field(alias("region")).isin(
+            [r.value for r in regions]
+        )
+        cache_valid *= 24 * 3600
+
+        if accounts is not None:
+            filter &= ds.field(alias("id")).isin([a.id for a in accounts])
+        if disabled is not None:
+            filter &= ds.field(alias("disabled")) == disabled
+        if inactive == OptAccountsInactive.yes:
+            filter &= ds.field(alias("inactive"))
+        elif inactive == OptAccountsInactive.no:
+            filter &= ~ds.field(alias("inactive"))
+        if id_range is not None:
+            filter &= (ds.field(alias("id")) >= id_range.start) & (
+                ds.field(alias("id")) <= id_range.stop
+            )
+        if active_since > 0:
+            filter &= ds.field(alias("last_battle_time")) >= active_since
+        if inactive_since > 0:
+            filter &= ds.field(alias("last_battle_time")) < inactive_since
+        if cache_valid > 0:
+            if stats_type is not None:
+                update_field: ds.Expression = ds.field(alias(stats_type.value))
+                filter &= update_field.is_null() | (
+                    update_field < epoch_now() - int(cache_valid)
+                )
+            else:
+                error("--cache-valid requires stat_type")
+        return filter
+
+    async def accounts_get(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.default(),
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        dist: OptAccountsDistributed | None = None,
+        sample: float = 0,
+        cache_valid: float = 0,
+        fields: Sequence[str] | None = None,
+    ) -> AsyncGenerator[BSAccount, None]:
+        """Get accounts from the backend
+        inactive: true = only inactive, false = not inactive, none = AUTO"""
+        try:
+            debug("starting")
+            filter: ds.Expression = self._mk_filter_accounts(
+                stats_type=stats_type,
+                regions=regions,
+                accounts=accounts,
+                inactive=inactive,
+                disabled=disabled,
+                active_since=active_since,
+                inactive_since=inactive_since,
+                cache_valid=cache_valid,
+            )
+            async for data in self._datas_get(
+                BSTableType.Accounts, filter=filter, sample=sample
+            ):
+                try:
+                    if (player := BSAccount.transform(data)) is None:
+                        continue
+                    if dist is not None and not dist.match(player.id):
+                        continue
+                    if (
+                        not disabled
+                        and inactive == OptAccountsInactive.auto
+                        and stats_type is not None
+                    ):
+                        if not player.update_needed(stats_type):
+                            continue
+                    yield player
+                except Exception as err:
+                    error(f"{err}")
+        except Exception as err:
+            error(
+                f"Error fetching accounts from {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+
+    async def accounts_count(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.default(),
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        dist: OptAccountsDistributed | None = None,
+        sample: float = 0,
+        cache_valid: float = 0,
+    ) -> int:
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        if accounts is not None:
+            return len(accounts)
+        try:
+            debug("starting")
+            if sample > 1:
+                return int(sample) * len(regions)
+            total: int = await self._datas_count(
+                BSTableType.Accounts,
+                self._mk_filter_accounts(
+                    stats_type=stats_type,
+                    regions=regions,
+                    inactive=inactive,
+                    disabled=disabled,
+                    active_since=active_since,
+                    inactive_since=inactive_since,
+                    cache_valid=cache_valid,
+                ),
+                sample=sample,
+            )
+            if dist is not None:
+                total = total // dist.div
+            return total
+        except Exception as err:
+            error(f"counting accounts failed: {err}")
+        return -1
+
+    async def accounts_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSAccount, None]:
+        """Export accounts"""
+        debug("starting")
+        async for obj in self.obj_export(BSTableType.Accounts, sample=sample):
+            if (acc := BSAccount.from_obj(obj, self.model_accounts)) is not None:
+                yield acc
+
+    async def accounts_insert(self, accounts: Sequence[BSAccount]) -> tuple[int, int]:
+        """Store account to the backend. Returns the number of added and not added"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.Accounts, accounts)
+
+    async def accounts_latest(self, regions: set[Region]) -> Dict[Region, BSAccount]:
+        """Return the latest accounts (=highest account_id) per region"""
+        debug("starting")
+        res: Dict[Region, BSAccount] = dict()
+        try:
+            alias: Callable = self._alias(BSTableType.Accounts)
+            for region in regions:
+                filter: ds.Expression = self._mk_filter_accounts(
+                    regions={region},
+                    id_range=region.id_range,
+                    inactive=OptAccountsInactive.both,
+                    disabled=None,
+                )
+                if (dataset := self._dataset(BSTableType.Accounts)) is None:
+                    break
+                ids: pa.Table = await to_thread(
+                    dataset.to_table, columns=[alias("id")], filter=filter
+                )
+                if ids.num_rows == 0:
+                    continue
+                latest: int = pc.max(ids.column(alias("id"))).as_py()
+                if (account := await self.account_get(latest)) is not None:
+                    res[account.region] = account
+        except Exception as err:
+            error(f"{err}")
+        return res
+
+    ########################################################
+    #
+    # FilesBackend(): player_achievements
+    #
+    ########################################################
+
+    async def player_achievement_insert(
+        self, player_achievement: PlayerAchievementsMaxSeries, force: bool = False
+    ) -> bool:
+        """Insert a single player achievement"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.PlayerAchievements, obj=player_achievement, upsert=True
+            )
+        else:
+            return await self._data_insert(
+                BSTableType.PlayerAchievements, obj=player_achievement
+            )
+
+    async def player_achievement_get(
+        self, account: BSAccount, added: int
+    ) -> PlayerAchievementsMaxSeries | None:
+        """Return a player_achievement from the backend"""
+        debug("starting")
+        try:
+            idx: PyObjectId = PlayerAchievementsMaxSeries.mk_index(
+                account_id=account.id, region=account.region, added=added
+            )
+            if (
+                res := await self._data_get(BSTableType.PlayerAchievements, idx=idx)
+            ) is not None:
+                return PlayerAchievementsMaxSeries.from_obj(
+                    res, self.model_player_achievements
+                )
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return None
+
+    async def player_achievement_delete(self, account: BSAccount, added: int) -> bool:
+        """Delete a player achievement from the backend"""
+        try:
+            debug("starting")
+            idx: PyObjectId = PlayerAchievementsMaxSeries.mk_index(
+                account.id, region=account.region, added=added
+            )
+            return await self._data_delete(BSTableType.PlayerAchievements, idx=idx)
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return False
+
+    async def player_achievements_insert(
+        self, player_achievements: Sequence[PlayerAchievementsMaxSeries]
+    ) -> tuple[int, int]:
+        """Store player achievements to the backend. Returns number of stats inserted and not inserted"""
+        debug("starting")
+        return await self._datas_insert(
+            BSTableType.PlayerAchievements, player_achievements
+        )
+
+    def _mk_filter_player_achievements(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        since: int = 0,
+    ) -> ds.Expression:
+        """Build dataset filter for player achievements"""
+        debug("starting")
+        alias: Callable = self._alias(BSTableType.PlayerAchievements)
+        filter: ds.Expression = ds.field(alias("region")).isin(
+            [r.value for r in regions]
+        )
+        if release is not None:
+            filter &= ds.field(alias("release")) == release.release
+        if accounts is not None:
+            filter &= ds.field(alias("account_id")).isin([a.id for a in accounts])
+        if since > 0:
+            filter &= ds.field(alias("added")) >= since
+        return filter
+
+    async def player_achievements_get(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Return player achievements from the backend"""
+        try:
+            debug("starting")
+            async for data in self._datas_get(
+                BSTableType.PlayerAchievements,
+                filter=self._mk_filter_player_achievements(
+                    release=release, regions=regions, accounts=accounts, since=since
+                ),
+                sample=sample,
+            ):
+                if (pa_ := PlayerAchievementsMaxSeries.transform(data)) is not None:
+                    yield pa_
+        except Exception as err:
+            error(
+                f"Error fetching player achievements from {self.table_uri(BSTableType.PlayerAchievements)}: {err}"
+            )
+
+    async def player_achievements_count(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        sample: float = 0,
+    ) -> int:
+        """Get number of player achievements from backend"""
+        debug("starting")
+        return await self._datas_count(
+            BSTableType.PlayerAchievements,
+            self._mk_filter_player_achievements(
+                release=release, regions=regions, accounts=accounts
+            ),
+            sample=sample,
+        )
+
+    async def player_achievement_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Export player achievements"""
+        async for obj in self.obj_export(BSTableType.PlayerAchievements, sample=sample):
+            if (
+                pa_ := PlayerAchievementsMaxSeries.from_obj(
+                    obj, self.model_player_achievements
+                )
+            ) is not None:
+                yield pa_
+
+    async def player_achievements_export(
+        self,
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[PlayerAchievementsMaxSeries], None]:
+        """Export player achievements as a list"""
+        debug("starting")
+        async for objs in self.objs_export(
+            BSTableType.PlayerAchievements, sample=sample, batch=batch
+        ):
+            yield PlayerAchievementsMaxSeries.from_objs(
+                objs=objs, in_type=self.model_player_achievements
+            )
+
+    async def player_achievements_duplicates(
+        self,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Find duplicate player achievements from the backend"""
+        debug("starting")
+        try:
+            async for obj in self._datas_duplicates(
+                BSTableType.PlayerAchievements,
+                self._mk_filter_player_achievements(release=release, regions=regions),
+                partition="account_id",
+                order="added",
+                sample=sample,
+            ):
+                if (pa_ := PlayerAchievementsMaxSeries.transform(obj)) is not None:
+                    yield pa_
+        except Exception as err:
+            debug(
+                f"Could not find duplicates from {self.table_uri(BSTableType.PlayerAchievements)}: {err}"
+            )
+
+    ########################################################
+    #
+    # FilesBackend(): releases
+    #
+    ########################################################
+
+    async def _releases_all(self) -> List[BSBlitzRelease]:
+        """Return all releases sorted by cut-off"""
+        releases: List[BSBlitzRelease] = list()
+        for doc in await self._docs_all(BSTableType.Releases):
+            if (
+                release := BSBlitzRelease.from_obj(doc, self.model_releases)
+            ) is not None:
+                releases.append(release)
+        releases.sort(key=lambda r: r.cut_off)
+        return releases
+
+    async def release_get(self, release: str) -> BSBlitzRelease | None:
+        """Get release from backend"""
+        debug("starting")
+        try:
+            debug(f"release={release}")
+            if (
+                obj := await self._data_get(BSTableType.Releases, idx=release)
+            ) is not None:
+                return BSBlitzRelease.transform(obj)
+        except Exception as err:
+            debug(f"{err}")
+        return None
+
+    async def release_get_latest(self) -> BSBlitzRelease | None:
+        """Get the latest release in the backend"""
+        debug("starting")
+        try:
+            releases: List[BSBlitzRelease] = [
+                r for r in await self._releases_all() if r.launch_date is not None
+            ]
+            if len(releases) > 0:
+                return max(releases, key=lambda r: r.launch_date)
+        except Exception as err:
+            error(
+                f"Could not find the latest release from {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return None
+
+    async def release_get_current(self) -> BSBlitzRelease | None:
+        """Get the release the current time falls into"""
+        debug("starting")
+        try:
+            now: int = epoch_now()
+            for release in await self._releases_all():
+                if release.cut_off >= now:
+                    return release
+        except Exception as err:
+            error(f"Could not find the current release: {err}")
+        return None
+
+    async def release_get_next(self, release: BSBlitzRelease) -> BSBlitzRelease | None:
+        """Get next release"""
+        debug("starting")
+        try:
+            if (rel := await self.release_get(release.release)) is None:
+                raise ValueError(f"release not found: {release.release}")
+            for r in await self._releases_all():
+                if r.cut_off > rel.cut_off:
+                    return r
+        except Exception as err:
+            error(
+                f"Could not find the next release from {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return None
+
+    async def release_get_previous(
+        self, release: BSBlitzRelease
+    ) -> BSBlitzRelease | None:
+        """Get previous release"""
+        debug("starting")
+        try:
+            if (rel := await self.release_get(release.release)) is None:
+                raise ValueError(f"release not found: {release.release}")
+            for r in reversed(await self._releases_all()):
+                if r.cut_off < rel.cut_off:
+                    return r
+            error("no previous release found")
+        except Exception as err:
+            error(
+                f"Could not find the previous release for {release} from {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return None
+
+    async def release_insert(
+        self, release: BSBlitzRelease, force: bool = False
+    ) -> bool:
+        """Insert new release to the backend"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Releases, obj=release, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Releases, obj=release)
+
+    async def release_update(
+        self,
+        release: BSBlitzRelease,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an release in the backend. Returns False
+        if the release was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Releases, obj=release, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating release {release} into {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return False
+
+    async def release_delete(self, release: str) -> bool:
+        """Delete a release from backend"""
+        debug("starting")
+        release = BSBlitzRelease.validate_release(release)
+        return await self._data_delete(BSTableType.Releases, idx=release)
+
+    async def releases_get(
+        self,
+        release_match: str | None = None,
+        since: int = 0,
+        first: BSBlitzRelease | None = None,
+    ) -> AsyncGenerator[BSBlitzRelease, None]:
+        assert since == 0 or first is None, "Only one can be defined: since, first"
+        debug("starting")
+        try:
+            releases: List[BSBlitzRelease] = list()
+            for release in await self._releases_all():
+                if since > 0 and (
+                    release.launch_date is None
+                    or release.launch_date.timestamp() < since
+                ):
+                    continue
+                if first is not None and (
+                    release.launch_date is None
+                    or first.launch_date is None
+                    or release.launch_date < first.launch_date
+                ):
+                    continue
+                if release_match is not None and not release.release.startswith(
+                    release_match
+                ):
+                    continue
+                releases.append(release)
+
+            releases.sort(key=lambda s: [int(u) for u in s.release.split(".")])
+
+            async for release in awrap(releases):
+                yield release
+        except Exception as err:
+            error(f"Error getting releases: {err}")
+
+    async def releases_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSBlitzRelease, None]:
+        """Export releases"""
+        debug("starting")
+        async for obj in self.obj_export(BSTableType.Releases, sample=sample):
+            if (rel := BSBlitzRelease.from_obj(obj, self.model_releases)) is not None:
+                yield rel
+
+    ########################################################
+    #
+    # FilesBackend(): replay
+    #
+    ########################################################
+
+    async def replay_insert(self, replay: JSONExportable) -> bool:
+        """Store replay into backend"""
+        debug("starting")
+        return await self._data_insert(BSTableType.Replays, obj=replay)
+
+    async def replay_get(self, replay_id: str) -> BSReplay | None:
+        """Get replay from backend"""
+        debug("starting")
+        if (
+            rep := await self._data_get(BSTableType.Replays, idx=replay_id)
+        ) is not None:
+            return BSReplay.from_obj(rep, self.model_replays)
+        return None
+
+    async def replay_delete(self, replay_id: str) -> bool:
+        """Delete a replay from backend"""
+        debug("starting")
+        return await self._data_delete(BSTableType.Replays, idx=replay_id)
+
+    async def replays_insert(
+        self, replays: Sequence[JSONExportable]
+    ) -> tuple[int, int]:
+        """Insert replays to the backend"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.Replays, replays)
+
+    async def _replays_match(
+        self, since: int = 0, **summary_fields
+    ) -> List[Dict[str, Any]]:
+        """Return replays matching the summary fields"""
+        alias: Callable = AliasMapper(self.model_replays).alias
+        match: Dict[str, Any] = dict()
+        for sf, value in summary_fields.items():
+            try:
+                match[alias(sf)] = value
+            except KeyError:
+                error(f"No such a key in {self.model_replays.__qualname__}: {sf}")
+        res: List[Dict[str, Any]] = list()
+        for doc in await self._docs_all(BSTableType.Replays):
+            summary: Dict[str, Any] = doc.get("s", dict())
+            if since > 0 and summary.get("bts", 0) < since:
+                continue
+            if all(summary.get(k) == v for k, v in match.items()):
+                res.append(doc)
+        return res
+
+    async def replays_get(
+        self,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+        **summary_fields,
+    ) -> AsyncGenerator[BSReplay, None]:
+        """Get replays from the backend"""
+        debug("starting")
+        try:
+            docs: List[Dict[str, Any]] = await self._replays_match(
+                since=since, **summary_fields
+            )
+            if 0 < sample < 1:
+                sample = int(len(docs) * sample)
+            if sample >= 1:
+                docs = docs[: int(sample)]
+            for doc in docs:
+                if (replay := BSReplay.from_obj(doc, self.model_replays)) is not None:
+                    yield replay
+        except Exception as err:
+            error(
+                f"Error exporting replays from {self.table_uri(BSTableType.Replays)}: {err}"
+            )
+
+    async def replays_count(
+        self, since: int = 0, sample: float = 0, **summary_fields
+    ) -> int:
+        """Count replays in backed"""
+        try:
+            debug("starting")
+            total: int = len(await self._replays_match(since=since, **summary_fields))
+            if sample == 0:
+                return total
+            if sample < 1:
+                return int(total * sample)
+            else:
+                return int(min(total, sample))
+        except Exception as err:
+            error(
+                f"Error counting replays from {self.table_uri(BSTableType.Replays)}: {err}"
+            )
+        return -1
+
+    async def replays_export(self, sample: float = 0) -> AsyncGenerator[BSReplay, None]:
+        """Export replays"""
+        debug("starting")
+        async for replay in self._datas_export(
+            BSTableType.Replays,
+            in_type=self.model_replays,
+            out_type=BSReplay,
+            sample=sample,
+        ):
+            yield replay
+
+    ########################################################
+    #
+    # FilesBackend(): tank_stats
+    #
+    ########################################################
+
+    async def tank_stat_insert(self, tank_stat: TankStat, force: bool = False) -> bool:
+        """Insert a single tank stat"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.TankStats, obj=tank_stat, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.TankStats, obj=tank_stat)
+
+    async def tank_stat_get(
+        self, account_id: int, tank_id: int, last_battle_time: int
+    ) -> TankStat | None:
+        """Return tank stats from the backend"""
+        try:
+            debug("starting")
+            idx: PyObjectId = TankStat.mk_id(account_id, last_battle_time, tank_id)
+            if (
+                res := await self._data_get(BSTableType.TankStats, idx=idx)
+            ) is not None:
+                return TankStat.from_obj(res, self.model_tank_stats)
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return None
+
+    async def tank_stat_update(
+        self,
+        tank_stat: TankStat,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an tank stat in the backend. Returns False
+        if the tank stat was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.TankStats,
+                idx=tank_stat.id,
+                obj=tank_stat,
+                update=update,
+                fields=fields,
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating tank stat (id={tank_stat.id}) into {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+        return False
+
+    async def tank_stat_delete(
+        self, account_id: int, tank_id: int, last_battle_time: int
+    ) -> bool:
+        try:
+            debug("starting")
+            idx: PyObjectId = TankStat.mk_id(account_id, last_battle_time, tank_id)
+            return await self._data_delete(BSTableType.TankStats, idx=idx)
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return False
+
+    async def tank_stats_insert(
+        self, tank_stats: Sequence[TankStat], force: bool = False
+    ) -> tuple[int, int]:
+        """Store tank stats to the backend. Returns the number of added and not added"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.TankStats, tank_stats, force=force)
+
+    def _mk_filter_tank_stats(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        missing: str | None = None,
+        since: int = 0,
+        id_range: range | None = None,
+    ) -> ds.Expression:
+        """Build dataset filter for tank stats. Same semantics as
+        MongoBackend._mk_pipeline_tank_stats()"""
+        debug("starting")
+        alias: Callable = self._alias(BSTableType.TankStats)
+        filter: ds.Expression = ds.field(alias("region")).isin(
+            [r.value for r in regions]
+        )
+        if release is not None:
+            filter &= ds.field(alias("release")) == release.release
+        if accounts is not None:
+            filter &= ds.field(alias("account_id")).isin([a.id for a in accounts])
+        if tanks is not None:
+            filter &= ds.field(alias("tank_id")).isin([t.tank_id for t in tanks])
+        if since > 0:
+            filter &= ds.field(alias("last_battle_time")) >= since
+        if id_range is not None:
+            filter &= (ds.field(alias("account_id")) >= id_range.start) & (
+                ds.field(alias("account_id")) < id_range.stop
+            )
+        if missing is not None:
+            filter &= ds.field(alias(missing)).is_null()
+        return filter
+
+    async def tank_stats_get(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        missing: str | None = None,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+        id_range: range | None = None,
+    ) -> AsyncGenerator[TankStat, None]:
+        """Return tank stats from the backend"""
+        try:
+            debug("starting")
+            async for data in self._datas_get(
+                BSTableType.TankStats,
+                filter=self._mk_filter_tank_stats(
+                    release=release,
+                    regions=regions,
+                    accounts=accounts,
+                    tanks=tanks,
+                    missing=missing,
+                    since=since,
+                    id_range=id_range,
+                ),
+                sample=sample,
+            ):
+                if (tank_stat := TankStat.transform(data)) is not None:
+                    yield tank_stat
+                else:
+                    error(f"could not transform data to TankStat: {data}")
+        except Exception as err:
+            error(
+                f"Error fetching tank stats from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
+    async def tank_stats_export_career(
+        self,
+        account: BSAccount,
+        release: BSBlitzRelease,
+    ) -> AsyncGenerator[List[TankStat], None]:
+        """Return the latest tank stats per tank by the release's cut-off"""
+        try:
+            debug("starting")
+            alias: Callable = self._alias(BSTableType.TankStats)
+            filter: ds.Expression = (
+                (ds.field(alias("region")) == account.region.value)
+                & (ds.field(alias("account_id")) == account.id)
+                & (ds.field(alias("last_battle_time")) <= release.cut_off)
+            )
+            latest: Dict[int, Dict[str, Any]] = dict()
+            lbt: str = alias("last_battle_time")
+            tank_id: str = alias("tank_id")
+            async for docs in self._docs_get(BSTableType.TankStats, filter=filter):
+                for doc in docs:
+                    if (prev := latest.get(doc[tank_id])) is None or prev[lbt] < doc[
+                        lbt
+                    ]:
+                        latest[doc[tank_id]] = doc
+            if len(latest) > 0:
+                yield TankStat.from_objs(
+                    list(latest.values()), in_type=self.model_tank_stats
+                )
+        except Exception as err:
+            error(
+                f"Error fetching tank stats from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
+    async def tank_stats_count(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        since: int = 0,
+        sample: float = 0,
+    ) -> int:
+        debug("starting")
+        return await self._datas_count(
+            BSTableType.TankStats,
+            self._mk_filter_tank_stats(
+                release=release,
+                regions=regions,
+                accounts=accounts,
+                tanks=tanks,
+                since=since,
+            ),
+            sample=sample,
+        )
+
+    async def tank_stat_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[TankStat, None]:
+        """Export tank stats"""
+        debug("starting")
+        async for tank_stat in self._datas_export(
+            BSTableType.TankStats,
+            in_type=self.model_tank_stats,
+            out_type=TankStat,
+            sample=sample,
+        ):
+            yield tank_stat
+
+    async def tank_stats_export(
+        self, sample: float = 0, batch: int = 0
+    ) -> AsyncGenerator[List[TankStat], None]:
+        """Export tank stats as list"""
+        debug("starting")
+        async for objs in self.objs_export(
+            BSTableType.TankStats, sample=sample, batch=batch
+        ):
+            yield TankStat.from_objs(objs=objs, in_type=self.model_tank_stats)
+
+    async def tank_stats_duplicates(
+        self,
+        tank: BSTank,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[TankStat, None]:
+        """Find duplicate tank stats from the backend"""
+        debug("starting")
+        try:
+            async for obj in self._datas_duplicates(
+                BSTableType.TankStats,
+                self._mk_filter_tank_stats(
+                    release=release, regions=regions, tanks=[tank]
+                ),
+                partition="account_id",
+                order="last_battle_time",
+                sample=sample,
+            ):
+                if (tank_stat := TankStat.transform(obj)) is not None:
+                    yield tank_stat
+        except Exception as err:
+            debug(
+                f"Could not find duplicates from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
+    async def tank_stats_unique(
+        self,
+        field: str,
+        field_type: type[A],
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        account: BSAccount | None = None,
+        tank: BSTank | None = None,
+        id_range: range | None = None,
+    ) -> AsyncGenerator[A, None]:
+        """Return unique values of field"""
+        debug("starting")
+        async for value in self._datas_unique(
+            BSTableType.TankStats,
+            field,
+            field_type,
+            self._mk_filter_tank_stats(
+                release=release,
+                regions=regions,
+                accounts=None if account is None else [account],
+                tanks=None if tank is None else [tank],
+                id_range=id_range,
+            ),
+        ):
+            yield value
+
+    async def tank_stats_unique_count(
+        self,
+        field: str,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        account: BSAccount | None = None,
+        tank: BSTank | None = None,
+        id_range: range | None = None,
+    ) -> int:
+        """Return count of unique values of field"""
+        debug("starting")
+        return await self._datas_unique_count(
+            BSTableType.TankStats,
+            field,
+            self._mk_filter_tank_stats(
+                release=release,
+                regions=regions,
+                accounts=None if account is None else [account],
+                tanks=None if tank is None else [tank],
+                id_range=id_range,
+            ),
+        )
+
+    ########################################################
+    #
+    # FilesBackend(): tankopedia
+    #
+    ########################################################
+
+    async def _tankopedia_match(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> List[BSTank]:
+        """Return tanks matching the parameters"""
+        tank_ids: set[int] | None = None
+        if tanks is not None and len(tanks) > 0:
+            tank_ids = {t.tank_id for t in tanks}
+        res: List[BSTank] = list()
+        for doc in await self._docs_all(BSTableType.Tankopedia):
+            if (tank := BSTank.from_obj(doc, self.model_tankopedia)) is None:
+                continue
+            if is_premium is not None and tank.is_premium != is_premium:
+                continue
+            if tier is not None and tank.tier != tier:
+                continue
+            if tank_type is not None and tank.type != tank_type:
+                continue
+            if nation is not None and tank.nation != nation:
+                continue
+            if tank_ids is not None and tank.tank_id not in tank_ids:
+                continue
+            res.append(tank)
+        return res
+
+    async def tankopedia_get(self, tank_id: int) -> BSTank | None:
+        debug("starting")
+        try:
+            if (
+                obj := await self._data_get(BSTableType.Tankopedia, idx=tank_id)
+            ) is not None:
+                return BSTank.from_obj(obj, self.model_tankopedia)
+        except Exception as err:
+            error(f"{err}")
+        return None
+
+    async def tankopedia_get_many(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> AsyncGenerator[BSTank, None]:
+        debug("starting")
+        try:
+            for tank in await self._tankopedia_match(
+                tanks=tanks,
+                tier=tier,
+                tank_type=tank_type,
+                nation=nation,
+                is_premium=is_premium,
+            ):
+                yield tank
+        except Exception as err:
+            error(
+                f"Could get Tankopedia from {self.table_uri(BSTableType.Tankopedia)}: {err}"
+            )
+
+    async def tankopedia_count(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> int:
+        """Count tanks in Tankopedia"""
+        try:
+            return len(
+                await self._tankopedia_match(
+                    tanks=tanks,
+                    tier=tier,
+                    tank_type=tank_type,
+                    nation=nation,
+                    is_premium=is_premium,
+                )
+            )
+        except Exception as err:
+            debug(
+                f"Could get Tankopedia from {self.table_uri(BSTableType.Tankopedia)}: {err}"
+            )
+        return -1
+
+    async def tankopedia_insert(self, tank: BSTank, force: bool = False) -> bool:
+        """ "insert tank into Tankopedia"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Tankopedia, obj=tank, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Tankopedia, obj=tank)
+
+    async def tankopedia_update(
+        self,
+        tank: BSTank,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update a tank in the backend's tankopedia. Returns False
+        if the tank was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Tankopedia, obj=tank, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Could't update tank {tank} in {self.table_uri(BSTableType.Tankopedia)}: {err}"
+            )
+        return False
+
+    async def tankopedia_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSTank, None]:
+        """Export tankopedia"""
+        debug(f"starting: model={self.model_tankopedia} ")
+        async for tank in self._datas_export(
+            BSTableType.Tankopedia,
+            in_type=self.model_tankopedia,
+            out_type=BSTank,
+            sample=sample,
+        ):
+            yield tank
+
+    async def tankopedia_delete(self, tank: BSTank) -> bool:
+        """Delete a tank from Tankopedia"""
+        return await self._data_delete(BSTableType.Tankopedia, idx=tank.tank_id)
+
+    ########################################################
+    #
+    # FilesBackend(): error_
+    #
+    ########################################################
+
+    def _errors_match(
+        self,
+        doc: Dict[str, Any],
+        table_type: BSTableType | None = None,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> bool:
+        if table_type is not None and doc.get("t") != self.get_table(table_type):
+            return False
+        if doc_id is not None and doc.get("did") != doc_id:
+            return False
+        if after is not None and doc.get("d", after) < after:
+            return False
+        return True
+
+    async def error_log(self, error: EventLog) -> bool:
+        """Log an error into the backend's EventLog"""
+        try:
+            debug("starting")
+            debug(f"Logging error: {error.table}: {error.msg}")
+            async with self._write_lock:
+                docs: Dict[Any, Dict[str, Any]] = await to_thread(
+                    self._docs_load, BSTableType.EventLog
+                )
+                docs[len(docs)] = error.obj_db()
+                await to_thread(self._docs_save, BSTableType.EventLog)
+            return True
+        except Exception as err:
+            debug(
+                f'Could not log error: {error.table}: "{error.msg}" into {self.table_uri(BSTableType.EventLog)}: {err}'
+            )
+        return False
+
+    async def errors_get(
+        self,
+        table_type: BSTableType | None = None,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> AsyncGenerator[EventLog, None]:
+        """Return errors from backend EventLog"""
+        try:
+            debug("starting")
+            for doc in await self._docs_all(BSTableType.EventLog):
+                try:
+                    if self._errors_match(
+                        doc, table_type=table_type, doc_id=doc_id, after=after
+                    ):
+                        yield EventLog.parse_obj(doc)
+                except Exception as e:
+                    error(f"{e}")
+        except Exception as e:
+            error(
+                f"Error getting errors from {self.table_uri(BSTableType.EventLog)}: {e}"
+            )
+
+    async def errors_clear(
+        self,
+        table_type: BSTableType,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> int:
+        """Clear errors from backend EventLog"""
+        try:
+            debug("starting")
+            async with self._write_lock:
+                docs: Dict[Any, Dict[str, Any]] = await to_thread(
+                    self._docs_load, BSTableType.EventLog
+                )
+                keep: List[Dict[str, Any]] = [
+                    doc
+                    for doc in docs.values()
+                    if not self._errors_match(
+                        doc, table_type=table_type, doc_id=doc_id, after=after
+                    )
+                ]
+                cleared: int = len(docs) - len(keep)
+                if cleared > 0:
+                    self._docs[BSTableType.EventLog] = dict(enumerate(keep))
+                    await to_thread(self._docs_save, BSTableType.EventLog)
+                return cleared
+        except Exception as e:
+            error(
+                f"Error clearing errors from {self.table_uri(BSTableType.EventLog)}: {e}"
+            )
+        return 0
+
+
+# Register backend
+
+debug("Registering files")
+Backend.register(driver=FilesBackend.driver, backend=FilesBackend)
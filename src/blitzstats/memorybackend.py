@@ -0,0 +1,1720 @@
+from configparser import ConfigParser
+from argparse import Namespace, ArgumentParser
+from datetime import datetime
+from os.path import isfile, join as path_join
+from random import random, sample as random_sample
+from typing import (
+    Optional,
+    Any,
+    Iterable,
+    Sequence,
+    AsyncGenerator,
+    TypeVar,
+    cast,
+    Callable,
+    Dict,
+    List,
+)
+import logging
+
+from bson import ObjectId, json_util
+from pydantic import ValidationError
+from sortedcontainers import SortedDict  # type: ignore
+
+from pydantic_exportables import (
+    JSONExportable,
+    AliasMapper,
+    Idx,
+    PyObjectId,
+)
+from pyutils.utils import epoch_now
+from pyutils import awrap
+
+from blitzmodels import (
+    Region,
+    TankStat,
+    PlayerAchievementsMaxSeries,
+    EnumNation,
+    EnumVehicleTier,
+)
+
+from .backend import (
+    Backend,
+    OptAccountsDistributed,
+    OptAccountsInactive,
+    BSTableType,
+    EventLog,
+    A,
+)
+from .models import (
+    BSAccount,
+    BSBlitzRelease,
+    StatsTypes,
+    BSReplay,
+    BSTank,
+    EnumVehicleTypeInt,
+)
+
+# Setup logging
+logger = logging.getLogger()
+error = logger.error
+message = logger.warning
+verbose = logger.info
+debug = logger.debug
+
+# Constants
+MEMORY_BATCH_SIZE: int = 1000
+
+D = TypeVar("D", bound="JSONExportable")
+OutJSONExportable = TypeVar("OutJSONExportable", bound="JSONExportable")
+
+Doc = Dict[str, Any]
+Match = Callable[[Doc], bool]
+
+##############################################
+#
+# Utils
+#
+##############################################
+
+
+def _key(idx: Idx) -> Any:
+    """Convert document index into a dict key"""
+    if isinstance(idx, ObjectId):
+        return str(idx)
+    return idx
+
+
+def _matches(doc: Doc, match: List[Match]) -> bool:
+    return all(m(doc) for m in match)
+
+
+def _sample(docs: List[Doc], sample: float = 0) -> List[Doc]:
+    """Sample documents. 0 < sample < 1 is a fraction, sample >= 1 a count"""
+    assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+    if sample == 0:
+        return docs
+    elif sample < 1:
+        return [doc for doc in docs if random() < sample]
+    return random_sample(docs, min(len(docs), int(sample)))
+
+
+##############################################
+#
+# class MemoryStore()
+#
+##############################################
+
+
+class MemoryStore:
+    """Tables of a database. Documents are stored in their DB format
+    (obj_db()) in dicts sorted by their index"""
+
+    def __init__(self) -> None:
+        self.tables: Dict[BSTableType, SortedDict] = {
+            table_type: SortedDict() for table_type in BSTableType
+        }
+        # (account_id, tank_id, last_battle_time) -> _id
+        self.tank_stats_by_account: SortedDict = SortedDict()
+        self.event_id: int = 0
+
+
+# Stores are module level to have forked worker processes inherit
+# the data. Changes made in worker processes are not visible in the parent.
+_STORES: Dict[str, MemoryStore] = dict()
+
+
+##############################################
+#
+# class MemoryBackend(Backend)
+#
+##############################################
+
+
+class MemoryBackend(Backend):
+    """In-memory backend for benchmarks and tests. Implements the same
+    filtering semantics as MongoBackend on dicts and sorted indexes.
+
+    The data can be seeded from a snapshot directory with a
+    '<table>.json' file per table (a list of documents in Extended JSON)."""
+
+    driver: str = "memory"
+
+    def __init__(
+        self,
+        config: ConfigParser | None = None,
+        db_config: Dict[str, Any] | None = None,
+        database: str | None = None,
+        table_config: Dict[BSTableType, str] | None = None,
+        model_config: Dict[BSTableType, type[JSONExportable]] | None = None,
+        **kwargs,
+    ):
+        """Init memory backend from config file and CLI args
+        CLI arguments overide settings in the config file"""
+
+        debug("starting")
+        try:
+            super().__init__(
+                config=config, db_config=db_config, database=database, **kwargs
+            )
+
+            memory_rc: Dict[str, Any] = dict()
+            memory_rc["snapshot"] = None
+            memory_rc["batch"] = MEMORY_BATCH_SIZE
+
+            if config is not None and "MEMORY" in config.sections():
+                configMemory = config["MEMORY"]
+                self._database = configMemory.get("database", self.database)
+                memory_rc["snapshot"] = configMemory.get(
+                    "snapshot", memory_rc["snapshot"]
+                )
+                memory_rc["batch"] = configMemory.getint("batch", memory_rc["batch"])
+
+            if db_config is not None:
+                kwargs = db_config | kwargs
+            kwargs = memory_rc | kwargs
+            # remove unset kwargs
+            kwargs = {k: v for k, v in kwargs.items() if v is not None}
+
+            self.set_database(database)
+            self._db_config = kwargs
+            self.config_tables(table_config=table_config)
+            self.config_models(model_config=model_config)
+
+            if self.database not in _STORES:
+                _STORES[self.database] = MemoryStore()
+                if (snapshot := kwargs.get("snapshot")) is not None:
+                    self._load_snapshot(snapshot)
+            self._store: MemoryStore = _STORES[self.database]
+
+            debug(
+                "config: "
+                + ", ".join(["{0}={1}".format(k, str(v)) for k, v in kwargs.items()])
+            )
+        except Exception as err:
+            error(f"Error initializing memory backend: {err}")
+            raise err
+
+    def _load_snapshot(self, snapshot: str) -> None:
+        """Seed the store from JSON files"""
+        store: MemoryStore = _STORES[self.database]
+        for table_type in BSTableType:
+            if not isfile(
+                filename := path_join(snapshot, f"{self.get_table(table_type)}.json")
+            ):
+                continue
+            with open(filename, "r", encoding="utf-8") as f:
+                docs: List[Doc] = json_util.loads(f.read())
+            for doc in docs:
+                if "_id" in doc:
+                    store.tables[table_type][_key(doc["_id"])] = doc
+                else:
+                    store.event_id += 1
+                    store.tables[table_type][store.event_id] = doc
+            if table_type == BSTableType.TankStats:
+                for idx, doc in store.tables[table_type].items():
+                    store.tank_stats_by_account[self._tank_stat_key(doc)] = idx
+            verbose(f"{self.table_uri(table_type)}: loaded {len(docs)} documents")
+
+    def debug(self) -> None:
+        """Print out debug info"""
+        print(f"###### DEBUG {self.driver} ######")
+        for table_type in BSTableType:
+            print(f"{self.table_uri(table_type)}: {len(self._table(table_type))}")
+
+    def copy(self, **kwargs) -> Optional["Backend"]:
+        """Create a copy of the backend"""
+        try:
+            debug("starting")
+
+            database: str = self.database
+            if "database" in kwargs.keys():
+                database = kwargs["database"]
+                del kwargs["database"]
+
+            return MemoryBackend(
+                config=None,
+                db_config=self.db_config,
+                database=database,
+                table_config=self.table_config,
+                model_config=self.model_config,
+                **kwargs,
+            )
+        except Exception as err:
+            error(f"Error creating copy: {err}")
+        return None
+
+    @property
+    def batch(self) -> int:
+        return self.db_config["batch"]
+
+    async def test(self) -> bool:
+        return True
+
+    @classmethod
+    def add_args_import(
+        cls, parser: ArgumentParser, config: Optional[ConfigParser] = None
+    ) -> bool:
+        """Add argument parser for import backend"""
+        try:
+            debug("starting")
+            super().add_args_import(parser=parser, config=config)
+
+            parser.add_argument(
+                "--database",
+                metavar="DATABASE",
+                type=str,
+                default=None,
+                dest="import_database",
+                help="Database to use. Uses current database as default",
+            )
+            parser.add_argument(
+                "--table",
+                metavar="TABLE",
+                type=str,
+                default=None,
+                dest="import_table",
+                help="Table to import from. Uses current database as default",
+            )
+            return True
+        except Exception as err:
+            error(f"{err}")
+        return False
+
+    @classmethod
+    def read_args(
+        cls, args: Namespace, driver: str, importdb: bool = False
+    ) -> Dict[str, Any]:
+        debug("starting")
+        if driver != cls.driver:
+            raise ValueError(f"calling {cls}.read_args() for {driver} backend")
+        kwargs: Dict[str, Any] = Backend.read_args_helper(
+            args, ["database"], importdb=importdb
+        )
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        debug(f"args={kwargs}")
+        return kwargs
+
+    @property
+    def backend(self) -> str:
+        return f"{self.driver}://{self.database}"
+
+    async def init(self, tables: List[str] = [tt.name for tt in BSTableType]) -> bool:  # type: ignore
+        """Nothing to init in memory backend"""
+        debug("starting")
+        return True
+
+    ########################################################
+    #
+    # MemoryBackend(): generic datas_funcs
+    #
+    ########################################################
+
+    def _table(self, table_type: BSTableType) -> SortedDict:
+        return self._store.tables[table_type]
+
+    def _alias(self, table_type: BSTableType) -> Callable:
+        return AliasMapper(self.get_model(table_type)).alias
+
+    def _tank_stat_key(self, doc: Doc) -> tuple[int, int, int]:
+        alias: Callable = self._alias(BSTableType.TankStats)
+        return (
+            doc[alias("account_id")],
+            doc[alias("tank_id")],
+            doc[alias("last_battle_time")],
+        )
+
+    def _doc_put(self, table_type: BSTableType, idx: Any, doc: Doc) -> None:
+        self._table(table_type)[idx] = doc
+        if table_type == BSTableType.TankStats:
+            self._store.tank_stats_by_account[self._tank_stat_key(doc)] = idx
+
+    def _doc_pop(self, table_type: BSTableType, idx: Any) -> Doc | None:
+        if (doc := self._table(table_type).pop(idx, None)) is None:
+            return None
+        if table_type == BSTableType.TankStats:
+            self._store.tank_stats_by_account.pop(self._tank_stat_key(doc), None)
+        return doc
+
+    def _docs_match(
+        self,
+        table_type: BSTableType,
+        match: List[Match],
+        docs: Iterable[Doc] | None = None,
+        sample: float = 0,
+    ) -> List[Doc]:
+        if docs is None:
+            docs = self._table(table_type).values()
+        return _sample([doc for doc in docs if _matches(doc, match)], sample)
+
+    def _parse(self, table_type: BSTableType, doc: Doc) -> JSONExportable | None:
+        model: type[JSONExportable] = self.get_model(table_type)
+        try:
+            return model.parse_obj(doc)
+        except ValidationError as err:
+            error(
+                f"Could not validate {model} ob={doc} from {self.table_uri(table_type)}: {err}"
+            )
+        return None
+
+    async def _data_insert(self, table_type: BSTableType, obj: JSONExportable) -> bool:
+        """Generic method to insert an object of data_type"""
+        added, _ = await self._datas_insert(table_type, [obj])
+        return added == 1
+
+    async def _data_get(
+        self, table_type: BSTableType, idx: Idx
+    ) -> JSONExportable | None:
+        """Get document in its native data type"""
+        if (doc := self._table(table_type).get(_key(idx))) is not None:
+            return self._parse(table_type, doc)
+        return None
+
+    async def _data_replace(
+        self, table_type: BSTableType, obj: JSONExportable, upsert: bool = False
+    ) -> bool:
+        """Generic method to replace an object of data_type"""
+        try:
+            debug("starting")
+            model: type[JSONExportable] = self.get_model(table_type)
+            if (data := model.transform(obj)) is None:
+                raise ValueError(f"could not transform obj: _id={obj.index}")
+            idx: Any = _key(data.index)
+            if self._doc_pop(table_type, idx) is None and not upsert:
+                return False
+            self._doc_put(table_type, idx, data.obj_db())
+            return True
+        except Exception as err:
+            error(f"could not replace obj in {self.table_uri(table_type)}: {err}")
+        return False
+
+    async def _data_update(
+        self,
+        table_type: BSTableType,
+        idx: Idx | None = None,
+        obj: JSONExportable | None = None,
+        update: dict | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Generic method to update an object of data_type"""
+        debug("starting")
+        model: type[JSONExportable] = self.get_model(table_type)
+
+        if obj is not None:
+            if (data := model.transform(obj)) is None:
+                raise ValueError(f"Could not transform {type(obj)} to {model}: {obj}")
+
+            if idx is None:
+                idx = data.index
+
+            if update is not None:
+                pass
+            elif fields is not None:
+                update = data.dict(include=set(fields))
+            else:
+                raise ValueError("'update', 'obj' and 'fields' cannot be all None")
+
+        elif idx is None or update is None:
+            raise ValueError("'update' is required with 'idx'")
+
+        if (doc := self._doc_pop(table_type, _key(idx))) is None:
+            return False
+        doc = doc | AliasMapper(model).map(update.items())
+        self._doc_put(table_type, _key(idx), doc)
+        return True
+
+    async def _data_delete(self, table_type: BSTableType, idx: Idx) -> bool:
+        """Delete a document"""
+        return self._doc_pop(table_type, _key(idx)) is not None
+
+    async def _datas_insert(
+        self, table_type: BSTableType, objs: Sequence[D], force: bool = False
+    ) -> tuple[int, int]:
+        """Store data to the backend. Returns the number of added and not added"""
+        debug("starting")
+        added: int = 0
+        not_added: int = 0
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            table: SortedDict = self._table(table_type)
+            datas: List[JSONExportable] = model.transform_many(objs)
+            not_added = len(objs) - len(datas)
+            for data in datas:
+                idx: Any = _key(data.index)
+                if idx in table:
+                    if not force:
+                        not_added += 1
+                        continue
+                    self._doc_pop(table_type, idx)
+                self._doc_put(table_type, idx, data.obj_db())
+                added += 1
+        except Exception as err:
+            error(
+                f"Unknown error when adding entries to {self.table_uri(table_type)}: {err}"
+            )
+        debug(f"added={added}, not_added={not_added}")
+        return added, not_added
+
+    async def _datas_upsert(
+        self, table_type: BSTableType, objs: Sequence[D]
+    ) -> tuple[int, int, int]:
+        """Replace or insert data. Returns the number of added, updated and unchanged"""
+        debug("starting")
+        added: int = 0
+        updated: int = 0
+        unchanged: int = 0
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            for data in model.transform_many(objs):
+                idx: Any = _key(data.index)
+                doc: Doc = data.obj_db()
+                if (prev := self._doc_pop(table_type, idx)) is None:
+                    added += 1
+                elif prev == doc:
+                    unchanged += 1
+                else:
+                    updated += 1
+                self._doc_put(table_type, idx, doc)
+        except Exception as err:
+            error(
+                f"Unknown error when upserting entries to {self.table_uri(table_type)}: {err}"
+            )
+        debug(f"added={added}, updated={updated}, unchanged={unchanged}")
+        return added, updated, unchanged
+
+    async def _datas_get(
+        self, table_type: BSTableType, docs: Iterable[Doc]
+    ) -> AsyncGenerator[JSONExportable, None]:
+        for doc in docs:
+            if (obj := self._parse(table_type, doc)) is not None:
+                yield obj
+
+    async def _datas_export(
+        self,
+        table_type: BSTableType,
+        in_type: type[D],
+        out_type: type[OutJSONExportable],
+        sample: float = 0,
+    ) -> AsyncGenerator[OutJSONExportable, None]:
+        """Export data"""
+        debug(f"starting export from: {self.table_uri(table_type)}")
+        async for obj in self.obj_export(table_type, sample=sample):
+            try:
+                if (res := out_type.from_obj(obj, in_type)) is not None:
+                    yield res
+            except Exception as err:
+                error(
+                    f"Could not export object={obj} type={in_type} to type={out_type}"
+                )
+                error(f"{err}: {obj}")
+
+    def _count(self, docs: List[Doc], sample: float = 0) -> int:
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        total: int = len(docs)
+        if sample == 0:
+            return total
+        if sample < 1:
+            return int(total * sample)
+        else:
+            return int(min(total, sample))
+
+    def _duplicates(
+        self, table_type: BSTableType, docs: List[Doc], partition: str, order: str
+    ) -> List[Doc]:
+        """Return all but the latest document per 'partition'"""
+        alias: Callable = self._alias(table_type)
+        latest: Dict[Any, Doc] = dict()
+        dups: List[Doc] = list()
+        for doc in docs:
+            if (prev := latest.get(doc[alias(partition)])) is None:
+                latest[doc[alias(partition)]] = doc
+            elif prev[alias(order)] < doc[alias(order)]:
+                dups.append(prev)
+                latest[doc[alias(partition)]] = doc
+            else:
+                dups.append(doc)
+        return dups
+
+    async def obj_export(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+    ) -> AsyncGenerator[Any, None]:
+        """Export raw documents. Aggregation pipelines are not supported"""
+        async for objs in self.objs_export(
+            table_type, pipeline=pipeline, sample=sample
+        ):
+            for obj in objs:
+                yield obj
+
+    async def objs_export(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[Any], None]:
+        """Export raw documents as a list. Aggregation pipelines are not supported"""
+        try:
+            debug("starting")
+            if len(pipeline) > 0:
+                raise ValueError(f"{self.driver} does not support pipelines")
+            if batch == 0:
+                batch = self.batch
+            docs: List[Doc] = _sample(list(self._table(table_type).values()), sample)
+            for i in range(0, len(docs), batch):
+                yield docs[i : i + batch]
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    ########################################################
+    #
+    # MemoryBackend(): account
+    #
+    ########################################################
+
+    async def account_insert(self, account: BSAccount, force: bool = False) -> bool:
+        """Store account to the backend. Returns False
+        if the account was not added"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Accounts, obj=account, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Accounts, obj=account)
+
+    async def account_get(self, account_id: int) -> BSAccount | None:
+        """Get account from backend"""
+        debug("starting")
+        if (
+            res := await self._data_get(BSTableType.Accounts, idx=account_id)
+        ) is not None:
+            return BSAccount.from_obj(res, self.model_accounts)
+        return None
+
+    async def account_update(
+        self,
+        account: BSAccount,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an account in the backend. Returns False
+        if the account was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Accounts, obj=account, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating account (id={account.id}) into {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+        return False
+
+    async def account_delete(self, account_id: int) -> bool:
+        """Delete account from the backend"""
+        debug("starting")
+        return await self._data_delete(BSTableType.Accounts, idx=account_id)
+
+    def _mk_match_accounts(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        id_range: range | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.auto,
+        dist: OptAccountsDistributed | None = None,
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        cache_valid: float = 0,
+    ) -> List[Match]:
+        """Build match for accounts. Same semantics as
+        MongoBackend._mk_pipeline_accounts()"""
+        debug("starting")
+        alias: Callable = self._alias(BSTableType.Accounts)
+        match: List[Match] = list()
+        a_id: str = alias("id")
+        a_lbt: str = alias("last_battle_time")
+
+        cache_valid *= 24 * 3600
+
+        if accounts is not None:
+            ids: set[int] = {a.id for a in accounts}
+            match.append(lambda doc: doc[a_id] in ids)
+        if disabled is not None:
+            a_disabled: str = alias("disabled")
+            match.append(lambda doc: doc.get(a_disabled, False) == disabled)
+        if inactive in [OptAccountsInactive.yes, OptAccountsInactive.no]:
+            a_inactive: str = alias("inactive")
+            is_inactive: bool = inactive == OptAccountsInactive.yes
+            match.append(lambda doc: doc.get(a_inactive, False) == is_inactive)
+
+        region_values: set[str] = {r.value for r in regions}
+        a_region: str = alias("region")
+        match.append(lambda doc: doc.get(a_region) in region_values)
+
+        if id_range is not None:
+            match.append(lambda doc: id_range.start <= doc[a_id] <= id_range.stop)
+        if active_since > 0:
+            match.append(lambda doc: doc.get(a_lbt, 0) >= active_since)
+        if inactive_since > 0:
+            match.append(lambda doc: doc.get(a_lbt, 0) < inactive_since)
+        if dist is not None:
+            match.append(lambda doc: dist.match(doc[a_id]))
+        if cache_valid > 0:
+            if stats_type is not None:
+                a_updated: str = alias(stats_type.value)
+                cache_limit: int = epoch_now() - int(cache_valid)
+                match.append(
+                    lambda doc: (
+                        doc.get(a_updated) is None or doc[a_updated] < cache_limit
+                    )
+                )
+            else:
+                error("--cache-valid requires stat_type")
+        return match
+
+    async def accounts_get(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.default(),
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        dist: OptAccountsDistributed | None = None,
+        sample: float = 0,
+        cache_valid: float = 0,
+        fields: Sequence[str] | None = None,
+    ) -> AsyncGenerator[BSAccount, None]:
+        """Get accounts from the backend
+        inactive: true = only inactive, false = not inactive, none = AUTO"""
+        try:
+            debug("starting")
+            match: List[Match] = self._mk_match_accounts(
+                stats_type=stats_type,
+                regions=regions,
+                accounts=accounts,
+                inactive=inactive,
+                disabled=disabled,
+                active_since=active_since,
+                inactive_since=inactive_since,
+                dist=dist,
+                cache_valid=cache_valid,
+            )
+            async for data in self._datas_get(
+                BSTableType.Accounts,
+                self._docs_match(BSTableType.Accounts, match, sample=sample),
+            ):
+                if (player := BSAccount.transform(data)) is None:
+                    continue
+                if (
+                    not disabled
+                    and inactive == OptAccountsInactive.auto
+                    and stats_type is not None
+                ):
+                    if not player.update_needed(stats_type):
+                        continue
+                yield player
+        except Exception as err:
+            error(
+                f"Error fetching accounts from {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+
+    async def accounts_count(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.default(),
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        dist: OptAccountsDistributed | None = None,
+        sample: float = 0,
+        cache_valid: float = 0,
+    ) -> int:
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        if accounts is not None:
+            return len(accounts)
+        debug("starting")
+        if sample > 1:
+            return int(sample) * len(regions)
+        match: List[Match] = self._mk_match_accounts(
+            stats_type=stats_type,
+            regions=regions,
+            inactive=inactive,
+            disabled=disabled,
+            active_since=active_since,
+            inactive_since=inactive_since,
+            dist=dist,
+            cache_valid=cache_valid,
+        )
+        return self._count(self._docs_match(BSTableType.Accounts, match), sample=sample)
+
+    async def accounts_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSAccount, None]:
+        """Export accounts"""
+        debug("starting")
+        async for obj in self.obj_export(BSTableType.Accounts, sample=sample):
+            if (acc := BSAccount.from_obj(obj, self.model_accounts)) is not None:
+                yield acc
+
+    async def accounts_insert(self, accounts: Sequence[BSAccount]) -> tuple[int, int]:
+        """Store account to the backend. Returns the number of added and not added"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.Accounts, accounts)
+
+    async def accounts_upsert(
+        self, accounts: Sequence[BSAccount]
+    ) -> tuple[int, int, int]:
+        """Replace or insert accounts. Returns the number of added, updated and unchanged"""
+        debug("starting")
+        return await self._datas_upsert(BSTableType.Accounts, accounts)
+
+    async def accounts_latest(self, regions: set[Region]) -> Dict[Region, BSAccount]:
+        """Return the latest accounts (=highest account_id) per region"""
+        debug("starting")
+        res: Dict[Region, BSAccount] = dict()
+        table: SortedDict = self._table(BSTableType.Accounts)
+        for region in regions:
+            match: List[Match] = self._mk_match_accounts(
+                regions={region},
+                inactive=OptAccountsInactive.both,
+                disabled=None,
+            )
+            for idx in table.irange(
+                region.id_range.start, region.id_range.stop, reverse=True
+            ):
+                if _matches(doc := table[idx], match):
+                    if (
+                        account := BSAccount.from_obj(doc, self.model_accounts)
+                    ) is not None:
+                        res[account.region] = account
+                    break
+        return res
+
+    ########################################################
+    #
+    # MemoryBackend(): player_achievements
+    #
+    ########################################################
+
+    async def player_achievement_insert(
+        self, player_achievement: PlayerAchievementsMaxSeries, force: bool = False
+    ) -> bool:
+        """Insert a single player achievement"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.PlayerAchievements, obj=player_achievement, upsert=True
+            )
+        else:
+            return await self._data_insert(
+                BSTableType.PlayerAchievements, obj=player_achievement
+            )
+
+    async def player_achievement_get(
+        self, account: BSAccount, added: int
+    ) -> PlayerAchievementsMaxSeries | None:
+        """Return a player_achievement from the backend"""
+        debug("starting")
+        try:
+            idx: PyObjectId = PlayerAchievementsMaxSeries.mk_index(
+                account_id=account.id, region=account.region, added=added
+            )
+            if (
+                res := await self._data_get(BSTableType.PlayerAchievements, idx=idx)
+            ) is not None:
+                return PlayerAchievementsMaxSeries.from_obj(
+                    res, self.model_player_achievements
+                )
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return None
+
+    async def player_achievement_delete(self, account: BSAccount, added: int) -> bool:
+        """Delete a player achievement from the backend"""
+        try:
+            debug("starting")
+            idx: PyObjectId = PlayerAchievementsMaxSeries.mk_index(
+                account.id, region=account.region, added=added
+            )
+            return await self._data_delete(BSTableType.PlayerAchievements, idx=idx)
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return False
+
+    async def player_achievements_insert(
+        self, player_achievements: Sequence[PlayerAchievementsMaxSeries]
+    ) -> tuple[int, int]:
+        """Store player achievements to the backend. Returns number of stats inserted and not inserted"""
+        debug("starting")
+        return await self._datas_insert(
+            BSTableType.PlayerAchievements, player_achievements
+        )
+
+    def _mk_match_player_achievements(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        since: int = 0,
+    ) -> List[Match]:
+        """Build match for player achievements"""
+        debug("starting")
+        alias: Callable = self._alias(BSTableType.PlayerAchievements)
+        match: List[Match] = list()
+        if release is not None:
+            a_release: str = alias("release")
+            match.append(lambda doc: doc.get(a_release) == release.release)
+        if regions != Region.API_regions():
+            a_region: str = alias("region")
+            region_values: set[str] = {r.value for r in regions}
+            match.append(lambda doc: doc.get(a_region) in region_values)
+        if accounts is not None:
+            a_account_id: str = alias("account_id")
+            ids: set[int] = {a.id for a in accounts}
+            match.append(lambda doc: doc[a_account_id] in ids)
+        if since > 0:
+            a_added: str = alias("added")
+            match.append(lambda doc: doc[a_added] >= since)
+        return match
+
+    async def player_achievements_get(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Return player achievements from the backend"""
+        debug("starting")
+        match: List[Match] = self._mk_match_player_achievements(
+            release=release, regions=regions, accounts=accounts, since=since
+        )
+        async for data in self._datas_get(
+            BSTableType.PlayerAchievements,
+            self._docs_match(BSTableType.PlayerAchievements, match, sample=sample),
+        ):
+            if (pa := PlayerAchievementsMaxSeries.transform(data)) is not None:
+                yield pa
+
+    async def player_achievements_count(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        sample: float = 0,
+    ) -> int:
+        """Get number of player achievements from backend"""
+        debug("starting")
+        match: List[Match] = self._mk_match_player_achievements(
+            release=release, regions=regions, accounts=accounts
+        )
+        return self._count(
+            self._docs_match(BSTableType.PlayerAchievements, match), sample=sample
+        )
+
+    async def player_achievement_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Export player achievements"""
+        async for obj in self.obj_export(BSTableType.PlayerAchievements, sample=sample):
+            if (
+                pa := PlayerAchievementsMaxSeries.from_obj(
+                    obj, self.model_player_achievements
+                )
+            ) is not None:
+                yield pa
+
+    async def player_achievements_export(
+        self,
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[PlayerAchievementsMaxSeries], None]:
+        """Export player achievements as a list"""
+        debug("starting")
+        async for objs in self.objs_export(
+            BSTableType.PlayerAchievements, sample=sample, batch=batch
+        ):
+            yield PlayerAchievementsMaxSeries.from_objs(
+                objs=objs, in_type=self.model_player_achievements
+            )
+
+    async def player_achievements_duplicates(
+        self,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Find duplicate player achievements from the backend"""
+        debug("starting")
+        match: List[Match] = self._mk_match_player_achievements(
+            release=release, regions=regions
+        )
+        dups: List[Doc] = self._duplicates(
+            BSTableType.PlayerAchievements,
+            self._docs_match(BSTableType.PlayerAchievements, match),
+            partition="account_id",
+            order="added",
+        )
+        if sample > 0:
+            dups = dups[:sample]
+        async for obj in self._datas_get(BSTableType.PlayerAchievements, dups):
+            if (pa := PlayerAchievementsMaxSeries.transform(obj)) is not None:
+                yield pa
+
+    ########################################################
+    #
+    # MemoryBackend(): releases
+    #
+    ########################################################
+
+    def _releases_all(self) -> List[BSBlitzRelease]:
+        """Return all releases sorted by cut-off"""
+        releases: List[BSBlitzRelease] = list()
+        for doc in self._table(BSTableType.Releases).values():
+            if (
+                release := BSBlitzRelease.from_obj(doc, self.model_releases)
+            ) is not None:
+                releases.append(release)
+        releases.sort(key=lambda r: r.cut_off)
+        return releases
+
+    async def release_get(self, release: str) -> BSBlitzRelease | None:
+        """Get release from backend"""
+        debug(f"release={release}")
+        if (obj := await self._data_get(BSTableType.Releases, idx=release)) is not None:
+            return BSBlitzRelease.transform(obj)
+        return None
+
+    async def release_get_latest(self) -> BSBlitzRelease | None:
+        """Get the latest release in the backend"""
+        debug("starting")
+        releases: List[BSBlitzRelease] = [
+            r for r in self._releases_all() if r.launch_date is not None
+        ]
+        if len(releases) > 0:
+            return max(releases, key=lambda r: r.launch_date)
+        return None
+
+    async def release_get_current(self) -> BSBlitzRelease | None:
+        """Get the release the current time falls into"""
+        debug("starting")
+        now: int = epoch_now()
+        for release in self._releases_all():
+            if release.cut_off >= now:
+                return release
+        return None
+
+    async def release_get_next(self, release: BSBlitzRelease) -> BSBlitzRelease | None:
+        """Get next release"""
+        debug("starting")
+        if (rel := await self.release_get(release.release)) is None:
+            error(f"release not found: {release.release}")
+            return None
+        for r in self._releases_all():
+            if r.cut_off > rel.cut_off:
+                return r
+        return None
+
+    async def release_get_previous(
+        self, release: BSBlitzRelease
+    ) -> BSBlitzRelease | None:
+        """Get previous release"""
+        debug("starting")
+        if (rel := await self.release_get(release.release)) is None:
+            error(f"release not found: {release.release}")
+            return None
+        for r in reversed(self._releases_all()):
+            if r.cut_off < rel.cut_off:
+                return r
+        error("no previous release found")
+        return None
+
+    async def release_insert(
+        self, release: BSBlitzRelease, force: bool = False
+    ) -> bool:
+        """Insert new release to the backend"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Releases, obj=release, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Releases, obj=release)
+
+    async def release_update(
+        self,
+        release: BSBlitzRelease,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an release in the backend. Returns False
+        if the release was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Releases, obj=release, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating release {release} into {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return False
+
+    async def release_delete(self, release: str) -> bool:
+        """Delete a release from backend"""
+        debug("starting")
+        release = BSBlitzRelease.validate_release(release)
+        return await self._data_delete(BSTableType.Releases, idx=release)
+
+    async def releases_get(
+        self,
+        release_match: str | None = None,
+        since: int = 0,
+        first: BSBlitzRelease | None = None,
+    ) -> AsyncGenerator[BSBlitzRelease, None]:
+        assert since == 0 or first is None, "Only one can be defined: since, first"
+        debug("starting")
+        releases: List[BSBlitzRelease] = list()
+        for release in self._releases_all():
+            if since > 0 and (
+                release.launch_date is None or release.launch_date.timestamp() < since
+            ):
+                continue
+            if first is not None and (
+                release.launch_date is None
+                or first.launch_date is None
+                or release.launch_date < first.launch_date
+            ):
+                continue
+            if release_match is not None and not release.release.startswith(
+                release_match
+            ):
+                continue
+            releases.append(release)
+
+        releases.sort(key=lambda s: [int(u) for u in s.release.split(".")])
+
+        async for release in awrap(releases):
+            yield release
+
+    async def releases_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSBlitzRelease, None]:
+        """Export releases"""
+        debug("starting")
+        async for obj in self.obj_export(BSTableType.Releases, sample=sample):
+            if (rel := BSBlitzRelease.from_obj(obj, self.model_releases)) is not None:
+                yield rel
+
+    ########################################################
+    #
+    # MemoryBackend(): replay
+    #
+    ########################################################
+
+    async def replay_insert(self, replay: JSONExportable) -> bool:
+        """Store replay into backend"""
+        debug("starting")
+        return await self._data_insert(BSTableType.Replays, obj=replay)
+
+    async def replay_get(self, replay_id: str) -> BSReplay | None:
+        """Get replay from backend"""
+        debug("starting")
+        if (
+            rep := await self._data_get(BSTableType.Replays, idx=replay_id)
+        ) is not None:
+            return BSReplay.from_obj(rep, self.model_replays)
+        return None
+
+    async def replay_delete(self, replay_id: str) -> bool:
+        """Delete a replay from backend"""
+        debug("starting")
+        return await self._data_delete(BSTableType.Replays, idx=replay_id)
+
+    async def replays_insert(
+        self, replays: Sequence[JSONExportable]
+    ) -> tuple[int, int]:
+        """Insert replays to the backend"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.Replays, replays)
+
+    def _mk_match_replays(self, since: int = 0, **summary_fields) -> List[Match]:
+        """Build match for replays"""
+        debug("starting")
+        alias: Callable = AliasMapper(self.model_replays).alias
+        match: List[Match] = list()
+        if since > 0:
+            match.append(lambda doc: doc.get("s", dict()).get("bts", 0) >= since)
+        for sf, value in summary_fields.items():
+            try:
+                field: str = alias(sf)
+                match.append(
+                    lambda doc, field=field, value=value: (
+                        doc.get("s", dict()).get(field) == value
+                    )
+                )
+            except KeyError:
+                error(f"No such a key in {self.model_replays.__qualname__}: {sf}")
+        return match
+
+    async def replays_get(
+        self,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+        **summary_fields,
+    ) -> AsyncGenerator[BSReplay, None]:
+        """Get replays from the backend"""
+        debug("starting")
+        match: List[Match] = self._mk_match_replays(since=since, **summary_fields)
+        async for data in self._datas_get(
+            BSTableType.Replays,
+            self._docs_match(BSTableType.Replays, match, sample=sample),
+        ):
+            if (replay := BSReplay.transform(data)) is not None:
+                yield replay
+
+    async def replays_count(
+        self, since: int = 0, sample: float = 0, **summary_fields
+    ) -> int:
+        """Count replays in backed"""
+        debug("starting")
+        match: List[Match] = self._mk_match_replays(since=since, **summary_fields)
+        return self._count(self._docs_match(BSTableType.Replays, match), sample=sample)
+
+    async def replays_export(self, sample: float = 0) -> AsyncGenerator[BSReplay, None]:
+        """Export replays"""
+        debug("starting")
+        async for replay in self._datas_export(
+            BSTableType.Replays,
+            in_type=self.model_replays,
+            out_type=BSReplay,
+            sample=sample,
+        ):
+            yield replay
+
+    ########################################################
+    #
+    # MemoryBackend(): tank_stats
+    #
+    ########################################################
+
+    async def tank_stat_insert(self, tank_stat: TankStat, force: bool = False) -> bool:
+        """Insert a single tank stat"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.TankStats, obj=tank_stat, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.TankStats, obj=tank_stat)
+
+    async def tank_stat_get(
+        self, account_id: int, tank_id: int, last_battle_time: int
+    ) -> TankStat | None:
+        """Return tank stats from the backend"""
+        debug("starting")
+        idx: PyObjectId = TankStat.mk_id(account_id, last_battle_time, tank_id)
+        if (res := await self._data_get(BSTableType.TankStats, idx=idx)) is not None:
+            return TankStat.from_obj(res, self.model_tank_stats)
+        return None
+
+    async def tank_stat_update(
+        self,
+        tank_stat: TankStat,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an tank stat in the backend. Returns False
+        if the tank stat was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.TankStats,
+                idx=tank_stat.id,
+                obj=tank_stat,
+                update=update,
+                fields=fields,
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating tank stat (id={tank_stat.id}) into {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+        return False
+
+    async def tank_stat_delete(
+        self, account_id: int, tank_id: int, last_battle_time: int
+    ) -> bool:
+        debug("starting")
+        idx: PyObjectId = TankStat.mk_id(account_id, last_battle_time, tank_id)
+        return await self._data_delete(BSTableType.TankStats, idx=idx)
+
+    async def tank_stats_insert(
+        self, tank_stats: Sequence[TankStat], force: bool = False
+    ) -> tuple[int, int]:
+        """Store tank stats to the backend. Returns the number of added and not added"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.TankStats, tank_stats, force=force)
+
+    async def tank_stats_upsert(
+        self, tank_stats: Sequence[TankStat]
+    ) -> tuple[int, int, int]:
+        """Replace or insert tank stats. Returns the number of added, updated and unchanged"""
+        debug("starting")
+        return await self._datas_upsert(BSTableType.TankStats, tank_stats)
+
+    def _tank_stats_docs(
+        self, accounts: Sequence[BSAccount] | None = None
+    ) -> List[Doc]:
+        """Return candidate tank stats using the account index"""
+        table: SortedDict = self._table(BSTableType.TankStats)
+        if accounts is None:
+            return list(table.values())
+        docs: List[Doc] = list()
+        index: SortedDict = self._store.tank_stats_by_account
+        for account_id in sorted({a.id for a in accounts}):
+            for key in index.irange(
+                (account_id,), (account_id + 1,), inclusive=(True, False)
+            ):
+                docs.append(table[index[key]])
+        return docs
+
+    def _mk_match_tank_stats(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        missing: str | None = None,
+        since: int = 0,
+        id_range: range | None = None,
+    ) -> List[Match]:
+        """Build match for tank stats. Same semantics as
+        MongoBackend._mk_pipeline_tank_stats()"""
+        debug("starting")
+        alias: Callable = self._alias(BSTableType.TankStats)
+        match: List[Match] = list()
+
+        a_region: str = alias("region")
+        region_values: set[str] = {r.value for r in regions}
+        match.append(lambda doc: doc.get(a_region) in region_values)
+        if release is not None:
+            a_release: str = alias("release")
+            match.append(lambda doc: doc.get(a_release) == release.release)
+        if accounts is not None:
+            a_account_id: str = alias("account_id")
+            account_ids: set[int] = {a.id for a in accounts}
+            match.append(lambda doc: doc[a_account_id] in account_ids)
+        if tanks is not None:
+            a_tank_id: str = alias("tank_id")
+            tank_ids: set[int] = {t.tank_id for t in tanks}
+            match.append(lambda doc: doc[a_tank_id] in tank_ids)
+        if since > 0:
+            a_lbt: str = alias("last_battle_time")
+            match.append(lambda doc: doc[a_lbt] >= since)
+        if id_range is not None:
+            a_id: str = alias("account_id")
+            match.append(lambda doc: doc[a_id] in id_range)
+        if missing is not None:
+            a_missing: str = alias(missing)
+            match.append(lambda doc: a_missing not in doc)
+        return match
+
+    async def tank_stats_get(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        missing: str | None = None,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+        id_range: range | None = None,
+    ) -> AsyncGenerator[TankStat, None]:
+        """Return tank stats from the backend"""
+        debug("starting")
+        match: List[Match] = self._mk_match_tank_stats(
+            release=release,
+            regions=regions,
+            accounts=accounts,
+            tanks=tanks,
+            missing=missing,
+            since=since,
+            id_range=id_range,
+        )
+        async for data in self._datas_get(
+            BSTableType.TankStats,
+            self._docs_match(
+                BSTableType.TankStats,
+                match,
+                docs=self._tank_stats_docs(accounts),
+                sample=sample,
+            ),
+        ):
+            if (tank_stat := TankStat.transform(data)) is not None:
+                yield tank_stat
+            else:
+                error(f"could not transform data to TankStat: {data}")
+
+    async def tank_stats_export_career(
+        self,
+        account: BSAccount,
+        release: BSBlitzRelease,
+    ) -> AsyncGenerator[List[TankStat], None]:
+        """Return the latest tank stats per tank by the release's cut-off"""
+        debug("starting")
+        alias: Callable = self._alias(BSTableType.TankStats)
+        a_region: str = alias("region")
+        table: SortedDict = self._table(BSTableType.TankStats)
+        index: SortedDict = self._store.tank_stats_by_account
+        latest: Dict[int, Doc] = dict()
+        # index is sorted by (account_id, tank_id, last_battle_time)
+        for account_id, tank_id, last_battle_time in index.irange(
+            (account.id,), (account.id + 1,), inclusive=(True, False)
+        ):
+            if last_battle_time > release.cut_off:
+                continue
+            doc: Doc = table[index[(account_id, tank_id, last_battle_time)]]
+            if doc.get(a_region) == account.region.value:
+                latest[tank_id] = doc
+        if len(latest) > 0:
+            yield TankStat.from_objs(list(latest.values()), self.model_tank_stats)
+
+    async def tank_stats_count(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        since: int = 0,
+        sample: float = 0,
+    ) -> int:
+        debug("starting")
+        match: List[Match] = self._mk_match_tank_stats(
+            release=release,
+            regions=regions,
+            accounts=accounts,
+            tanks=tanks,
+            since=since,
+        )
+        return self._count(
+            self._docs_match(
+                BSTableType.TankStats, match, docs=self._tank_stats_docs(accounts)
+            ),
+            sample=sample,
+        )
+
+    async def tank_stat_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[TankStat, None]:
+        """Export tank stats"""
+        debug("starting")
+        async for tank_stat in self._datas_export(
+            BSTableType.TankStats,
+            in_type=self.model_tank_stats,
+            out_type=TankStat,
+            sample=sample,
+        ):
+            yield tank_stat
+
+    async def tank_stats_export(
+        self, sample: float = 0, batch: int = 0
+    ) -> AsyncGenerator[List[TankStat], None]:
+        """Export tank stats as list"""
+        debug("starting")
+        async for objs in self.objs_export(
+            BSTableType.TankStats, sample=sample, batch=batch
+        ):
+            yield TankStat.from_objs(objs=objs, in_type=self.model_tank_stats)
+
+    async def tank_stats_duplicates(
+        self,
+        tank: BSTank,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[TankStat, None]:
+        """Find duplicate tank stats from the backend"""
+        debug("starting")
+        match: List[Match] = self._mk_match_tank_stats(
+            release=release, regions=regions, tanks=[tank]
+        )
+        dups: List[Doc] = self._duplicates(
+            BSTableType.TankStats,
+            self._docs_match(BSTableType.TankStats, match),
+            partition="account_id",
+            order="last_battle_time",
+        )
+        if sample > 0:
+            dups = dups[:sample]
+        async for obj in self._datas_get(BSTableType.TankStats, dups):
+            if (tank_stat := TankStat.transform(obj)) is not None:
+                yield tank_stat
+
+    async def tank_stats_unique(
+        self,
+        field: str,
+        field_type: type[A],
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        account: BSAccount | None = None,
+        tank: BSTank | None = None,
+        id_range: range | None = None,
+    ) -> AsyncGenerator[A, None]:
+        """Return unique values of field"""
+        debug("starting")
+        accounts: List[BSAccount] | None = None if account is None else [account]
+        match: List[Match] = self._mk_match_tank_stats(
+            release=release,
+            regions=regions,
+            accounts=accounts,
+            tanks=None if tank is None else [tank],
+            id_range=id_range,
+        )
+        a_field: str = self._alias(BSTableType.TankStats)(field)
+        values: set[Any] = {
+            doc.get(a_field)
+            for doc in self._docs_match(
+                BSTableType.TankStats, match, docs=self._tank_stats_docs(accounts)
+            )
+        }
+        for value in values:
+            yield cast(A, value)
+
+    async def tank_stats_unique_count(
+        self,
+        field: str,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        account: BSAccount | None = None,
+        tank: BSTank | None = None,
+        id_range: range | None = None,
+    ) -> int:
+        """Return count of unique values of field"""
+        debug("starting")
+        values: set[Any] = set()
+        async for value in self.tank_stats_unique(
+            field,
+            object,
+            release=release,
+            regions=regions,
+            account=account,
+            tank=tank,
+            id_range=id_range,
+        ):
+            values.add(value)
+        return len(values)
+
+    ########################################################
+    #
+    # MemoryBackend(): tankopedia
+    #
+    ########################################################
+
+    def _mk_match_tankopedia(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> List[Match]:
+        """Build match for Tankopedia"""
+        debug("starting")
+        alias: Callable = AliasMapper(self.model_tankopedia).alias
+        match: List[Match] = list()
+        if is_premium is not None:
+            a_premium: str = alias("is_premium")
+            match.append(lambda doc: doc.get(a_premium) == is_premium)
+        if tier is not None:
+            a_tier: str = alias("tier")
+            match.append(lambda doc: doc.get(a_tier) == tier.value)
+        if tank_type is not None:
+            a_type: str = alias("type")
+            match.append(lambda doc: doc.get(a_type) == tank_type.value)
+        if nation is not None:
+            a_nation: str = alias("nation")
+            match.append(lambda doc: doc.get(a_nation) == nation.value)
+        if tanks is not None and len(tanks) > 0:
+            a_tank_id: str = alias("tank_id")
+            tank_ids: set[int] = {t.tank_id for t in tanks}
+            match.append(lambda doc: doc[a_tank_id] in tank_ids)
+        return match
+
+    async def tankopedia_get(self, tank_id: int) -> BSTank | None:
+        debug("starting")
+        if (
+            obj := await self._data_get(BSTableType.Tankopedia, idx=tank_id)
+        ) is not None:
+            return BSTank.from_obj(obj, self.model_tankopedia)
+        return None
+
+    async def tankopedia_get_many(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> AsyncGenerator[BSTank, None]:
+        debug("starting")
+        match: List[Match] = self._mk_match_tankopedia(
+            tanks=tanks,
+            tier=tier,
+            tank_type=tank_type,
+            nation=nation,
+            is_premium=is_premium,
+        )
+        async for data in self._datas_get(
+            BSTableType.Tankopedia, self._docs_match(BSTableType.Tankopedia, match)
+        ):
+            if (tank := BSTank.transform(data)) is not None:
+                yield tank
+            else:
+                error(f"could not transform BSTank from object: {data}")
+
+    async def tankopedia_count(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> int:
+        """Count tanks in Tankopedia"""
+        match: List[Match] = self._mk_match_tankopedia(
+            tanks=tanks,
+            tier=tier,
+            tank_type=tank_type,
+            nation=nation,
+            is_premium=is_premium,
+        )
+        return len(self._docs_match(BSTableType.Tankopedia, match))
+
+    async def tankopedia_insert(self, tank: BSTank, force: bool = False) -> bool:
+        """ "insert tank into Tankopedia"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Tankopedia, obj=tank, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Tankopedia, obj=tank)
+
+    async def tankopedia_update(
+        self,
+        tank: BSTank,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update a tank in the backend's tankopedia. Returns False
+        if the tank was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Tankopedia, obj=tank, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Could't update tank {tank} in {self.table_uri(BSTableType.Tankopedia)}: {err}"
+            )
+        return False
+
+    async def tankopedia_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSTank, None]:
+        """Export tankopedia"""
+        debug(f"starting: model={self.model_tankopedia} ")
+        async for tank in self._datas_export(
+            BSTableType.Tankopedia,
+            in_type=self.model_tankopedia,
+            out_type=BSTank,
+            sample=sample,
+        ):
+            yield tank
+
+    async def tankopedia_delete(self, tank: BSTank) -> bool:
+        """Delete a tank from Tankopedia"""
+        return await self._data_delete(BSTableType.Tankopedia, idx=tank.tank_id)
+
+    ########################################################
+    #
+    # MemoryBackend(): error_
+    #
+    ########################################################
+
+    def _mk_match_errors(
+        self,
+        table_type: BSTableType | None = None,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> List[Match]:
+        """Build match for EventLog"""
+        match: List[Match] = list()
+        if table_type is not None:
+            table: str = self.get_table(table_type)
+            match.append(lambda doc: doc.get("t") == table)
+        if doc_id is not None:
+            match.append(lambda doc: doc.get("did") == doc_id)
+        if after is not None:
+            match.append(lambda doc: doc.get("d", after) >= after)
+        return match
+
+    async def error_log(self, error: EventLog) -> bool:
+        """Log an error into the backend's EventLog"""
+        debug(f"Logging error: {error.table}: {error.msg}")
+        self._store.event_id += 1
+        self._table(BSTableType.EventLog)[self._store.event_id] = error.obj_db()
+        return True
+
+    async def errors_get(
+        self,
+        table_type: BSTableType | None = None,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> AsyncGenerator[EventLog, None]:
+        """Return errors from backend EventLog"""
+        debug("starting")
+        match: List[Match] = self._mk_match_errors(
+            table_type=table_type, doc_id=doc_id, after=after
+        )
+        for doc in self._docs_match(BSTableType.EventLog, match):
+            try:
+                yield EventLog.parse_obj(doc)
+            except Exception as e:
+                error(f"{e}")
+
+    async def errors_clear(
+        self,
+        table_type: BSTableType,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> int:
+        """Clear errors from backend EventLog"""
+        debug("starting")
+        match: List[Match] = self._mk_match_errors(
+            table_type=table_type, doc_id=doc_id, after=after
+        )
+        table: SortedDict = self._table(BSTableType.EventLog)
+        idxs: List[int] = [idx for idx, doc in table.items() if _matches(doc, match)]
+        for idx in idxs:
+            del table[idx]
+        return len(idxs)
+
+
+# Register backend
+
+debug("Registering memory")
+Backend.register(driver=MemoryBackend.driver, backend=MemoryBackend)
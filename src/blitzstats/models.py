@@ -19,6 +19,7 @@ from pydantic_exportables import (
 
 from blitzmodels import (
     Account,
+    Region,
     Release,
     AccountInfo,
     Tank,
@@ -262,6 +263,72 @@ class BSBlitzRelease(Release):
         return super().txt_row(format) + extra
 
 
+class BSStats(JSONExportable):
+    """Summary of stats per stats type, release, region and tank.
+    tank_id=0 is the summary over all the tanks. 'built' is set only by
+    stats_rebuild() on the all-tanks summary once the region has been fully counted
+    and cleared by writes the summaries do not track"""
+
+    # fmt: off
+    id          : str | None    = Field(default=None, alias="_id")
+    stats_type  : StatsTypes    = Field(alias="s")
+    release     : str           = Field(alias="u")
+    region      : Region        = Field(alias="r")
+    tank_id     : int           = Field(default=0, alias="t")
+    documents   : int           = Field(default=0, alias="n")
+    accounts    : int           = Field(default=0, alias="a")
+    battles     : int           = Field(default=0, alias="b")
+    built       : bool          = Field(default=False, alias="c")
+    updated     : int           = Field(default_factory=epoch_now, alias="d")
+    # fmt: on
+
+    _exclude_defaults = False
+
+    class Config:
+        validate_assignment = True
+        populate_by_name = True
+
+    @classmethod
+    def mk_id(
+        cls, stats_type: StatsTypes, release: str, region: Region, tank_id: int = 0
+    ) -> str:
+        return f"{stats_type.name}:{release}:{region.value}:{tank_id}"
+
+    @model_validator(mode="after")
+    def set_id(self) -> Self:
+        if self.id is None:
+            self._set_skip_validation(
+                "id",
+                self.mk_id(self.stats_type, self.release, self.region, self.tank_id),
+            )
+        return self
+
+    @property
+    def index(self) -> Idx:
+        """return backend index"""
+        if self.id is None:
+            return self.mk_id(self.stats_type, self.release, self.region, self.tank_id)
+        return self.id
+
+    @property
+    def indexes(self) -> Dict[str, Idx]:
+        """return backend indexes"""
+        return {"_id": self.index}
+
+    @classmethod
+    def backend_indexes(cls) -> List[List[tuple[str, IndexSortOrder]]]:
+        indexes: List[List[BackendIndex]] = list()
+        indexes.append(
+            [
+                ("stats_type", ASCENDING),
+                ("release", ASCENDING),
+                ("region", ASCENDING),
+                ("tank_id", ASCENDING),
+            ]
+        )
+        return indexes
+
+
 class BSReplay(Replay):
     """
     Replay model for Blitz-Stats
@@ -1,6 +1,7 @@
 from configparser import ConfigParser
 from argparse import Namespace, ArgumentParser
 from datetime import datetime
+from enum import Enum
 from typing import (
     Optional,
     Any,
@@ -13,24 +14,43 @@ from typing import (
     Callable,
     Dict,
     List,
+    get_args,
+    get_origin,
 )
 import logging
 
-from asyncio import Task, create_task, gather
-from bson import ObjectId
+from asyncio import Queue, CancelledError, Task, create_task, gather
+from random import randrange
+from time import monotonic
+from os import getpid, makedirs, replace, remove
+from os.path import isfile, join as path_join
+from functools import cache
+from hashlib import sha1
+from bson import ObjectId, json_util, encode as bson_encode
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from motor.motor_asyncio import (  # type: ignore
     AsyncIOMotorClient,
     AsyncIOMotorDatabase,
     AsyncIOMotorCursor,
     AsyncIOMotorCollection,
 )  # type: ignore
+from pymongo import ReplaceOne, UpdateOne, WriteConcern
 from pymongo.results import (
+    BulkWriteResult,
     InsertManyResult,
     InsertOneResult,
     DeleteResult,
+    UpdateResult,
 )
-from pymongo.errors import BulkWriteError, CollectionInvalid, ConnectionFailure
-from pydantic import ValidationError, Field
+from pymongo.errors import (
+    BulkWriteError,
+    CollectionInvalid,
+    ConnectionFailure,
+    OperationFailure,
+)
+from pydantic import BaseModel, ValidationError, Field
+import pyarrow as pa  # type: ignore
 
 # from icecream import ic  # type: ignore
 
@@ -43,7 +63,7 @@ from pydantic_exportables import (
     ASCENDING,
     PyObjectId,
 )
-from pyutils.utils import epoch_now
+from pyutils.utils import epoch_now, chunker
 from pyutils import awrap
 
 from blitzmodels import (
@@ -56,6 +76,7 @@ from blitzmodels import (
 )
 # from blitzmodels.wotinspector.wi_apiv2 import Replay
 
+from .arrow import record_batch_from_docs, schema_defaults
 from .backend import (
     Backend,
     OptAccountsDistributed,
@@ -63,12 +84,14 @@ from .backend import (
     BSTableType,
     EventLog,
     A,
+    BULK_BATCH_BYTES,
 )
 from .models import (
     BSAccount,
     BSBlitzRelease,
     StatsTypes,
     BSReplay,
+    BSStats,
     BSTank,
     EnumVehicleTypeInt,
 )
@@ -83,6 +106,28 @@ debug = logger.debug
 # Constants
 TANK_STATS_BATCH: int = 1000
 MONGO_BATCH_SIZE: int = 1000
+MONGO_COUNT_CACHE_TTL: float = 15 * 60  # seconds
+# Fractional samples >= MONGO_SAMPLE_HASH or after a $match are selected by
+# a hash of an integer field instead of $sample that sorts the whole collection
+MONGO_SAMPLE_HASH: float = 0.05
+MONGO_SAMPLE_BUCKETS: int = 10007  # prime
+MONGO_SAMPLE_MULTIPLIER: int = 40503
+
+MONGO_BULK_BATCH_MAX: int = 100000
+
+# Documents sampled per partition by split_points()
+MONGO_SPLIT_SAMPLE: int = 100
+
+# Validate every Nth document with 'trusted_reads' to catch schema drift
+MONGO_TRUSTED_VALIDATE: int = 10000
+
+# Backend options that are not passed to AsyncIOMotorClient()
+MONGO_BACKEND_OPTIONS: List[str] = [
+    "count_cache_ttl",
+    "sample_seed",
+    "trusted_reads",
+    "trusted_validate",
+]
 
 
 class MongoErrorLog(EventLog):
@@ -105,6 +150,107 @@ class MongoErrorLog(EventLog):
 D = TypeVar("D", bound="JSONExportable")
 J = TypeVar("J", bound="JSONExportable")
 OutJSONExportable = TypeVar("OutJSONExportable", bound="JSONExportable")
+B = TypeVar("B", bound=BaseModel)
+
+
+@cache
+def _construct_fields(
+    model: type[BaseModel],
+) -> List[tuple[str, str, type[BaseModel] | None, type | None, type[Enum] | None]]:
+    """Return (key, name, sub model, container, enum) for the fields of a model"""
+    fields: List[
+        tuple[str, str, type[BaseModel] | None, type | None, type[Enum] | None]
+    ] = list()
+    for name, info in model.model_fields.items():
+        key: str = info.alias if info.alias is not None else name
+        sub_model: type[BaseModel] | None = None
+        container: type | None = None
+        enum: type[Enum] | None = None
+        for tp in (info.annotation, *get_args(info.annotation)):
+            if isinstance(tp, type) and issubclass(tp, Enum):
+                enum = tp
+                break
+            if (origin := get_origin(tp)) in (list, dict):
+                container = origin
+                tp = get_args(tp)[-1]
+            if isinstance(tp, type) and issubclass(tp, BaseModel):
+                sub_model = tp
+                break
+            container = None
+        fields.append((key, name, sub_model, container, enum))
+    return fields
+
+
+@cache
+def _construct_validators(model: type[BaseModel]) -> List[Callable]:
+    """Return the model validators of a model run after field validation"""
+    return [
+        dec.func
+        for dec in model.__pydantic_decorators__.model_validators.values()
+        if dec.info.mode == "after"
+    ]
+
+
+def _construct(model: type[B], obj: Dict[str, Any]) -> B:
+    """Construct a model and its sub models from a document without field
+    validation. Enum fields are coerced and 'after' model validators are run
+    so the result equals model_validate(obj) for documents the models wrote"""
+    values: Dict[str, Any] = dict()
+    for key, name, sub_model, container, enum in _construct_fields(model):
+        if key in obj:
+            value = obj[key]
+        elif name in obj:
+            value = obj[name]
+        else:
+            continue
+        if sub_model is not None:
+            if container is list and isinstance(value, list):
+                value = [
+                    _construct(sub_model, v) if isinstance(v, dict) else v
+                    for v in value
+                ]
+            elif container is dict and isinstance(value, dict):
+                value = {
+                    k: _construct(sub_model, v) if isinstance(v, dict) else v
+                    for k, v in value.items()
+                }
+            elif container is None and isinstance(value, dict):
+                value = _construct(sub_model, value)
+        elif enum is not None and value is not None and not isinstance(value, enum):
+            try:
+                value = enum(value)
+            except ValueError:
+                pass
+        values[name] = value
+    res: B = model.model_construct(**values)
+    for validator in _construct_validators(model):
+        res = validator(res)
+    return res
+
+
+def _keyset_supported(pipeline: List[Dict[str, Any]]) -> bool:
+    """True if a pipeline only filters and projects documents keeping _id
+    so it can be paginated by _id"""
+    for stage in pipeline:
+        for op, spec in stage.items():
+            if op == "$match":
+                continue
+            if op == "$project" and spec.get("_id", 1) not in (0, False):
+                continue
+            return False
+    return True
+
+
+def _pipeline_hash(pipeline: List[Dict[str, Any]]) -> str:
+    """Hash of an aggregation pipeline to match resume tokens to scans"""
+    return sha1(json_util.dumps(pipeline).encode()).hexdigest()
+
+
+def _stats_keys(objs: Iterable[Any]) -> set[tuple[str | None, Region | None]]:
+    """Return (release, region) keys of the stats summaries 'objs' belong to"""
+    return {
+        (getattr(obj, "release", None), getattr(obj, "region", None)) for obj in objs
+    }
 
 
 class MongoBackend(Backend):
@@ -145,6 +291,19 @@ class MongoBackend(Backend):
             mongodb_rc["authSource"] = None
             mongodb_rc["username"] = None
             mongodb_rc["password"] = None
+            mongodb_rc["count_cache_ttl"] = MONGO_COUNT_CACHE_TTL
+            mongodb_rc["sample_seed"] = None
+            mongodb_rc["trusted_reads"] = False
+            mongodb_rc["trusted_validate"] = MONGO_TRUSTED_VALIDATE
+            # connection pool, use pymongo defaults if not set
+            mongodb_rc["maxPoolSize"] = None
+            mongodb_rc["minPoolSize"] = None
+            mongodb_rc["compressors"] = None
+            mongodb_rc["socketTimeoutMS"] = None
+            mongodb_rc["connectTimeoutMS"] = None
+            mongodb_rc["serverSelectionTimeoutMS"] = None
+            mongodb_rc["readPreference"] = None
+            mongodb_rc["w"] = None
 
             if config is not None and "MONGODB" in config.sections():
                 configMongo = config["MONGODB"]
@@ -169,6 +328,42 @@ class MongoBackend(Backend):
                 mongodb_rc["password"] = configMongo.get(
                     "password", mongodb_rc["password"]
                 )
+                mongodb_rc["count_cache_ttl"] = configMongo.getfloat(
+                    "count_cache_ttl", mongodb_rc["count_cache_ttl"]
+                )
+                mongodb_rc["sample_seed"] = configMongo.getint(
+                    "sample_seed", mongodb_rc["sample_seed"]
+                )
+                mongodb_rc["trusted_reads"] = configMongo.getboolean(
+                    "trusted_reads", mongodb_rc["trusted_reads"]
+                )
+                mongodb_rc["trusted_validate"] = configMongo.getint(
+                    "trusted_validate", mongodb_rc["trusted_validate"]
+                )
+                mongodb_rc["maxPoolSize"] = configMongo.getint(
+                    "pool_size", mongodb_rc["maxPoolSize"]
+                )
+                mongodb_rc["minPoolSize"] = configMongo.getint(
+                    "min_pool_size", mongodb_rc["minPoolSize"]
+                )
+                mongodb_rc["compressors"] = configMongo.get(
+                    "compressors", mongodb_rc["compressors"]
+                )
+                mongodb_rc["socketTimeoutMS"] = configMongo.getint(
+                    "socket_timeout_ms", mongodb_rc["socketTimeoutMS"]
+                )
+                mongodb_rc["connectTimeoutMS"] = configMongo.getint(
+                    "connect_timeout_ms", mongodb_rc["connectTimeoutMS"]
+                )
+                mongodb_rc["serverSelectionTimeoutMS"] = configMongo.getint(
+                    "server_selection_timeout_ms",
+                    mongodb_rc["serverSelectionTimeoutMS"],
+                )
+                mongodb_rc["readPreference"] = configMongo.get(
+                    "read_preference", mongodb_rc["readPreference"]
+                )
+                if (w := configMongo.get("write_concern")) is not None:
+                    mongodb_rc["w"] = int(w) if w.isdigit() else w
 
                 self.set_table(BSTableType.Accounts, configMongo.get("t_accounts"))
                 self.set_table(BSTableType.Tankopedia, configMongo.get("t_tankopedia"))
@@ -184,6 +379,7 @@ class MongoBackend(Backend):
                 )
                 self.set_table(BSTableType.AccountLog, configMongo.get("t_account_log"))
                 self.set_table(BSTableType.EventLog, configMongo.get("t_error_log"))
+                self.set_table(BSTableType.Stats, configMongo.get("t_stats"))
 
                 self.set_model(BSTableType.Accounts, configMongo.get("m_accounts"))
                 self.set_model(BSTableType.Tankopedia, configMongo.get("m_tankopedia"))
@@ -199,6 +395,7 @@ class MongoBackend(Backend):
                 )
                 self.set_model(BSTableType.AccountLog, configMongo.get("m_account_log"))
                 self.set_model(BSTableType.EventLog, configMongo.get("m_event_log"))
+                self.set_model(BSTableType.Stats, configMongo.get("m_stats"))
 
             if db_config is not None:
                 kwargs = db_config | kwargs
@@ -208,12 +405,31 @@ class MongoBackend(Backend):
 
             # ic("about to create mongodb", kwargs)
             self.set_database(database)
-            self._client = AsyncIOMotorClient(**kwargs)
+            self._count_cache_ttl: float = float(kwargs["count_cache_ttl"])
+            self._count_cache: Dict[str, tuple[float, int]] = dict()
+            # random seed is kept in db_config to sample the same way in copies
+            self._sample_seed: int = int(
+                kwargs.setdefault("sample_seed", randrange(MONGO_SAMPLE_BUCKETS))
+            )
+            # documents written by blitzstats are constructed without validation
+            self._trusted_reads: bool = bool(kwargs["trusted_reads"])
+            self._trusted_validate: int = max(int(kwargs["trusted_validate"]), 1)
+            self._trusted_count: int = 0
+            # set by set_bulk_mode()
+            self._write_concern: WriteConcern | None = None
+            # set by set_scan_resume()
+            self._scan_dir: str | None = None
+            self._scan_name: str | None = None
+            self._scans: Dict[BSTableType, Dict[str, Any]] = dict()
+            self._client = AsyncIOMotorClient(
+                **{k: v for k, v in kwargs.items() if k not in MONGO_BACKEND_OPTIONS}
+            )
             debug(f"{self._client}")
             self.db = self._client[self.database]
             self._db_config = kwargs
             self.config_tables(table_config=table_config)
             self.config_models(model_config=model_config)
+            self._log_client_options()
 
             # debug(f'Mongo DB: {self.backend}')
             debug(
@@ -232,6 +448,40 @@ class MongoBackend(Backend):
         print(f"###### DEBUG {self.driver} ######")
         print(f"DB Client: {self._client}")
 
+    def _log_client_options(self) -> None:
+        """Log effective connection pool settings of the client"""
+        try:
+            options = self._client.options
+            pool = options.pool_options
+            verbose(
+                f"{self.driver} client (PID={getpid()}): "
+                + f"pool_size={pool.max_pool_size}, min_pool_size={pool.min_pool_size}, "
+                + f"compressors={options._options.get('compressors')}, "
+                + f"socket_timeout={pool.socket_timeout}, "
+                + f"connect_timeout={pool.connect_timeout}, "
+                + f"server_selection_timeout={options.server_selection_timeout}, "
+                + f"read_preference={options.read_preference.mongos_mode}, "
+                + f"write_concern={options.write_concern.document}"
+            )
+        except Exception as err:
+            debug(f"could not read client options: {err}")
+
+    @classmethod
+    def worker_db_config(
+        cls, db_config: Dict[str, Any] | None, threads: int
+    ) -> Dict[str, Any] | None:
+        """Size the connection pool of a worker process for 'threads' async tasks.
+        A smaller configured 'pool_size' is kept"""
+        if db_config is None:
+            db_config = dict()
+        db_config = dict(db_config)
+        if (pool_size := db_config.get("maxPoolSize")) is not None:
+            threads = min(pool_size, threads)
+        db_config["maxPoolSize"] = max(threads, 1)
+        if (min_pool := db_config.get("minPoolSize")) is not None:
+            db_config["minPoolSize"] = min(min_pool, db_config["maxPoolSize"])
+        return db_config
+
     def copy(self, **kwargs) -> Optional["Backend"]:
         """Create a copy of the backend"""
         try:
@@ -269,6 +519,10 @@ class MongoBackend(Backend):
         return False
 
     def get_collection(self, table_type: BSTableType) -> AsyncIOMotorCollection:
+        if self._write_concern is not None:
+            return self.db.get_collection(
+                self.get_table(table_type), write_concern=self._write_concern
+            )
         return self.db[self.get_table(table_type)]
 
     @property
@@ -295,6 +549,10 @@ class MongoBackend(Backend):
     def collection_tank_stats(self) -> AsyncIOMotorCollection:
         return self.get_collection(BSTableType.TankStats)
 
+    @property
+    def collection_stats(self) -> AsyncIOMotorCollection:
+        return self.get_collection(BSTableType.Stats)
+
     @property
     def collection_error_log(self) -> AsyncIOMotorCollection:
         return self.get_collection(BSTableType.EventLog)
@@ -432,6 +690,50 @@ class MongoBackend(Backend):
             error(f"{err}")
         return False
 
+    def set_bulk_mode(
+        self,
+        write_concern: Dict[str, Any] | None = None,
+        batch_bytes: int = BULK_BATCH_BYTES,
+    ) -> None:
+        """Use relaxed write concern (e.g. w=1, j=False) and
+        large unordered insert batches for bulk imports"""
+        super().set_bulk_mode(write_concern=write_concern, batch_bytes=batch_bytes)
+        if write_concern is not None:
+            self._write_concern = WriteConcern(**write_concern)
+        verbose(
+            f"{self.backend}: bulk mode: write_concern={write_concern}, batch_bytes={batch_bytes}"
+        )
+
+    def bulk_batch_size(self, objs: Sequence[JSONExportable]) -> int:
+        """Number of objects per bulk insert batch based on BSON size of 'objs'"""
+        try:
+            sample: Sequence[JSONExportable] = objs[:100]
+            if len(sample) > 0:
+                size: int = sum(len(bson_encode(obj.obj_db())) for obj in sample)
+                return min(
+                    max(self._bulk_batch_bytes * len(sample) // size, MONGO_BATCH_SIZE),
+                    MONGO_BULK_BATCH_MAX,
+                )
+        except Exception as err:
+            error(f"could not estimate batch size: {err}")
+        return MONGO_BATCH_SIZE
+
+    async def indexes_drop(self, table_type: BSTableType) -> bool:
+        """Drop indexes of a collection except _id"""
+        debug("starting")
+        try:
+            message(f"Dropping indexes: {self.table_uri(table_type)}")
+            await self.get_collection(table_type).drop_indexes()
+            return True
+        except Exception as err:
+            error(f"Could not drop indexes of {self.table_uri(table_type)}: {err}")
+        return False
+
+    async def indexes_rebuild(self, table_type: BSTableType) -> bool:
+        """Create the model's indexes of a collection"""
+        debug("starting")
+        return await self.init_collection(table_type)
+
     # type: ignore
     async def init(self, tables: List[str] = [tt.name for tt in BSTableType]) -> bool:  # type: ignore
         """Init MongoDB backend: create tables and set indexes"""
@@ -454,24 +756,77 @@ class MongoBackend(Backend):
     #
     ########################################################
 
+    def _parse(self, model: type[D], obj: Dict[str, Any]) -> D:
+        """Parse a document read from the DB. With 'trusted_reads' documents are
+        constructed without validation except every 'trusted_validate'th"""
+        if self._trusted_reads:
+            self._trusted_count += 1
+            if self._trusted_count % self._trusted_validate != 0:
+                return _construct(model, obj)
+        return model.model_validate(obj)
+
+    def _parse_many(self, model: type[D], objs: Iterable[Dict[str, Any]]) -> List[D]:
+        """Parse a list of documents read from the DB, skip invalid ones"""
+        res: List[D] = list()
+        for obj in objs:
+            try:
+                res.append(self._parse(model, obj))
+            except ValidationError as err:
+                error(f"Could not validate {model} ob={obj}: {err}")
+        return res
+
+    def _from_objs(
+        self,
+        out_type: type[D],
+        objs: Sequence[Dict[str, Any]],
+        in_type: type[JSONExportable],
+    ) -> List[D]:
+        """Transform documents of 'in_type' to 'out_type'.
+        Uses trusted reads if the types are the same"""
+        if self._trusted_reads and in_type is out_type:
+            return self._parse_many(out_type, objs)
+        return out_type.from_objs(objs=objs, in_type=in_type)
+
     async def _datas_get(
-        self, table_type: BSTableType, pipeline: List[Dict[str, Any]], **options
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]],
+        fields: Sequence[str] | None = None,
+        keyset: bool = False,
+        batch: int = MONGO_BATCH_SIZE,
+        **options,
     ) -> AsyncGenerator[JSONExportable, None]:
+        """Get data with an aggregation pipeline. 'fields' adds a $project stage
+        and returns partial objects that are not validated. keyset=True paginates
+        long scans by _id, see _aggregate_pages()"""
         try:
             debug("starting")
-            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
             model: type[JSONExportable] = self.get_model(table_type)
 
-            debug(f"collection={dbc.name}, model={model}, pipeline={pipeline}")
-            async for obj in dbc.aggregate(pipeline, allowDiskUse=True, **options):
-                try:
-                    yield model.parse_obj(obj)
-                except ValidationError as err:
-                    error(
-                        f"Could not validate {model} ob={obj} from {self.table_uri(table_type)}: {err}"
-                    )
-                except Exception as err:
-                    error(f"{err}")
+            if fields is not None:
+                alias: Callable = AliasMapper(model).alias
+                pipeline = pipeline + [
+                    {"$project": {alias(field): 1 for field in fields}}
+                ]
+
+            debug(
+                f"table={self.table_uri(table_type)}, model={model}, pipeline={pipeline}"
+            )
+            async for objs in self._aggregate_pages(
+                table_type, pipeline, batch=batch, keyset=keyset, **options
+            ):
+                for obj in objs:
+                    try:
+                        if fields is not None:
+                            yield model.model_construct(**obj)
+                        else:
+                            yield self._parse(model, obj)
+                    except ValidationError as err:
+                        error(
+                            f"Could not validate {model} ob={obj} from {self.table_uri(table_type)}: {err}"
+                        )
+                    except Exception as err:
+                        error(f"{err}")
         except Exception as err:
             error(f"Failed to get data from {self.table_uri(table_type)}: {err}")
 
@@ -490,7 +845,7 @@ class MongoBackend(Backend):
             datas: List[JSONExportable] = list()
             async for obj in dbc.aggregate(pipeline, allowDiskUse=True, **options):
                 try:
-                    datas.append(model.parse_obj(obj))
+                    datas.append(self._parse(model, obj))
                     if len(datas) == batch:
                         yield datas
                         datas = list()
@@ -519,11 +874,7 @@ class MongoBackend(Backend):
             dbc: AsyncIOMotorCollection = self.get_collection(table_type)
             pipeline: List[Dict[str, Any]] = list()
 
-            if sample > 0 and sample < 1:
-                N: int = await dbc.estimated_document_count()
-                pipeline.append({"$sample": {"size": int(N * sample)}})
-            elif sample >= 1:
-                pipeline.append({"$sample": {"size": int(sample)}})
+            pipeline = await self._mk_pipeline_sample(table_type, pipeline, sample)
 
             async for obj in dbc.aggregate(pipeline, allowDiskUse=True, **options):
                 try:
@@ -575,11 +926,30 @@ class MongoBackend(Backend):
             dbc: AsyncIOMotorCollection = self.get_collection(table_type)
             model: type[JSONExportable] = self.get_model(table_type)
             if (res := await dbc.find_one({"_id": idx})) is not None:
-                return model.parse_obj(res)
+                return self._parse(model, res)
         except Exception as err:
             error(f"Error getting _id={idx} from {self.table_uri(table_type)}: {err}")
         return None
 
+    async def _datas_get_many(
+        self, table_type: BSTableType, ids: Sequence[Idx], batch: int = MONGO_BATCH_SIZE
+    ) -> Dict[Idx, JSONExportable]:
+        """Get documents by _id with chunked {_id: {$in: [...]}} queries.
+        Returns a dict of _id: document for the documents found"""
+        res: Dict[Idx, JSONExportable] = dict()
+        try:
+            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+            model: type[JSONExportable] = self.get_model(table_type)
+            for id_batch in chunker(list(ids), batch):
+                async for obj in dbc.find({"_id": {"$in": id_batch}}):
+                    try:
+                        res[obj["_id"]] = self._parse(model, obj)
+                    except ValidationError as err:
+                        error(f"Could not validate {model} ob={obj}: {err}")
+        except Exception as err:
+            error(f"Error getting documents from {self.table_uri(table_type)}: {err}")
+        return res
+
     async def _data_replace(
         self, table_type: BSTableType, obj: JSONExportable, upsert: bool = False
     ) -> bool:
@@ -681,30 +1051,40 @@ class MongoBackend(Backend):
         return False
 
     async def _datas_insert(
-        self, table_type: BSTableType, objs: Sequence[D]
+        self,
+        table_type: BSTableType,
+        objs: Sequence[D],
+        inserted: List[JSONExportable] | None = None,
     ) -> tuple[int, int]:
-        """Store data to the backend. Returns the number of added and not added"""
+        """Store data to the backend. Returns the number of added and not added.
+        The added objects are appended to 'inserted' if given"""
         debug("starting")
         added: int = 0
         not_added: int = 0
+        datas: List[JSONExportable] = list()
         try:
             debug(f"inserting to {self.table_uri(table_type)}")
             dbc: AsyncIOMotorCollection = self.get_collection(table_type)
             model: type[JSONExportable] = self.get_model(table_type)
             if len(objs) == 0:
                 raise ValueError("No data to insert")
-            datas: List[JSONExportable | None] = [
-                model.transform(obj) for obj in objs
-            ]  # transform_many()
+            datas = model.transform_many(objs)
 
             res: InsertManyResult = await dbc.insert_many(
-                (data.obj_db() for data in datas if data is not None), ordered=False
+                (data.obj_db() for data in datas), ordered=False
             )
             added = len(res.inserted_ids)
+            if inserted is not None:
+                inserted.extend(datas)
         except BulkWriteError as err:
             if err.details is not None:
                 added = err.details["nInserted"]
                 not_added = len(err.details["writeErrors"])
+                if inserted is not None:
+                    failed: set[int] = {e["index"] for e in err.details["writeErrors"]}
+                    inserted.extend(
+                        data for i, data in enumerate(datas) if i not in failed
+                    )
                 debug(
                     f"Added {added}, could not add {not_added} entries to {self.table_uri(table_type)}"
                 )
@@ -717,38 +1097,210 @@ class MongoBackend(Backend):
         debug(f"added={added}, not_added={not_added}")
         return added, not_added
 
+    async def _datas_upsert(
+        self,
+        table_type: BSTableType,
+        objs: Sequence[D],
+    ) -> tuple[int, int, int]:
+        """Replace or insert data with unordered bulk writes.
+        Returns the number of added, updated and unchanged"""
+        debug("starting")
+        added: int = 0
+        updated: int = 0
+        unchanged: int = 0
+        try:
+            debug(f"upserting to {self.table_uri(table_type)}")
+            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+            model: type[JSONExportable] = self.get_model(table_type)
+            datas: List[JSONExportable] = model.transform_many(objs)
+
+            for i in range(0, len(datas), MONGO_BATCH_SIZE):
+                batch: List[JSONExportable] = datas[i : i + MONGO_BATCH_SIZE]
+                ops: List[ReplaceOne] = [
+                    ReplaceOne({"_id": data.index}, data.obj_db(), upsert=True)
+                    for data in batch
+                ]
+                try:
+                    res: BulkWriteResult = await dbc.bulk_write(ops, ordered=False)
+                    added += res.upserted_count
+                    updated += res.modified_count
+                    unchanged += res.matched_count - res.modified_count
+                except BulkWriteError as err:
+                    if err.details is not None:
+                        added += err.details["nUpserted"]
+                        updated += err.details["nModified"]
+                        unchanged += err.details["nMatched"] - err.details["nModified"]
+                        debug(
+                            f"could not upsert {len(err.details['writeErrors'])} entries to {self.table_uri(table_type)}"
+                        )
+                    else:
+                        error("BulkWriteError.details is None")
+        except Exception as err:
+            error(
+                f"Unknown error when upserting entries to {self.table_uri(table_type)}: {err}"
+            )
+        debug(f"added={added}, updated={updated}, unchanged={unchanged}")
+        return added, updated, unchanged
+
+    def _count_cache_key(
+        self, table_type: BSTableType, pipeline: List[Dict[str, Any]], *args: str
+    ) -> str:
+        """Cache key of a count: table and the pipeline with sorted keys"""
+        return ":".join(
+            [
+                self.get_table(table_type),
+                *args,
+                json_util.dumps(pipeline, sort_keys=True),
+            ]
+        )
+
+    def _count_cache_get(self, key: str) -> int:
+        """Return cached count or -1 if not found or expired"""
+        if (cached := self._count_cache.get(key)) is not None:
+            if monotonic() - cached[0] < self._count_cache_ttl:
+                debug(f"count cache hit: {key}")
+                return cached[1]
+            del self._count_cache[key]
+        return -1
+
+    def _count_hint(
+        self, table_type: BSTableType, query: Dict[str, Any]
+    ) -> List[tuple[str, int]] | None:
+        """Return the backend index with the longest prefix of fields in the query"""
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            mapper: AliasMapper = AliasMapper(model)
+            fields: set[str] = set()
+            for cond in query.get("$and", [query]):
+                fields.update(k for k in cond.keys() if not k.startswith("$"))
+            hint: List[tuple[str, int]] | None = None
+            prefix_max: int = 0
+            for index in model.backend_indexes():
+                db_index: List[tuple[str, int]] = list(mapper.map(index).items())
+                prefix: int = 0
+                for field, _ in db_index:
+                    if field not in fields:
+                        break
+                    prefix += 1
+                if prefix > prefix_max:
+                    prefix_max = prefix
+                    hint = db_index
+            return hint
+        except Exception as err:
+            debug(f"could not find index hint: {err}")
+        return None
+
     async def _datas_count(
         self, table_type: BSTableType, pipeline: List[Dict[str, Any]]
     ) -> int:
+        """Count documents. A pipeline with only a $match stage is counted with
+        count_documents() and an index hint. Counts are cached for 'count_cache_ttl' secs"""
         try:
             debug("starting")
             dbc: AsyncIOMotorCollection = self.get_collection(table_type)
-            pipeline.append({"$count": "total"})
-            async for res in dbc.aggregate(pipeline, allowDiskUse=True):
-                # print(f"_data_count(): total={res['total']}")
-                return int(res["total"])
+            key: str = self._count_cache_key(table_type, pipeline)
+            total: int
+            if (total := self._count_cache_get(key)) >= 0:
+                return total
+
+            if len(pipeline) == 0 or (len(pipeline) == 1 and "$match" in pipeline[0]):
+                query: Dict[str, Any] = pipeline[0]["$match"] if pipeline else {}
+                hint: List[tuple[str, int]] | None = self._count_hint(table_type, query)
+                try:
+                    if hint is not None:
+                        total = await dbc.count_documents(query, hint=hint)
+                    else:
+                        total = await dbc.count_documents(query)
+                except OperationFailure as err:
+                    debug(f"count with hint={hint} failed: {err}")
+                    total = await dbc.count_documents(query)
+            else:
+                pipeline.append({"$count": "total"})
+                total = 0
+                async for res in dbc.aggregate(pipeline, allowDiskUse=True):
+                    total = int(res["total"])
+            self._count_cache[key] = (monotonic(), total)
+            return total
 
         except Exception as err:
             error(f"Error counting documents in {self.table_uri(table_type)}: {err}")
         return -1
 
+    async def estimated_count(self, table_type: BSTableType) -> int:
+        """Return estimated number of documents in a table from collection metadata"""
+        debug("starting")
+        try:
+            return cast(
+                int, await self.get_collection(table_type).estimated_document_count()
+            )
+        except Exception as err:
+            error(f"Error estimating count of {self.table_uri(table_type)}: {err}")
+        return -1
+
+    async def _datas_duplicates(
+        self, table_type: BSTableType, pipeline: List[Dict[str, Any]]
+    ) -> AsyncGenerator[JSONExportable, None]:
+        """Get duplicates found by an aggregation pipeline returning
+        documents with a list of '_id's in 'ids' field"""
+        debug("starting")
+        dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+        model: type[JSONExportable] = self.get_model(table_type)
+        async for idxs in dbc.aggregate(pipeline, allowDiskUse=True):
+            try:
+                async for obj in dbc.find({"_id": {"$in": idxs["ids"]}}):
+                    try:
+                        yield self._parse(model, obj)
+                    except ValidationError as err:
+                        error(f"Could not validate {model} ob={obj}: {err}")
+            except Exception as err:
+                error(f"{err}")
+
+    async def _datas_prune(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]],
+        commit: bool = False,
+    ) -> tuple[int, int]:
+        """Delete duplicates found by an aggregation pipeline returning documents
+        with a list of '_id's in 'ids' field. The duplicates are deleted in batches
+        of MONGO_BATCH_SIZE. commit=False only counts the duplicates.
+        Returns the number of duplicates found and deleted"""
+        debug("starting")
+        dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+        found: int = 0
+        deleted: int = 0
+        ids: List[Idx] = list()
+        res: DeleteResult
+
+        async for idxs in dbc.aggregate(pipeline, allowDiskUse=True):
+            found += len(idxs["ids"])
+            if not commit:
+                continue
+            ids.extend(idxs["ids"])
+            if len(ids) >= MONGO_BATCH_SIZE:
+                res = await dbc.delete_many({"_id": {"$in": ids}})
+                deleted += res.deleted_count
+                ids = list()
+        if len(ids) > 0:
+            res = await dbc.delete_many({"_id": {"$in": ids}})
+            deleted += res.deleted_count
+        debug(f"found={found}, deleted={deleted}")
+        return found, deleted
+
     def _mk_pipeline_unique(
         self, table_type: BSTableType, field: str, pipeline: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]] | None:
         """Create pipeline to return unique values of 'field' in
-        documents { 'field': unique_value }"""
+        documents { 'field': unique_value }. Grouping by the field streams
+        the values instead of collecting them into a single document"""
         try:
             debug("starting")
             model: type[JSONExportable] = self.get_model(table_type)
             a: AliasMapper = AliasMapper(model)
             alias: Callable = a.alias
 
-            pipeline.append({"$project": {"_id": 0, alias(field): 1}})
-            pipeline.append(
-                {"$group": {"_id": None, field: {"$addToSet": "$" + alias(field)}}}
-            )
-            pipeline.append({"$unwind": {"path": "$" + field}})
-            pipeline.append({"$project": {"_id": 0}})
+            pipeline.append({"$group": {"_id": "$" + alias(field)}})
+            pipeline.append({"$project": {"_id": 0, field: "$_id"}})
 
             return pipeline
 
@@ -774,7 +1326,9 @@ class MongoBackend(Backend):
             else:
                 pipeline = pl
 
-            async for doc in dbc.aggregate(pipeline, allowDiskUse=True):
+            async for doc in dbc.aggregate(
+                pipeline, allowDiskUse=True, batchSize=MONGO_BATCH_SIZE
+            ):
                 try:
                     yield cast(A, doc[field])
                 except Exception as err:
@@ -790,6 +1344,10 @@ class MongoBackend(Backend):
         try:
             debug("starting")
             dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+            key: str = self._count_cache_key(table_type, pipeline, "unique", field)
+            total: int
+            if (total := self._count_cache_get(key)) >= 0:
+                return total
             if (pl := self._mk_pipeline_unique(table_type, field, pipeline)) is None:
                 raise ValueError(
                     f"could not build aggregation pipeline for unique values: field={field}"
@@ -798,15 +1356,198 @@ class MongoBackend(Backend):
                 pipeline = pl
             pipeline.append({"$count": "total"})
 
+            total = 0
             async for doc in dbc.aggregate(
                 pipeline, allowDiskUse=True, batchSize=10000
             ):
-                return cast(int, doc["total"])
+                total = cast(int, doc["total"])
+            self._count_cache[key] = (monotonic(), total)
+            return total
 
         except Exception as err:
             error(f"Error counting documents in {self.table_uri(table_type)}: {err}")
         return -1
 
+    def _sample_field(self, table_type: BSTableType) -> str | None:
+        """Return the integer field to sample 'table_type' by hash or None"""
+        try:
+            if table_type == BSTableType.Accounts:
+                return "_id"
+            elif table_type in [BSTableType.TankStats, BSTableType.PlayerAchievements]:
+                return AliasMapper(self.get_model(table_type)).alias("account_id")
+            elif table_type == BSTableType.Replays:
+                return "s.bts"
+        except Exception as err:
+            debug(f"no sample field for {table_type}: {err}")
+        return None
+
+    async def _mk_pipeline_sample(
+        self, table_type: BSTableType, pipeline: List[Dict[str, Any]], sample: float
+    ) -> List[Dict[str, Any]]:
+        """Add a sampling stage to a pipeline. 0 < sample < 1 is sampled
+        with a hash of _sample_field() if the fraction is large or the pipeline
+        has stages already. The hash sample streams and is reproducible with
+        the same 'sample_seed'. Other samples use $sample"""
+        if sample >= 1:
+            return pipeline + [{"$sample": {"size": int(sample)}}]
+        elif sample <= 0:
+            return pipeline
+        if (field := self._sample_field(table_type)) is not None and (
+            sample >= MONGO_SAMPLE_HASH or len(pipeline) > 0
+        ):
+            buckets: int = max(1, round(sample * MONGO_SAMPLE_BUCKETS))
+            bucket: Dict[str, Any] = {
+                "$mod": [
+                    {
+                        "$add": [
+                            {"$multiply": ["$" + field, MONGO_SAMPLE_MULTIPLIER]},
+                            self._sample_seed,
+                        ]
+                    },
+                    MONGO_SAMPLE_BUCKETS,
+                ]
+            }
+            return pipeline + [{"$match": {"$expr": {"$lt": [bucket, buckets]}}}]
+        N: int = await self.get_collection(table_type).estimated_document_count()
+        return pipeline + [{"$sample": {"size": int(N * sample)}}]
+
+    def set_scan_resume(self, dirname: str | None, scan: str | None = None) -> bool:
+        """Keep the resume tokens of keyset paginated scans in 'dirname' and
+        continue scans from them. 'scan' separates concurrent scans of a table"""
+        debug("starting")
+        try:
+            if dirname is not None:
+                makedirs(dirname, exist_ok=True)
+            self._scan_dir = dirname
+            self._scan_name = scan
+            return True
+        except Exception as err:
+            error(f"Could not set scan resume directory {dirname}: {err}")
+        return False
+
+    def _scan_file(self, table_type: BSTableType) -> str | None:
+        if self._scan_dir is None:
+            return None
+        name: str = f"{self.database}.{self.get_table(table_type)}"
+        if self._scan_name is not None:
+            name = f"{name}-{self._scan_name}"
+        return path_join(self._scan_dir, f"{name}.json")
+
+    def _scan_token_load(self, table_type: BSTableType) -> Dict[str, Any] | None:
+        """Read the resume token of a scan: the last _id processed, the hash of
+        the scan's pipeline and the epoch time the scan was started"""
+        if (filename := self._scan_file(table_type)) is None or not isfile(filename):
+            return None
+        try:
+            with open(filename, "r", encoding="utf-8") as file:
+                return json_util.loads(file.read())
+        except Exception as err:
+            error(f"Could not read resume token from {filename}: {err}")
+        return None
+
+    def _scan_token_save(self, table_type: BSTableType) -> None:
+        """Write the resume token of a scan"""
+        if (filename := self._scan_file(table_type)) is None:
+            return None
+        try:
+            with open(f"{filename}.tmp", "w", encoding="utf-8") as file:
+                file.write(json_util.dumps(self._scans[table_type]))
+            replace(f"{filename}.tmp", filename)
+        except Exception as err:
+            error(f"Could not write resume token to {filename}: {err}")
+
+    def _scan_finish(self, table_type: BSTableType) -> None:
+        """Remove the resume token of a finished scan"""
+        self._scans.pop(table_type, None)
+        if (filename := self._scan_file(table_type)) is None:
+            return None
+        try:
+            if isfile(filename):
+                remove(filename)
+        except Exception as err:
+            error(f"Could not remove resume token {filename}: {err}")
+
+    def _scan_epoch(self, table_type: BSTableType) -> int:
+        """Current time for pipelines of resumable scans. A resumed scan uses
+        the time it was started at so its pipeline does not change"""
+        if self._scan_dir is None:
+            return epoch_now()
+        if (scan := self._scans.get(table_type)) is None:
+            if (scan := self._scan_token_load(table_type)) is None:
+                scan = {"epoch": epoch_now()}
+            self._scans[table_type] = scan
+        return int(scan.get("epoch", epoch_now()))
+
+    def scan_checkpoint(self, table_type: BSTableType, last: Any) -> None:
+        """Save 'last' as the resume token of the running scan of 'table_type'.
+        Call once every object up to 'last' (by _id) has been processed"""
+        if self._scan_dir is None or table_type not in self._scans:
+            return None
+        self._scans[table_type]["_id"] = last
+        self._scan_token_save(table_type)
+
+    async def _aggregate_pages(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]],
+        batch: int = MONGO_BATCH_SIZE,
+        keyset: bool = True,
+        dbc: AsyncIOMotorCollection | None = None,
+        **options,
+    ) -> AsyncGenerator[List[Any], None]:
+        """Run an aggregation pipeline in pages of 'batch' documents.
+
+        With keyset=True pipelines of $match and $project stages are paginated
+        by _id range instead of holding a server-side cursor open. If
+        set_scan_resume() is set, the scan continues from the resume token saved
+        by scan_checkpoint() when the token's pipeline is the same"""
+        if dbc is None:
+            dbc = self.get_collection(table_type)
+        if not (keyset and _keyset_supported(pipeline)):
+            cursor: AsyncIOMotorCursor = dbc.aggregate(
+                pipeline, allowDiskUse=True, **options
+            )
+            while objs := await cursor.to_list(batch):
+                yield objs
+            return
+
+        last: Any | None = None
+        if self._scan_dir is not None:
+            digest: str = _pipeline_hash(pipeline)
+            epoch: int = self._scan_epoch(table_type)
+            scan: Dict[str, Any] = self._scans[table_type]
+            if scan.get("pipeline") == digest and "_id" in scan:
+                last = scan["_id"]
+                message(
+                    f"Resuming scan of {self.table_uri(table_type)} after _id={last}"
+                )
+            elif "_id" in scan:
+                message(
+                    f"Ignoring resume token of a different scan of {self.table_uri(table_type)}"
+                )
+            self._scans[table_type] = {"epoch": epoch, "pipeline": digest}
+            if last is not None:
+                self._scans[table_type]["_id"] = last
+        page: List[Dict[str, Any]] = pipeline + [
+            {"$sort": {"_id": ASCENDING}},
+            {"$limit": batch},
+        ]
+        while True:
+            pipe: List[Dict[str, Any]] = page
+            if last is not None:
+                pipe = [{"$match": {"_id": {"$gt": last}}}] + page
+            objs = await dbc.aggregate(pipe, allowDiskUse=True, **options).to_list(
+                batch
+            )
+            if len(objs) == 0:
+                break
+            yield objs
+            if len(objs) < batch:
+                break
+            last = objs[-1]["_id"]
+        if self._scan_dir is not None:
+            self._scan_finish(table_type)
+
     async def obj_export(
         self,
         table_type: BSTableType,
@@ -816,17 +1557,13 @@ class MongoBackend(Backend):
         """Export raw documents from Mongo DB"""
         try:
             debug("starting")
-            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
             debug(f"export from: {self.table_uri(table_type)}")
 
-            if sample > 0 and sample < 1:
-                N: int = await dbc.estimated_document_count()
-                pipeline.append({"$sample": {"size": int(N * sample)}})
-            elif sample >= 1:
-                pipeline.append({"$sample": {"size": int(sample)}})
+            pipeline = await self._mk_pipeline_sample(table_type, pipeline, sample)
 
-            async for obj in dbc.aggregate(pipeline, allowDiskUse=True):
-                yield obj
+            async for objs in self._aggregate_pages(table_type, pipeline):
+                for obj in objs:
+                    yield obj
 
         except Exception as err:
             error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
@@ -841,75 +1578,388 @@ class MongoBackend(Backend):
         """Export raw documents as a list from Mongo DB"""
         try:
             debug("starting")
-            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
             debug(f"export from: {self.table_uri(table_type)}")
             if batch == 0:
                 batch = MONGO_BATCH_SIZE
 
-            if sample > 0 and sample < 1:
-                N: int = await dbc.estimated_document_count()
-                pipeline.append({"$sample": {"size": int(N * sample)}})
-            elif sample >= 1:
-                pipeline.append({"$sample": {"size": int(sample)}})
+            pipeline = await self._mk_pipeline_sample(table_type, pipeline, sample)
 
-            cursor: AsyncIOMotorCursor = dbc.aggregate(pipeline, allowDiskUse=True)
-            while objs := await cursor.to_list(batch):
+            async for objs in self._aggregate_pages(table_type, pipeline, batch=batch):
                 yield objs
             debug(f"finished exporting {table_type}")
         except Exception as err:
             error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
 
-    ########################################################
-    #
-    # MongoBackend(): account
-    #
-    ########################################################
+    def raw_copy_supported(self, source: Backend, table_type: BSTableType) -> bool:
+        """Raw BSON documents can be copied between MongoDB backends
+        using the same model"""
+        return isinstance(source, MongoBackend) and source.get_model(
+            table_type
+        ) is self.get_model(table_type)
 
-    async def account_insert(self, account: BSAccount, force: bool = False) -> bool:
-        """Store account to the backend. Returns False
-        if the account was not added"""
-        debug("starting")
-        if force:
-            return await self._data_replace(
-                BSTableType.Accounts, obj=account, upsert=True
+    async def objs_export_raw(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[RawBSONDocument], None]:
+        """Export documents as RawBSONDocument lists without decoding them"""
+        try:
+            debug("starting")
+            dbc: AsyncIOMotorCollection = self.get_collection(table_type).with_options(
+                codec_options=CodecOptions(document_class=RawBSONDocument)
             )
-        else:
-            return await self._data_insert(BSTableType.Accounts, obj=account)
+            debug(f"export from: {self.table_uri(table_type)}")
+            if batch == 0:
+                batch = MONGO_BATCH_SIZE
 
-    async def account_get(self, account_id: int) -> BSAccount | None:
-        """Get account from backend"""
-        debug("starting")
-        idx: int = account_id
-        if (res := await self._data_get(BSTableType.Accounts, idx=idx)) is not None:
-            return BSAccount.from_obj(res, self.model_accounts)
-        return None
+            pipeline = await self._mk_pipeline_sample(table_type, pipeline, sample)
 
-    async def account_update(
+            async for objs in self._aggregate_pages(
+                table_type, pipeline, batch=batch, dbc=dbc, batchSize=batch
+            ):
+                yield objs
+            debug(f"finished exporting {table_type}")
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    async def objs_insert_raw(
         self,
-        account: BSAccount,
-        update: Dict[str, Any] | None = None,
-        fields: List[str] | None = None,
-    ) -> bool:
-        """Update an account in the backend. Returns False
-        if the account was not updated"""
+        table_type: BSTableType,
+        objs: Sequence[RawBSONDocument],
+        force: bool = False,
+    ) -> tuple[int, int]:
+        """Insert RawBSONDocuments unchanged with unordered insert_many().
+        force=True replaces existing documents. Returns the number of
+        documents inserted/replaced and not inserted"""
+        debug("starting")
+        added: int = 0
+        not_added: int = 0
         try:
-            debug("starting")
-            return await self._data_update(
-                BSTableType.Accounts, obj=account, update=update, fields=fields
-            )
+            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+            if force:
+                res: BulkWriteResult = await dbc.bulk_write(
+                    [ReplaceOne({"_id": obj["_id"]}, obj, upsert=True) for obj in objs],
+                    ordered=False,
+                )
+                added = res.upserted_count + res.matched_count
+                not_added = len(objs) - added
+            else:
+                added = len((await dbc.insert_many(objs, ordered=False)).inserted_ids)
+        except BulkWriteError as err:
+            if err.details is not None:
+                added = err.details["nInserted"] + err.details.get("nUpserted", 0)
+                not_added = len(err.details["writeErrors"])
+            else:
+                error("BulkWriteError.details is None")
         except Exception as err:
-            debug(
-                f"Error while updating account (id={account.id}) into {self.table_uri(BSTableType.Accounts)}: {err}"
+            error(
+                f"Unknown error when adding entries to {self.table_uri(table_type)}: {err}"
             )
-        return False
+        debug(f"added={added}, not_added={not_added}")
+        return added, not_added
 
-    async def account_delete(self, account_id: int) -> bool:
-        """Deleta account from MongoDB backend"""
+    async def split_points(
+        self,
+        table_type: BSTableType,
+        n: int,
+        field: str = "_id",
+        exact: bool = False,
+        pipeline: List[Dict[str, Any]] = list(),
+    ) -> List[Any]:
+        """Return up to n-1 sorted values of 'field' that split the documents
+        matching 'pipeline' into 'n' parts of roughly equal size. The values are
+        picked from a $sample of MONGO_SPLIT_SAMPLE documents per part. exact=True
+        uses $bucketAuto that reads all the matching documents"""
         debug("starting")
-        return await self._data_delete(BSTableType.Accounts, idx=account_id)
+        points: List[Any] = list()
+        if n <= 1:
+            return points
+        try:
+            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+            key: str = field
+            if field != "_id":
+                key = AliasMapper(self.get_model(table_type)).alias(field)
+            if exact:
+                buckets: List[Dict[str, Any]] = pipeline + [
+                    {"$bucketAuto": {"groupBy": "$" + key, "buckets": n}}
+                ]
+                async for bucket in dbc.aggregate(buckets, allowDiskUse=True):
+                    points.append(bucket["_id"]["min"])
+                return points[1:]
+
+            sampled: List[Dict[str, Any]] = (
+                [{"$sample": {"size": n * MONGO_SPLIT_SAMPLE}}]
+                + pipeline
+                + [
+                    {"$match": {key: {"$ne": None}}},
+                    {"$project": {"_id": 0, "key": "$" + key}},
+                    {"$sort": {"key": ASCENDING}},
+                ]
+            )
+            keys: List[Any] = [
+                doc["key"] async for doc in dbc.aggregate(sampled, allowDiskUse=True)
+            ]
+            if len(pipeline) > 0 and len(keys) < n * MONGO_SPLIT_SAMPLE // 10:
+                # selective pipeline: sample the matching documents instead
+                sampled = (
+                    pipeline
+                    + [{"$sample": {"size": n * MONGO_SPLIT_SAMPLE}}]
+                    + sampled[len(pipeline) + 1 :]
+                )
+                keys = [
+                    doc["key"]
+                    async for doc in dbc.aggregate(sampled, allowDiskUse=True)
+                ]
+            if len(keys) < n:
+                return points
+            for i in range(1, n):
+                if len(points) == 0 or points[-1] != keys[i * len(keys) // n]:
+                    points.append(keys[i * len(keys) // n])
+        except Exception as err:
+            error(f"Could not split {self.table_uri(table_type)} by {field}: {err}")
+        return points
 
-    async def _mk_pipeline_accounts(
-        self,
+    async def _tank_stats_split_points(self, n: int, **getargs) -> List[Any]:
+        """Return account_ids that split the tank stats matching the query of
+        tank_stats_get(**getargs) into 'n' parts"""
+        debug("starting")
+        try:
+            for arg in ("fields", "sample"):
+                getargs.pop(arg, None)
+            pipeline: List[Dict[str, Any]] | None
+            if (pipeline := await self._mk_pipeline_tank_stats(**getargs)) is None:
+                raise ValueError("could not build aggregation pipeline")
+            match: List[Dict[str, Any]] = list()
+            if (query := self._get_query(pipeline)) is not None:
+                match.append({"$match": query})
+            return await self.split_points(
+                BSTableType.TankStats, n, field="account_id", pipeline=match
+            )
+        except Exception as err:
+            error(f"Could not split {self.table_uri(BSTableType.TankStats)}: {err}")
+        return list()
+
+    async def objs_export_partitioned(
+        self,
+        table_type: BSTableType,
+        partitions: int = 1,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+        batch: int = 0,
+        raw: bool = False,
+    ) -> AsyncGenerator[List[Any], None]:
+        """Export raw documents as lists reading 'partitions' disjoint _id ranges
+        concurrently. The ranges are split at sampled _id values. Resumable scans
+        (set_scan_resume()) and pipelines that cannot be paginated by _id
+        (e.g. $sample) are not partitioned"""
+        debug("starting")
+        workers: List[Task] = list()
+        try:
+            points: List[Any] = list()
+            sampled: List[Dict[str, Any]] = await self._mk_pipeline_sample(
+                table_type, pipeline, sample
+            )
+            if partitions > 1 and self._scan_dir is None and _keyset_supported(sampled):
+                points = await self.split_points(
+                    table_type, partitions, pipeline=sampled
+                )
+            if len(points) == 0:
+                async for objs in super().objs_export_partitioned(
+                    table_type, pipeline=pipeline, sample=sample, batch=batch, raw=raw
+                ):
+                    yield objs
+                return
+
+            if batch == 0:
+                batch = MONGO_BATCH_SIZE
+            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+            if raw:
+                dbc = dbc.with_options(
+                    codec_options=CodecOptions(document_class=RawBSONDocument)
+                )
+            objsQ: Queue[List[Any] | None] = Queue(2 * (len(points) + 1))
+            bounds: List[Any] = [None] + points + [None]
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                id_match: Dict[str, Any] = dict()
+                if start is not None:
+                    id_match["$gte"] = start
+                if stop is not None:
+                    id_match["$lt"] = stop
+                workers.append(
+                    create_task(
+                        self._objs_export_partition(
+                            table_type,
+                            [{"$match": {"_id": id_match}}] + sampled,
+                            objsQ,
+                            batch=batch,
+                            dbc=dbc,
+                        )
+                    )
+                )
+            debug(
+                f"exporting {len(workers)} partitions of {self.table_uri(table_type)}"
+            )
+            running: int = len(workers)
+            while running > 0:
+                if (objs := await objsQ.get()) is None:
+                    running -= 1
+                else:
+                    yield objs
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _objs_export_partition(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]],
+        objsQ: Queue[List[Any] | None],
+        batch: int,
+        dbc: AsyncIOMotorCollection,
+    ) -> None:
+        """Read a partition to objsQ. Adds None when done"""
+        try:
+            async for objs in self._aggregate_pages(
+                table_type, pipeline, batch=batch, dbc=dbc
+            ):
+                await objsQ.put(objs)
+        except CancelledError:
+            debug("Cancelled")
+            return None
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+        await objsQ.put(None)
+
+    def _arrow_paths(
+        self, table_type: BSTableType, schema: pa.Schema
+    ) -> List[List[str]]:
+        """Map the dotted field names of an Arrow schema to
+        the (aliased) keys of the documents in the backend"""
+        model: type[JSONExportable] = self.get_model(table_type)
+        paths: List[List[str]] = list()
+        for field in schema:
+            path: List[str] = list()
+            sub_model: type[BaseModel] | None = model
+            for name in field.name.split("."):
+                if sub_model is None or name not in sub_model.model_fields:
+                    path.append(name)
+                    sub_model = None
+                    continue
+                info = sub_model.model_fields[name]
+                path.append(info.alias if info.alias is not None else name)
+                sub_model = None
+                for tp in (info.annotation, *get_args(info.annotation)):
+                    if isinstance(tp, type) and issubclass(tp, BaseModel):
+                        sub_model = tp
+                        break
+            paths.append(path)
+        return paths
+
+    async def _datas_arrow(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]],
+        schema: pa.Schema,
+        batch: int = MONGO_BATCH_SIZE,
+    ) -> AsyncGenerator[pa.RecordBatch, None]:
+        """Decode documents of an aggregation pipeline directly into
+        Arrow record batches of 'schema' skipping model validation"""
+        debug("starting")
+        try:
+            dbc: AsyncIOMotorCollection = self.get_collection(table_type)
+            paths: List[List[str]] = self._arrow_paths(table_type, schema)
+            defaults: List[Any] = schema_defaults(self.get_model(table_type), schema)
+            cursor: AsyncIOMotorCursor = dbc.aggregate(
+                pipeline, allowDiskUse=True, batchSize=min(batch, 10000)
+            )
+            while docs := await cursor.to_list(batch):
+                yield record_batch_from_docs(docs, schema, paths, defaults)
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    ########################################################
+    #
+    # MongoBackend(): account
+    #
+    ########################################################
+
+    async def account_insert(self, account: BSAccount, force: bool = False) -> bool:
+        """Store account to the backend. Returns False
+        if the account was not added"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Accounts, obj=account, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Accounts, obj=account)
+
+    async def account_get(self, account_id: int) -> BSAccount | None:
+        """Get account from backend"""
+        debug("starting")
+        idx: int = account_id
+        if (res := await self._data_get(BSTableType.Accounts, idx=idx)) is not None:
+            return BSAccount.from_obj(res, self.model_accounts)
+        return None
+
+    async def accounts_get_many(
+        self, ids: Iterable[int], batch: int = MONGO_BATCH_SIZE
+    ) -> Dict[int, BSAccount]:
+        """Get accounts by ids with chunked {_id: {$in: [...]}} queries.
+        Returns a dict of account_id: account for accounts found"""
+        debug("starting")
+        res: Dict[int, BSAccount] = dict()
+        try:
+            dbc: AsyncIOMotorCollection = self.collection_accounts
+            model: type[JSONExportable] = self.model_accounts
+            account: BSAccount | None
+            for id_batch in chunker(list(ids), batch):
+                async for obj in dbc.find({"_id": {"$in": id_batch}}):
+                    try:
+                        if (
+                            account := BSAccount.from_obj(
+                                self._parse(model, obj), model
+                            )
+                        ) is not None:
+                            res[account.id] = account
+                    except ValidationError as err:
+                        error(f"Could not validate {model} ob={obj}: {err}")
+        except Exception as err:
+            error(
+                f"Could not get accounts from {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+        return res
+
+    async def account_update(
+        self,
+        account: BSAccount,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an account in the backend. Returns False
+        if the account was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Accounts, obj=account, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating account (id={account.id}) into {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+        return False
+
+    async def account_delete(self, account_id: int) -> bool:
+        """Deleta account from MongoDB backend"""
+        debug("starting")
+        return await self._data_delete(BSTableType.Accounts, idx=account_id)
+
+    async def _mk_pipeline_accounts(
+        self,
         stats_type: StatsTypes | None = None,
         regions: set[Region] = Region.API_regions(),
         accounts: Sequence[BSAccount] | None = None,
@@ -928,7 +1978,6 @@ class MongoBackend(Backend):
             db_model: type[JSONExportable] = self.model_accounts
             a = AliasMapper(db_model)
             alias: Callable = a.alias
-            dbc: AsyncIOMotorCollection = self.collection_accounts
             match: List[Dict[str, str | int | float | dict | list]] = list()
             pipeline: List[Dict[str, Any]] = list()
 
@@ -977,7 +2026,12 @@ class MongoBackend(Backend):
                         {
                             "$or": [
                                 {update_field: None},
-                                {update_field: {"$lt": epoch_now() - int(cache_valid)}},
+                                {
+                                    update_field: {
+                                        "$lt": self._scan_epoch(BSTableType.Accounts)
+                                        - int(cache_valid)
+                                    }
+                                },
                             ]
                         }
                     )
@@ -987,11 +2041,9 @@ class MongoBackend(Backend):
             if len(match) > 0:
                 pipeline.append({"$match": {"$and": match}})
 
-            if sample >= 1:
-                pipeline.append({"$sample": {"size": int(sample)}})
-            elif sample > 0:
-                n: int = cast(int, await dbc.estimated_document_count())
-                pipeline.append({"$sample": {"size": int(n * sample)}})
+            pipeline = await self._mk_pipeline_sample(
+                BSTableType.Accounts, pipeline, sample
+            )
 
             return pipeline
         except Exception as err:
@@ -1022,11 +2074,21 @@ class MongoBackend(Backend):
         dist: OptAccountsDistributed | None = None,
         sample: float = 0,
         cache_valid: float = 0,
+        fields: Sequence[str] | None = None,
     ) -> AsyncGenerator[BSAccount, None]:
         """Get accounts from Mongo DB
-        inactive: true = only inactive, false = not inactive, none = AUTO"""
+        inactive: true = only inactive, false = not inactive, none = AUTO.
+        'fields' returns partial accounts unless accounts are filtered by
+        update_needed() that requires full accounts"""
         try:
             debug("starting")
+            update_needed: bool = (
+                not disabled
+                and inactive == OptAccountsInactive.auto
+                and stats_type is not None
+            )
+            if update_needed:
+                fields = None
             pipeline: List[Dict[str, Any]] | None
             pipeline = await self._mk_pipeline_accounts(
                 stats_type=stats_type,
@@ -1047,19 +2109,22 @@ class MongoBackend(Backend):
                 )
             # message(f'accounts_get(): pipeline={pipeline}')
 
-            # 'batchSize' is required to keep cursor alive
+            # paginate by _id instead of keeping a cursor alive for hours
             async for data in self._datas_get(
-                BSTableType.Accounts, pipeline=pipeline, batchSize=5000
+                BSTableType.Accounts,
+                pipeline=pipeline,
+                fields=fields,
+                keyset=True,
+                batch=5000,
             ):
                 try:
+                    if fields is not None:
+                        yield cast(BSAccount, data)
+                        continue
                     if (player := BSAccount.transform(data)) is None:
                         continue
                     # if not force and not disabled and inactive is None and player.inactive:
-                    if (
-                        not disabled
-                        and inactive == OptAccountsInactive.auto
-                        and stats_type is not None
-                    ):
+                    if update_needed and stats_type is not None:
                         if not player.update_needed(stats_type):
                             continue
                     yield player
@@ -1145,6 +2210,57 @@ class MongoBackend(Backend):
         debug("starting")
         return await self._datas_insert(BSTableType.Accounts, accounts)
 
+    async def accounts_upsert(
+        self, accounts: Sequence[BSAccount]
+    ) -> tuple[int, int, int]:
+        """Replace or insert accounts. Returns the number of added, updated and unchanged"""
+        debug("starting")
+        return await self._datas_upsert(BSTableType.Accounts, accounts)
+
+    async def accounts_update(
+        self, updates: Dict[int, Dict[str, Any]]
+    ) -> tuple[int, int]:
+        """Set fields of many accounts with unordered bulk writes. Accounts not in
+        the backend are not added since their region is not known.
+        Returns the number of accounts updated and not found"""
+        debug("starting")
+        updated: int = 0
+        try:
+            model: type[JSONExportable] = self.model_accounts
+            dbc: AsyncIOMotorCollection = self.collection_accounts
+            mapper: AliasMapper = AliasMapper(model)
+            ops: List[UpdateOne] = list()
+            for account_id, update in updates.items():
+                if (account := model.transform(BSAccount(id=account_id))) is None:
+                    raise ValueError(f"Could not transform account to {model}")
+                ops.append(
+                    UpdateOne(
+                        {"_id": account.index},
+                        {"$set": mapper.map(update.items())},
+                        upsert=False,
+                    )
+                )
+            for i in range(0, len(ops), MONGO_BATCH_SIZE):
+                try:
+                    res: BulkWriteResult = await dbc.bulk_write(
+                        ops[i : i + MONGO_BATCH_SIZE], ordered=False
+                    )
+                    updated += res.matched_count
+                except BulkWriteError as err:
+                    if err.details is not None:
+                        updated += err.details["nMatched"]
+                        error(
+                            f"could not update {len(err.details['writeErrors'])} accounts in {self.table_uri(BSTableType.Accounts)}"
+                        )
+                    else:
+                        error("BulkWriteError.details is None")
+        except Exception as err:
+            error(
+                f"Error updating accounts in {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+        debug(f"updated={updated}, not_found={len(updates) - updated}")
+        return updated, len(updates) - updated
+
     async def accounts_latest(self, regions: set[Region]) -> Dict[Region, BSAccount]:
         """Return the latest accounts (=highest account_id) per region"""
         debug("starting")
@@ -1188,14 +2304,24 @@ class MongoBackend(Backend):
     ) -> bool:
         """Insert a single player achievement"""
         debug("starting")
+        keys: set[tuple[str | None, Region | None]] = _stats_keys([player_achievement])
+        res: bool
         if force:
-            return await self._data_replace(
+            keys.add(
+                await self._stats_key_get(
+                    BSTableType.PlayerAchievements, player_achievement.index
+                )
+            )
+            res = await self._data_replace(
                 BSTableType.PlayerAchievements, obj=player_achievement, upsert=True
             )
         else:
-            return await self._data_insert(
+            res = await self._data_insert(
                 BSTableType.PlayerAchievements, obj=player_achievement
             )
+        if res:
+            await self._stats_invalidate(StatsTypes.player_achievements, keys)
+        return res
 
     async def player_achievement_get(
         self, account: BSAccount, added: int
@@ -1222,7 +2348,12 @@ class MongoBackend(Backend):
             idx: PyObjectId = PlayerAchievementsMaxSeries.mk_index(
                 account.id, region=account.region, added=added
             )
-            return await self._data_delete(BSTableType.PlayerAchievements, idx=idx)
+            key: tuple[str | None, Region | None] = await self._stats_key_get(
+                BSTableType.PlayerAchievements, idx
+            )
+            if await self._data_delete(BSTableType.PlayerAchievements, idx=idx):
+                await self._stats_invalidate(StatsTypes.player_achievements, [key])
+                return True
         except Exception as err:
             error(f"Unknown error: {err}")
         return False
@@ -1232,9 +2363,14 @@ class MongoBackend(Backend):
     ) -> tuple[int, int]:
         """Store player achievements to the backend. Returns number of stats inserted and not inserted"""
         debug("starting")
-        return await self._datas_insert(
-            BSTableType.PlayerAchievements, player_achievements
+        inserted: List[JSONExportable] = list()
+        res: tuple[int, int] = await self._datas_insert(
+            BSTableType.PlayerAchievements, player_achievements, inserted=inserted
+        )
+        await self._stats_invalidate(
+            StatsTypes.player_achievements, _stats_keys(inserted)
         )
+        return res
 
     async def _mk_pipeline_player_achievements(
         self,
@@ -1259,7 +2395,6 @@ class MongoBackend(Backend):
             a = AliasMapper(self.model_player_achievements)
             alias: Callable = a.alias
 
-            dbc: AsyncIOMotorCollection = self.collection_player_achievements
             pipeline: List[Dict[str, Any]] = list()
             match: List[Dict[str, str | int | float | dict | list]] = list()
 
@@ -1278,11 +2413,9 @@ class MongoBackend(Backend):
             if len(match) > 0:
                 pipeline.append({"$match": {"$and": match}})
 
-            if sample >= 1:
-                pipeline.append({"$sample": {"size": int(sample)}})
-            elif sample > 0:
-                n: int = cast(int, await dbc.estimated_document_count())
-                pipeline.append({"$sample": {"size": int(n * sample)}})
+            pipeline = await self._mk_pipeline_sample(
+                BSTableType.PlayerAchievements, pipeline, sample
+            )
             return pipeline
         except Exception as err:
             error(f"{err}")
@@ -1295,6 +2428,7 @@ class MongoBackend(Backend):
         accounts: Iterable[BSAccount] | None = None,
         since: int = 0,
         sample: float = 0,
+        fields: Sequence[str] | None = None,
     ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
         """Return player achievements from the backend"""
         try:
@@ -1313,9 +2447,11 @@ class MongoBackend(Backend):
                 )
 
             async for data in self._datas_get(
-                BSTableType.PlayerAchievements, pipeline=pipeline
+                BSTableType.PlayerAchievements, pipeline=pipeline, fields=fields
             ):
-                if (pa := PlayerAchievementsMaxSeries.transform(data)) is not None:
+                if fields is not None:
+                    yield cast(PlayerAchievementsMaxSeries, data)
+                elif (pa := PlayerAchievementsMaxSeries.transform(data)) is not None:
                     yield pa
         except Exception as err:
             error(
@@ -1335,8 +2471,14 @@ class MongoBackend(Backend):
             debug("starting")
             dbc: AsyncIOMotorCollection = self.collection_player_achievements
 
+            total: int = -1
             if release is None and regions == Region.API_regions():
-                total: int = cast(int, await dbc.estimated_document_count())
+                total = cast(int, await dbc.estimated_document_count())
+            elif release is not None and accounts is None:
+                total = await self._stats_count(
+                    StatsTypes.player_achievements, release=release, regions=regions
+                )
+            if total >= 0:
                 # print(f'player achievements: total={total}, sample={sample}')
                 if sample == 0:
                     return total
@@ -1389,17 +2531,18 @@ class MongoBackend(Backend):
         async for objs in self.objs_export(
             BSTableType.PlayerAchievements, sample=sample, batch=batch
         ):
-            yield PlayerAchievementsMaxSeries.from_objs(
-                objs=objs, in_type=self.model_player_achievements
+            yield self._from_objs(
+                PlayerAchievementsMaxSeries, objs, self.model_player_achievements
             )
 
-    async def player_achievements_duplicates(
+    async def _mk_pipeline_player_achievements_duplicates(
         self,
         release: BSBlitzRelease,
         regions: set[Region] = Region.API_regions(),
         sample: int = 0,
-    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
-        """Find duplicate player achievements from the backend"""
+    ) -> List[Dict[str, Any]] | None:
+        """Create a pipeline returning the '_id's of duplicate player achievements
+        per account. The latest player achievements are not included"""
         debug("starting")
         try:
             a: AliasMapper = AliasMapper(self.model_player_achievements)
@@ -1427,30 +2570,71 @@ class MongoBackend(Backend):
 
             if sample > 0:
                 pipeline.append({"$sample": {"size": sample}})
+            return pipeline
+        except Exception as err:
+            error(f"{err}")
+        return None
 
-            async for idxs in self.collection_player_achievements.aggregate(
-                pipeline, allowDiskUse=True
+    async def player_achievements_duplicates(
+        self,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Find duplicate player achievements from the backend"""
+        debug("starting")
+        try:
+            pipeline: List[Dict[str, Any]] | None
+            if (
+                pipeline := await self._mk_pipeline_player_achievements_duplicates(
+                    release=release, regions=regions, sample=sample
+                )
+            ) is None:
+                raise ValueError("Could not create pipeline")
+
+            async for obj in self._datas_duplicates(
+                BSTableType.PlayerAchievements, pipeline
             ):
-                try:
-                    for idx in idxs["ids"]:
-                        if (
-                            obj := await self._data_get(
-                                BSTableType.PlayerAchievements, idx
-                            )
-                        ) is not None:
-                            if (
-                                pa := PlayerAchievementsMaxSeries.transform(obj)
-                            ) is not None:
-                                # debug(f'tank stat duplicate: {tank_stat}')
-                                yield pa
-                except Exception as err:
-                    error(f"{err}")
+                if (pa := PlayerAchievementsMaxSeries.transform(obj)) is not None:
+                    yield pa
 
         except Exception as err:
             debug(
                 f"Could not find duplicates from {self.table_uri(BSTableType.PlayerAchievements)}: {err}"
             )
 
+    async def player_achievements_prune(
+        self,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        commit: bool = False,
+        sample: int = 0,
+    ) -> tuple[int, int]:
+        """Delete duplicate player achievements keeping the latest one. commit=False only
+        counts the duplicates. Returns the number of duplicates found and deleted"""
+        debug("starting")
+        try:
+            pipeline: List[Dict[str, Any]] | None
+            if (
+                pipeline := await self._mk_pipeline_player_achievements_duplicates(
+                    release=release, regions=regions, sample=sample
+                )
+            ) is None:
+                raise ValueError("Could not create pipeline")
+            found, deleted = await self._datas_prune(
+                BSTableType.PlayerAchievements, pipeline, commit=commit
+            )
+            if deleted > 0:
+                await self.stats_rebuild(
+                    StatsTypes.player_achievements, release=release, regions=regions
+                )
+            return found, deleted
+        except Exception as err:
+            error(
+                f"Could not prune duplicates from {self.table_uri(BSTableType.PlayerAchievements)}: {err}"
+            )
+        return 0, 0
+
     ########################################################
     #
     # MongoBackend(): releases
@@ -1697,7 +2881,6 @@ class MongoBackend(Backend):
         debug("starting")
         match: List[Dict[str, str | int | float | dict | list]] = list()
         pipeline: List[Dict[str, Any]] = list()
-        dbc: AsyncIOMotorCollection = self.collection_replays
         a: AliasMapper = AliasMapper(self.model_replays)
         alias: Callable = a.alias
 
@@ -1717,16 +2900,14 @@ class MongoBackend(Backend):
         if len(match) > 0:
             pipeline.append({"$match": {"$and": match}})
 
-        if sample >= 1:
-            pipeline.append({"$sample": {"size": int(sample)}})
-        elif sample > 0:
-            n: int = cast(int, await dbc.estimated_document_count())
-            pipeline.append({"$sample": {"size": int(n * sample)}})
-
-        return pipeline
+        return await self._mk_pipeline_sample(BSTableType.Replays, pipeline, sample)
 
     async def replays_get(
-        self, since: int = 0, sample: float = 0, **summary_fields
+        self,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+        **summary_fields,
     ) -> AsyncGenerator[BSReplay, None]:
         """Get replays from mongodb backend"""
         debug("starting")
@@ -1736,8 +2917,12 @@ class MongoBackend(Backend):
             pipeline = await self._mk_pipeline_replays(
                 since=since, sample=sample, **summary_fields
             )
-            async for data in self._datas_get(BSTableType.Replays, pipeline):
-                if (replay := BSReplay.transform(data)) is not None:
+            async for data in self._datas_get(
+                BSTableType.Replays, pipeline, fields=fields
+            ):
+                if fields is not None:
+                    yield cast(BSReplay, data)
+                elif (replay := BSReplay.transform(data)) is not None:
                     yield replay
         except Exception as err:
             error(
@@ -1781,12 +2966,18 @@ class MongoBackend(Backend):
     async def tank_stat_insert(self, tank_stat: TankStat, force: bool = False) -> bool:
         """Insert a single tank stat"""
         debug("starting")
+        keys: set[tuple[str | None, Region | None]] = _stats_keys([tank_stat])
+        res: bool
         if force:
-            return await self._data_replace(
+            keys.add(await self._stats_key_get(BSTableType.TankStats, tank_stat.index))
+            res = await self._data_replace(
                 BSTableType.TankStats, obj=tank_stat, upsert=True
             )
         else:
-            return await self._data_insert(BSTableType.TankStats, obj=tank_stat)
+            res = await self._data_insert(BSTableType.TankStats, obj=tank_stat)
+        if res:
+            await self._stats_invalidate(StatsTypes.tank_stats, keys)
+        return res
 
     async def tank_stat_get(
         self, account_id: int, tank_id: int, last_battle_time: int
@@ -1813,13 +3004,23 @@ class MongoBackend(Backend):
         if the tank stat was not updated"""
         try:
             debug("starting")
-            return await self._data_update(
+            # the update may move the tank stat to another release
+            keys: set[tuple[str | None, Region | None]] = _stats_keys([tank_stat])
+            old: tuple[str | None, Region | None] = await self._stats_key_get(
+                BSTableType.TankStats, tank_stat.id
+            )
+            keys.add(old)
+            if update is not None and "release" in update:
+                keys.add((update["release"], old[1]))
+            if await self._data_update(
                 BSTableType.TankStats,
                 idx=tank_stat.id,
                 obj=tank_stat,
                 update=update,
                 fields=fields,
-            )
+            ):
+                await self._stats_invalidate(StatsTypes.tank_stats, keys)
+                return True
         except Exception as err:
             debug(
                 f"Error while updating tank stat (id={tank_stat.id}) into {self.table_uri(BSTableType.TankStats)}: {err}"
@@ -1832,7 +3033,12 @@ class MongoBackend(Backend):
         try:
             debug("starting")
             idx: PyObjectId = TankStat.mk_id(account_id, last_battle_time, tank_id)
-            return await self._data_delete(BSTableType.TankStats, idx=idx)
+            key: tuple[str | None, Region | None] = await self._stats_key_get(
+                BSTableType.TankStats, idx
+            )
+            if await self._data_delete(BSTableType.TankStats, idx=idx):
+                await self._stats_invalidate(StatsTypes.tank_stats, [key])
+                return True
         except Exception as err:
             error(f"Unknown error: {err}")
         return False
@@ -1840,17 +3046,31 @@ class MongoBackend(Backend):
     async def tank_stats_insert(
         self, tank_stats: Sequence[TankStat], force: bool = False
     ) -> tuple[int, int]:
-        """Store tank stats to the backend. Returns the number of added and not added"""
+        """Store tank stats to the backend. Returns the number of added and not added.
+        force=True counts both inserted and updated stats as added"""
         debug("starting")
         if force:
-            added: int = 0
-            not_added: int = len(tank_stats)
-            for ts in tank_stats:
-                if await self.tank_stat_insert(ts, force=True):
-                    added += 1
-            return added, not_added - added
+            added, updated, _ = await self.tank_stats_upsert(tank_stats)
+            return added + updated, len(tank_stats) - added - updated
         else:
-            return await self._datas_insert(BSTableType.TankStats, tank_stats)
+            inserted: List[JSONExportable] = list()
+            res: tuple[int, int] = await self._datas_insert(
+                BSTableType.TankStats, tank_stats, inserted=inserted
+            )
+            await self._stats_invalidate(StatsTypes.tank_stats, _stats_keys(inserted))
+            return res
+
+    async def tank_stats_upsert(
+        self, tank_stats: Sequence[TankStat]
+    ) -> tuple[int, int, int]:
+        """Replace or insert tank stats with bulk writes.
+        Returns the number of added, updated and unchanged"""
+        debug("starting")
+        res: tuple[int, int, int] = await self._datas_upsert(
+            BSTableType.TankStats, tank_stats
+        )
+        await self._stats_invalidate(StatsTypes.tank_stats, _stats_keys(tank_stats))
+        return res
 
     async def _mk_pipeline_tank_stats(
         self,
@@ -1860,6 +3080,7 @@ class MongoBackend(Backend):
         tanks: Sequence[BSTank] | None = None,
         missing: str | None = None,
         since: int = 0,
+        id_range: range | None = None,
         sample: float = 0,
     ) -> List[Dict[str, Any]] | None:
         assert sample >= 0, f"'sample' must be >= 0, was {sample}"
@@ -1883,7 +3104,6 @@ class MongoBackend(Backend):
 
             a = AliasMapper(self.model_tank_stats)
             alias: Callable = a.alias
-            dbc: AsyncIOMotorCollection = self.collection_tank_stats
             pipeline: List[Dict[str, Any]] = list()
             match: List[Dict[str, str | int | float | dict | list]] = list()
 
@@ -1899,16 +3119,23 @@ class MongoBackend(Backend):
                 match.append({alias("tank_id"): {"$in": [t.tank_id for t in tanks]}})
             if since > 0:
                 match.append({alias("last_battle_time"): {"$gte": since}})
+            if id_range is not None:
+                match.append(
+                    {
+                        alias("account_id"): {
+                            "$gte": id_range.start,
+                            "$lt": id_range.stop,
+                        }
+                    }
+                )
             if missing is not None:
                 match.append({alias(missing): {"$exists": False}})
 
             pipeline.append({"$match": {"$and": match}})
 
-            if sample >= 1:
-                pipeline.append({"$sample": {"size": int(sample)}})
-            elif sample > 0:
-                n: int = cast(int, await dbc.estimated_document_count())
-                pipeline.append({"$sample": {"size": int(n * sample)}})
+            pipeline = await self._mk_pipeline_sample(
+                BSTableType.TankStats, pipeline, sample
+            )
 
             # message(f'pipeline={pipeline}')
             return pipeline
@@ -1921,7 +3148,10 @@ class MongoBackend(Backend):
         account: BSAccount,
         release: BSBlitzRelease,
         # tanks: 		Sequence[BSTank] | None = None,
+        keep_id: bool = False,
     ) -> List[Dict[str, Any]] | None:
+        """Create a pipeline returning the latest tank stats per tank of an account
+        before the release's cut-off. keep_id=True keeps '_id' of the documents"""
         try:
             debug("starting")
 
@@ -1959,7 +3189,8 @@ class MongoBackend(Backend):
                 {"$group": {"_id": "$" + alias("tank_id"), "doc": {"$first": "$$ROOT"}}}
             )
             pipeline.append({"$replaceWith": "$doc"})
-            pipeline.append({"$project": {"_id": 0}})
+            if not keep_id:
+                pipeline.append({"$project": {"_id": 0}})
             # debug(f'pipeline={pipeline}')
             return pipeline
         except Exception as err:
@@ -1975,6 +3206,8 @@ class MongoBackend(Backend):
         missing: str | None = None,
         since: int = 0,
         sample: float = 0,
+        fields: Sequence[str] | None = None,
+        id_range: range | None = None,
     ) -> AsyncGenerator[TankStat, None]:
         """Return tank stats from the backend"""
         try:
@@ -1987,6 +3220,7 @@ class MongoBackend(Backend):
                 accounts=accounts,
                 missing=missing,
                 since=since,
+                id_range=id_range,
                 sample=sample,
             )
             if pipeline is None:
@@ -1994,8 +3228,12 @@ class MongoBackend(Backend):
                     f"could not create pipeline for get tank stats {self.backend}"
                 )
 
-            async for data in self._datas_get(BSTableType.TankStats, pipeline):
-                if (tank_stat := TankStat.transform(data)) is not None:
+            async for data in self._datas_get(
+                BSTableType.TankStats, pipeline, fields=fields
+            ):
+                if fields is not None:
+                    yield cast(TankStat, data)
+                elif (tank_stat := TankStat.transform(data)) is not None:
                     yield tank_stat
                 else:
                     error(f"could not transform data to TankStat: {data}")
@@ -2024,7 +3262,11 @@ class MongoBackend(Backend):
 
             async for data in self.objs_export(BSTableType.TankStats, pipeline):
                 if (
-                    len(tank_stats := TankStat.from_objs(data, self.model_tank_stats))
+                    len(
+                        tank_stats := self._from_objs(
+                            TankStat, data, self.model_tank_stats
+                        )
+                    )
                     > 0
                 ):
                     yield tank_stats
@@ -2037,6 +3279,66 @@ class MongoBackend(Backend):
                 f"Error fetching tank stats from {self.table_uri(BSTableType.TankStats)}: {err}"
             )
 
+    async def tank_stats_get_arrow(
+        self,
+        schema: pa.Schema,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        tanks: Sequence[BSTank] | None = None,
+        batch: int = TANK_STATS_BATCH,
+    ) -> AsyncGenerator[pa.RecordBatch, None]:
+        """Return tank stats as Arrow record batches of 'schema' decoded
+        directly from the documents"""
+        debug("starting")
+        try:
+            pipeline: List[Dict[str, Any]] | None
+            if (
+                pipeline := await self._mk_pipeline_tank_stats(
+                    release=release, regions=regions, tanks=tanks
+                )
+            ) is None:
+                raise ValueError(
+                    f"could not create pipeline for get tank stats {self.backend}"
+                )
+            async for record_batch in self._datas_arrow(
+                BSTableType.TankStats, pipeline, schema, batch=batch
+            ):
+                yield record_batch
+        except Exception as err:
+            error(
+                f"Error fetching tank stats from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
+    async def tank_stats_export_career_arrow(
+        self,
+        schema: pa.Schema,
+        account: BSAccount,
+        release: BSBlitzRelease,
+    ) -> AsyncGenerator[pa.RecordBatch, None]:
+        """Return the latest tank stats of an account as Arrow record batches
+        of 'schema' decoded directly from the documents"""
+        debug("starting")
+        try:
+            pipeline: List[Dict[str, Any]] | None
+            if (
+                pipeline := await self._mk_pipeline_tank_stats_latest(
+                    account=account,
+                    release=release,
+                    keep_id="id" in schema.names,  # '_id' for the 'id' column
+                )
+            ) is None:
+                raise ValueError(
+                    f"{self.backend}: could not create pipeline for get latest tank stats"
+                )
+            async for record_batch in self._datas_arrow(
+                BSTableType.TankStats, pipeline, schema
+            ):
+                yield record_batch
+        except Exception as err:
+            error(
+                f"Error fetching tank stats from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
     async def tank_stats_count(
         self,
         release: BSBlitzRelease | None = None,
@@ -2051,8 +3353,14 @@ class MongoBackend(Backend):
             debug("starting")
             dbc: AsyncIOMotorCollection = self.collection_tank_stats
 
+            total: int = -1
             if release is None and regions == Region.API_regions():
-                total: int = cast(int, await dbc.estimated_document_count())
+                total = cast(int, await dbc.estimated_document_count())
+            elif release is not None and accounts is None and since == 0:
+                total = await self._stats_count(
+                    StatsTypes.tank_stats, release=release, regions=regions, tanks=tanks
+                )
+            if total >= 0:
                 if sample == 0:
                     return total
                 if sample < 1:
@@ -2102,16 +3410,17 @@ class MongoBackend(Backend):
         async for objs in self.objs_export(
             BSTableType.TankStats, sample=sample, batch=batch
         ):
-            yield TankStat.from_objs(objs=objs, in_type=self.model_tank_stats)
+            yield self._from_objs(TankStat, objs, self.model_tank_stats)
 
-    async def tank_stats_duplicates(
+    async def _mk_pipeline_tank_stats_duplicates(
         self,
         tank: BSTank,
         release: BSBlitzRelease,
         regions: set[Region] = Region.API_regions(),
         sample: int = 0,
-    ) -> AsyncGenerator[TankStat, None]:
-        """Find duplicate tank stats from the backend"""
+    ) -> List[Dict[str, Any]] | None:
+        """Create a pipeline returning the '_id's of duplicate tank stats
+        per account. The latest tank stats are not included"""
         debug("starting")
         try:
             a = AliasMapper(self.model_tank_stats)
@@ -2139,26 +3448,123 @@ class MongoBackend(Backend):
 
             if sample > 0:
                 pipeline.append({"$sample": {"size": sample}})
+            return pipeline
+        except Exception as err:
+            error(f"{err}")
+        return None
 
-            async for idxs in self.collection_tank_stats.aggregate(
-                pipeline, allowDiskUse=True
-            ):
-                try:
-                    for idx in idxs["ids"]:
-                        if (
-                            obj := await self._data_get(BSTableType.TankStats, idx)
-                        ) is not None:
-                            if (tank_stat := TankStat.transform(obj)) is not None:
-                                # debug(f'tank stat duplicate: {tank_stat}')
-                                yield tank_stat
-                except Exception as err:
-                    error(f"{err}")
+    async def tank_stats_duplicates(
+        self,
+        tank: BSTank,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[TankStat, None]:
+        """Find duplicate tank stats from the backend"""
+        debug("starting")
+        try:
+            pipeline: List[Dict[str, Any]] | None
+            if (
+                pipeline := await self._mk_pipeline_tank_stats_duplicates(
+                    tank=tank, release=release, regions=regions, sample=sample
+                )
+            ) is None:
+                raise ValueError("Could not create pipeline")
+
+            async for obj in self._datas_duplicates(BSTableType.TankStats, pipeline):
+                if (tank_stat := TankStat.transform(obj)) is not None:
+                    yield tank_stat
 
         except Exception as err:
             debug(
                 f"Could not find duplicates from {self.table_uri(BSTableType.TankStats)}: {err}"
             )
 
+    async def tank_stats_prune(
+        self,
+        tank: BSTank,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        commit: bool = False,
+        sample: int = 0,
+    ) -> tuple[int, int]:
+        """Delete duplicate tank stats keeping the latest one. commit=False only counts
+        the duplicates. Returns the number of duplicates found and deleted"""
+        debug("starting")
+        try:
+            pipeline: List[Dict[str, Any]] | None
+            if (
+                pipeline := await self._mk_pipeline_tank_stats_duplicates(
+                    tank=tank, release=release, regions=regions, sample=sample
+                )
+            ) is None:
+                raise ValueError("Could not create pipeline")
+            found, deleted = await self._datas_prune(
+                BSTableType.TankStats, pipeline, commit=commit
+            )
+            if deleted > 0:
+                await self._stats_refresh_tank(tank, release, regions)
+            return found, deleted
+        except Exception as err:
+            error(
+                f"Could not prune duplicates from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+        return 0, 0
+
+    async def tank_stats_remap_release(
+        self,
+        release: BSBlitzRelease,
+        after: int = 0,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        commit: bool = False,
+        source: BSBlitzRelease | None = None,
+    ) -> tuple[int, int]:
+        """Set 'release' of the tank stats with after < last_battle_time <= release.cut_off
+        and a different release with update_many(). 'source' limits the update to tank
+        stats of that release. commit=False only counts the tank stats to update.
+        Returns the number of tank stats matched and modified"""
+        debug("starting")
+        try:
+            a = AliasMapper(self.model_tank_stats)
+            alias: Callable = a.alias
+            dbc: AsyncIOMotorCollection = self.collection_tank_stats
+            match: List[Dict[str, Any]] = list()
+
+            match.append({alias("region"): {"$in": [r.value for r in regions]}})
+            if accounts is not None:
+                match.append({alias("account_id"): {"$in": [a.id for a in accounts]}})
+            match.append(
+                {alias("last_battle_time"): {"$gt": after, "$lte": release.cut_off}}
+            )
+            match.append({alias("release"): {"$ne": release.release}})
+            if source is not None:
+                match.append({alias("release"): source.release})
+
+            if commit:
+                # releases the tank stats are moved from and to. The summaries
+                # are marked not built and rebuilt by the caller once all is done
+                releases: List[str | None] = await dbc.distinct(
+                    alias("release"), {"$and": match}
+                )
+                releases.append(release.release)
+                res: UpdateResult = await dbc.update_many(
+                    {"$and": match}, {"$set": {alias("release"): release.release}}
+                )
+                if res.modified_count > 0:
+                    await self._stats_invalidate(
+                        StatsTypes.tank_stats,
+                        [(rel, region) for rel in releases for region in regions],
+                    )
+                return res.matched_count, res.modified_count
+            else:
+                return await dbc.count_documents({"$and": match}), 0
+        except Exception as err:
+            error(
+                f"Could not remap release {release} in {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+        return 0, 0
+
     async def tank_stats_unique(
         self,
         field: str,
@@ -2167,14 +3573,28 @@ class MongoBackend(Backend):
         regions: set[Region] = Region.API_regions(),
         account: BSAccount | None = None,
         tank: BSTank | None = None,
+        id_range: range | None = None,
     ) -> AsyncGenerator[A, None]:
-        """Return unique values of field"""
+        """Return unique values of field. Unique tank_ids of a release
+        are read from the stats summaries if available"""
         debug("starting")
         try:
             pipeline: List[Dict[str, Any]] | None
             accounts: Sequence[BSAccount] | None = None
             tanks: Sequence[BSTank] | None = None
 
+            if (
+                field == "tank_id"
+                and release is not None
+                and account is None
+                and tank is None
+                and id_range is None
+                and (tank_ids := await self._stats_tanks(release, regions)) is not None
+            ):
+                for tank_id in tank_ids:
+                    yield cast(A, tank_id)
+                return
+
             if account is not None:
                 accounts = [account]
             if tank is not None:
@@ -2182,7 +3602,11 @@ class MongoBackend(Backend):
 
             if (
                 pipeline := await self._mk_pipeline_tank_stats(
-                    release=release, regions=regions, accounts=accounts, tanks=tanks
+                    release=release,
+                    regions=regions,
+                    accounts=accounts,
+                    tanks=tanks,
+                    id_range=id_range,
                 )
             ) is None:
                 raise ValueError("could not build filtering pipeline")
@@ -2202,6 +3626,7 @@ class MongoBackend(Backend):
         regions: set[Region] = Region.API_regions(),
         account: BSAccount | None = None,
         tank: BSTank | None = None,
+        id_range: range | None = None,
     ) -> int:
         """Return count of unique values of field"""
         debug("starting")
@@ -2221,7 +3646,11 @@ class MongoBackend(Backend):
             for r in regions:
                 if (
                     pipeline := await self._mk_pipeline_tank_stats(
-                        release=release, regions={r}, accounts=accounts, tanks=tanks
+                        release=release,
+                        regions={r},
+                        accounts=accounts,
+                        tanks=tanks,
+                        id_range=id_range,
                     )
                 ) is None:
                     raise ValueError("could not build filtering pipeline")
@@ -2397,6 +3826,357 @@ class MongoBackend(Backend):
         """Delete a tank from Tankopedia"""
         return await self._data_delete(BSTableType.Tankopedia, idx=tank.tank_id)
 
+    ########################################################
+    #
+    # MongoBackend(): stats
+    #
+    ########################################################
+
+    def _stats_source(self, stats_type: StatsTypes) -> BSTableType:
+        """Return the table stats summaries of 'stats_type' are built from"""
+        if stats_type == StatsTypes.tank_stats:
+            return BSTableType.TankStats
+        elif stats_type == StatsTypes.player_achievements:
+            return BSTableType.PlayerAchievements
+        raise ValueError(f"stats summaries are not supported for {stats_type.name}")
+
+    def _mk_query_stats(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        tank_ids: Sequence[int] | None = None,
+    ) -> Dict[str, Any]:
+        """Create a query for stats summaries"""
+        alias: Callable = AliasMapper(self.model_stats).alias
+        query: Dict[str, Any] = {alias("stats_type"): stats_type.value}
+        if release is not None:
+            query[alias("release")] = release.release
+        query[alias("region")] = {"$in": [r.value for r in regions]}
+        if tank_ids is not None:
+            query[alias("tank_id")] = {"$in": list(tank_ids)}
+        return query
+
+    def _mk_pipeline_stats(
+        self,
+        stats_type: StatsTypes,
+        pipeline: List[Dict[str, Any]],
+        by_tank: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Add stages to a $match pipeline to count documents, distinct accounts and
+        battles per release, region and tank (by_tank=True) or per release and region"""
+        model: type[JSONExportable] = self.get_model(self._stats_source(stats_type))
+        alias: Callable = AliasMapper(model).alias
+        keys: Dict[str, str] = {
+            "release": "$" + alias("release"),
+            "region": "$" + alias("region"),
+        }
+        if by_tank:
+            keys["tank_id"] = "$" + alias("tank_id")
+        battles: str | int = 0
+        if stats_type == StatsTypes.tank_stats:
+            all_model = cast(type[JSONExportable], model.model_fields["all"].annotation)
+            battles = "$" + alias("all") + "." + AliasMapper(all_model).alias("battles")
+
+        # group per account first to count distinct accounts
+        pipeline.append(
+            {
+                "$group": {
+                    "_id": keys | {"account_id": "$" + alias("account_id")},
+                    "documents": {"$sum": 1},
+                    "battles": {"$sum": battles},
+                }
+            }
+        )
+        pipeline.append(
+            {
+                "$group": {
+                    "_id": {key: "$_id." + key for key in keys},
+                    "documents": {"$sum": "$documents"},
+                    "accounts": {"$sum": 1},
+                    "battles": {"$sum": "$battles"},
+                }
+            }
+        )
+        return pipeline
+
+    async def _stats_invalidate(
+        self,
+        stats_type: StatsTypes,
+        keys: Iterable[tuple[str | None, Region | None]],
+    ) -> None:
+        """Mark the all-tanks stats summaries of (release, region) keys not built
+        after writes the summaries do not track. Readers count from the source
+        table until the summaries are rebuilt with stats_rebuild()"""
+        debug("starting")
+        try:
+            ids: List[str] = [
+                BSStats.mk_id(stats_type, release, region)
+                for release, region in set(keys)
+                if release is not None and region is not None
+            ]
+            if len(ids) == 0:
+                return None
+            alias: Callable = AliasMapper(self.model_stats).alias
+            await self.collection_stats.update_many(
+                {"_id": {"$in": ids}, alias("built"): True},
+                {"$set": {alias("built"): False, alias("updated"): epoch_now()}},
+            )
+        except Exception as err:
+            error(f"Could not update {self.table_uri(BSTableType.Stats)}: {err}")
+        return None
+
+    async def stats_invalidate(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+    ) -> None:
+        """Mark the all-tanks stats summaries not built before writes the
+        summaries do not track, e.g. raw copies"""
+        debug("starting")
+        try:
+            alias: Callable = AliasMapper(self.model_stats).alias
+            query: Dict[str, Any] = self._mk_query_stats(
+                stats_type, release=release, regions=regions, tank_ids=[0]
+            )
+            query[alias("built")] = True
+            await self.collection_stats.update_many(
+                query, {"$set": {alias("built"): False, alias("updated"): epoch_now()}}
+            )
+        except Exception as err:
+            error(f"Could not update {self.table_uri(BSTableType.Stats)}: {err}")
+        return None
+
+    async def _stats_key_get(
+        self, table_type: BSTableType, idx: Idx
+    ) -> tuple[str | None, Region | None]:
+        """Return the (release, region) stats summary key of a stored document"""
+        try:
+            alias: Callable = AliasMapper(self.get_model(table_type)).alias
+            if (
+                doc := await self.get_collection(table_type).find_one(
+                    {"_id": idx}, {alias("release"): 1, alias("region"): 1}
+                )
+            ) is not None:
+                region: str | None = doc.get(alias("region"))
+                return doc.get(alias("release")), (
+                    Region(region) if region is not None else None
+                )
+        except Exception as err:
+            error(f"Could not read {self.table_uri(table_type)}: {err}")
+        return None, None
+
+    async def _stats_refresh_tank(
+        self,
+        tank: BSTank,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+    ) -> None:
+        """Rebuild the stats summaries of a tank after pruning and
+        subtract the removed documents from the all-tanks summaries"""
+        debug("starting")
+        try:
+            alias: Callable = AliasMapper(self.model_stats).alias
+            old: Dict[Region, BSStats] = dict()
+            async for stats in self.stats_get(
+                StatsTypes.tank_stats, release=release, regions=regions, tanks=[tank]
+            ):
+                old[stats.region] = stats
+            if len(old) == 0:
+                return None
+            await self.stats_rebuild(
+                StatsTypes.tank_stats, release=release, regions=regions, tanks=[tank]
+            )
+            async for stats in self.stats_get(
+                StatsTypes.tank_stats, release=release, regions=regions, tanks=[tank]
+            ):
+                if (prev := old.get(stats.region)) is not None:
+                    prev.documents -= stats.documents
+                    prev.battles -= stats.battles
+            ops: List[UpdateOne] = [
+                UpdateOne(
+                    {
+                        "_id": BSStats.mk_id(
+                            StatsTypes.tank_stats, release.release, region
+                        )
+                    },
+                    {
+                        "$inc": {
+                            alias("documents"): -stats.documents,
+                            alias("battles"): -stats.battles,
+                        }
+                    },
+                )
+                for region, stats in old.items()
+            ]
+            await self.collection_stats.bulk_write(ops, ordered=False)
+        except Exception as err:
+            error(f"Could not update {self.table_uri(BSTableType.Stats)}: {err}")
+        return None
+
+    async def _stats_count(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        tanks: Sequence[BSTank] | None = None,
+    ) -> int:
+        """Count documents from the stats summaries. Returns -1 if
+        the summaries of a region have not been built"""
+        debug("starting")
+        tank_ids: List[int] = [0]
+        if tanks is not None:
+            tank_ids = tank_ids + [tank.tank_id for tank in tanks]
+        found: set[Region] = set()
+        total: int = 0
+        async for stats in self.stats_get(
+            stats_type,
+            release=release,
+            regions=regions,
+            tanks=[BSTank(tank_id=tank_id) for tank_id in tank_ids],
+        ):
+            if stats.tank_id == 0:
+                if stats.built:
+                    found.add(stats.region)
+                if tanks is None:
+                    total += stats.documents
+            else:
+                total += stats.documents
+        if found != regions:
+            return -1
+        return total
+
+    async def _stats_tanks(
+        self,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+    ) -> List[int] | None:
+        """Return tank_ids with tank stats in the release from the stats summaries.
+        Returns None if the summaries of a region have not been built"""
+        debug("starting")
+        found: set[Region] = set()
+        tank_ids: set[int] = set()
+        async for stats in self.stats_get(
+            StatsTypes.tank_stats, release=release, regions=regions
+        ):
+            if stats.tank_id == 0:
+                if stats.built:
+                    found.add(stats.region)
+            elif stats.documents > 0:
+                tank_ids.add(stats.tank_id)
+        if found != regions:
+            return None
+        return sorted(tank_ids)
+
+    async def stats_get(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        tanks: Sequence[BSTank] | None = None,
+    ) -> AsyncGenerator[BSStats, None]:
+        """Return stats summaries from the backend"""
+        debug("starting")
+        try:
+            model: type[JSONExportable] = self.model_stats
+            tank_ids: List[int] | None = None
+            if tanks is not None:
+                tank_ids = [tank.tank_id for tank in tanks]
+            query: Dict[str, Any] = self._mk_query_stats(
+                stats_type, release=release, regions=regions, tank_ids=tank_ids
+            )
+            async for obj in self.collection_stats.find(query):
+                if (stats := BSStats.from_obj(obj, model)) is not None:
+                    yield stats
+        except Exception as err:
+            error(
+                f"Could not get stats from {self.table_uri(BSTableType.Stats)}: {err}"
+            )
+
+    async def stats_rebuild(
+        self,
+        stats_type: StatsTypes,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        tanks: Sequence[BSTank] | None = None,
+    ) -> int:
+        """Rebuild stats summaries from tank stats or player achievements.
+        The all-tanks summaries (tank_id=0) are rebuilt and marked as 'built' only
+        if 'tanks' is not given. Returns the number of summaries written or -1 on error"""
+        debug("starting")
+        try:
+            source: BSTableType = self._stats_source(stats_type)
+            dbc: AsyncIOMotorCollection = self.get_collection(source)
+            tank_ids: List[int] | None = None
+            groupings: List[bool] = [False]
+            if stats_type == StatsTypes.tank_stats:
+                groupings = [True, False]
+            if tanks is not None:
+                groupings = [True]
+                tank_ids = [tank.tank_id for tank in tanks]
+
+            res: DeleteResult = await self.collection_stats.delete_many(
+                self._mk_query_stats(
+                    stats_type, release=release, regions=regions, tank_ids=tank_ids
+                )
+            )
+            debug(f"deleted {res.deleted_count} old summaries")
+
+            summaries: List[BSStats] = list()
+            pipeline: List[Dict[str, Any]] | None
+            for by_tank in groupings:
+                if stats_type == StatsTypes.tank_stats:
+                    pipeline = await self._mk_pipeline_tank_stats(
+                        release=release, regions=regions, tanks=tanks
+                    )
+                else:
+                    pipeline = await self._mk_pipeline_player_achievements(
+                        release=release, regions=regions
+                    )
+                if pipeline is None:
+                    raise ValueError(f"could not create pipeline for {source}")
+                pipeline = self._mk_pipeline_stats(stats_type, pipeline, by_tank)
+
+                async for doc in dbc.aggregate(pipeline, allowDiskUse=True):
+                    try:
+                        if doc["_id"].get("release") is None:
+                            debug(f"skipping documents without release: {doc}")
+                            continue
+                        summaries.append(
+                            BSStats(
+                                stats_type=stats_type,
+                                release=doc["_id"]["release"],
+                                region=Region(doc["_id"]["region"]),
+                                tank_id=doc["_id"].get("tank_id", 0),
+                                documents=doc["documents"],
+                                accounts=doc["accounts"],
+                                battles=doc["battles"],
+                                built=not by_tank,
+                            )
+                        )
+                    except Exception as err:
+                        error(f"could not create stats summary from {doc}: {err}")
+
+            if release is not None and tanks is None:
+                # mark regions without documents as built too
+                counted: set[Region] = {s.region for s in summaries if s.built}
+                for region in regions - counted:
+                    summaries.append(
+                        BSStats(
+                            stats_type=stats_type,
+                            release=release.release,
+                            region=region,
+                            built=True,
+                        )
+                    )
+
+            added, updated, _ = await self._datas_upsert(BSTableType.Stats, summaries)
+            return added + updated
+        except Exception as err:
+            error(f"Could not rebuild {self.table_uri(BSTableType.Stats)}: {err}")
+        return -1
+
     ########################################################
     #
     # MongoBackend(): tank_string_
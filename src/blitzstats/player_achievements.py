@@ -12,7 +12,6 @@ from asyncio import (
 )
 from os import getpid
 from math import ceil
-from sortedcollections import NearestDict  # type: ignore
 from pydantic import BaseModel
 from alive_progress import alive_bar  # type: ignore
 
@@ -35,6 +34,8 @@ from .backend import (
     BSTableType,
     ACCOUNTS_Q_MAX,
     get_sub_type,
+    add_args_bulk_mode,
+    read_args_bulk_mode,
 )
 from .models import BSAccount, BSBlitzRelease, StatsTypes
 from .accounts import (
@@ -42,7 +43,7 @@ from .accounts import (
     create_accountQ_batch,
     accounts_parse_args,
 )
-from .releases import release_mapper
+from .releases import release_index, reference_data, ReleaseIndex, ReferenceData
 
 logger = logging.getLogger()
 error = logger.error
@@ -55,6 +56,7 @@ debug = logger.debug
 WORKERS_WGAPI: int = 40
 WORKERS_IMPORTERS: int = 5
 PLAYER_ACHIEVEMENTS_Q_MAX: int = 5000
+MP_THREADS: int = 4  # async workers per worker process
 
 # Globals
 
@@ -62,6 +64,7 @@ db: Backend
 readQ: AsyncQueue[List[Any] | None]
 in_model: type[BaseModel]
 mp_options: Dict[str, Any] = dict()
+mp_refdata: ReferenceData | None = None
 
 ########################################################
 #
@@ -232,7 +235,13 @@ def add_args_prune(
         "--commit",
         action="store_true",
         default=False,
-        help="execute pruning stats instead of listing duplicates",
+        help="execute pruning stats instead of counting duplicates",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        default=False,
+        help="list duplicates and the newer stats instead of counting them (slow)",
     )
     parser.add_argument(
         "--sample", type=int, default=0, metavar="SAMPLE", help="sample size"
@@ -292,6 +301,7 @@ def add_args_import(
             default=False,
             help="Do not map releases when importing",
         )
+        add_args_bulk_mode(parser)
         parser.add_argument("--last", action="store_true", default=False, help=SUPPRESS)
 
         return True
@@ -527,14 +537,15 @@ async def fetch_api_region_worker(
 async def fetch_backend_worker(
     db: Backend, statsQ: Queue[List[PlayerAchievementsMaxSeries]]
 ) -> EventCounter:
-    """Async worker to add player achievements to backend. Assumes batch is for the same account"""
+    """Async worker to add player achievements to backend and to mark the accounts updated"""
     debug("starting")
     stats: EventCounter = EventCounter(f"{db.driver}")
     added: int
     not_added: int
+    updated: int
 
     try:
-        releases: NearestDict[int, BSBlitzRelease] = await release_mapper(db)
+        releases: ReleaseIndex = await release_index(db)
         while True:
             added = 0
             not_added = 0
@@ -549,11 +560,14 @@ async def fetch_backend_worker(
                     added, not_added = await db.player_achievements_insert(
                         player_achievements
                     )
-                    for pac in player_achievements:
-                        if (
-                            account := await db.account_get(account_id=pac.account_id)
-                        ) is not None:
-                            account.stats_updated(StatsTypes.player_achievements)
+                    now: int = epoch_now()
+                    updated, _ = await db.accounts_update(
+                        {
+                            pac.account_id: {StatsTypes.player_achievements.value: now}
+                            for pac in player_achievements
+                        }
+                    )
+                    stats.log("accounts updated", updated)
             except Exception as err:
                 error(f"{err}")
             finally:
@@ -594,7 +608,7 @@ async def cmd_import(db: Backend, args: Namespace) -> bool:
         import_backend: str = args.import_backend
         map_releases: bool = not args.no_release_map
 
-        releases: NearestDict[int, BSBlitzRelease] = await release_mapper(db)
+        releases: ReleaseIndex = await release_index(db)
         workers: List[Task] = list()
         debug("args parsed")
 
@@ -694,45 +708,63 @@ async def cmd_importMP(db: Backend, args: Namespace) -> bool:
             options: Dict[str, Any] = dict()
             options["force"] = args.force
             # options['map_releases'] 				= not args.no_release_map
+            options["bulk"] = read_args_bulk_mode(args)
+            drop_indexes: bool = options["bulk"] is not None and args.drop_indexes
+            if drop_indexes:
+                await db.indexes_drop(BSTableType.PlayerAchievements)
 
-            with Pool(
-                processes=WORKERS,
-                initializer=import_mp_init,
-                initargs=[db.config, readQ, import_model, options],
-            ) as pool:
-                debug(f"starting {WORKERS} workers")
-                results: AsyncResult = pool.map_async(
-                    import_mp_worker_start, range(WORKERS)
-                )
-                pool.close()
-
-                message("Counting player achievements to import ...")
-                N: int = await import_db.player_achievements_count(sample=args.sample)
-
-                with alive_bar(
-                    N,
-                    title="Importing player achievements ",
-                    enrich_print=False,
-                    refresh_secs=1,
-                ) as bar:
-                    async for objs in import_db.objs_export(
-                        table_type=BSTableType.PlayerAchievements, sample=args.sample
-                    ):
-                        read: int = len(objs)
-                        # debug(f'read {read} player achievements objects')
-                        readQ.put(objs)
-                        stats.log(f"{db.driver}: stats read", read)
-                        bar(read)
+            try:
+                with Pool(
+                    processes=WORKERS,
+                    initializer=import_mp_init,
+                    initargs=[
+                        db.config,
+                        readQ,
+                        import_model,
+                        options,
+                        await reference_data(db),
+                    ],
+                ) as pool:
+                    debug(f"starting {WORKERS} workers")
+                    results: AsyncResult = pool.map_async(
+                        import_mp_worker_start, range(WORKERS)
+                    )
+                    pool.close()
 
-                debug(
-                    f"Finished exporting {import_model} from {import_db.table_uri(BSTableType.PlayerAchievements)}"
-                )
-                for _ in range(WORKERS):
-                    readQ.put(None)  # add sentinel
+                    message("Counting player achievements to import ...")
+                    N: int = await import_db.player_achievements_count(
+                        sample=args.sample
+                    )
 
-                for res in results.get():
-                    stats.merge_child(res)
-                pool.join()
+                    with alive_bar(
+                        N,
+                        title="Importing player achievements ",
+                        enrich_print=False,
+                        refresh_secs=1,
+                    ) as bar:
+                        async for objs in import_db.objs_export(
+                            table_type=BSTableType.PlayerAchievements,
+                            sample=args.sample,
+                        ):
+                            read: int = len(objs)
+                            # debug(f'read {read} player achievements objects')
+                            readQ.put(objs)
+                            stats.log(f"{db.driver}: stats read", read)
+                            bar(read)
+
+                    debug(
+                        f"Finished exporting {import_model} from {import_db.table_uri(BSTableType.PlayerAchievements)}"
+                    )
+                    for _ in range(WORKERS):
+                        readQ.put(None)  # add sentinel
+
+                    for res in results.get():
+                        stats.merge_child(res)
+                    pool.join()
+            finally:
+                if drop_indexes:
+                    message("Rebuilding indexes...")
+                    await db.indexes_rebuild(BSTableType.PlayerAchievements)
 
         message(stats.print(do_print=False, clean=True))
         return True
@@ -746,17 +778,22 @@ def import_mp_init(
     inputQ: queue.Queue,
     import_model: type[BaseModel],
     options: Dict[str, Any],
+    refdata: ReferenceData | None = None,
 ):
     """Initialize static/global backend into a forked process"""
-    global db, readQ, in_model, mp_options
+    global db, readQ, in_model, mp_options, mp_refdata
     debug(f"starting (PID={getpid()})")
 
-    if (tmp_db := Backend.create(**backend_config)) is None:
+    # async workers and the main task of the worker process
+    if (
+        tmp_db := Backend.create_worker(backend_config, threads=MP_THREADS + 1)
+    ) is None:
         raise ValueError("could not create backend")
     db = tmp_db
     readQ = AsyncQueue(inputQ)
     in_model = import_model
     mp_options = options
+    mp_refdata = refdata
     debug("finished")
 
 
@@ -772,14 +809,24 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
     stats: EventCounter = EventCounter("importer")
     workers: List[Task] = list()
     try:
-        global db, readQ, in_model, mp_options
-        THREADS: int = 4
+        global db, readQ, in_model, mp_options, mp_refdata
+        THREADS: int = MP_THREADS
         force: bool = mp_options["force"]
         import_model: type[BaseModel] = in_model
-        releases: NearestDict[int, BSBlitzRelease] = await release_mapper(db)
+        releases: ReleaseIndex
+        if mp_refdata is not None:
+            releases = mp_refdata.releases
+        else:
+            releases = await release_index(db)
         player_achievementsQ: Queue[List[PlayerAchievementsMaxSeries]] = Queue(100)
         player_achievements: List[PlayerAchievementsMaxSeries]
         # rel_map		: bool								= mp_options['map_releases']
+        bulk: Dict[str, Any] | None = mp_options["bulk"]
+        buffer: List[PlayerAchievementsMaxSeries] = list()
+        batch: int = 0
+
+        if bulk is not None:
+            db.set_bulk_mode(**bulk)
 
         for _ in range(THREADS):
             workers.append(
@@ -811,13 +858,24 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
                 stats.log("not release mapped", read - mapped)
                 stats.log("release map errors", errors)
 
-                await player_achievementsQ.put(player_achievements)
+                if bulk is None:
+                    await player_achievementsQ.put(player_achievements)
+                    continue
+                # bulk mode: insert in large batches
+                if batch == 0:
+                    batch = db.bulk_batch_size(player_achievements)
+                buffer.extend(player_achievements)
+                if len(buffer) >= batch:
+                    await player_achievementsQ.put(buffer)
+                    buffer = list()
             except Exception as err:
                 error(f"{err}")
             finally:
                 readQ.task_done()
         debug(f"#{id}: finished reading objects")
         readQ.task_done()
+        if len(buffer) > 0:
+            await player_achievementsQ.put(buffer)
         await player_achievementsQ.join()  # add sentinel for other workers
         await stats.gather_stats(workers)
     except CancelledError:
@@ -829,26 +887,22 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
 
 def map_releases(
     player_achievements: List[PlayerAchievementsMaxSeries],
-    releases: NearestDict[int, BSBlitzRelease],
+    releases: ReleaseIndex,
 ) -> tuple[List[PlayerAchievementsMaxSeries], int, int]:
+    """Map a batch of player achievements to releases"""
     debug("starting")
     mapped: int = 0
     errors: int = 0
-    res: List[PlayerAchievementsMaxSeries] = list()
-    for player_achievement in player_achievements:
-        try:
-            if (release := releases[player_achievement.added]) is not None:
-                player_achievement.release = release.release
-                mapped += 1
-        except Exception as err:
-            error(f"{err}")
-            errors += 1
-        res.append(player_achievement)
-    return res, mapped, errors
+    try:
+        mapped, _ = releases.map_objs(player_achievements, epoch_field="added")
+    except Exception as err:
+        error(f"{err}")
+        errors = len(player_achievements)
+    return player_achievements, mapped, errors
 
 
 async def player_releases_worker(
-    releases: NearestDict[int, BSBlitzRelease],
+    releases: ReleaseIndex,
     inputQ: Queue[PlayerAchievementsMaxSeries],
     outputQ: Queue[List[PlayerAchievementsMaxSeries]],
     map_releases: bool = True,
@@ -859,25 +913,25 @@ async def player_releases_worker(
     debug(f"starting: map_releases={map_releases}")
     stats: EventCounter = EventCounter("Release mapper")
     IMPORT_BATCH: int = 500
-    release: BSBlitzRelease | None
     pa_list: List[PlayerAchievementsMaxSeries] = list()
 
+    def map_batch() -> None:
+        if map_releases:
+            mapped, not_mapped = releases.map_objs(pa_list, epoch_field="added")
+            stats.log("mapped", mapped)
+            if not_mapped > 0:
+                error(f"Could not map release for {not_mapped} player achievements")
+                stats.log("errors", not_mapped)
+
     try:
         # await outputQ.add_producer()
         while True:
             pac = await inputQ.get()
             # debug(f'read: {pac}')
             try:
-                if map_releases:
-                    if (release := releases[(pac.added)]) is not None:
-                        pac.release = release.release
-                        # debug(f'mapped: release={release.release}')
-                        stats.log("mapped")
-                    else:
-                        error(f"Could not map release: added={pac.added}")
-                        stats.log("errors")
                 pa_list.append(pac)
                 if len(pa_list) == IMPORT_BATCH:
+                    map_batch()
                     await outputQ.put(pa_list)
                     # debug(f'put {len(pa_list)} items to outputQ')
                     stats.log("read", len(pa_list))
@@ -889,6 +943,7 @@ async def player_releases_worker(
     except CancelledError:
         debug(f"Cancelled: pa_list has {len(pa_list)} items")
         if len(pa_list) > 0:
+            map_batch()
             await outputQ.put(pa_list)
             # debug(f'{len(pa_list)} items added to outputQ')
             stats.log("read", len(pa_list))
@@ -924,24 +979,15 @@ async def cmd_prune(db: Backend, args: Namespace) -> bool:
             await sleep(3)
             progress_str = "Pruning duplicates "
 
+        found: int
+        deleted: int
         with alive_bar(len(regions), title=progress_str, refresh_secs=1) as bar:
             for region in regions:
-                async for dup in db.player_achievements_duplicates(
-                    release, regions={region}, sample=sample
-                ):
-                    stats.log("duplicates found")
-                    if commit:
-                        # verbose(f'deleting duplicate: {dup}')
-                        if await db.player_achievement_delete(
-                            account=BSAccount(id=dup.account_id, region=region),
-                            added=dup.added,
-                        ):
-                            verbose(f"deleted duplicate: {dup}")
-                            stats.log("duplicates deleted")
-                        else:
-                            error(f"failed to delete duplicate: {dup}")
-                            stats.log("deletion errors")
-                    else:
+                if args.list and not commit:
+                    async for dup in db.player_achievements_duplicates(
+                        release, regions={region}, sample=sample
+                    ):
+                        stats.log("duplicates found")
                         verbose(f"duplicate:  {dup}")
                         async for newer in db.player_achievements_get(
                             release=release,
@@ -950,6 +996,14 @@ async def cmd_prune(db: Backend, args: Namespace) -> bool:
                             since=dup.added + 1,
                         ):
                             verbose(f"newer stat: {newer}")
+                else:
+                    found, deleted = await db.player_achievements_prune(
+                        release, regions={region}, commit=commit, sample=sample
+                    )
+                    stats.log("duplicates found", found)
+                    if commit:
+                        stats.log("duplicates deleted", deleted)
+                        stats.log("deletion errors", found - deleted)
                 bar()
 
         stats.print()
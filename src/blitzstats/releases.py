@@ -1,11 +1,15 @@
 from argparse import ArgumentParser, Namespace
 from configparser import ConfigParser
-from typing import Optional, Any, List, Dict
+from typing import Optional, Any, List, Dict, Iterable, Sequence, TypeVar
 import logging
 from asyncio import create_task, gather, wait, Queue, Task, sleep
 from sortedcollections import NearestDict  # type: ignore
 from math import ceil
 from datetime import date, datetime
+import numpy as np
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+from pydantic import BaseModel
 
 from pyutils import (
     EventCounter,
@@ -22,6 +26,8 @@ MAX_EPOCH: int = (
     2**36
 )  ##  Sunday, August 20, 4147 7:32:16, I doubt Python3 is supported anymore then
 
+A = TypeVar("A", pa.Table, pa.RecordBatch)
+
 logger = logging.getLogger()
 error = logger.error
 message = logger.warning
@@ -520,6 +526,150 @@ async def release_mapper(db: Backend) -> NearestDict[int, BSBlitzRelease]:
     return releases
 
 
+class ReleaseIndex:
+    """Map epoch times to releases in batches. Holds a sorted array of release
+    cut-offs and maps epochs to the release with the next cut-off (like
+    NearestDict.NEAREST_NEXT) with a single searchsorted() call"""
+
+    def __init__(self, releases: Iterable[BSBlitzRelease]):
+        self._releases: List[BSBlitzRelease] = list()
+        for r in sorted(releases, key=lambda r: r.cut_off):
+            if len(self._releases) > 0 and self._releases[-1].cut_off == r.cut_off:
+                message(f"Cannot store releases with duplicate cut-off times: {r}")
+                continue
+            self._releases.append(r)
+        self._cut_offs: np.ndarray = np.array(
+            [r.cut_off for r in self._releases], dtype=np.int64
+        )
+        # epochs after the last cut-off map to index len() == None
+        self._names: np.ndarray = np.array(
+            [r.release for r in self._releases] + [None], dtype=object
+        )
+        self._dictionary: pa.Array = pa.array(
+            [r.release for r in self._releases], type=pa.string()
+        )
+
+    def __len__(self) -> int:
+        return len(self._releases)
+
+    @property
+    def releases(self) -> List[BSBlitzRelease]:
+        """Releases sorted by cut-off"""
+        return self._releases
+
+    def get(self, release: str) -> BSBlitzRelease | None:
+        """Get release by its name"""
+        for r in self._releases:
+            if r.release == release:
+                return r
+        return None
+
+    def previous(self, release: BSBlitzRelease) -> BSBlitzRelease | None:
+        """Get the release before 'release' by cut-off"""
+        for i, r in enumerate(self._releases):
+            if r.release == release.release:
+                return self._releases[i - 1] if i > 0 else None
+        return None
+
+    def __getitem__(self, epoch: int) -> BSBlitzRelease | None:
+        """Map a single epoch to release"""
+        idx: int = int(np.searchsorted(self._cut_offs, epoch, side="left"))
+        if idx < len(self._releases):
+            return self._releases[idx]
+        return None
+
+    def indices(self, epochs: Sequence[int] | np.ndarray) -> np.ndarray:
+        """Return release indices for epochs. len() means no release"""
+        return np.searchsorted(
+            self._cut_offs, np.asarray(epochs, dtype=np.int64), side="left"
+        )
+
+    def map(self, epochs: Sequence[int] | np.ndarray) -> List[str | None]:
+        """Map epochs to release strings, None if no release found"""
+        return self._names[self.indices(epochs)].tolist()
+
+    def map_objs(
+        self,
+        objs: Sequence[BaseModel],
+        epoch_field: str = "last_battle_time",
+        release_field: str = "release",
+    ) -> tuple[int, int]:
+        """Set objs' 'release_field' based on 'epoch_field'.
+        The release strings are assigned without validation.
+        Returns (mapped, not mapped)"""
+        if len(objs) == 0:
+            return 0, 0
+        releases: List[str | None] = self.map(
+            [getattr(obj, epoch_field) for obj in objs]
+        )
+        mapped: int = 0
+        for obj, release in zip(objs, releases):
+            if release is not None:
+                obj.__dict__[release_field] = release
+                obj.__pydantic_fields_set__.add(release_field)
+                mapped += 1
+        return mapped, len(objs) - mapped
+
+    def arrow(
+        self,
+        epochs: pa.Array | pa.ChunkedArray,
+        type: pa.DataType = pa.string(),
+    ) -> pa.Array:
+        """Map an Arrow array of epochs to an array of releases of 'type'.
+        Epochs without a release are null"""
+        if isinstance(epochs, pa.ChunkedArray):
+            epochs = epochs.combine_chunks()
+        idx: np.ndarray = self.indices(
+            epochs.fill_null(0).to_numpy(zero_copy_only=False)
+        )
+        mask: np.ndarray = idx >= len(self._releases)
+        if epochs.null_count > 0:
+            mask |= epochs.is_null().to_numpy(zero_copy_only=False)
+        res: pa.Array = pa.DictionaryArray.from_arrays(
+            pa.array(idx.astype(np.int32), mask=mask), self._dictionary
+        )
+        if res.type != type:
+            res = pc.cast(res, type)
+        return res
+
+    def set_column(
+        self,
+        data: A,
+        epoch_field: str = "last_battle_time",
+        release_field: str = "release",
+    ) -> A:
+        """Set (or append) 'release_field' column of an Arrow table or
+        record batch based on 'epoch_field' column"""
+        idx: int = data.schema.get_field_index(release_field)
+        type: pa.DataType = pa.string()
+        if idx >= 0:
+            type = data.schema.field(idx).type
+        col: pa.Array = self.arrow(data.column(epoch_field), type=type)
+        if idx >= 0:
+            return data.set_column(idx, data.schema.field(idx), col)
+        return data.append_column(release_field, col)
+
+
+async def release_index(db: Backend) -> ReleaseIndex:
+    """Fetch all releases and create a ReleaseIndex()"""
+    return ReleaseIndex([r async for r in db.releases_get()])
+
+
+class ReferenceData:
+    """Picklable snapshot of reference data (releases) built once by the parent
+    and passed to worker processes with the Pool initargs so the workers do not
+    need to query it from the backend"""
+
+    def __init__(self, releases: ReleaseIndex):
+        self.releases: ReleaseIndex = releases
+
+
+async def reference_data(db: Backend) -> ReferenceData:
+    """Fetch reference data from the backend for worker processes"""
+    debug("starting")
+    return ReferenceData(await release_index(db))
+
+
 def round_epoch(epoch: int, round_to: int = 0) -> int:
     """Round epoch time to the next even 'round_to'.
     Adds round_to/2 to the epoch first to ensure there is enough gap"""
@@ -17,7 +17,13 @@ from pydantic_exportables import JSONExportable
 # from blitzmodels.replay import ReplayJSON, ReplayData
 # from blitzmodels.wotinspector.wi_apiv2 import Replay
 from .models import BSReplay
-from .backend import Backend, BSTableType, get_sub_type
+from .backend import (
+    Backend,
+    BSTableType,
+    get_sub_type,
+    add_args_bulk_mode,
+    read_args_bulk_mode,
+)
 from .accounts import add_args_fetch_wi as add_args_accounts_fetch_wi
 from .accounts import cmd_fetch_wi as cmd_accounts_fetch_wi
 
@@ -33,6 +39,7 @@ WI_RATE_LIMIT: Optional[float] = 20 / 3600
 WI_AUTH_TOKEN: Optional[str] = None
 REPLAY_Q_MAX: int = 100
 REPLAYS_BATCH: int = 50
+MP_THREADS: int = 4  # async workers per worker process
 
 # Globals
 
@@ -214,8 +221,9 @@ def add_args_import(
             "--force",
             action="store_true",
             default=False,
-            help="Overwrite existing file(s) when exporting",
+            help="Overwrite existing replays. Cannot be used with --bulk-mode",
         )
+        add_args_bulk_mode(parser)
 
         return True
     except Exception as err:
@@ -361,6 +369,11 @@ async def cmd_importMP(db: Backend, args: Namespace) -> bool:
         if WORKERS == 0:
             WORKERS = max([cpu_count() - 1, 1])
 
+        if args.force and read_args_bulk_mode(args) is not None:
+            raise ValueError(
+                "--force cannot be used with --bulk-mode: bulk inserts skip existing replays"
+            )
+
         if (import_model := get_sub_type(args.import_model, BaseModel)) is None:
             raise ValueError(
                 "--import-model not defined or not is a subclass of BaseModel"
@@ -381,43 +394,55 @@ async def cmd_importMP(db: Backend, args: Namespace) -> bool:
             readQ: queue.Queue[List[Any] | None] = manager.Queue(REPLAY_Q_MAX)
             options: Dict[str, Any] = dict()
             options["force"] = args.force
+            options["bulk"] = read_args_bulk_mode(args)
+            drop_indexes: bool = options["bulk"] is not None and args.drop_indexes
+            if drop_indexes:
+                await db.indexes_drop(BSTableType.Replays)
 
-            with Pool(
-                processes=WORKERS,
-                initializer=import_mp_init,
-                initargs=[db.config, readQ, import_model, options],
-            ) as pool:
-                debug(f"starting {WORKERS} workers")
-                results: AsyncResult = pool.map_async(
-                    import_mp_worker_start, range(WORKERS)
-                )
-                pool.close()
-
-                message("Counting replays to import ...")
-                N: int = await import_db.replays_count(sample=args.sample)
-
-                with alive_bar(
-                    N, title="Importing replays ", enrich_print=False, refresh_secs=1
-                ) as bar:
-                    async for objs in import_db.objs_export(
-                        table_type=BSTableType.Replays,
-                        sample=args.sample,
-                        batch=REPLAYS_BATCH,
-                    ):
-                        read: int = len(objs)
-                        readQ.put(objs)
-                        stats.log(f"{db.driver}:stats read", read)
-                        bar(read)
-
-                debug(
-                    f"Finished exporting {import_model} from {import_db.table_uri(BSTableType.Replays)}"
-                )
-                for _ in range(WORKERS):
-                    readQ.put(None)  # add sentinel
-
-                for res in results.get():
-                    stats.merge_child(res)
-                pool.join()
+            try:
+                with Pool(
+                    processes=WORKERS,
+                    initializer=import_mp_init,
+                    initargs=[db.config, readQ, import_model, options],
+                ) as pool:
+                    debug(f"starting {WORKERS} workers")
+                    results: AsyncResult = pool.map_async(
+                        import_mp_worker_start, range(WORKERS)
+                    )
+                    pool.close()
+
+                    message("Counting replays to import ...")
+                    N: int = await import_db.replays_count(sample=args.sample)
+
+                    with alive_bar(
+                        N,
+                        title="Importing replays ",
+                        enrich_print=False,
+                        refresh_secs=1,
+                    ) as bar:
+                        async for objs in import_db.objs_export(
+                            table_type=BSTableType.Replays,
+                            sample=args.sample,
+                            batch=REPLAYS_BATCH,
+                        ):
+                            read: int = len(objs)
+                            readQ.put(objs)
+                            stats.log(f"{db.driver}:stats read", read)
+                            bar(read)
+
+                    debug(
+                        f"Finished exporting {import_model} from {import_db.table_uri(BSTableType.Replays)}"
+                    )
+                    for _ in range(WORKERS):
+                        readQ.put(None)  # add sentinel
+
+                    for res in results.get():
+                        stats.merge_child(res)
+                    pool.join()
+            finally:
+                if drop_indexes:
+                    message("Rebuilding indexes...")
+                    await db.indexes_rebuild(BSTableType.Replays)
 
         message(stats.print(do_print=False, clean=True))
         return True
@@ -436,7 +461,10 @@ def import_mp_init(
     global db, readQ, in_model, mp_options
     debug(f"starting (PID={getpid()})")
 
-    if (tmp_db := Backend.create(**backend_config)) is None:
+    # async workers and the main task of the worker process
+    if (
+        tmp_db := Backend.create_worker(backend_config, threads=MP_THREADS + 1)
+    ) is None:
         raise ValueError("could not create backend")
     db = tmp_db
     readQ = AsyncQueue(inputQ)
@@ -458,10 +486,16 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
     workers: List[Task] = list()
     try:
         global db, readQ, in_model, mp_options
-        THREADS: int = 4
+        THREADS: int = MP_THREADS
         import_model: type[BaseModel] = in_model
         writeQ: Queue[JSONExportable] = Queue(500)
         force: bool = mp_options["force"]
+        bulk: Dict[str, Any] | None = mp_options["bulk"]
+        buffer: List[BSReplay] = list()
+        batch: int = 0
+
+        if bulk is not None:
+            db.set_bulk_mode(**bulk)
 
         for _ in range(THREADS):
             workers.append(
@@ -479,14 +513,26 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
                 errors = len(objs) - len(replays)
                 stats.log("replays read", len(replays))
                 stats.log("conversion errors", errors)
-                for replay in replays:
-                    await writeQ.put(replay)
+                if bulk is None:
+                    for replay in replays:
+                        await writeQ.put(replay)
+                    continue
+                # bulk mode: insert in large batches, existing replays are skipped.
+                # --force is rejected with --bulk-mode in cmd_importMP()
+                if batch == 0:
+                    batch = db.bulk_batch_size(replays)
+                buffer.extend(replays)
+                if len(buffer) >= batch:
+                    await replays_insert_bulk(buffer, stats)
+                    buffer = list()
             except Exception as err:
                 error(f"{err}")
             finally:
                 readQ.task_done()
         debug(f"#{id}: finished reading objects")
         readQ.task_done()
+        if len(buffer) > 0:
+            await replays_insert_bulk(buffer, stats)
         await writeQ.join()  # add sentinel for other workers
         await stats.gather_stats(workers)
     except CancelledError:
@@ -494,3 +540,11 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
     except Exception as err:
         error(f"{err}")
     return stats
+
+
+async def replays_insert_bulk(replays: List[BSReplay], stats: EventCounter) -> None:
+    """Insert a batch of replays in one call"""
+    global db
+    added, not_added = await db.replays_insert(replays)
+    stats.log("added", added)
+    stats.log("not added", not_added)
@@ -3,7 +3,11 @@ from configparser import ConfigParser
 from typing import Optional, List
 import logging
 
+from blitzmodels import Region
+
 from .backend import Backend, BSTableType
+from .models import BSBlitzRelease, StatsTypes
+from .releases import get_releases
 
 logger = logging.getLogger()
 error = logger.error
@@ -26,7 +30,7 @@ def add_args(parser: ArgumentParser, config: Optional[ConfigParser] = None) -> b
             title="setup commands",
             description="valid commands",
             help="setup help",
-            metavar="init | list | test",
+            metavar="init | list | test | compact | rebuild-stats",
         )
         setup_parsers.required = True
         init_parser = setup_parsers.add_parser("init", help="setup init help")
@@ -41,6 +45,20 @@ def add_args(parser: ArgumentParser, config: Optional[ConfigParser] = None) -> b
         if not add_args_test(test_parser, config=config):
             raise Exception("Failed to define argument parser for: setup test")
 
+        compact_parser = setup_parsers.add_parser(
+            "compact", help="setup compact help"
+        )
+        if not add_args_compact(compact_parser, config=config):
+            raise Exception("Failed to define argument parser for: setup compact")
+
+        rebuild_stats_parser = setup_parsers.add_parser(
+            "rebuild-stats", help="setup rebuild-stats help"
+        )
+        if not add_args_rebuild_stats(rebuild_stats_parser, config=config):
+            raise Exception(
+                "Failed to define argument parser for: setup rebuild-stats"
+            )
+
         return True
     except Exception as err:
         error(f"{err}")
@@ -115,6 +133,67 @@ def add_args_test(
     return False
 
 
+def add_args_compact(
+    parser: ArgumentParser, config: Optional[ConfigParser] = None
+) -> bool:
+    try:
+        debug("starting")
+        tables: List[str] = ["all"] + sorted([tt.value for tt in BSTableType])
+        parser.add_argument(
+            "setup_compact_tables",
+            nargs="*",
+            default="all",
+            choices=tables,
+            metavar="TABLE [TABLE...]",
+            help="TABLE(S) to compact: " + ", ".join(tables),
+        )
+        return True
+    except Exception as err:
+        error(f"{err}")
+    return False
+
+
+def add_args_rebuild_stats(
+    parser: ArgumentParser, config: Optional[ConfigParser] = None
+) -> bool:
+    try:
+        debug("starting")
+        stats_types: List[str] = [
+            StatsTypes.tank_stats.name,
+            StatsTypes.player_achievements.name,
+        ]
+        parser.add_argument(
+            "setup_rebuild_stats_types",
+            nargs="*",
+            default=stats_types,
+            choices=stats_types,
+            metavar="STATS [STATS...]",
+            help="STATS summaries to rebuild: " + ", ".join(stats_types),
+        )
+        parser.add_argument(
+            "--releases",
+            "--release",
+            type=str,
+            nargs="*",
+            default=None,
+            metavar="RELEASE [RELEASE ...]",
+            help="Rebuild summaries of RELEASE(S). Default is all",
+        )
+        parser.add_argument(
+            "--regions",
+            "--region",
+            type=str,
+            nargs="*",
+            choices=[r.value for r in Region.API_regions()],
+            default=[r.value for r in Region.API_regions()],
+            help=f"Filter by region (default is API = {' + '.join([r.value for r in Region.API_regions()])})",
+        )
+        return True
+    except Exception as err:
+        error(f"{err}")
+    return False
+
+
 ###########################################
 #
 # cmd_accouts functions
@@ -136,6 +215,14 @@ async def cmd(db: Backend, args: Namespace) -> bool:
         elif args.setup_cmd == "test":
             debug("setup test")
             return await cmd_test(db, args)
+
+        elif args.setup_cmd == "compact":
+            debug("setup compact")
+            return await cmd_compact(db, args)
+
+        elif args.setup_cmd == "rebuild-stats":
+            debug("setup rebuild-stats")
+            return await cmd_rebuild_stats(db, args)
         else:
             error(f"setup: unknown or missing subcommand: {args.setup_cmd}")
 
@@ -183,3 +270,44 @@ async def cmd_test(db: Backend, args: Namespace) -> bool:
     except Exception as err:
         error(f"{err}")
     return False
+
+
+async def cmd_compact(db: Backend, args: Namespace) -> bool:
+    try:
+        debug("starting")
+        tables: List[str] = args.setup_compact_tables
+
+        if "all" in tables:
+            tables = [tt.value for tt in BSTableType]
+        return await db.compact(tables=tables)
+    except Exception as err:
+        error(f"{err}")
+    return False
+
+
+async def cmd_rebuild_stats(db: Backend, args: Namespace) -> bool:
+    try:
+        debug("starting")
+        regions: set[Region] = {Region(r) for r in args.regions}
+        releases: List[BSBlitzRelease | None] = [None]
+        if args.releases is not None:
+            releases = list(await get_releases(db, args.releases))
+            if len(releases) == 0:
+                raise ValueError(f"could not find releases: {args.releases}")
+        res: bool = True
+        for stats_type in args.setup_rebuild_stats_types:
+            for release in releases:
+                N: int = await db.stats_rebuild(
+                    StatsTypes[stats_type], release=release, regions=regions
+                )
+                if N < 0:
+                    res = False
+                    continue
+                message(
+                    f"{stats_type}: {N} summaries rebuilt"
+                    + ("" if release is None else f" for release {release}")
+                )
+        return res
+    except Exception as err:
+        error(f"{err}")
+    return False
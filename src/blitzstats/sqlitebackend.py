@@ -0,0 +1,2192 @@
+from configparser import ConfigParser
+from argparse import Namespace, ArgumentParser
+from datetime import datetime
+from typing import (
+    Optional,
+    Any,
+    Iterable,
+    Sequence,
+    AsyncGenerator,
+    TypeVar,
+    cast,
+    Callable,
+    Dict,
+    List,
+)
+import logging
+
+from asyncio import Lock
+from bson import ObjectId, json_util
+import aiosqlite
+from pydantic import ValidationError
+
+from pydantic_exportables import (
+    JSONExportable,
+    AliasMapper,
+    Idx,
+    BackendIndex,
+    DESCENDING,
+    TEXT,
+    PyObjectId,
+)
+from pyutils.utils import epoch_now
+from pyutils import awrap
+
+from blitzmodels import (
+    Region,
+    TankStat,
+    PlayerAchievementsMaxSeries,
+    EnumNation,
+    EnumVehicleTier,
+)
+
+from .backend import (
+    Backend,
+    OptAccountsDistributed,
+    OptAccountsInactive,
+    BSTableType,
+    EventLog,
+    A,
+)
+from .models import (
+    BSAccount,
+    BSBlitzRelease,
+    StatsTypes,
+    BSReplay,
+    BSTank,
+    EnumVehicleTypeInt,
+)
+
+# Setup logging
+logger = logging.getLogger()
+error = logger.error
+message = logger.warning
+verbose = logger.info
+debug = logger.debug
+
+# Constants
+SQLITE_BATCH_SIZE: int = 1000
+SQLITE_SAMPLE_RESOLUTION: int = 1000000
+SQLITE_LOG_TABLES: List[BSTableType] = [BSTableType.EventLog, BSTableType.AccountLog]
+
+D = TypeVar("D", bound="JSONExportable")
+OutJSONExportable = TypeVar("OutJSONExportable", bound="JSONExportable")
+
+Query = tuple[str, List[Any]]
+
+
+##############################################
+#
+# Utils
+#
+##############################################
+
+
+def _key(idx: Idx) -> Any:
+    """Convert document index into a SQLite primary key"""
+    if isinstance(idx, ObjectId):
+        return str(idx)
+    return idx
+
+
+def _dumps(obj: Dict[str, Any]) -> str:
+    """Serialize a document into JSON. BSON types are stored in Extended JSON"""
+    return json_util.dumps(obj, default=str)
+
+
+def _loads(doc: str) -> Dict[str, Any]:
+    """Deserialize a document stored with _dumps()"""
+    return json_util.loads(doc)
+
+
+def _field(alias: str) -> str:
+    """SQL expression of a document field"""
+    if alias == "_id":
+        return "_id"
+    return f"json_extract(doc, '$.{alias}')"
+
+
+def _in(field: str, values: Sequence[Any]) -> str:
+    """SQL 'IN' expression with parameter placeholders"""
+    return f"{field} IN ({', '.join('?' * len(values))})"
+
+
+##############################################
+#
+# class SQLiteBackend(Backend)
+#
+##############################################
+
+
+class SQLiteBackend(Backend):
+    """Backend storing documents as JSON into a SQLite database file.
+    Documents are indexed with expression indexes on the JSON fields"""
+
+    driver: str = "sqlite"
+
+    def __init__(
+        self,
+        config: ConfigParser | None = None,
+        db_config: Dict[str, Any] | None = None,
+        database: str | None = None,
+        table_config: Dict[BSTableType, str] | None = None,
+        model_config: Dict[BSTableType, type[JSONExportable]] | None = None,
+        **kwargs,
+    ):
+        """Init SQLite backend from config file and CLI args
+        CLI arguments overide settings in the config file"""
+
+        debug("starting")
+        try:
+            super().__init__(
+                config=config, db_config=db_config, database=database, **kwargs
+            )
+
+            sqlite_rc: Dict[str, Any] = dict()
+            self._conn: aiosqlite.Connection | None = None
+            self._conn_lock: Lock = Lock()
+            self._write_lock: Lock = Lock()
+
+            # defaults
+            sqlite_rc["filename"] = "blitzstats.sqlite"
+            sqlite_rc["journal_mode"] = "WAL"
+            sqlite_rc["synchronous"] = "NORMAL"
+            sqlite_rc["cache_size"] = -64000  # KiB
+            sqlite_rc["busy_timeout"] = 60000  # ms
+            sqlite_rc["batch"] = SQLITE_BATCH_SIZE
+
+            if config is not None and "SQLITE" in config.sections():
+                configSQLite = config["SQLITE"]
+                self._database = configSQLite.get("database", self.database)
+                sqlite_rc["filename"] = configSQLite.get("file", sqlite_rc["filename"])
+                sqlite_rc["journal_mode"] = configSQLite.get(
+                    "journal_mode", sqlite_rc["journal_mode"]
+                )
+                sqlite_rc["synchronous"] = configSQLite.get(
+                    "synchronous", sqlite_rc["synchronous"]
+                )
+                sqlite_rc["cache_size"] = configSQLite.getint(
+                    "cache_size", sqlite_rc["cache_size"]
+                )
+                sqlite_rc["busy_timeout"] = configSQLite.getint(
+                    "busy_timeout", sqlite_rc["busy_timeout"]
+                )
+                sqlite_rc["batch"] = configSQLite.getint("batch", sqlite_rc["batch"])
+
+                self.set_table(BSTableType.Accounts, configSQLite.get("t_accounts"))
+                self.set_table(BSTableType.Tankopedia, configSQLite.get("t_tankopedia"))
+                self.set_table(BSTableType.Releases, configSQLite.get("t_releases"))
+                self.set_table(BSTableType.Replays, configSQLite.get("t_replays"))
+                self.set_table(BSTableType.TankStats, configSQLite.get("t_tank_stats"))
+                self.set_table(
+                    BSTableType.PlayerAchievements,
+                    configSQLite.get("t_player_achievements"),
+                )
+                self.set_table(
+                    BSTableType.AccountLog, configSQLite.get("t_account_log")
+                )
+                self.set_table(BSTableType.EventLog, configSQLite.get("t_error_log"))
+                self.set_table(BSTableType.Stats, configSQLite.get("t_stats"))
+
+                self.set_model(BSTableType.Accounts, configSQLite.get("m_accounts"))
+                self.set_model(BSTableType.Tankopedia, configSQLite.get("m_tankopedia"))
+                self.set_model(BSTableType.Releases, configSQLite.get("m_releases"))
+                self.set_model(BSTableType.Replays, configSQLite.get("m_replays"))
+                self.set_model(BSTableType.TankStats, configSQLite.get("m_tank_stats"))
+                self.set_model(
+                    BSTableType.PlayerAchievements,
+                    configSQLite.get("m_player_achievements"),
+                )
+                self.set_model(
+                    BSTableType.AccountLog, configSQLite.get("m_account_log")
+                )
+                self.set_model(BSTableType.EventLog, configSQLite.get("m_event_log"))
+                self.set_model(BSTableType.Stats, configSQLite.get("m_stats"))
+
+            if db_config is not None:
+                kwargs = db_config | kwargs
+            kwargs = sqlite_rc | kwargs
+            # remove unset kwargs
+            kwargs = {k: v for k, v in kwargs.items() if v is not None}
+
+            self.set_database(database)
+            self._db_config = kwargs
+            self.config_tables(table_config=table_config)
+            self.config_models(model_config=model_config)
+
+            debug(
+                "config: "
+                + ", ".join(["{0}={1}".format(k, str(v)) for k, v in kwargs.items()])
+            )
+        except Exception as err:
+            error(f"Error initializing SQLite backend: {err}")
+            raise err
+
+    def debug(self) -> None:
+        """Print out debug info"""
+        print(f"###### DEBUG {self.driver} ######")
+        print(f"DB file: {self.filename}")
+        print(f"DB connection: {self._conn}")
+
+    def copy(self, **kwargs) -> Optional["Backend"]:
+        """Create a copy of the backend"""
+        try:
+            debug("starting")
+
+            database: str = self.database
+            if "database" in kwargs.keys():
+                database = kwargs["database"]
+                del kwargs["database"]
+
+            return SQLiteBackend(
+                config=None,
+                db_config=self.db_config,
+                database=database,
+                table_config=self.table_config,
+                model_config=self.model_config,
+                **kwargs,
+            )
+        except Exception as err:
+            error(f"Error creating copy: {err}")
+        return None
+
+    @property
+    def filename(self) -> str:
+        return self.db_config["filename"]
+
+    @property
+    def batch(self) -> int:
+        return self.db_config["batch"]
+
+    async def _connection(self) -> aiosqlite.Connection:
+        """Return connection to the SQLite database. Connects on the first call"""
+        if self._conn is not None:
+            return self._conn
+        async with self._conn_lock:
+            if self._conn is None:
+                debug(f"connecting: {self.filename}")
+                conn: aiosqlite.Connection = await aiosqlite.connect(
+                    self.filename,
+                    iter_chunk_size=self.batch,
+                    isolation_level=None,
+                    timeout=self.db_config["busy_timeout"] / 1000,
+                )
+                await conn.execute(
+                    f"PRAGMA journal_mode = {self.db_config['journal_mode']}"
+                )
+                await conn.execute(
+                    f"PRAGMA synchronous = {self.db_config['synchronous']}"
+                )
+                await conn.execute(
+                    f"PRAGMA cache_size = {int(self.db_config['cache_size'])}"
+                )
+                await conn.execute(
+                    f"PRAGMA busy_timeout = {int(self.db_config['busy_timeout'])}"
+                )
+                for table_type in BSTableType:
+                    await conn.execute(self._mk_create_table(table_type))
+                self._conn = conn
+        return self._conn
+
+    async def close(self) -> None:
+        """Close the database connection"""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _write(
+        self, sql: str, params: Sequence[Any] | Iterable[Sequence[Any]] = ()
+    ) -> int:
+        """Execute a write statement. Iterable of parameter sequences is
+        executed with executemany() inside a single transaction.
+        Returns the number of changed rows"""
+        conn: aiosqlite.Connection = await self._connection()
+        async with self._write_lock:
+            if (
+                isinstance(params, list)
+                and len(params) > 0
+                and isinstance(params[0], (list, tuple))
+            ):
+                await conn.execute("BEGIN")
+                try:
+                    cursor = await conn.executemany(sql, params)
+                    await conn.execute("COMMIT")
+                except Exception:
+                    await conn.execute("ROLLBACK")
+                    raise
+            else:
+                cursor = await conn.execute(sql, params)
+            rowcount: int = cursor.rowcount
+            await cursor.close()
+            return rowcount
+
+    async def test(self) -> bool:
+        try:
+            debug(f"trying to connect: {self.driver}")
+            conn: aiosqlite.Connection = await self._connection()
+            async with conn.execute("SELECT 1") as cursor:
+                await cursor.fetchone()
+            debug(f"connection succeeded: {self.backend}")
+            return True
+        except Exception as err:
+            error(f"Error connection: {self.backend}: {err}")
+        return False
+
+    @classmethod
+    def add_args_import(
+        cls, parser: ArgumentParser, config: Optional[ConfigParser] = None
+    ) -> bool:
+        """Add argument parser for import backend"""
+        try:
+            debug("starting")
+            super().add_args_import(parser=parser, config=config)
+
+            parser.add_argument(
+                "--file",
+                metavar="FILE",
+                type=str,
+                default=None,
+                dest="import_filename",
+                help="SQLite database file to import from. Uses current backend as default",
+            )
+            parser.add_argument(
+                "--database",
+                metavar="DATABASE",
+                type=str,
+                default=None,
+                dest="import_database",
+                help="Database to use. Uses current database as default",
+            )
+            parser.add_argument(
+                "--table",
+                metavar="TABLE",
+                type=str,
+                default=None,
+                dest="import_table",
+                help="Table to import from. Uses current database as default",
+            )
+            return True
+        except Exception as err:
+            error(f"{err}")
+        return False
+
+    @classmethod
+    def read_args(
+        cls, args: Namespace, driver: str, importdb: bool = False
+    ) -> Dict[str, Any]:
+        debug("starting")
+        if driver != cls.driver:
+            raise ValueError(f"calling {cls}.read_args() for {driver} backend")
+        kwargs: Dict[str, Any] = Backend.read_args_helper(
+            args, ["filename", "database"], importdb=importdb
+        )
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        debug(f"args={kwargs}")
+        return kwargs
+
+    @property
+    def backend(self) -> str:
+        return f"{self.driver}://{self.filename}/{self.database}"
+
+    def __eq__(self, __o: object) -> bool:
+        return (
+            __o is not None
+            and isinstance(__o, SQLiteBackend)
+            and self.filename == __o.filename
+            and self.database == __o.database
+        )
+
+    def _mk_create_table(self, table_type: BSTableType) -> str:
+        """SQL to create a table for documents"""
+        if table_type in SQLITE_LOG_TABLES:
+            return f'CREATE TABLE IF NOT EXISTS "{self.get_table(table_type)}" (_id INTEGER PRIMARY KEY, doc TEXT NOT NULL)'
+        return f'CREATE TABLE IF NOT EXISTS "{self.get_table(table_type)}" (_id PRIMARY KEY, doc TEXT NOT NULL)'
+
+    async def _create_index(
+        self,
+        table_type: BSTableType,
+        mapper: AliasMapper,
+        index: Sequence[BackendIndex],
+    ) -> bool:
+        """Helper to create an expression index to a table"""
+        try:
+            table: str = self.get_table(table_type)
+            debug(f"starting: table={table}")
+            db_index: List[BackendIndex] = list(mapper.map(index).items())
+            columns: List[str] = list()
+            for field, direction in db_index:
+                if direction == TEXT:
+                    message(f"Skipping text index in {table}: {field}")
+                    return False
+                columns.append(
+                    f"{_field(field)} {'DESC' if direction == DESCENDING else 'ASC'}"
+                )
+            name: str = "_".join(
+                [table] + [field.replace(".", "_") for field, _ in db_index]
+            )
+            message(f"Adding index: {name}")
+            await self._write(
+                f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({", ".join(columns)})'
+            )
+            return True
+        except Exception as err:
+            error(f"{err}")
+        return False
+
+    async def init_collection(
+        self, table_type: BSTableType, indexes: List[List[BackendIndex]] | None = None
+    ) -> bool:
+        """Helper to create a table and its indexes"""
+        debug("starting")
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            mapper: AliasMapper = AliasMapper(model)
+
+            if indexes is None:
+                indexes = model.backend_indexes()
+
+            await self._write(self._mk_create_table(table_type))
+            message(f"Table created: {self.get_table(table_type)}")
+
+            if len(indexes) == 0:
+                print(f"No indexes defined for {self.table_uri(table_type)}")
+            for index in indexes:
+                await self._create_index(table_type, mapper, index)
+            return True
+        except Exception as err:
+            error(f"{err}")
+        return False
+
+    async def init(self, tables: List[str] = [tt.name for tt in BSTableType]) -> bool:  # type: ignore
+        """Init SQLite backend: create tables and set indexes"""
+        try:
+            debug("starting")
+            for table in tables:
+                try:
+                    table_type: BSTableType = BSTableType(table)
+                    await self.init_collection(table_type)
+                except Exception as err:
+                    error(f"{self.backend}: Could not init table: {err}")
+            await self._write("ANALYZE")
+            return True
+        except Exception as err:
+            error(f"Error initializing {self.backend}: {err}")
+        return False
+
+    ########################################################
+    #
+    # SQLiteBackend(): generic datas_funcs
+    #
+    ########################################################
+
+    def _mk_query(
+        self,
+        table_type: BSTableType,
+        where: List[str] | None = None,
+        params: List[Any] | None = None,
+        columns: str = "doc",
+        order_by: str | None = None,
+        sample: float = 0,
+    ) -> Query:
+        """Build a SELECT query. 0 < sample < 1 is a Bernoulli sample that
+        does not require sorting, sample >= 1 picks random rows"""
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        where = list() if where is None else list(where)
+        params = list() if params is None else list(params)
+        limit: str = ""
+
+        if sample > 0 and sample < 1:
+            where.append(f"(abs(random()) % {SQLITE_SAMPLE_RESOLUTION}) < ?")
+            params.append(int(sample * SQLITE_SAMPLE_RESOLUTION))
+        elif sample >= 1:
+            order_by = "random()"
+            limit = f" LIMIT {int(sample)}"
+
+        sql: str = f'SELECT {columns} FROM "{self.get_table(table_type)}"'
+        if len(where) > 0:
+            sql += " WHERE " + " AND ".join(where)
+        if order_by is not None:
+            sql += f" ORDER BY {order_by}"
+        return sql + limit, params
+
+    async def _rows_get(self, sql: str, params: List[Any]) -> AsyncGenerator[Any, None]:
+        """Stream rows of a query"""
+        conn: aiosqlite.Connection = await self._connection()
+        async with conn.execute(sql, params) as cursor:
+            async for row in cursor:
+                yield row
+
+    async def _datas_get(
+        self, table_type: BSTableType, query: Query
+    ) -> AsyncGenerator[JSONExportable, None]:
+        try:
+            debug("starting")
+            model: type[JSONExportable] = self.get_model(table_type)
+            sql, params = query
+            debug(f"table={self.get_table(table_type)}, model={model}, query={sql}")
+            async for row in self._rows_get(sql, params):
+                try:
+                    yield model.parse_obj(_loads(row[0]))
+                except ValidationError as err:
+                    error(
+                        f"Could not validate {model} ob={row[0]} from {self.table_uri(table_type)}: {err}"
+                    )
+                except Exception as err:
+                    error(f"{err}")
+        except Exception as err:
+            error(f"Failed to get data from {self.table_uri(table_type)}: {err}")
+
+    async def _datas_export(
+        self,
+        table_type: BSTableType,
+        in_type: type[D],
+        out_type: type[OutJSONExportable],
+        sample: float = 0,
+    ) -> AsyncGenerator[OutJSONExportable, None]:
+        """Export data from SQLite"""
+        try:
+            debug(f"starting export from: {self.table_uri(table_type)}")
+            sql, params = self._mk_query(table_type, sample=sample)
+            async for row in self._rows_get(sql, params):
+                obj: Dict[str, Any] = _loads(row[0])
+                try:
+                    if (res := out_type.from_obj(obj, in_type)) is not None:
+                        yield res
+                except Exception as err:
+                    error(
+                        f"Could not export object={obj} type={in_type} to type={out_type}"
+                    )
+                    error(f"{err}: {obj}")
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    async def _data_insert(self, table_type: BSTableType, obj: JSONExportable) -> bool:
+        """Generic method to insert an object of data_type"""
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            data: JSONExportable | None = obj
+            if type(obj) is not model:
+                data = model.transform(obj)
+            if data is None:
+                raise ValueError(f"could not transform object: {obj}")
+            return (
+                await self._write(
+                    f'INSERT OR IGNORE INTO "{self.get_table(table_type)}" (_id, doc) VALUES (?, ?)',
+                    (_key(data.index), _dumps(data.obj_db())),
+                )
+                == 1
+            )
+        except ValueError as err:
+            error(f"invalid data: {err}")
+        except Exception as err:
+            debug(
+                f"Failed to insert obj={obj} into {self.table_uri(table_type)}: {err}"
+            )
+        return False
+
+    async def _data_get(
+        self, table_type: BSTableType, idx: Idx
+    ) -> JSONExportable | None:
+        """Get document from SQLite in its native data type"""
+        try:
+            model: type[JSONExportable] = self.get_model(table_type)
+            sql: str = f'SELECT doc FROM "{self.get_table(table_type)}" WHERE _id = ?'
+            async for row in self._rows_get(sql, [_key(idx)]):
+                return model.parse_obj(_loads(row[0]))
+        except Exception as err:
+            error(f"Error getting _id={idx} from {self.table_uri(table_type)}: {err}")
+        return None
+
+    async def _data_replace(
+        self, table_type: BSTableType, obj: JSONExportable, upsert: bool = False
+    ) -> bool:
+        """Generic method to replace an object of data_type"""
+        try:
+            debug("starting")
+            model: type[JSONExportable] = self.get_model(table_type)
+            table: str = self.get_table(table_type)
+
+            if (data := model.transform(obj)) is not None:
+                sql: str
+                params: tuple[Any, Any]
+                if upsert:
+                    sql = f'INSERT OR REPLACE INTO "{table}" (_id, doc) VALUES (?, ?)'
+                    params = (_key(data.index), _dumps(data.obj_db()))
+                else:
+                    sql = f'UPDATE "{table}" SET doc = ? WHERE _id = ?'
+                    params = (_dumps(data.obj_db()), _key(data.index))
+                if await self._write(sql, params) > 0:
+                    debug(
+                        "replaced (_id=%s) into %s",
+                        str(data.index),
+                        str(self.table_uri(table_type)),
+                    )
+                    return True
+                debug(
+                    "did not replace (_id=%s) into %s",
+                    str(data.index),
+                    str(self.table_uri(table_type)),
+                )
+            else:
+                error(f"could not transform obj: _id={obj.index}")
+        except Exception as err:
+            error(f"could not replace obj in {self.table_uri(table_type)}: {err}")
+            error(f"obj: {obj}")
+        return False
+
+    async def _data_update(
+        self,
+        table_type: BSTableType,
+        idx: Idx | None = None,
+        obj: JSONExportable | None = None,
+        update: dict | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Generic method to update an object of data_type"""
+        debug("starting")
+        model: type[JSONExportable] = self.get_model(table_type)
+        table: str = self.get_table(table_type)
+
+        if obj is not None:
+            if (data := model.transform(obj)) is None:
+                raise ValueError(f"Could not transform {type(obj)} to {model}: {obj}")
+
+            if idx is None:
+                idx = data.index
+
+            if update is not None:
+                pass
+            elif fields is not None:
+                update = data.dict(include=set(fields))
+            else:
+                raise ValueError("'update', 'obj' and 'fields' cannot be all None")
+
+        elif idx is None or update is None:
+            raise ValueError("'update' is required with 'idx'")
+
+        alias_fields: Dict[str, Any] = AliasMapper(model).map(update.items())
+
+        async with self._write_lock:
+            conn: aiosqlite.Connection = await self._connection()
+            doc: Dict[str, Any] | None = None
+            async with conn.execute(
+                f'SELECT doc FROM "{table}" WHERE _id = ?', [_key(idx)]
+            ) as cursor:
+                if (row := await cursor.fetchone()) is not None:
+                    doc = _loads(row[0])
+            if doc is None:
+                return False
+            doc.update(_loads(_dumps(alias_fields)))
+            await conn.execute(
+                f'UPDATE "{table}" SET doc = ? WHERE _id = ?', (_dumps(doc), _key(idx))
+            )
+        return True
+
+    async def _data_delete(self, table_type: BSTableType, idx: Idx) -> bool:
+        """Delete a document from SQLite"""
+        try:
+            return (
+                await self._write(
+                    f'DELETE FROM "{self.get_table(table_type)}" WHERE _id = ?',
+                    (_key(idx),),
+                )
+                == 1
+            )
+        except Exception as err:
+            debug(
+                f"Error while deleting _id={idx} from {self.table_uri(table_type)}: {err}"
+            )
+        return False
+
+    async def _datas_insert(
+        self, table_type: BSTableType, objs: Sequence[D], force: bool = False
+    ) -> tuple[int, int]:
+        """Store data to the backend with executemany().
+        Returns the number of added and not added"""
+        debug("starting")
+        added: int = 0
+        not_added: int = 0
+        try:
+            debug(f"inserting to {self.table_uri(table_type)}")
+            model: type[JSONExportable] = self.get_model(table_type)
+            if len(objs) == 0:
+                raise ValueError("No data to insert")
+            rows: List[tuple[Any, str]] = [
+                (_key(data.index), _dumps(data.obj_db()))
+                for data in model.transform_many(objs)
+            ]
+            op: str = "REPLACE" if force else "IGNORE"
+            added = await self._write(
+                f'INSERT OR {op} INTO "{self.get_table(table_type)}" (_id, doc) VALUES (?, ?)',
+                rows,
+            )
+            not_added = len(objs) - added
+        except Exception as err:
+            error(
+                f"Unknown error when adding entries to {self.table_uri(table_type)}: {err}"
+            )
+        debug(f"added={added}, not_added={not_added}")
+        return added, not_added
+
+    async def _datas_count(self, table_type: BSTableType, query: Query) -> int:
+        """Count rows. query has to be created with columns='COUNT(*)'"""
+        try:
+            debug("starting")
+            sql, params = query
+            async for row in self._rows_get(sql, params):
+                return int(row[0])
+        except Exception as err:
+            error(f"Error counting documents in {self.table_uri(table_type)}: {err}")
+        return -1
+
+    async def _datas_unique(
+        self,
+        table_type: BSTableType,
+        field: str,
+        field_type: type[A],
+        where: List[str],
+        params: List[Any],
+    ) -> AsyncGenerator[A, None]:
+        """Return unique values of 'field'"""
+        try:
+            debug("starting")
+            alias: Callable = AliasMapper(self.get_model(table_type)).alias
+            sql: str
+            sql, params = self._mk_query(
+                table_type, where, params, columns=f"DISTINCT {_field(alias(field))}"
+            )
+            async for row in self._rows_get(sql, params):
+                yield cast(A, row[0])
+        except Exception as err:
+            error(
+                f"Error getting unique values from {self.table_uri(table_type)}: {err}"
+            )
+
+    async def _datas_unique_count(
+        self,
+        table_type: BSTableType,
+        field: str,
+        where: List[str],
+        params: List[Any],
+    ) -> int:
+        """Return the number of unique values of 'field'"""
+        try:
+            debug("starting")
+            alias: Callable = AliasMapper(self.get_model(table_type)).alias
+            return await self._datas_count(
+                table_type,
+                self._mk_query(
+                    table_type,
+                    where,
+                    params,
+                    columns=f"COUNT(DISTINCT {_field(alias(field))})",
+                ),
+            )
+        except Exception as err:
+            error(f"Error counting documents in {self.table_uri(table_type)}: {err}")
+        return -1
+
+    async def obj_export(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+    ) -> AsyncGenerator[Any, None]:
+        """Export raw documents from SQLite. Aggregation pipelines are not supported"""
+        try:
+            debug("starting")
+            if len(pipeline) > 0:
+                raise ValueError(f"{self.driver} does not support pipelines")
+            sql, params = self._mk_query(table_type, sample=sample)
+            async for row in self._rows_get(sql, params):
+                yield _loads(row[0])
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    async def _objs_get(
+        self, query: Query, batch: int = 0
+    ) -> AsyncGenerator[List[Any], None]:
+        """Return raw documents in batches"""
+        if batch == 0:
+            batch = self.batch
+        sql, params = query
+        conn: aiosqlite.Connection = await self._connection()
+        async with conn.execute(sql, params) as cursor:
+            while rows := await cursor.fetchmany(batch):
+                yield [_loads(row[0]) for row in rows]
+
+    async def objs_export(
+        self,
+        table_type: BSTableType,
+        pipeline: List[Dict[str, Any]] = list(),
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[Any], None]:
+        """Export raw documents as a list from SQLite. Aggregation pipelines are not supported"""
+        try:
+            debug("starting")
+            if len(pipeline) > 0:
+                raise ValueError(f"{self.driver} does not support pipelines")
+            async for objs in self._objs_get(
+                self._mk_query(table_type, sample=sample), batch=batch
+            ):
+                yield objs
+            debug(f"finished exporting {table_type}")
+        except Exception as err:
+            error(f"Error fetching data from {self.table_uri(table_type)}: {err}")
+
+    ########################################################
+    #
+    # SQLiteBackend(): account
+    #
+    ########################################################
+
+    async def account_insert(self, account: BSAccount, force: bool = False) -> bool:
+        """Store account to the backend. Returns False
+        if the account was not added"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Accounts, obj=account, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Accounts, obj=account)
+
+    async def account_get(self, account_id: int) -> BSAccount | None:
+        """Get account from backend"""
+        debug("starting")
+        if (
+            res := await self._data_get(BSTableType.Accounts, idx=account_id)
+        ) is not None:
+            return BSAccount.from_obj(res, self.model_accounts)
+        return None
+
+    async def account_update(
+        self,
+        account: BSAccount,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an account in the backend. Returns False
+        if the account was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Accounts, obj=account, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating account (id={account.id}) into {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+        return False
+
+    async def account_delete(self, account_id: int) -> bool:
+        """Delete account from SQLite backend"""
+        debug("starting")
+        return await self._data_delete(BSTableType.Accounts, idx=account_id)
+
+    def _mk_where_accounts(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        id_range: range | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.auto,
+        dist: OptAccountsDistributed | None = None,
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        cache_valid: float = 0,
+    ) -> tuple[List[str], List[Any]]:
+        """Build WHERE conditions for accounts. Same semantics as
+        MongoBackend._mk_pipeline_accounts()"""
+        debug("starting")
+        db_model: type[JSONExportable] = self.model_accounts
+        alias: Callable = AliasMapper(db_model).alias
+        where: List[str] = list()
+        params: List[Any] = list()
+
+        cache_valid *= 24 * 3600
+        update_field: str | None = None
+        if stats_type is not None:
+            update_field = _field(alias(stats_type.value))
+
+        if accounts is not None:
+            ids: List[Any] = [_key(a.index) for a in db_model.transform_many(accounts)]
+            where.append(_in(_field(alias("id")), ids))
+            params.extend(ids)
+        if disabled is not None:
+            where.append(f"{_field(alias('disabled'))} = ?")
+            params.append(disabled)
+        if inactive == OptAccountsInactive.yes:
+            where.append(f"{_field(alias('inactive'))} = ?")
+            params.append(True)
+        elif inactive == OptAccountsInactive.no:
+            where.append(f"{_field(alias('inactive'))} = ?")
+            params.append(False)
+
+        region_values: List[str] = [r.value for r in regions]
+        where.append(_in(_field(alias("region")), region_values))
+        params.extend(region_values)
+
+        if id_range is not None:
+            where.append(f"{_field(alias('id'))} BETWEEN ? AND ?")
+            params.extend([id_range.start, id_range.stop])
+
+        if active_since > 0:
+            where.append(f"{_field(alias('last_battle_time'))} >= ?")
+            params.append(active_since)
+        if inactive_since > 0:
+            where.append(f"{_field(alias('last_battle_time'))} < ?")
+            params.append(inactive_since)
+
+        if dist is not None:
+            where.append(f"{_field(alias('id'))} % ? = ?")
+            params.extend([dist.div, dist.mod])
+
+        if cache_valid > 0:
+            if update_field is not None:
+                where.append(f"({update_field} IS NULL OR {update_field} < ?)")
+                params.append(epoch_now() - int(cache_valid))
+            else:
+                error("--cache-valid requires stat_type")
+        return where, params
+
+    async def accounts_get(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.default(),
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        dist: OptAccountsDistributed | None = None,
+        sample: float = 0,
+        cache_valid: float = 0,
+        fields: Sequence[str] | None = None,
+    ) -> AsyncGenerator[BSAccount, None]:
+        """Get accounts from SQLite
+        inactive: true = only inactive, false = not inactive, none = AUTO"""
+        try:
+            debug("starting")
+            where, params = self._mk_where_accounts(
+                stats_type=stats_type,
+                regions=regions,
+                accounts=accounts,
+                inactive=inactive,
+                disabled=disabled,
+                active_since=active_since,
+                inactive_since=inactive_since,
+                dist=dist,
+                cache_valid=cache_valid,
+            )
+            async for data in self._datas_get(
+                BSTableType.Accounts,
+                self._mk_query(BSTableType.Accounts, where, params, sample=sample),
+            ):
+                try:
+                    if (player := BSAccount.transform(data)) is None:
+                        continue
+                    if (
+                        not disabled
+                        and inactive == OptAccountsInactive.auto
+                        and stats_type is not None
+                    ):
+                        if not player.update_needed(stats_type):
+                            continue
+                    yield player
+                except Exception as err:
+                    error(f"{err}")
+        except Exception as err:
+            error(
+                f"Error fetching accounts from {self.table_uri(BSTableType.Accounts)}: {err}"
+            )
+
+    async def accounts_count(
+        self,
+        stats_type: StatsTypes | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        inactive: OptAccountsInactive = OptAccountsInactive.default(),
+        disabled: bool | None = False,
+        active_since: int = 0,
+        inactive_since: int = 0,
+        dist: OptAccountsDistributed | None = None,
+        sample: float = 0,
+        cache_valid: float = 0,
+    ) -> int:
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        if accounts is not None:
+            return len(accounts)
+        try:
+            debug("starting")
+            if sample > 1:
+                return int(sample) * len(regions)
+            where, params = self._mk_where_accounts(
+                stats_type=stats_type,
+                regions=regions,
+                inactive=inactive,
+                disabled=disabled,
+                active_since=active_since,
+                inactive_since=inactive_since,
+                dist=dist,
+                cache_valid=cache_valid,
+            )
+            total: int = await self._datas_count(
+                BSTableType.Accounts,
+                self._mk_query(BSTableType.Accounts, where, params, columns="COUNT(*)"),
+            )
+            if sample == 0:
+                return total
+            if sample < 1:
+                return int(total * sample)
+            else:
+                return int(min(total, sample))
+        except Exception as err:
+            error(f"counting accounts failed: {err}")
+        return -1
+
+    async def accounts_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSAccount, None]:
+        """Export accounts from SQLite"""
+        debug("starting")
+        async for obj in self.obj_export(BSTableType.Accounts, sample=sample):
+            if (acc := BSAccount.from_obj(obj, self.model_accounts)) is not None:
+                yield acc
+
+    async def accounts_insert(self, accounts: Sequence[BSAccount]) -> tuple[int, int]:
+        """Store account to the backend. Returns the number of added and not added"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.Accounts, accounts)
+
+    async def accounts_latest(self, regions: set[Region]) -> Dict[Region, BSAccount]:
+        """Return the latest accounts (=highest account_id) per region"""
+        debug("starting")
+        res: Dict[Region, BSAccount] = dict()
+        try:
+            model: type[JSONExportable] = self.model_accounts
+            alias: Callable = AliasMapper(model).alias
+            account: BSAccount | None
+            for region in regions:
+                where, params = self._mk_where_accounts(
+                    regions={region},
+                    id_range=region.id_range,
+                    inactive=OptAccountsInactive.both,
+                    disabled=None,
+                )
+                sql, params = self._mk_query(
+                    BSTableType.Accounts,
+                    where,
+                    params,
+                    order_by=f"{_field(alias('id'))} DESC",
+                )
+                async for row in self._rows_get(sql + " LIMIT 1", params):
+                    if (
+                        account := BSAccount.from_obj(_loads(row[0]), model)
+                    ) is not None:
+                        res[account.region] = account
+        except Exception as err:
+            error(f"{err}")
+        return res
+
+    ########################################################
+    #
+    # SQLiteBackend(): player_achievements
+    #
+    ########################################################
+
+    async def player_achievement_insert(
+        self, player_achievement: PlayerAchievementsMaxSeries, force: bool = False
+    ) -> bool:
+        """Insert a single player achievement"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.PlayerAchievements, obj=player_achievement, upsert=True
+            )
+        else:
+            return await self._data_insert(
+                BSTableType.PlayerAchievements, obj=player_achievement
+            )
+
+    async def player_achievement_get(
+        self, account: BSAccount, added: int
+    ) -> PlayerAchievementsMaxSeries | None:
+        """Return a player_achievement from the backend"""
+        debug("starting")
+        try:
+            idx: PyObjectId = PlayerAchievementsMaxSeries.mk_index(
+                account_id=account.id, region=account.region, added=added
+            )
+            if (
+                res := await self._data_get(BSTableType.PlayerAchievements, idx=idx)
+            ) is not None:
+                return PlayerAchievementsMaxSeries.from_obj(
+                    res, self.model_player_achievements
+                )
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return None
+
+    async def player_achievement_delete(self, account: BSAccount, added: int) -> bool:
+        """Delete a player achievement from the backend"""
+        try:
+            debug("starting")
+            idx: PyObjectId = PlayerAchievementsMaxSeries.mk_index(
+                account.id, region=account.region, added=added
+            )
+            return await self._data_delete(BSTableType.PlayerAchievements, idx=idx)
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return False
+
+    async def player_achievements_insert(
+        self, player_achievements: Sequence[PlayerAchievementsMaxSeries]
+    ) -> tuple[int, int]:
+        """Store player achievements to the backend. Returns number of stats inserted and not inserted"""
+        debug("starting")
+        return await self._datas_insert(
+            BSTableType.PlayerAchievements, player_achievements
+        )
+
+    def _mk_where_player_achievements(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        since: int = 0,
+    ) -> tuple[List[str], List[Any]]:
+        """Build WHERE conditions for player achievements"""
+        debug("starting")
+        alias: Callable = AliasMapper(self.model_player_achievements).alias
+        where: List[str] = list()
+        params: List[Any] = list()
+
+        if release is not None:
+            where.append(f"{_field(alias('release'))} = ?")
+            params.append(release.release)
+        if regions != Region.API_regions():
+            region_values: List[str] = [r.value for r in regions]
+            where.append(_in(_field(alias("region")), region_values))
+            params.extend(region_values)
+        if accounts is not None:
+            ids: List[int] = [a.id for a in accounts]
+            where.append(_in(_field(alias("account_id")), ids))
+            params.extend(ids)
+        if since > 0:
+            where.append(f"{_field(alias('added'))} >= ?")
+            params.append(since)
+        return where, params
+
+    async def player_achievements_get(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Return player achievements from the backend"""
+        try:
+            debug("starting")
+            where, params = self._mk_where_player_achievements(
+                release=release, regions=regions, accounts=accounts, since=since
+            )
+            async for data in self._datas_get(
+                BSTableType.PlayerAchievements,
+                self._mk_query(
+                    BSTableType.PlayerAchievements, where, params, sample=sample
+                ),
+            ):
+                if (pa := PlayerAchievementsMaxSeries.transform(data)) is not None:
+                    yield pa
+        except Exception as err:
+            error(
+                f"Error fetching player achievements from {self.table_uri(BSTableType.PlayerAchievements)}: {err}"
+            )
+
+    async def player_achievements_count(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Iterable[BSAccount] | None = None,
+        sample: float = 0,
+    ) -> int:
+        """Get number of player achievements from backend"""
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        try:
+            debug("starting")
+            where, params = self._mk_where_player_achievements(
+                release=release, regions=regions, accounts=accounts
+            )
+            total: int = await self._datas_count(
+                BSTableType.PlayerAchievements,
+                self._mk_query(
+                    BSTableType.PlayerAchievements, where, params, columns="COUNT(*)"
+                ),
+            )
+            if sample == 0:
+                return total
+            if sample < 1:
+                return int(total * sample)
+            else:
+                return int(min(total, sample))
+        except Exception as err:
+            error(f"counting player achievements failed: {err}")
+        return -1
+
+    async def player_achievement_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Export player achievements from SQLite"""
+        async for obj in self.obj_export(BSTableType.PlayerAchievements, sample=sample):
+            if (
+                pa := PlayerAchievementsMaxSeries.from_obj(
+                    obj, self.model_player_achievements
+                )
+            ) is not None:
+                yield pa
+
+    async def player_achievements_export(
+        self,
+        sample: float = 0,
+        batch: int = 0,
+    ) -> AsyncGenerator[List[PlayerAchievementsMaxSeries], None]:
+        """Export player achievements as a list from SQLite"""
+        debug("starting")
+        async for objs in self.objs_export(
+            BSTableType.PlayerAchievements, sample=sample, batch=batch
+        ):
+            yield PlayerAchievementsMaxSeries.from_objs(
+                objs=objs, in_type=self.model_player_achievements
+            )
+
+    def _mk_query_duplicates(
+        self,
+        table_type: BSTableType,
+        where: List[str],
+        params: List[Any],
+        partition: str,
+        order: str,
+        sample: int = 0,
+    ) -> Query:
+        """Build query returning all but the latest document per 'partition'"""
+        alias: Callable = AliasMapper(self.get_model(table_type)).alias
+        sql: str
+        sql, params = self._mk_query(
+            table_type,
+            where,
+            params,
+            columns=f"doc, ROW_NUMBER() OVER (PARTITION BY {_field(alias(partition))} ORDER BY {_field(alias(order))} DESC) AS rn",
+        )
+        sql = f"SELECT doc FROM ({sql}) WHERE rn > 1"
+        if sample > 0:
+            sql += f" LIMIT {int(sample)}"
+        return sql, params
+
+    async def player_achievements_duplicates(
+        self,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[PlayerAchievementsMaxSeries, None]:
+        """Find duplicate player achievements from the backend"""
+        debug("starting")
+        try:
+            where, params = self._mk_where_player_achievements(
+                release=release, regions=regions
+            )
+            async for obj in self._datas_get(
+                BSTableType.PlayerAchievements,
+                self._mk_query_duplicates(
+                    BSTableType.PlayerAchievements,
+                    where,
+                    params,
+                    partition="account_id",
+                    order="added",
+                    sample=sample,
+                ),
+            ):
+                if (pa := PlayerAchievementsMaxSeries.transform(obj)) is not None:
+                    yield pa
+        except Exception as err:
+            debug(
+                f"Could not find duplicates from {self.table_uri(BSTableType.PlayerAchievements)}: {err}"
+            )
+
+    ########################################################
+    #
+    # SQLiteBackend(): releases
+    #
+    ########################################################
+
+    async def _releases_all(self) -> List[BSBlitzRelease]:
+        """Return all releases sorted by cut-off. The table is small"""
+        releases: List[BSBlitzRelease] = list()
+        async for data in self._datas_get(
+            BSTableType.Releases, self._mk_query(BSTableType.Releases)
+        ):
+            if (release := BSBlitzRelease.transform(data)) is not None:
+                releases.append(release)
+        releases.sort(key=lambda r: r.cut_off)
+        return releases
+
+    async def release_get(self, release: str) -> BSBlitzRelease | None:
+        """Get release from backend"""
+        debug("starting")
+        try:
+            debug(f"release={release}")
+            if (
+                obj := await self._data_get(BSTableType.Releases, idx=release)
+            ) is not None:
+                return BSBlitzRelease.transform(obj)
+        except Exception as err:
+            debug(f"{err}")
+        return None
+
+    async def release_get_latest(self) -> BSBlitzRelease | None:
+        """Get the latest release in the backend"""
+        debug("starting")
+        try:
+            releases: List[BSBlitzRelease] = await self._releases_all()
+            releases = [r for r in releases if r.launch_date is not None]
+            if len(releases) > 0:
+                return max(releases, key=lambda r: r.launch_date)
+        except Exception as err:
+            error(
+                f"Could not find the latest release from {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return None
+
+    async def release_get_current(self) -> BSBlitzRelease | None:
+        """Get the release the current time falls into"""
+        debug("starting")
+        try:
+            now: int = epoch_now()
+            for release in await self._releases_all():
+                if release.cut_off >= now:
+                    return release
+        except Exception as err:
+            error(f"Could not find the current release: {err}")
+        return None
+
+    async def release_get_next(self, release: BSBlitzRelease) -> BSBlitzRelease | None:
+        """Get next release"""
+        debug("starting")
+        try:
+            if (rel := await self.release_get(release.release)) is None:
+                raise ValueError(f"release not found: {release.release}")
+            for r in await self._releases_all():
+                if r.cut_off > rel.cut_off:
+                    return r
+        except Exception as err:
+            error(
+                f"Could not find the next release from {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return None
+
+    async def release_get_previous(
+        self, release: BSBlitzRelease
+    ) -> BSBlitzRelease | None:
+        """Get previous release"""
+        debug("starting")
+        try:
+            if (rel := await self.release_get(release.release)) is None:
+                raise ValueError(f"release not found: {release.release}")
+            for r in reversed(await self._releases_all()):
+                if r.cut_off < rel.cut_off:
+                    return r
+            error("no previous release found")
+        except Exception as err:
+            error(
+                f"Could not find the previous release for {release} from {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return None
+
+    async def release_insert(
+        self, release: BSBlitzRelease, force: bool = False
+    ) -> bool:
+        """Insert new release to the backend"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Releases, obj=release, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Releases, obj=release)
+
+    async def release_update(
+        self,
+        release: BSBlitzRelease,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an release in the backend. Returns False
+        if the release was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Releases, obj=release, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating release {release} into {self.table_uri(BSTableType.Releases)}: {err}"
+            )
+        return False
+
+    async def release_delete(self, release: str) -> bool:
+        """Delete a release from backend"""
+        debug("starting")
+        release = BSBlitzRelease.validate_release(release)
+        return await self._data_delete(BSTableType.Releases, idx=release)
+
+    async def releases_get(
+        self,
+        release_match: str | None = None,
+        since: int = 0,
+        first: BSBlitzRelease | None = None,
+    ) -> AsyncGenerator[BSBlitzRelease, None]:
+        assert since == 0 or first is None, "Only one can be defined: since, first"
+        debug("starting")
+        try:
+            releases: List[BSBlitzRelease] = list()
+            for release in await self._releases_all():
+                if since > 0 and (
+                    release.launch_date is None
+                    or release.launch_date.timestamp() < since
+                ):
+                    continue
+                if first is not None and (
+                    release.launch_date is None
+                    or first.launch_date is None
+                    or release.launch_date < first.launch_date
+                ):
+                    continue
+                if release_match is not None and not release.release.startswith(
+                    release_match
+                ):
+                    continue
+                releases.append(release)
+
+            releases.sort(key=lambda s: [int(u) for u in s.release.split(".")])
+
+            async for release in awrap(releases):
+                yield release
+        except Exception as err:
+            error(f"Error getting releases: {err}")
+
+    async def releases_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSBlitzRelease, None]:
+        """Export releases from SQLite"""
+        debug("starting")
+        async for obj in self.obj_export(BSTableType.Releases, sample=sample):
+            if (rel := BSBlitzRelease.from_obj(obj, self.model_releases)) is not None:
+                yield rel
+
+    ########################################################
+    #
+    # SQLiteBackend(): replay
+    #
+    ########################################################
+
+    async def replay_insert(self, replay: JSONExportable) -> bool:
+        """Store replay into backend"""
+        debug("starting")
+        return await self._data_insert(BSTableType.Replays, obj=replay)
+
+    async def replay_get(self, replay_id: str) -> BSReplay | None:
+        """Get replay from backend"""
+        debug("starting")
+        if (
+            rep := await self._data_get(BSTableType.Replays, idx=replay_id)
+        ) is not None:
+            return BSReplay.from_obj(rep, self.model_replays)
+        return None
+
+    async def replay_delete(self, replay_id: str) -> bool:
+        """Delete a replay from backend"""
+        debug("starting")
+        return await self._data_delete(BSTableType.Replays, idx=replay_id)
+
+    async def replays_insert(
+        self, replays: Sequence[JSONExportable]
+    ) -> tuple[int, int]:
+        """Insert replays to SQLite backend"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.Replays, replays)
+
+    def _mk_where_replays(
+        self, since: int = 0, **summary_fields
+    ) -> tuple[List[str], List[Any]]:
+        """Build WHERE conditions for replays"""
+        debug("starting")
+        alias: Callable = AliasMapper(self.model_replays).alias
+        where: List[str] = list()
+        params: List[Any] = list()
+
+        if since > 0:
+            where.append(f"{_field('s.bts')} >= ?")
+            params.append(since)
+
+        for sf, value in summary_fields.items():
+            try:
+                where.append(f"{_field('s.' + alias(sf))} = ?")
+                params.append(value)
+            except KeyError:
+                error(
+                    f"No such a key in {self.model_replays.__qualname__}: {alias(sf)}"
+                )
+            except Exception as err:
+                error(f"Error setting filter for summary field '{alias(sf)}': {err}")
+        return where, params
+
+    async def replays_get(
+        self,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+        **summary_fields,
+    ) -> AsyncGenerator[BSReplay, None]:
+        """Get replays from SQLite backend"""
+        debug("starting")
+        try:
+            where, params = self._mk_where_replays(since=since, **summary_fields)
+            async for data in self._datas_get(
+                BSTableType.Replays,
+                self._mk_query(BSTableType.Replays, where, params, sample=sample),
+            ):
+                if (replay := BSReplay.transform(data)) is not None:
+                    yield replay
+        except Exception as err:
+            error(
+                f"Error exporting replays from {self.table_uri(BSTableType.Replays)}: {err}"
+            )
+
+    async def replays_count(
+        self, since: int = 0, sample: float = 0, **summary_fields
+    ) -> int:
+        """Count replays in backed"""
+        try:
+            debug("starting")
+            where, params = self._mk_where_replays(since=since, **summary_fields)
+            total: int = await self._datas_count(
+                BSTableType.Replays,
+                self._mk_query(BSTableType.Replays, where, params, columns="COUNT(*)"),
+            )
+            if sample == 0:
+                return total
+            if sample < 1:
+                return int(total * sample)
+            else:
+                return int(min(total, sample))
+        except Exception as err:
+            error(
+                f"Error counting replays from {self.table_uri(BSTableType.Replays)}: {err}"
+            )
+        return -1
+
+    async def replays_export(self, sample: float = 0) -> AsyncGenerator[BSReplay, None]:
+        """Export replays from SQLite"""
+        debug("starting")
+        async for replay in self._datas_export(
+            BSTableType.Replays,
+            in_type=self.model_replays,
+            out_type=BSReplay,
+            sample=sample,
+        ):
+            yield replay
+
+    ########################################################
+    #
+    # SQLiteBackend(): tank_stats
+    #
+    ########################################################
+
+    async def tank_stat_insert(self, tank_stat: TankStat, force: bool = False) -> bool:
+        """Insert a single tank stat"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.TankStats, obj=tank_stat, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.TankStats, obj=tank_stat)
+
+    async def tank_stat_get(
+        self, account_id: int, tank_id: int, last_battle_time: int
+    ) -> TankStat | None:
+        """Return tank stats from the backend"""
+        try:
+            debug("starting")
+            idx: PyObjectId = TankStat.mk_id(account_id, last_battle_time, tank_id)
+            if (
+                res := await self._data_get(BSTableType.TankStats, idx=idx)
+            ) is not None:
+                return TankStat.from_obj(res, self.model_tank_stats)
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return None
+
+    async def tank_stat_update(
+        self,
+        tank_stat: TankStat,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update an tank stat in the backend. Returns False
+        if the tank stat was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.TankStats,
+                idx=tank_stat.id,
+                obj=tank_stat,
+                update=update,
+                fields=fields,
+            )
+        except Exception as err:
+            debug(
+                f"Error while updating tank stat (id={tank_stat.id}) into {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+        return False
+
+    async def tank_stat_delete(
+        self, account_id: int, tank_id: int, last_battle_time: int
+    ) -> bool:
+        try:
+            debug("starting")
+            idx: PyObjectId = TankStat.mk_id(account_id, last_battle_time, tank_id)
+            return await self._data_delete(BSTableType.TankStats, idx=idx)
+        except Exception as err:
+            error(f"Unknown error: {err}")
+        return False
+
+    async def tank_stats_insert(
+        self, tank_stats: Sequence[TankStat], force: bool = False
+    ) -> tuple[int, int]:
+        """Store tank stats to the backend. Returns the number of added and not added"""
+        debug("starting")
+        return await self._datas_insert(BSTableType.TankStats, tank_stats, force=force)
+
+    def _mk_where_tank_stats(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        missing: str | None = None,
+        since: int = 0,
+        id_range: range | None = None,
+    ) -> tuple[List[str], List[Any]]:
+        """Build WHERE conditions for tank stats. Same semantics as
+        MongoBackend._mk_pipeline_tank_stats()"""
+        debug("starting")
+        alias: Callable = AliasMapper(self.model_tank_stats).alias
+        where: List[str] = list()
+        params: List[Any] = list()
+
+        region_values: List[str] = [r.value for r in regions]
+        where.append(_in(_field(alias("region")), region_values))
+        params.extend(region_values)
+        if release is not None:
+            where.append(f"{_field(alias('release'))} = ?")
+            params.append(release.release)
+        if accounts is not None:
+            account_ids: List[int] = [a.id for a in accounts]
+            where.append(_in(_field(alias("account_id")), account_ids))
+            params.extend(account_ids)
+        if tanks is not None:
+            tank_ids: List[int] = [t.tank_id for t in tanks]
+            where.append(_in(_field(alias("tank_id")), tank_ids))
+            params.extend(tank_ids)
+        if since > 0:
+            where.append(f"{_field(alias('last_battle_time'))} >= ?")
+            params.append(since)
+        if id_range is not None:
+            where.append(f"{_field(alias('account_id'))} >= ?")
+            where.append(f"{_field(alias('account_id'))} < ?")
+            params.extend([id_range.start, id_range.stop])
+        if missing is not None:
+            where.append(f"{_field(alias(missing))} IS NULL")
+        return where, params
+
+    async def tank_stats_get(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        missing: str | None = None,
+        since: int = 0,
+        sample: float = 0,
+        fields: Sequence[str] | None = None,
+        id_range: range | None = None,
+    ) -> AsyncGenerator[TankStat, None]:
+        """Return tank stats from the backend"""
+        try:
+            debug("starting")
+            where, params = self._mk_where_tank_stats(
+                release=release,
+                regions=regions,
+                accounts=accounts,
+                tanks=tanks,
+                missing=missing,
+                since=since,
+                id_range=id_range,
+            )
+            async for data in self._datas_get(
+                BSTableType.TankStats,
+                self._mk_query(BSTableType.TankStats, where, params, sample=sample),
+            ):
+                if (tank_stat := TankStat.transform(data)) is not None:
+                    yield tank_stat
+                else:
+                    error(f"could not transform data to TankStat: {data}")
+        except Exception as err:
+            error(
+                f"Error fetching tank stats from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
+    async def tank_stats_export_career(
+        self,
+        account: BSAccount,
+        release: BSBlitzRelease,
+    ) -> AsyncGenerator[List[TankStat], None]:
+        """Return the latest tank stats per tank by the release's cut-off"""
+        try:
+            debug("starting")
+            alias: Callable = AliasMapper(self.model_tank_stats).alias
+            where: List[str] = [
+                f"{_field(alias('region'))} = ?",
+                f"{_field(alias('account_id'))} = ?",
+                f"{_field(alias('last_battle_time'))} <= ?",
+            ]
+            params: List[Any] = [account.region.value, account.id, release.cut_off]
+            sql: str
+            sql, params = self._mk_query(
+                BSTableType.TankStats,
+                where,
+                params,
+                columns=f"doc, ROW_NUMBER() OVER (PARTITION BY {_field(alias('tank_id'))} ORDER BY {_field(alias('last_battle_time'))} DESC) AS rn",
+            )
+            async for objs in self._objs_get(
+                (f"SELECT doc FROM ({sql}) WHERE rn = 1", params)
+            ):
+                if (
+                    len(tank_stats := TankStat.from_objs(objs, self.model_tank_stats))
+                    > 0
+                ):
+                    yield tank_stats
+        except Exception as err:
+            error(
+                f"Error fetching tank stats from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
+    async def tank_stats_count(
+        self,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        accounts: Sequence[BSAccount] | None = None,
+        tanks: Sequence[BSTank] | None = None,
+        since: int = 0,
+        sample: float = 0,
+    ) -> int:
+        assert sample >= 0, f"'sample' must be >= 0, was {sample}"
+        try:
+            debug("starting")
+            where: List[str]
+            params: List[Any]
+            if (
+                release is None
+                and regions == Region.API_regions()
+                and accounts is None
+                and tanks is None
+                and since == 0
+            ):
+                where, params = list(), list()
+            else:
+                where, params = self._mk_where_tank_stats(
+                    release=release,
+                    regions=regions,
+                    accounts=accounts,
+                    tanks=tanks,
+                    since=since,
+                )
+            total: int = await self._datas_count(
+                BSTableType.TankStats,
+                self._mk_query(
+                    BSTableType.TankStats, where, params, columns="COUNT(*)"
+                ),
+            )
+            if sample == 0:
+                return total
+            if sample < 1:
+                return int(total * sample)
+            else:
+                return int(min(total, sample))
+        except Exception as err:
+            error(f"counting tank stats failed: {err}")
+        return -1
+
+    async def tank_stat_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[TankStat, None]:
+        """Export tank stats from SQLite"""
+        debug("starting")
+        async for tank_stat in self._datas_export(
+            BSTableType.TankStats,
+            in_type=self.model_tank_stats,
+            out_type=TankStat,
+            sample=sample,
+        ):
+            yield tank_stat
+
+    async def tank_stats_export(
+        self, sample: float = 0, batch: int = 0
+    ) -> AsyncGenerator[List[TankStat], None]:
+        """Export tank stats as list from SQLite"""
+        debug("starting")
+        async for objs in self.objs_export(
+            BSTableType.TankStats, sample=sample, batch=batch
+        ):
+            yield TankStat.from_objs(objs=objs, in_type=self.model_tank_stats)
+
+    async def tank_stats_duplicates(
+        self,
+        tank: BSTank,
+        release: BSBlitzRelease,
+        regions: set[Region] = Region.API_regions(),
+        sample: int = 0,
+    ) -> AsyncGenerator[TankStat, None]:
+        """Find duplicate tank stats from the backend"""
+        debug("starting")
+        try:
+            where, params = self._mk_where_tank_stats(
+                release=release, regions=regions, tanks=[tank]
+            )
+            async for obj in self._datas_get(
+                BSTableType.TankStats,
+                self._mk_query_duplicates(
+                    BSTableType.TankStats,
+                    where,
+                    params,
+                    partition="account_id",
+                    order="last_battle_time",
+                    sample=sample,
+                ),
+            ):
+                if (tank_stat := TankStat.transform(obj)) is not None:
+                    yield tank_stat
+        except Exception as err:
+            debug(
+                f"Could not find duplicates from {self.table_uri(BSTableType.TankStats)}: {err}"
+            )
+
+    async def tank_stats_unique(
+        self,
+        field: str,
+        field_type: type[A],
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        account: BSAccount | None = None,
+        tank: BSTank | None = None,
+        id_range: range | None = None,
+    ) -> AsyncGenerator[A, None]:
+        """Return unique values of field"""
+        debug("starting")
+        try:
+            where, params = self._mk_where_tank_stats(
+                release=release,
+                regions=regions,
+                accounts=None if account is None else [account],
+                tanks=None if tank is None else [tank],
+                id_range=id_range,
+            )
+            async for value in self._datas_unique(
+                BSTableType.TankStats, field, field_type, where, params
+            ):
+                yield value
+        except Exception as err:
+            error(f"{err}")
+
+    async def tank_stats_unique_count(
+        self,
+        field: str,
+        release: BSBlitzRelease | None = None,
+        regions: set[Region] = Region.API_regions(),
+        account: BSAccount | None = None,
+        tank: BSTank | None = None,
+        id_range: range | None = None,
+    ) -> int:
+        """Return count of unique values of field"""
+        debug("starting")
+        try:
+            where, params = self._mk_where_tank_stats(
+                release=release,
+                regions=regions,
+                accounts=None if account is None else [account],
+                tanks=None if tank is None else [tank],
+                id_range=id_range,
+            )
+            return await self._datas_unique_count(
+                BSTableType.TankStats, field, where, params
+            )
+        except Exception as err:
+            error(f"{err}")
+        return -1
+
+    ########################################################
+    #
+    # SQLiteBackend(): tankopedia
+    #
+    ########################################################
+
+    def _mk_where_tankopedia(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> tuple[List[str], List[Any]]:
+        """Build WHERE conditions for Tankopedia"""
+        debug("starting")
+        alias: Callable = AliasMapper(self.model_tankopedia).alias
+        where: List[str] = list()
+        params: List[Any] = list()
+        if is_premium is not None:
+            where.append(f"{_field(alias('is_premium'))} = ?")
+            params.append(is_premium)
+        if tier is not None:
+            where.append(f"{_field(alias('tier'))} = ?")
+            params.append(tier.value)
+        if tank_type is not None:
+            where.append(f"{_field(alias('type'))} = ?")
+            params.append(tank_type.value)
+        if nation is not None:
+            where.append(f"{_field(alias('nation'))} = ?")
+            params.append(nation.value)
+        if tanks is not None and len(tanks) > 0:
+            tank_ids: List[int] = [t.tank_id for t in tanks]
+            where.append(_in(_field(alias("tank_id")), tank_ids))
+            params.extend(tank_ids)
+        return where, params
+
+    async def tankopedia_get(self, tank_id: int) -> BSTank | None:
+        debug("starting")
+        try:
+            if (
+                obj := await self._data_get(BSTableType.Tankopedia, idx=tank_id)
+            ) is not None:
+                return BSTank.from_obj(obj, self.model_tankopedia)
+        except Exception as err:
+            error(f"{err}")
+        return None
+
+    async def tankopedia_get_many(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> AsyncGenerator[BSTank, None]:
+        debug("starting")
+        try:
+            where, params = self._mk_where_tankopedia(
+                tanks=tanks,
+                tier=tier,
+                tank_type=tank_type,
+                nation=nation,
+                is_premium=is_premium,
+            )
+            async for data in self._datas_get(
+                BSTableType.Tankopedia,
+                self._mk_query(BSTableType.Tankopedia, where, params),
+            ):
+                if (tank := BSTank.transform(data)) is not None:
+                    yield tank
+                else:
+                    error(f"could not transform BSTank from object: {data}")
+        except Exception as err:
+            error(
+                f"Could get Tankopedia from {self.table_uri(BSTableType.Tankopedia)}: {err}"
+            )
+
+    async def tankopedia_count(
+        self,
+        tanks: List[BSTank] | None = None,
+        tier: EnumVehicleTier | None = None,
+        tank_type: EnumVehicleTypeInt | None = None,
+        nation: EnumNation | None = None,
+        is_premium: bool | None = None,
+    ) -> int:
+        """Count tanks in Tankopedia"""
+        try:
+            where, params = self._mk_where_tankopedia(
+                tanks=tanks,
+                tier=tier,
+                tank_type=tank_type,
+                nation=nation,
+                is_premium=is_premium,
+            )
+            return await self._datas_count(
+                BSTableType.Tankopedia,
+                self._mk_query(
+                    BSTableType.Tankopedia, where, params, columns="COUNT(*)"
+                ),
+            )
+        except Exception as err:
+            debug(
+                f"Could get Tankopedia from {self.table_uri(BSTableType.Tankopedia)}: {err}"
+            )
+        return -1
+
+    async def tankopedia_insert(self, tank: BSTank, force: bool = False) -> bool:
+        """ "insert tank into Tankopedia"""
+        debug("starting")
+        if force:
+            return await self._data_replace(
+                BSTableType.Tankopedia, obj=tank, upsert=True
+            )
+        else:
+            return await self._data_insert(BSTableType.Tankopedia, obj=tank)
+
+    async def tankopedia_update(
+        self,
+        tank: BSTank,
+        update: Dict[str, Any] | None = None,
+        fields: List[str] | None = None,
+    ) -> bool:
+        """Update a tank in the backend's tankopedia. Returns False
+        if the tank was not updated"""
+        try:
+            debug("starting")
+            return await self._data_update(
+                BSTableType.Tankopedia, obj=tank, update=update, fields=fields
+            )
+        except Exception as err:
+            debug(
+                f"Could't update tank {tank} in {self.table_uri(BSTableType.Tankopedia)}: {err}"
+            )
+        return False
+
+    async def tankopedia_export(
+        self, sample: float = 0
+    ) -> AsyncGenerator[BSTank, None]:
+        """Export tankopedia"""
+        debug(f"starting: model={self.model_tankopedia} ")
+        async for tank in self._datas_export(
+            BSTableType.Tankopedia,
+            in_type=self.model_tankopedia,
+            out_type=BSTank,
+            sample=sample,
+        ):
+            yield tank
+
+    async def tankopedia_delete(self, tank: BSTank) -> bool:
+        """Delete a tank from Tankopedia"""
+        return await self._data_delete(BSTableType.Tankopedia, idx=tank.tank_id)
+
+    ########################################################
+    #
+    # SQLiteBackend(): error_
+    #
+    ########################################################
+
+    def _mk_where_errors(
+        self,
+        table_type: BSTableType | None = None,
+        doc_id: Any | None = None,
+    ) -> tuple[List[str], List[Any]]:
+        """Build WHERE conditions for EventLog"""
+        where: List[str] = list()
+        params: List[Any] = list()
+        if table_type is not None:
+            where.append(f"{_field('t')} = ?")
+            params.append(self.get_table(table_type))
+        if doc_id is not None:
+            where.append(f"{_field('did')} = ?")
+            params.append(_key(doc_id))
+        return where, params
+
+    async def error_log(self, error: EventLog) -> bool:
+        """Log an error into the backend's EventLog"""
+        try:
+            debug("starting")
+            debug(f"Logging error: {error.table}: {error.msg}")
+            await self._write(
+                f'INSERT INTO "{self.table_error_log}" (doc) VALUES (?)',
+                (_dumps(error.obj_db()),),
+            )
+            return True
+        except Exception as err:
+            debug(
+                f'Could not log error: {error.table}: "{error.msg}" into {self.table_uri(BSTableType.EventLog)}: {err}'
+            )
+        return False
+
+    async def errors_get(
+        self,
+        table_type: BSTableType | None = None,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> AsyncGenerator[EventLog, None]:
+        """Return errors from backend EventLog"""
+        try:
+            debug("starting")
+            where, params = self._mk_where_errors(table_type=table_type, doc_id=doc_id)
+            sql, params = self._mk_query(
+                BSTableType.EventLog, where, params, order_by="_id"
+            )
+            err: EventLog
+            async for row in self._rows_get(sql, params):
+                try:
+                    err = EventLog.parse_obj(_loads(row[0]))
+                    if after is not None and err.date < after:
+                        continue
+                    yield err
+                except Exception as e:
+                    error(f"{e}")
+        except Exception as e:
+            error(
+                f"Error getting errors from {self.table_uri(BSTableType.EventLog)}: {e}"
+            )
+
+    async def errors_clear(
+        self,
+        table_type: BSTableType,
+        doc_id: Any | None = None,
+        after: datetime | None = None,
+    ) -> int:
+        """Clear errors from backend EventLog"""
+        try:
+            debug("starting")
+            where, params = self._mk_where_errors(table_type=table_type, doc_id=doc_id)
+            sql, params = self._mk_query(
+                BSTableType.EventLog, where, params, columns="_id, doc"
+            )
+            ids: List[tuple[int]] = list()
+            async for row in self._rows_get(sql, params):
+                if after is None or EventLog.parse_obj(_loads(row[1])).date >= after:
+                    ids.append((row[0],))
+            if len(ids) == 0:
+                return 0
+            return await self._write(
+                f'DELETE FROM "{self.table_error_log}" WHERE _id = ?', ids
+            )
+        except Exception as e:
+            error(
+                f"Error clearing errors from {self.table_uri(BSTableType.EventLog)}: {e}"
+            )
+        return 0
+
+
+# Register backend
+
+debug("Registering sqlite")
+Backend.register(driver=SQLiteBackend.driver, backend=SQLiteBackend)
@@ -3,7 +3,17 @@ from configparser import ConfigParser
 from datetime import datetime
 from typing import Optional, Any, List, Dict
 import logging
-from asyncio import run, create_task, gather, sleep, wait, Queue, CancelledError, Task
+from asyncio import (
+    run,
+    create_task,
+    gather,
+    sleep,
+    wait,
+    wait_for,
+    Queue,
+    CancelledError,
+    Task,
+)
 from sortedcollections import NearestDict  # type: ignore
 
 import copy
@@ -38,7 +48,7 @@ from pyutils import (
     QCounter,
 )
 
-from pyutils.utils import alive_bar_monitor
+from pyutils.utils import alive_bar_monitor, epoch_now
 
 from pydantic_exportables import JSONExportable, export
 from blitzmodels import (
@@ -50,10 +60,17 @@ from blitzmodels import (
 
 from .backend import (
     Backend,
+    AccountsUpdateBuffer,
+    BackgroundCount,
+    ScanProgress,
     OptAccountsInactive,
     BSTableType,
     ACCOUNTS_Q_MAX,
+    TANK_STATS_REMAP_FIELDS,
     get_sub_type,
+    add_args_bulk_mode,
+    add_args_resume,
+    read_args_bulk_mode,
 )
 from .models import BSAccount, BSBlitzRelease, StatsTypes, BSTank
 from .accounts import (
@@ -62,7 +79,14 @@ from .accounts import (
     create_accountQ_active,
     accounts_parse_args,
 )
-from .releases import get_releases, release_mapper
+from .releases import (
+    get_releases,
+    release_mapper,
+    release_index,
+    reference_data,
+    ReleaseIndex,
+    ReferenceData,
+)
 
 from .arrow import (
     dataset_writer,
@@ -84,6 +108,10 @@ WORKERS_PRUNE: int = 10
 WORKERS_EDIT: int = 10
 TANK_STATS_Q_MAX: int = 1000
 TANK_STATS_BATCH: int = 50000
+ACCOUNTS_ACTIVE_PARTITIONS: int = 4  # parallel queries per region
+TANK_STATS_PARTITIONS: int = 4  # parallel partitioned reads
+TANK_STATS_CHECKPOINT: int = 100  # pages between resume tokens
+MP_THREADS: int = 4  # async workers per worker process
 
 # Globals
 
@@ -99,6 +127,7 @@ counterQas: AsyncQueue[int]
 writeQ: AsyncQueue[pd.DataFrame]
 in_model: type[JSONExportable]
 mp_options: Dict[str, Any] = dict()
+mp_refdata: ReferenceData | None = None
 mp_args: Namespace
 
 ########################################################
@@ -254,6 +283,7 @@ def add_args_fetch(
             default=None,
             help="Read account_ids from FILENAME one account_id per line",
         )
+        add_args_resume(parser)
         parser.add_argument("--last", action="store_true", default=False, help=SUPPRESS)
 
         return True
@@ -372,6 +402,12 @@ def add_args_edit_remap_release(
     parser: ArgumentParser, config: Optional[ConfigParser] = None
 ) -> bool:
     debug("starting")
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        default=False,
+        help="Remap releases in the backend per release and region (ignores --sample)",
+    )
     return add_args_edit_common(parser, config)
 
 
@@ -410,7 +446,13 @@ def add_args_prune(
         "--commit",
         action="store_true",
         default=False,
-        help="execute pruning stats instead of listing duplicates",
+        help="execute pruning stats instead of counting duplicates",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        default=False,
+        help="list duplicates and the newer stats instead of counting them (slow)",
     )
     parser.add_argument(
         "--workers",
@@ -481,6 +523,34 @@ def add_args_import(
             default=False,
             help="do not map releases when importing",
         )
+        parser.add_argument(
+            "--raw",
+            action="store_true",
+            default=False,
+            help="copy raw documents without decoding them if the backends and models match",
+        )
+        parser.add_argument(
+            "--remap-releases",
+            action="store_true",
+            default=False,
+            help="remap releases of ALL tank stats in the backend after a --raw copy, not only of the copied ones",
+        )
+        parser.add_argument(
+            "--no-rebuild-stats",
+            action="store_false",
+            default=True,
+            dest="rebuild_stats",
+            help="do not rebuild the stats summaries after a --raw copy. The summaries are marked not built and counts are read from the tank stats until 'setup rebuild-stats' is run. The summaries are not rebuilt after a --sample copy either",
+        )
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            default=TANK_STATS_PARTITIONS,
+            metavar="N",
+            help=f"read tank stats in N parallel partitions (default: {TANK_STATS_PARTITIONS})",
+        )
+        add_args_bulk_mode(parser)
+        add_args_resume(parser)
         # parser.add_argument('--last', action='store_true', default=False, help=SUPPRESS)
 
         return True
@@ -584,6 +654,13 @@ def add_args_export(
             default=0,
             help="sample size. 0 < SAMPLE < 1 : %% of stats, 1<=SAMPLE : Absolute number",
         )
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            default=TANK_STATS_PARTITIONS,
+            metavar="N",
+            help=f"read tank stats in N parallel partitions (default: {TANK_STATS_PARTITIONS})",
+        )
         return True
     except Exception as err:
         error(f"{err}")
@@ -733,7 +810,7 @@ async def cmd_fetchMP(db: Backend, args: Namespace) -> bool:
             with Pool(
                 processes=WORKERS,
                 initializer=fetch_mp_init,
-                initargs=[db.config, args, counterQ],
+                initargs=[db.config, args, counterQ, await reference_data(db)],
             ) as pool:
                 accounts_args: Dict[str, Any] | None
                 if (accounts_args := await accounts_parse_args(db, args)) is None:
@@ -742,23 +819,20 @@ async def cmd_fetchMP(db: Backend, args: Namespace) -> bool:
                 # worker = create_task(fetch_backend_worker(db, statsQ, force=args.force))
                 counter: QCounter = QCounter(counterQas)
                 worker = create_task(counter.start())
-                message("counting accounts ...")
-                accounts: int = await db.accounts_count(
-                    StatsTypes.tank_stats, **accounts_args
+                # start with an estimate and refine the total in the background
+                accounts: BackgroundCount = BackgroundCount(
+                    db.accounts_count(StatsTypes.tank_stats, **accounts_args),
+                    estimate=await db.estimated_count(BSTableType.Accounts),
                 )
                 debug(f"starting {WORKERS} workers")
                 results: AsyncResult = pool.map_async(fetch_mp_worker_start, regions)
                 pool.close()
 
-                done: int
-                prev: int = 0
-                with alive_bar(accounts, title="Fetching tank stats ") as bar:
+                with alive_bar(None, title="Fetching tank stats ", manual=True) as bar:
                     while not results.ready():
-                        done = counter.count
-                        if done - prev > 0:
-                            bar(done - prev)
-                        prev = done
+                        bar(accounts.progress(counter.count))
                         await sleep(1)
+                accounts.cancel()
 
                 # await statsQ.join()
                 worker.cancel()
@@ -778,15 +852,19 @@ def fetch_mp_init(
     backend_config: Dict[str, Any],
     args: Namespace,
     counterQ: queue.Queue[int],
+    refdata: ReferenceData | None = None,
 ):
     """Initialize static/global backend into a forked process"""
-    global db, counterQas, mp_args
+    global db, counterQas, mp_args, mp_refdata
     debug(f"starting (PID={getpid()})")
 
-    if (tmp_db := Backend.create(**backend_config)) is None:
+    if (
+        tmp_db := Backend.create_worker(backend_config, threads=args.wg_workers + 2)
+    ) is None:
         raise ValueError("could not create backend")
     db = tmp_db
     mp_args = args
+    mp_refdata = refdata
     counterQas = AsyncQueue(counterQ)
     debug("finished")
 
@@ -799,13 +877,14 @@ def fetch_mp_worker_start(region: Region) -> EventCounter:
 
 async def fetch_mp_worker(region: Region) -> EventCounter:
     """Forkable tank stats import worker for latest (career) stats"""
-    global db, counterQas, mp_args
+    global db, counterQas, mp_args, mp_refdata
 
     debug(f"fetch worker starting: {region}")
     stats: EventCounter = EventCounter(f"fetch {region}")
     accountQ: IterableQueue[BSAccount] = IterableQueue(maxsize=100)
     retryQ: IterableQueue[BSAccount] | None = None
     statsQ: Queue[List[TankStat]] = Queue(TANK_STATS_Q_MAX)
+    progress: ScanProgress | None = None
     args: Namespace = mp_args
     THREADS: int = args.wg_workers
     wg: WGApi = WGApi(
@@ -814,12 +893,26 @@ async def fetch_mp_worker(region: Region) -> EventCounter:
     )
     try:
         args.regions = {region}
+        if args.resume is not None and db.set_scan_resume(
+            args.resume, scan=region.value
+        ):
+            progress = ScanProgress(db, BSTableType.Accounts)
 
         if not args.disabled:
             retryQ = IterableQueue()  # must not use maxsize
 
         workers: List[Task] = list()
-        workers.append(create_task(fetch_backend_worker(db, statsQ, force=args.force)))
+        workers.append(
+            create_task(
+                fetch_backend_worker(
+                    db,
+                    statsQ,
+                    force=args.force,
+                    releases=mp_refdata.releases if mp_refdata is not None else None,
+                    progress=progress,
+                )
+            )
+        )
 
         for _ in range(THREADS):
             workers.append(
@@ -831,6 +924,7 @@ async def fetch_mp_worker(region: Region) -> EventCounter:
                         statsQ=statsQ,
                         retryQ=retryQ,
                         disabled=args.disabled,
+                        progress=progress,
                     )
                 )
             )
@@ -841,6 +935,8 @@ async def fetch_mp_worker(region: Region) -> EventCounter:
             async for account in db.accounts_get(
                 stats_type=StatsTypes.tank_stats, **accounts_args
             ):
+                if progress is not None:
+                    progress.add(account.id)
                 await accountQ.put(account)
                 stats.log("read")
                 i += 1
@@ -1003,11 +1099,14 @@ async def fetch_api_worker(
     statsQ: Queue[List[TankStat]],
     retryQ: IterableQueue[BSAccount] | None = None,
     disabled: bool = False,
+    progress: ScanProgress | None = None,
 ) -> EventCounter:
-    """Async worker to fetch tank stats from WG API"""
+    """Async worker to fetch tank stats from WG API. Accounts with stats are
+    marked processed in 'progress' by fetch_backend_worker()"""
     debug("starting")
     stats: EventCounter
     tank_stats: List[TankStat] | None
+    queued: bool
     if retryQ is None:
         stats = EventCounter("re-try")
     else:
@@ -1017,6 +1116,7 @@ async def fetch_api_worker(
     try:
         while True:
             account: BSAccount = await accountQ.get()
+            queued = False
             # if retryQ is None:
             # 	print(f'retryQ: account_id={account.id}')
             try:
@@ -1044,6 +1144,7 @@ async def fetch_api_worker(
                         stats.log("accounts disabled")
                 else:
                     await statsQ.put(tank_stats)
+                    queued = len(tank_stats) > 0
                     stats.log("tank stats fetched", len(tank_stats))
                     stats.log("accounts /w stats")
                     if disabled:
@@ -1055,6 +1156,8 @@ async def fetch_api_worker(
                 stats.log("errors")
                 error(f"{err}")
             finally:
+                if progress is not None and not queued:
+                    progress.done(account.id)
                 accountQ.task_done()
     except QueueDone:
         debug("accountQ has been processed")
@@ -1073,73 +1176,90 @@ async def fetch_api_worker(
 
 
 async def fetch_backend_worker(
-    db: Backend, statsQ: Queue[List[TankStat]], force: bool = False
+    db: Backend,
+    statsQ: Queue[List[TankStat]],
+    force: bool = False,
+    releases: ReleaseIndex | None = None,
+    progress: ScanProgress | None = None,
 ) -> EventCounter:
-    """Async worker to add tank stats to backend. Assumes batch is for the same account"""
+    """Async worker to add tank stats to backend. Assumes batch is for the same account.
+    Account updates are written in bulk by AccountsUpdateBuffer().
+    Releases are fetched from the backend unless 'releases' is given.
+    Accounts are marked processed in 'progress' after their stats are added"""
     debug("starting")
     stats: EventCounter = EventCounter(f"db: {db.driver}")
     added: int
     not_added: int
-    account: BSAccount | None
     account_id: int
     last_battle_time: int
-    rel: BSBlitzRelease | None
+    update: Dict[str, Any]
+    not_mapped: int
+    accounts: AccountsUpdateBuffer = AccountsUpdateBuffer(db)
 
     try:
-        releases: NearestDict[int, BSBlitzRelease] = await release_mapper(db)
+        if releases is None:
+            releases = await release_index(db)
         while True:
             added = 0
             not_added = 0
             last_battle_time = -1
-            account = None
-            tank_stats: List[TankStat] = await statsQ.get()
+            account_id = 0
+            try:
+                tank_stats: List[TankStat] = await wait_for(
+                    statsQ.get(), timeout=accounts.interval
+                )
+            except TimeoutError:
+                await accounts.flush()
+                continue
 
             try:
                 if len(tank_stats) > 0:
                     debug(f"Read {len(tank_stats)} from queue")
+                    account_id = tank_stats[0].account_id
 
                     last_battle_time = max([ts.last_battle_time for ts in tank_stats])
-                    for ts in tank_stats:
-                        if (rel := releases[(ts.last_battle_time)]) is not None:
-                            ts.release = rel.release
-                        else:
-                            error(
-                                f"could not map release last_battle_time={ts.last_battle_time}"
-                            )
-                            stats.log("release mapping errors")
+                    _, not_mapped = releases.map_objs(tank_stats)
+                    if not_mapped > 0:
+                        error(
+                            f"could not map release for {not_mapped} tank stats: last_battle_time={last_battle_time}"
+                        )
+                        stats.log("release mapping errors", not_mapped)
 
                     added, not_added = await db.tank_stats_insert(
                         tank_stats, force=force
                     )
-                    account_id = tank_stats[0].account_id
-                    if (account := await db.account_get(account_id=account_id)) is None:
-                        account = BSAccount(id=account_id)
-                    account.last_battle_time = last_battle_time
-                    account.stats_updated(StatsTypes.tank_stats)
+                    update = {
+                        "last_battle_time": last_battle_time,
+                        StatsTypes.tank_stats.value: epoch_now(),
+                        "inactive": epoch_now() - last_battle_time
+                        > BSAccount.inactivity_limit(),
+                    }
                     if added > 0:
                         stats.log("accounts /w new stats")
-                        if account.inactive:
-                            stats.log("accounts marked active")
-                        account.inactive = False
+                        update["inactive"] = False
                     else:
                         stats.log("accounts w/o new stats")
-                        # if account.is_inactive():
-                        # 	if not account.inactive:
-                        # 		stats.log('accounts marked inactive')
-                        # 	account.inactive = True
-
-                    await db.account_insert(account=account, force=True)
+                    await accounts.update(account_id, update)
             except Exception as err:
                 error(f"{err}")
             finally:
                 stats.log("tank stats added", added)
                 stats.log("old tank stats found", not_added)
                 debug(f"{added} tank stats added, {not_added} old tank stats found")
+                if progress is not None:
+                    progress.done(account_id)
                 statsQ.task_done()
     except CancelledError:
         debug("Cancelled")
     except Exception as err:
         error(f"{err}")
+    finally:
+        try:
+            await accounts.flush()
+        except Exception as err:
+            error(f"could not update accounts: {err}")
+        stats.log("accounts updated", accounts.updated)
+        stats.log("accounts not found", accounts.not_found)
     return stats
 
 
@@ -1169,7 +1289,19 @@ async def cmd_edit(db: Backend, args: Namespace) -> bool:
         edit_tasks: List[Task] = list()
         message("Counting tank-stats to scan for edits")
 
-        if args.tank_stats_edit_cmd == "remap-release":
+        if args.tank_stats_edit_cmd == "remap-release" and args.bulk:
+            stats.merge_child(
+                await cmd_edit_rel_remap_bulk(
+                    db,
+                    release=release,
+                    regions=regions,
+                    accounts=accounts,
+                    since=since,
+                    commit=commit,
+                )
+            )
+
+        elif args.tank_stats_edit_cmd == "remap-release":
             N: int = await db.tank_stats_count(
                 release=release,
                 regions=regions,
@@ -1189,6 +1321,7 @@ async def cmd_edit(db: Backend, args: Namespace) -> bool:
                     accounts=accounts,
                     since=since,
                     sample=sample,
+                    fields=TANK_STATS_REMAP_FIELDS,
                 )
             )
             await tank_statQ.join()
@@ -1390,6 +1523,101 @@ async def cmd_edit_rel_remap(
     return stats
 
 
+async def cmd_edit_rel_remap_bulk(
+    db: Backend,
+    release: BSBlitzRelease | None = None,
+    regions: set[Region] = Region.API_regions(),
+    accounts: List[BSAccount] | None = None,
+    since: int = 0,
+    commit: bool = False,
+    rebuild_stats: bool = True,
+) -> EventCounter:
+    """Remap tank stat's releases in the backend one release at a time.
+    'release' limits remapping to the tank stats of that release like in
+    cmd_edit_rel_remap(). Regions are remapped concurrently. The stats summaries
+    of the regions are rebuilt once at the end if 'rebuild_stats' is True"""
+    debug("starting")
+    stats: EventCounter = EventCounter("remap releases")
+    try:
+        releases: NearestDict[int, BSBlitzRelease] = await release_mapper(db)
+        windows: List[tuple[int, BSBlitzRelease]] = list()
+        after: int = 0
+        for cut_off, rel in releases.items():
+            if cut_off >= since:
+                windows.append((max(after, since - 1), rel))
+            after = cut_off
+
+        with alive_bar(
+            len(windows) * len(regions),
+            title="Remapping tank stats' releases ",
+            refresh_secs=1,
+            enrich_print=False,
+        ) as bar:
+            workers: List[Task] = list()
+            for region in regions:
+                workers.append(
+                    create_task(
+                        rel_remap_region_worker(
+                            db,
+                            windows=windows,
+                            region=region,
+                            accounts=accounts,
+                            commit=commit,
+                            source=release,
+                            bar=bar,
+                        )
+                    )
+                )
+            await stats.gather_stats(workers, cancel=False)
+        if commit and rebuild_stats:
+            message("Rebuilding stats summaries...")
+            await db.stats_rebuild(StatsTypes.tank_stats, regions=regions)
+    except Exception as err:
+        error(f"{err}")
+    return stats
+
+
+async def rel_remap_region_worker(
+    db: Backend,
+    windows: List[tuple[int, BSBlitzRelease]],
+    region: Region,
+    accounts: List[BSAccount] | None = None,
+    commit: bool = False,
+    source: BSBlitzRelease | None = None,
+    bar: Any = None,
+) -> EventCounter:
+    """Remap releases of a region. 'windows' is a list of (after, release) tuples.
+    'source' limits remapping to the tank stats of that release"""
+    debug("starting")
+    stats: EventCounter = EventCounter(f"{region}")
+    matched: int
+    modified: int
+    try:
+        for after, release in windows:
+            matched, modified = await db.tank_stats_remap_release(
+                release,
+                after=after,
+                regions={region},
+                accounts=accounts,
+                commit=commit,
+                source=source,
+            )
+            if commit:
+                stats.log("matched", matched)
+                stats.log("updated", modified)
+                verbose(f"{region}: {release}: updated {modified}/{matched} tank stats")
+            else:
+                stats.log("would update", matched)
+                verbose(f"{region}: {release}: would update {matched} tank stats")
+            if bar is not None:
+                bar()
+    except CancelledError:
+        debug("Cancelled")
+    except Exception as err:
+        error(f"{err}")
+    return stats
+
+
 ########################################################
 #
 # cmd_prune()
@@ -1438,6 +1666,7 @@ async def cmd_prune(db: Backend, args: Namespace) -> bool:
                         release=release,
                         regions=regions,
                         commit=commit,
+                        list_dups=args.list,
                         sample=sample,
                     )
                 )
@@ -1469,28 +1698,21 @@ async def prune_worker(
     release: BSBlitzRelease,
     regions: set[Region],
     commit: bool = False,
+    list_dups: bool = False,
     sample: int = 0,
 ) -> EventCounter:
     """Worker to delete duplicates"""
     debug("starting")
     stats: EventCounter = EventCounter("duplicates")
+    found: int
+    deleted: int
     try:
         while True:
             tank = await tankQ.get()
-            async for dup in db.tank_stats_duplicates(tank, release, regions):
-                stats.log("found")
-                if commit:
-                    if await db.tank_stat_delete(
-                        account_id=dup.account_id,
-                        last_battle_time=dup.last_battle_time,
-                        tank_id=tank.tank_id,
-                    ):
-                        verbose(f"deleted duplicate: {dup}")
-                        stats.log("deleted")
-                    else:
-                        error(f"failed to delete duplicate: {dup}")
-                        stats.log("deletion errors")
-                else:
+            if list_dups and not commit:
+                found = 0
+                async for dup in db.tank_stats_duplicates(tank, release, regions):
+                    found += 1
                     async for newer in db.tank_stats_get(
                         release=release,
                         regions=regions,
@@ -1500,12 +1722,21 @@ async def prune_worker(
                     ):
                         verbose(f"duplicate:  {dup}")
                         verbose(f"newer stat: {newer}")
-                if sample == 1:
-                    tankQ.task_done()
-                    raise CancelledError
-                elif sample > 1:
-                    sample -= 1
+                    if sample > 0 and found >= sample:
+                        break
+            else:
+                found, deleted = await db.tank_stats_prune(
+                    tank, release, regions, commit=commit, sample=sample
+                )
+                if commit:
+                    stats.log("deleted", deleted)
+                    stats.log("deletion errors", found - deleted)
+            stats.log("found", found)
             tankQ.task_done()
+            if sample > 0:
+                if found >= sample:
+                    raise CancelledError
+                sample -= found
     except CancelledError:
         debug("cancelled")
     except Exception as err:
@@ -1556,6 +1787,7 @@ async def cmd_export_text(db: Backend, args: Namespace) -> bool:
         backend_worker = create_task(
             db.tank_stats_get_worker(
                 tank_statQs["all"],
+                partitions=args.partitions,
                 regions=regions,
                 sample=sample,
                 accounts=accounts,
@@ -1675,9 +1907,9 @@ async def cmd_export_career(db: Backend, args: Namespace) -> bool:
             WORKERS = cpu_count() - 1
 
         with Manager() as manager:
-            dataQ: queue.Queue[pd.DataFrame] = manager.Queue(TANK_STATS_Q_MAX)
+            dataQ: queue.Queue[pa.Table] = manager.Queue(TANK_STATS_Q_MAX)
             workQ: queue.Queue[BSAccount | None] = manager.Queue(100)
-            adataQ: AsyncQueue[pd.DataFrame] = AsyncQueue(dataQ)
+            adataQ: AsyncQueue[pa.Table] = AsyncQueue(dataQ)
             aworkQ: AsyncQueue[BSAccount | None] = AsyncQueue(workQ)
             partioning: ds.Partioning = ds.partitioning(
                 pa.schema([("region", pa.string())])
@@ -1697,14 +1929,21 @@ async def cmd_export_career(db: Backend, args: Namespace) -> bool:
             with Pool(
                 processes=WORKERS,
                 initializer=export_career_mp_init,
-                initargs=[db.config, workQ, dataQ, options],
+                initargs=[db.config, workQ, dataQ, options, await reference_data(db)],
             ) as pool:
                 message("Counting accounts played during release...")
                 N: int = await db.tank_stats_unique_count(
                     "account_id", release=release, regions=regions
                 )
                 Qcreator: Task = create_task(
-                    create_accountQ_active(db, aworkQ, release, regions, randomize=True)
+                    create_accountQ_active(
+                        db,
+                        aworkQ,
+                        release,
+                        regions,
+                        randomize=True,
+                        partitions=ACCOUNTS_ACTIVE_PARTITIONS,
+                    )
                 )
                 debug(f"starting {WORKERS} workers")
                 results: AsyncResult = pool.map_async(
@@ -1744,19 +1983,24 @@ async def cmd_export_career(db: Backend, args: Namespace) -> bool:
 def export_career_mp_init(
     backend_config: Dict[str, Any],
     accountQ: queue.Queue[BSAccount | None],
-    dataQ: queue.Queue[pd.DataFrame],
+    dataQ: queue.Queue[pa.Table],
     options: Dict[str, Any],
+    refdata: ReferenceData | None = None,
 ):
     """Initialize static/global backend into a forked process"""
-    global db, workQ_a, writeQ, mp_options
+    global db, workQ_a, writeQ, mp_options, mp_refdata
     debug(f"starting (PID={getpid()})")
 
-    if (tmp_db := Backend.create(**backend_config)) is None:
+    # async workers and the main task of the worker process
+    if (
+        tmp_db := Backend.create_worker(backend_config, threads=MP_THREADS + 1)
+    ) is None:
         raise ValueError("could not create backend")
     db = tmp_db
     workQ_a = AsyncQueue(accountQ)
     writeQ = AsyncQueue(dataQ)
     mp_options = options
+    mp_refdata = refdata
     debug("finished")
 
 
@@ -1768,25 +2012,37 @@ def export_career_stats_mp_worker_start(worker: int = 0) -> EventCounter:
 
 async def export_career_stats_mp_worker(worker: int = 0) -> EventCounter:
     """Forkable tank stats import worker for latest (career) stats"""
-    global db, workQ_a, writeQ, mp_options
+    global db, workQ_a, writeQ, mp_options, mp_refdata
 
     debug(f"#{worker}: starting")
     stats: EventCounter = EventCounter("importer")
-    THREADS: int = 4
+    THREADS: int = MP_THREADS
 
     try:
         release: BSBlitzRelease = mp_options["release"]
         after: bool = mp_options["after"]
         workers: List[Task] = list()
+        releases: ReleaseIndex | None = None
+        if mp_refdata is not None:
+            releases = mp_refdata.releases
         if not after:
-            if (rel := await db.release_get_previous(release)) is None:
+            rel: BSBlitzRelease | None
+            if releases is not None:
+                rel = releases.previous(release)
+            else:
+                rel = await db.release_get_previous(release)
+            if rel is None:
                 raise ValueError(f"could not find previous release: {release}")
             else:
                 release = rel
 
         for _ in range(THREADS):
             workers.append(
-                create_task(export_career_fetcher(db, workQ_a, writeQ, release))
+                create_task(
+                    export_career_fetcher(
+                        db, workQ_a, writeQ, release, releases=releases
+                    )
+                )
             )
 
         for w in workers:
@@ -1802,35 +2058,44 @@ async def export_career_stats_mp_worker(worker: int = 0) -> EventCounter:
 async def export_career_fetcher(
     db: Backend,
     accountQ: AsyncQueue[BSAccount | None],
-    dataQ: AsyncQueue[pd.DataFrame],
+    dataQ: AsyncQueue[pa.Table],
     release: BSBlitzRelease,
+    releases: ReleaseIndex | None = None,
 ) -> EventCounter:
-    """Fetch tanks stats data from backend and convert to Pandas data frames"""
+    """Fetch tanks stats data from backend as Arrow record batches.
+    Career stats span releases, so the release column is remapped
+    from last_battle_time if 'releases' is given"""
     debug("starting")
     stats: EventCounter = EventCounter(f"fetch {db.driver}")
-    datas: List[Dict[str, Any]] = list()
-    tank_stats: List[TankStat]
+    schema: pa.Schema = TankStat.arrow_schema()
+    batches: List[pa.RecordBatch] = list()
+    rows: int = 0
+    if "release" not in schema.names:
+        releases = None
     try:
         while (account := await accountQ.get()) is not None:
             try:
-                async for tank_stats in db.tank_stats_export_career(
-                    account=account, release=release
+                async for batch in db.tank_stats_export_career_arrow(
+                    schema, account=account, release=release
                 ):
-                    datas.extend([ts.obj_src() for ts in tank_stats])
-                    if len(datas) >= TANK_STATS_BATCH:
-                        # error(f'putting DF to dataQ: {len(tank_stats)} rows')
-                        await dataQ.put(pd.json_normalize(datas))
-                        stats.log("tank stats read", len(datas))
-                        datas = list()
+                    if releases is not None:
+                        batch = releases.set_column(batch)
+                    batches.append(batch)
+                    rows += batch.num_rows
+                    if rows >= TANK_STATS_BATCH:
+                        await dataQ.put(pa.Table.from_batches(batches, schema))
+                        stats.log("tank stats read", rows)
+                        batches = list()
+                        rows = 0
             except Exception as err:
                 error(f"{err}")
             finally:
                 stats.log("accounts")
                 accountQ.task_done()
 
-        if len(datas) > 0:
-            await dataQ.put(pd.json_normalize(datas))
-            stats.log("tank stats read", len(datas))
+        if rows > 0:
+            await dataQ.put(pa.Table.from_batches(batches, schema))
+            stats.log("tank stats read", rows)
 
     except CancelledError:
         debug("cancelled")
@@ -1870,9 +2135,9 @@ async def cmd_export_update(db: Backend, args: Namespace) -> bool:
         message(f"Exporting update stats for release {release}")
 
         with Manager() as manager:
-            dataQ: queue.Queue[pd.DataFrame] = manager.Queue(TANK_STATS_Q_MAX)
+            dataQ: queue.Queue[pa.Table] = manager.Queue(TANK_STATS_Q_MAX)
             tankQ: queue.Queue[int | None] = manager.Queue()
-            adataQ: AsyncQueue[pd.DataFrame] = AsyncQueue(dataQ)
+            adataQ: AsyncQueue[pa.Table] = AsyncQueue(dataQ)
             atankQ: AsyncQueue[int | None] = AsyncQueue(tankQ)
             partioning: ds.Partioning = ds.partitioning(
                 pa.schema([("region", pa.string())])
@@ -1892,7 +2157,7 @@ async def cmd_export_update(db: Backend, args: Namespace) -> bool:
             with Pool(
                 processes=WORKERS,
                 initializer=export_update_mp_init,
-                initargs=[db.config, tankQ, dataQ, options],
+                initargs=[db.config, tankQ, dataQ, options, await reference_data(db)],
             ) as pool:
                 async for tank_id in db.tank_stats_unique(
                     "tank_id", int, regions=regions, release=release
@@ -1941,19 +2206,24 @@ async def cmd_export_update(db: Backend, args: Namespace) -> bool:
 def export_update_mp_init(
     backend_config: Dict[str, Any],
     tankQ: queue.Queue[int | None],
-    dataQ: queue.Queue[pd.DataFrame],
+    dataQ: queue.Queue[pa.Table],
     options: Dict[str, Any],
+    refdata: ReferenceData | None = None,
 ):
     """Initialize static/global backend into a forked process"""
-    global db, workQ_t, writeQ, mp_options
+    global db, workQ_t, writeQ, mp_options, mp_refdata
     debug(f"starting (PID={getpid()})")
 
-    if (tmp_db := Backend.create(**backend_config)) is None:
+    # async workers and the main task of the worker process
+    if (
+        tmp_db := Backend.create_worker(backend_config, threads=MP_THREADS + 1)
+    ) is None:
         raise ValueError("could not create backend")
     db = tmp_db
     workQ_t = AsyncQueue(tankQ)
     writeQ = AsyncQueue(dataQ)
     mp_options = options
+    mp_refdata = refdata
     debug("finished")
 
 
@@ -1965,16 +2235,21 @@ def export_data_update_mp_worker_start(worker: int = 0) -> EventCounter:
 
 async def export_data_update_mp_worker(worker: int = 0) -> EventCounter:
     """Forkable tank stats import worker"""
-    global db, workQ_t, writeQ, mp_options
+    global db, workQ_t, writeQ, mp_options, mp_refdata
 
     debug(f"#{worker}: starting")
     stats: EventCounter = EventCounter("importer")
     workers: List[Task] = list()
-    THREADS: int = 4
+    THREADS: int = MP_THREADS
 
     try:
         regions: set[Region] = mp_options["regions"]
         release: BSBlitzRelease = BSBlitzRelease(release=mp_options["release"])
+        if (
+            mp_refdata is not None
+            and (rel := mp_refdata.releases.get(release.release)) is not None
+        ):
+            release = rel
 
         for _ in range(THREADS):
             workers.append(
@@ -1998,30 +2273,38 @@ async def export_update_fetcher(
     release: BSBlitzRelease,
     regions: set[Region],
     tankQ: AsyncQueue[int | None],
-    dataQ: AsyncQueue[pd.DataFrame],
+    dataQ: AsyncQueue[pa.Table],
 ) -> EventCounter:
-    """Fetch tanks stats data from backend and convert to Pandas data frames"""
+    """Fetch tanks stats data from backend as Arrow record batches"""
     debug("starting")
     stats: EventCounter = EventCounter(f"fetch {db.driver}")
-    tank_stats: List[Dict[str, Any]] = list()
+    schema: pa.Schema = TankStat.arrow_schema()
+    batches: List[pa.RecordBatch] = list()
+    rows: int = 0
 
     try:
         while (tank_id := await tankQ.get()) is not None:
-            async for tank_stat in db.tank_stats_get(
-                release=release, regions=regions, tanks=[BSTank(tank_id=tank_id)]
+            async for batch in db.tank_stats_get_arrow(
+                schema,
+                release=release,
+                regions=regions,
+                tanks=[BSTank(tank_id=tank_id)],
+                batch=TANK_STATS_BATCH,
             ):
-                tank_stats.append(tank_stat.obj_src())
-                if len(tank_stats) == TANK_STATS_BATCH:
-                    await dataQ.put(pd.json_normalize(tank_stats))
-                    stats.log("tank stats read", len(tank_stats))
-                    tank_stats = list()
+                batches.append(batch)
+                rows += batch.num_rows
+                if rows >= TANK_STATS_BATCH:
+                    await dataQ.put(pa.Table.from_batches(batches, schema))
+                    stats.log("tank stats read", rows)
+                    batches = list()
+                    rows = 0
 
             stats.log("tanks processed")
             tankQ.task_done()
 
-        if len(tank_stats) > 0:
-            await dataQ.put(pd.json_normalize(tank_stats))
-            stats.log("tank stats read", len(tank_stats))
+        if rows > 0:
+            await dataQ.put(pa.Table.from_batches(batches, schema))
+            stats.log("tank stats read", rows)
 
     except CancelledError:
         debug("cancelled")
@@ -2061,47 +2344,90 @@ async def cmd_importMP(db: Backend, args: Namespace) -> bool:
         ) is None:
             raise ValueError(f"Could not init {import_backend} to import releases from")
 
+        resume: bool = args.resume is not None and import_db.set_scan_resume(
+            args.resume
+        )
+
+        if args.raw:
+            if db.raw_copy_supported(import_db, BSTableType.TankStats):
+                stats.merge_child(await import_raw(db, import_db, args, resume=resume))
+                message(stats.print(do_print=False, clean=True))
+                return True
+            message(
+                f"Cannot copy raw documents from {import_db.backend} to {db.backend}: "
+                + "using normal import"
+            )
+
         with Manager() as manager:
             readQ: queue.Queue[List[Any] | None] = manager.Queue(TANK_STATS_Q_MAX)
             options: Dict[str, Any] = dict()
             options["force"] = args.force
             options["map_releases"] = not args.no_release_map
+            options["bulk"] = read_args_bulk_mode(args)
+            options["resume"] = resume
+            drop_indexes: bool = options["bulk"] is not None and args.drop_indexes
+            if drop_indexes:
+                await db.indexes_drop(BSTableType.TankStats)
 
-            with Pool(
-                processes=WORKERS,
-                initializer=import_mp_init,
-                initargs=[db.config, readQ, import_model, options],
-            ) as pool:
-                debug(f"starting {WORKERS} workers")
-                results: AsyncResult = pool.map_async(
-                    import_mp_worker_start, range(WORKERS)
-                )
-                pool.close()
-
-                message("Counting tank stats to import ...")
-                N: int = await import_db.tank_stats_count(sample=args.sample)
-
-                with alive_bar(
-                    N, title="Importing tank stats ", enrich_print=False, refresh_secs=1
-                ) as bar:
-                    async for objs in import_db.objs_export(
-                        table_type=BSTableType.TankStats, sample=args.sample
-                    ):
-                        read: int = len(objs)
-                        # debug(f'read {read} tank_stat objects')
-                        readQ.put(objs)
-                        stats.log(f"{db.driver}:stats read", read)
-                        bar(read)
-
-                debug(
-                    f"Finished exporting {import_model} from {import_db.table_uri(BSTableType.TankStats)}"
-                )
-                for _ in range(WORKERS):
-                    readQ.put(None)  # add sentinel
+            try:
+                with Pool(
+                    processes=WORKERS,
+                    initializer=import_mp_init,
+                    initargs=[
+                        db.config,
+                        readQ,
+                        import_model,
+                        options,
+                        await reference_data(db) if options["map_releases"] else None,
+                    ],
+                ) as pool:
+                    debug(f"starting {WORKERS} workers")
+                    results: AsyncResult = pool.map_async(
+                        import_mp_worker_start, range(WORKERS)
+                    )
+                    pool.close()
+
+                    message("Counting tank stats to import ...")
+                    N: int = await import_db.tank_stats_count(sample=args.sample)
+
+                    pages: int = 0
+                    with alive_bar(
+                        N,
+                        title="Importing tank stats ",
+                        enrich_print=False,
+                        refresh_secs=1,
+                    ) as bar:
+                        async for objs in import_db.objs_export_partitioned(
+                            table_type=BSTableType.TankStats,
+                            partitions=args.partitions,
+                            sample=args.sample,
+                        ):
+                            read: int = len(objs)
+                            # debug(f'read {read} tank_stat objects')
+                            readQ.put(objs)
+                            stats.log(f"{db.driver}:stats read", read)
+                            bar(read)
+                            pages += 1
+                            if resume and pages % TANK_STATS_CHECKPOINT == 0:
+                                # workers acknowledge pages after inserting them
+                                readQ.join()
+                                import_db.scan_checkpoint(
+                                    BSTableType.TankStats, objs[-1]["_id"]
+                                )
+
+                    debug(
+                        f"Finished exporting {import_model} from {import_db.table_uri(BSTableType.TankStats)}"
+                    )
+                    for _ in range(WORKERS):
+                        readQ.put(None)  # add sentinel
 
-                for res in results.get():
-                    stats.merge_child(res)
-                pool.join()
+                    for res in results.get():
+                        stats.merge_child(res)
+                    pool.join()
+            finally:
+                if drop_indexes:
+                    message("Rebuilding indexes...")
+                    await db.indexes_rebuild(BSTableType.TankStats)
 
         message(stats.print(do_print=False, clean=True))
         return True
@@ -2110,22 +2436,123 @@ async def cmd_importMP(db: Backend, args: Namespace) -> bool:
     return False
 
 
+async def import_raw(
+    db: Backend, import_db: Backend, args: Namespace, resume: bool = False
+) -> EventCounter:
+    """Copy tank stats as raw documents without decoding them.
+    Releases are remapped in the backend afterwards if requested. Raw inserts
+    do not update the stats summaries: they are marked not built and rebuilt
+    after the copy unless --no-rebuild-stats or --sample is given"""
+    debug("starting")
+    stats: EventCounter = EventCounter("raw copy")
+    workers: List[Task] = list()
+    try:
+        rawQ: Queue[List[Any]] = Queue(MP_THREADS * 2)
+        bulk: Dict[str, Any] | None = read_args_bulk_mode(args)
+        drop_indexes: bool = bulk is not None and args.drop_indexes
+        if bulk is not None:
+            db.set_bulk_mode(**bulk)
+        if drop_indexes:
+            await db.indexes_drop(BSTableType.TankStats)
+        await db.stats_invalidate(StatsTypes.tank_stats)
+
+        try:
+            for _ in range(MP_THREADS):
+                workers.append(
+                    create_task(import_raw_worker(db, rawQ, force=args.force))
+                )
+
+            message("Counting tank stats to import ...")
+            N: int = await import_db.tank_stats_count(sample=args.sample)
+            pages: int = 0
+            with alive_bar(
+                N, title="Copying tank stats ", enrich_print=False, refresh_secs=1
+            ) as bar:
+                async for objs in import_db.objs_export_partitioned(
+                    table_type=BSTableType.TankStats,
+                    partitions=args.partitions,
+                    sample=args.sample,
+                    raw=True,
+                ):
+                    await rawQ.put(objs)
+                    stats.log(f"{import_db.driver}: stats read", len(objs))
+                    bar(len(objs))
+                    pages += 1
+                    if resume and pages % TANK_STATS_CHECKPOINT == 0:
+                        await rawQ.join()
+                        import_db.scan_checkpoint(
+                            BSTableType.TankStats, objs[-1]["_id"]
+                        )
+
+            await rawQ.join()
+            await stats.gather_stats(workers)
+        finally:
+            if drop_indexes:
+                message("Rebuilding indexes...")
+                await db.indexes_rebuild(BSTableType.TankStats)
+        if args.remap_releases:
+            stats.merge_child(
+                await cmd_edit_rel_remap_bulk(db, commit=True, rebuild_stats=False)
+            )
+        if args.rebuild_stats and args.sample == 0:
+            message("Rebuilding stats summaries...")
+            await db.stats_rebuild(StatsTypes.tank_stats)
+        else:
+            message("Stats summaries not rebuilt. Run 'setup rebuild-stats' later")
+    except Exception as err:
+        error(f"{err}")
+    return stats
+
+
+async def import_raw_worker(
+    db: Backend, rawQ: Queue[List[Any]], force: bool = False
+) -> EventCounter:
+    """Insert raw document batches as is"""
+    debug("starting")
+    stats: EventCounter = EventCounter("raw insert")
+    added: int
+    not_added: int
+    try:
+        while True:
+            objs: List[Any] = await rawQ.get()
+            try:
+                added, not_added = await db.objs_insert_raw(
+                    BSTableType.TankStats, objs, force=force
+                )
+                stats.log("stats added", added)
+                stats.log("stats not added", not_added)
+            except Exception as err:
+                error(f"{err}")
+            finally:
+                rawQ.task_done()
+    except CancelledError:
+        debug("Cancelled")
+    except Exception as err:
+        error(f"{err}")
+    return stats
+
+
 def import_mp_init(
     backend_config: Dict[str, Any],
     inputQ: queue.Queue,
     import_model: type[JSONExportable],
     options: Dict[str, Any],
+    refdata: ReferenceData | None = None,
 ):
     """Initialize static/global backend into a forked process"""
-    global db, readQ, in_model, mp_options
+    global db, readQ, in_model, mp_options, mp_refdata
     debug(f"starting (PID={getpid()})")
 
-    if (tmp_db := Backend.create(**backend_config)) is None:
+    # async workers and the main task of the worker process
+    if (
+        tmp_db := Backend.create_worker(backend_config, threads=MP_THREADS + 1)
+    ) is None:
         raise ValueError("could not create backend")
     db = tmp_db
     readQ = AsyncQueue(inputQ)
     in_model = import_model
     mp_options = options
+    mp_refdata = refdata
     debug("finished")
 
 
@@ -2141,18 +2568,28 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
     stats: EventCounter = EventCounter("importer")
     workers: List[Task] = list()
     try:
-        global db, readQ, in_model, mp_options
-        THREADS: int = 4
+        global db, readQ, in_model, mp_options, mp_refdata
+        THREADS: int = MP_THREADS
         import_model: type[JSONExportable] = in_model
-        releases: NearestDict[int, BSBlitzRelease] | None = None
+        releases: ReleaseIndex | None = None
         tank_statsQ: Queue[List[TankStat]] = Queue(100)
         force: bool = mp_options["force"]
         rel_map: bool = mp_options["map_releases"]
+        bulk: Dict[str, Any] | None = mp_options["bulk"]
+        resume: bool = mp_options["resume"]
         tank_stats: List[TankStat]
+        buffer: List[TankStat] = list()
+        batch: int = 0
+
+        if bulk is not None:
+            db.set_bulk_mode(**bulk)
 
         if rel_map:
             debug("mapping releases")
-            releases = await release_mapper(db)
+            if mp_refdata is not None:
+                releases = mp_refdata.releases
+            else:
+                releases = await release_index(db)
 
         for _ in range(THREADS):
             workers.append(
@@ -2177,13 +2614,27 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
                     stats.log("release mapped", mapped)
                     stats.log("not release mapped", read - mapped)
                     stats.log("release map errors", errors)
-                await tank_statsQ.put(tank_stats)
+                if bulk is None or resume:
+                    await tank_statsQ.put(tank_stats)
+                    if resume:
+                        # acknowledge the page (readQ.task_done()) once inserted
+                        await tank_statsQ.join()
+                    continue
+                # bulk mode: insert in large batches
+                if batch == 0:
+                    batch = db.bulk_batch_size(tank_stats)
+                buffer.extend(tank_stats)
+                if len(buffer) >= batch:
+                    await tank_statsQ.put(buffer)
+                    buffer = list()
             except Exception as err:
                 error(f"{err}")
             finally:
                 readQ.task_done()
         debug(f"#{id}: finished reading objects")
         readQ.task_done()
+        if len(buffer) > 0:
+            await tank_statsQ.put(buffer)
         await tank_statsQ.join()  # add sentinel for other workers
         await stats.gather_stats(workers)
     except CancelledError:
@@ -2194,33 +2645,30 @@ async def import_mp_worker(id: int = 0) -> EventCounter:
 
 
 def map_releases(
-    tank_stats: List[TankStat], releases: NearestDict[int, BSBlitzRelease]
+    tank_stats: List[TankStat], releases: ReleaseIndex
 ) -> tuple[List[TankStat], int, int]:
+    """Map a batch of tank stats to releases"""
     debug("starting")
     mapped: int = 0
     errors: int = 0
-    res: List[TankStat] = list()
-    for tank_stat in tank_stats:
-        try:
-            if (release := releases[tank_stat.last_battle_time]) is not None:
-                tank_stat.release = release.release
-                mapped += 1
-        except Exception as err:
-            error(f"{err}")
-            errors += 1
-        res.append(tank_stat)
-    return res, mapped, errors
+    try:
+        mapped, _ = releases.map_objs(tank_stats)
+    except Exception as err:
+        error(f"{err}")
+        errors = len(tank_stats)
+    return tank_stats, mapped, errors
 
 
 async def map_releases_worker(
-    releases: NearestDict[int, BSBlitzRelease] | None,
+    releases: ReleaseIndex | None,
     inputQ: Queue[List[TankStat]],
     outputQ: Queue[List[TankStat]],
 ) -> EventCounter:
     """Map tank stats to releases and pack those to List[TankStat] queue.
     map_all is None means no release mapping is done"""
     stats: EventCounter = EventCounter("Release mapper")
-    release: BSBlitzRelease | None
+    mapped: int
+    not_mapped: int
     try:
         debug("starting")
         while True:
@@ -2228,14 +2676,9 @@ async def map_releases_worker(
             stats.log("read", len(tank_stats))
             try:
                 if releases is not None:
-                    for tank_stat in tank_stats:
-                        if (
-                            release := releases[(tank_stat.last_battle_time)]
-                        ) is not None:
-                            tank_stat.release = release.release
-                            stats.log("mapped")
-                        else:
-                            stats.log("could not map")
+                    mapped, not_mapped = releases.map_objs(tank_stats)
+                    stats.log("mapped", mapped)
+                    stats.log("could not map", not_mapped)
                 else:
                     stats.log("not mapped", len(tank_stats))
 
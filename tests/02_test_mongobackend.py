@@ -0,0 +1,108 @@
+import pytest  # type: ignore
+import pytest_asyncio  # type: ignore
+from configparser import ConfigParser
+from typing import AsyncGenerator, Callable, List
+
+from blitzmodels import Region
+from blitzmodels.wg_api import TankStat
+
+from blitzstats.models import BSAccount, BSBlitzRelease, BSTank
+from blitzstats.mongobackend import MongoBackend, _construct
+
+########################################################
+#
+# Tests for MongoBackend(). Require a MongoDB server at
+# localhost:27017. The tests are skipped if it is not
+# available.
+#
+########################################################
+
+MONGO_TEST_DB: str = "blitzstats_pytest"
+
+ACCOUNT_ID: int = 521458531  # EU
+TANK_ID: int = 2049
+RELEASE: str = "10.0"
+
+
+@pytest_asyncio.fixture
+async def db() -> AsyncGenerator[MongoBackend, None]:
+    config = ConfigParser()
+    config.read_dict(
+        {
+            "MONGODB": {
+                "database": MONGO_TEST_DB,
+                "server_selection_timeout_ms": "1000",
+            }
+        }
+    )
+    mongo = MongoBackend(config=config)
+    if not await mongo.test():
+        pytest.skip("MongoDB server not available")
+    await mongo._client.drop_database(MONGO_TEST_DB)
+    await mongo.init()
+    yield mongo
+    await mongo._client.drop_database(MONGO_TEST_DB)
+
+
+@pytest.mark.asyncio
+async def test_1_tank_stats_duplicates_list(
+    db: MongoBackend, mk_tank_stat: Callable[..., TankStat]
+) -> None:
+    """Test the '--list' path of 'tank-stats prune': duplicates are returned
+    as parsed TankStat objects and the newer stats are found for each"""
+    release = BSBlitzRelease(release=RELEASE)
+    tank = BSTank(tank_id=TANK_ID)
+    tank_stats: List[TankStat] = [
+        mk_tank_stat(ACCOUNT_ID, TANK_ID, last_battle_time=lbt, battles=battles)
+        for lbt, battles in [(1700000000, 10), (1700001000, 11), (1700002000, 12)]
+    ]
+    added, _ = await db.tank_stats_insert(tank_stats)
+    assert added == len(tank_stats), f"could not insert test tank stats: {added}"
+
+    dups: List[TankStat] = list()
+    async for dup in db.tank_stats_duplicates(tank, release, {Region.eu}):
+        assert isinstance(dup, TankStat), f"duplicate is not a TankStat: {type(dup)}"
+        dups.append(dup)
+    assert len(dups) == 2, f"expected 2 duplicates, found {len(dups)}"
+    for dup in dups:
+        assert dup.account_id == ACCOUNT_ID, f"incorrect account_id: {dup.account_id}"
+        assert dup.tank_id == TANK_ID, f"incorrect tank_id: {dup.tank_id}"
+        assert (
+            dup.last_battle_time < 1700002000
+        ), f"the latest tank stat was returned as a duplicate: {dup}"
+        newer: int = 0
+        async for _ in db.tank_stats_get(
+            release=release,
+            regions={Region.eu},
+            accounts=[BSAccount(id=dup.account_id)],
+            tanks=[tank],
+            since=dup.last_battle_time + 1,
+        ):
+            newer += 1
+        assert newer > 0, f"no newer tank stats found for duplicate {dup}"
+
+
+def test_2_construct_tank_stat(mk_tank_stat: Callable[..., TankStat]) -> None:
+    """Trusted reads construct the same TankStat as validation"""
+    doc = mk_tank_stat(ACCOUNT_ID, TANK_ID, 1700000000, 10).obj_db()
+    constructed = _construct(TankStat, doc)
+    validated = TankStat.model_validate(doc)
+    assert constructed == validated, f"constructed differs: {constructed} != {validated}"
+    assert isinstance(
+        constructed.region, Region
+    ), f"enum not coerced: {type(constructed.region)}"
+
+
+def test_3_construct_account() -> None:
+    """Trusted reads construct the same BSAccount as validation,
+    including the 'inactive' field recomputed by the model validator"""
+    account = BSAccount(id=ACCOUNT_ID, region=Region.eu, last_battle_time=1600000000)
+    doc = account.obj_db()
+    doc[BSAccount.model_fields["inactive"].alias] = False  # stale DB value
+    constructed = _construct(BSAccount, doc)
+    validated = BSAccount.model_validate(doc)
+    assert constructed == validated, f"constructed differs: {constructed} != {validated}"
+    assert constructed.inactive, "'inactive' not recomputed"
+    assert isinstance(
+        constructed.region, Region
+    ), f"enum not coerced: {type(constructed.region)}"
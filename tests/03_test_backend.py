@@ -0,0 +1,155 @@
+import pytest  # type: ignore
+from typing import Any, Dict, List
+
+from blitzstats.backend import (
+    AccountsUpdateBuffer,
+    BSTableType,
+    ScanProgress,
+    split_range,
+    split_range_at,
+)
+
+########################################################
+#
+# Tests for backend.py helpers
+#
+########################################################
+
+
+class CheckpointRecorder:
+    """Record Backend.scan_checkpoint() calls"""
+
+    def __init__(self) -> None:
+        self.checkpoints: List[Any] = list()
+
+    def scan_checkpoint(self, table_type: BSTableType, last: Any) -> None:
+        self.checkpoints.append(last)
+
+
+class UpdateRecorder:
+    """Record Backend.accounts_update() calls. Accounts in 'missing'
+    are reported as not found"""
+
+    def __init__(self, missing: set[int] | None = None) -> None:
+        self.updates: List[Dict[int, Dict[str, Any]]] = list()
+        self.missing: set[int] = missing if missing is not None else set()
+
+    async def accounts_update(
+        self, updates: Dict[int, Dict[str, Any]]
+    ) -> tuple[int, int]:
+        self.updates.append(updates)
+        not_found: int = len(self.missing & updates.keys())
+        return len(updates) - not_found, not_found
+
+
+def test_1_ScanProgress_in_order() -> None:
+    db = CheckpointRecorder()
+    progress = ScanProgress(db, BSTableType.TankStats, interval=2)  # type: ignore
+    for idx in range(5):
+        progress.add(idx)
+    for idx in range(5):
+        progress.done(idx)
+    assert db.checkpoints == [1, 3], f"incorrect checkpoints: {db.checkpoints}"
+    assert len(progress) == 0, f"objects left pending: {len(progress)}"
+
+
+def test_2_ScanProgress_out_of_order() -> None:
+    db = CheckpointRecorder()
+    progress = ScanProgress(db, BSTableType.TankStats, interval=1)  # type: ignore
+    for idx in range(4):
+        progress.add(idx)
+    progress.done(2)
+    progress.done(1)
+    assert db.checkpoints == [], f"token saved too early: {db.checkpoints}"
+    progress.done(0)
+    assert db.checkpoints == [2], f"incorrect checkpoints: {db.checkpoints}"
+    progress.done(3)
+    assert db.checkpoints == [2, 3], f"incorrect checkpoints: {db.checkpoints}"
+
+
+def test_3_ScanProgress_unknown() -> None:
+    db = CheckpointRecorder()
+    progress = ScanProgress(db, BSTableType.Accounts, interval=1)  # type: ignore
+    progress.add(10)
+    progress.done(11)  # e.g. re-tried accounts not added by the scan
+    assert db.checkpoints == [], f"token saved for unknown object: {db.checkpoints}"
+    assert len(progress) == 1, f"pending objects changed: {len(progress)}"
+
+
+def test_4_split_range() -> None:
+    for id_range, n in [
+        (range(0, 100), 4),
+        (range(0, 10), 3),
+        (range(5, 7), 4),
+        (range(10, 11), 1),
+        (range(0, 0), 2),
+    ]:
+        ranges = split_range(id_range, n)
+        assert len(ranges) <= n, f"too many ranges: {id_range}, {n}: {ranges}"
+        assert all(
+            len(r) > 0 for r in ranges
+        ), f"empty ranges returned: {id_range}, {n}: {ranges}"
+        assert [i for r in ranges for i in r] == list(
+            id_range
+        ), f"ranges do not cover {id_range} exactly: {ranges}"
+    assert split_range(range(0, 10), 3) == [
+        range(0, 4),
+        range(4, 8),
+        range(8, 10),
+    ], f"incorrect split: {split_range(range(0, 10), 3)}"
+
+
+def test_5_split_range_at() -> None:
+    id_range = range(10, 20)
+    ranges = split_range_at(id_range, [15, 12, 15])
+    assert ranges == [
+        range(10, 12),
+        range(12, 15),
+        range(15, 20),
+    ], f"incorrect split: {ranges}"
+    # points at or outside the range boundaries do not create empty ranges
+    ranges = split_range_at(id_range, [0, 10, 20, 30])
+    assert ranges == [id_range], f"incorrect split: {ranges}"
+    ranges = split_range_at(id_range, [11, 19])
+    assert ranges == [
+        range(10, 11),
+        range(11, 19),
+        range(19, 20),
+    ], f"incorrect split: {ranges}"
+    assert split_range_at(id_range, []) == [id_range], "range split without points"
+
+
+@pytest.mark.asyncio
+async def test_6_AccountsUpdateBuffer_batch() -> None:
+    db = UpdateRecorder(missing={3})
+    buffer = AccountsUpdateBuffer(db, batch=3, interval=3600)  # type: ignore
+    await buffer.update(1, {"a": 1})
+    await buffer.update(2, {"a": 2})
+    await buffer.update(1, {"b": 1})  # merged with the earlier update
+    assert db.updates == [], f"buffer flushed too early: {db.updates}"
+    assert len(buffer) == 2, f"incorrect number of buffered accounts: {len(buffer)}"
+    await buffer.update(3, {"a": 3})
+    assert db.updates == [
+        {1: {"a": 1, "b": 1}, 2: {"a": 2}, 3: {"a": 3}}
+    ], f"incorrect updates: {db.updates}"
+    assert len(buffer) == 0, f"buffer not emptied: {len(buffer)}"
+    assert buffer.updated == 2, f"incorrect updated count: {buffer.updated}"
+    assert buffer.not_found == 1, f"incorrect not found count: {buffer.not_found}"
+
+
+@pytest.mark.asyncio
+async def test_7_AccountsUpdateBuffer_flush() -> None:
+    db = UpdateRecorder()
+    buffer = AccountsUpdateBuffer(db, batch=100, interval=3600)  # type: ignore
+    await buffer.flush()
+    assert db.updates == [], f"empty buffer flushed: {db.updates}"
+    await buffer.update(1, {"a": 1})
+    assert not buffer.due, "buffer due before batch or interval"
+    await buffer.flush()
+    assert db.updates == [{1: {"a": 1}}], f"incorrect updates: {db.updates}"
+
+    buffer.interval = 0
+    assert not buffer.due, "empty buffer due"
+    await buffer.update(2, {"a": 2})  # interval passed: flushed right away
+    assert db.updates[-1] == {2: {"a": 2}}, f"incorrect updates: {db.updates}"
+    assert buffer.updated == 2, f"incorrect updated count: {buffer.updated}"
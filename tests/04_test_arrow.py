@@ -0,0 +1,80 @@
+from typing import List
+
+import pyarrow as pa  # type: ignore
+from pydantic import BaseModel, Field
+
+from blitzstats.arrow import record_batch_from_docs, schema_defaults
+
+########################################################
+#
+# Tests for arrow.py
+#
+########################################################
+
+
+class _Stats(BaseModel):
+    battles: int = Field(default=0, alias="b")
+    wins: int = Field(default=0, alias="w")
+
+
+class _TankStat(BaseModel):
+    account_id: int = Field(default=..., alias="a")
+    tank_id: int = Field(default=..., alias="t")
+    mark_of_mastery: int = Field(default=0, alias="m")
+    release: str | None = Field(default=None, alias="u")
+    tags: List[str] = Field(default_factory=list, alias="g")
+    all: _Stats = Field(default_factory=_Stats, alias="s")
+
+
+SCHEMA: pa.Schema = pa.schema(
+    [
+        ("account_id", pa.int64()),
+        ("tank_id", pa.int32()),
+        ("mark_of_mastery", pa.int8()),
+        ("release", pa.string()),
+        ("all.battles", pa.int32()),
+        ("all.wins", pa.int32()),
+    ]
+)
+
+
+def test_1_schema_defaults() -> None:
+    defaults = schema_defaults(_TankStat, SCHEMA)
+    assert defaults == [None, None, 0, None, 0, 0], f"incorrect defaults: {defaults}"
+
+
+def test_2_record_batch_from_docs_defaults() -> None:
+    """Keys missing from documents get the model defaults, explicit nulls are kept"""
+    docs = [
+        {"account_id": 1, "tank_id": 2, "mark_of_mastery": 3, "all": {"battles": 5}},
+        {"account_id": 1, "tank_id": 3, "release": None},
+    ]
+    batch = record_batch_from_docs(
+        docs, SCHEMA, defaults=schema_defaults(_TankStat, SCHEMA)
+    )
+    assert batch.num_rows == 2, f"incorrect number of rows: {batch.num_rows}"
+    rows = batch.to_pylist()
+    assert rows[0]["mark_of_mastery"] == 3, f"value overwritten: {rows[0]}"
+    assert rows[0]["all.battles"] == 5, f"value overwritten: {rows[0]}"
+    assert rows[0]["all.wins"] == 0, f"default not used: {rows[0]}"
+    assert rows[1]["mark_of_mastery"] == 0, f"default not used: {rows[1]}"
+    assert rows[1]["all.battles"] == 0, f"default not used: {rows[1]}"
+    assert rows[1]["release"] is None, f"incorrect release: {rows[1]}"
+
+
+def test_3_record_batch_from_docs_paths() -> None:
+    """Documents with DB field aliases are read with 'paths'"""
+    docs = [{"a": 1, "t": 2, "s": {"b": 10, "w": 6}}]
+    paths = [["a"], ["t"], ["m"], ["u"], ["s", "b"], ["s", "w"]]
+    batch = record_batch_from_docs(
+        docs, SCHEMA, paths, schema_defaults(_TankStat, SCHEMA)
+    )
+    row = batch.to_pylist()[0]
+    assert row == {
+        "account_id": 1,
+        "tank_id": 2,
+        "mark_of_mastery": 0,
+        "release": None,
+        "all.battles": 10,
+        "all.wins": 6,
+    }, f"incorrect row: {row}"
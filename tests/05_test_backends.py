@@ -0,0 +1,198 @@
+import pytest  # type: ignore
+import pytest_asyncio  # type: ignore
+from asyncio import Queue, create_task
+from pathlib import Path
+from typing import AsyncGenerator, Callable, List
+from uuid import uuid4
+
+from blitzmodels import Region
+from pyutils import EventCounter
+from blitzmodels.wg_api import TankStat
+
+from blitzstats.backend import Backend, OptAccountsInactive
+from blitzstats.models import BSAccount, BSBlitzRelease, BSTank
+from blitzstats.filesbackend import FilesBackend
+from blitzstats.memorybackend import MemoryBackend
+from blitzstats.sqlitebackend import SQLiteBackend
+
+########################################################
+#
+# Round-trip tests for the local backends:
+# insert -> get / count / export
+#
+########################################################
+
+BACKENDS: List[str] = ["sqlite", "files", "memory"]
+
+ACCOUNT_IDS: List[int] = [521458531, 521458532, 521458533]  # EU
+TANK_IDS: List[int] = [1, 2049]
+RELEASE: str = "10.0"
+CUT_OFF: int = 1700005000
+
+
+@pytest.fixture
+def tank_stats(mk_tank_stat: Callable[..., TankStat]) -> List[TankStat]:
+    """Two tank stats per account and tank. The later ones are after CUT_OFF"""
+    return [
+        mk_tank_stat(account_id, tank_id, last_battle_time=lbt, battles=battles)
+        for account_id in ACCOUNT_IDS
+        for tank_id in TANK_IDS
+        for lbt, battles in [(1700000000, 10), (1700010000, 20)]
+    ]
+
+
+def tank_stat_key(tank_stat: TankStat) -> tuple[int, int, int]:
+    return tank_stat.account_id, tank_stat.tank_id, tank_stat.last_battle_time
+
+
+def mk_backend(driver: str, tmp_path: Path) -> Backend:
+    if driver == "sqlite":
+        return SQLiteBackend(db_config={"filename": str(tmp_path / "pytest.sqlite")})
+    elif driver == "files":
+        return FilesBackend(db_config={"path": str(tmp_path)})
+    elif driver == "memory":
+        # memory stores are shared by database name
+        return MemoryBackend(database=f"pytest{uuid4().hex}")
+    raise ValueError(f"unknown backend: {driver}")
+
+
+@pytest_asyncio.fixture(params=BACKENDS)
+async def db(request, tmp_path: Path) -> AsyncGenerator[Backend, None]:
+    backend: Backend = mk_backend(request.param, tmp_path)
+    assert await backend.test(), f"could not access {backend.backend}"
+    assert await backend.init(), f"could not init {backend.backend}"
+    yield backend
+    if isinstance(backend, SQLiteBackend):
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_1_accounts(db: Backend) -> None:
+    accounts: List[BSAccount] = [
+        BSAccount(id=account_id, region=Region.eu, last_battle_time=1700000000)
+        for account_id in ACCOUNT_IDS
+    ]
+    added, not_added = await db.accounts_insert(accounts)
+    assert added == len(accounts), f"{db.driver}: could not insert accounts: {added}"
+    assert not_added == 0, f"{db.driver}: accounts not added: {not_added}"
+    added, not_added = await db.accounts_insert(accounts)
+    assert added == 0, f"{db.driver}: duplicate accounts added: {added}"
+
+    for account in accounts:
+        res = await db.account_get(account.id)
+        assert res == account, f"{db.driver}: account differs: {res} != {account}"
+
+    count: int = await db.accounts_count(
+        regions={Region.eu}, inactive=OptAccountsInactive.both
+    )
+    assert count == len(accounts), f"{db.driver}: incorrect account count: {count}"
+
+    ids: List[int] = sorted(
+        [
+            account.id
+            async for account in db.accounts_get(
+                regions={Region.eu}, inactive=OptAccountsInactive.both
+            )
+        ]
+    )
+    assert ids == ACCOUNT_IDS, f"{db.driver}: incorrect accounts returned: {ids}"
+
+
+async def insert_accounts(
+    db: Backend, accounts: List[BSAccount], force: bool = False
+) -> EventCounter:
+    """Insert accounts with Backend.accounts_insert_worker()"""
+    accountQ: Queue[BSAccount] = Queue()
+    worker = create_task(db.accounts_insert_worker(accountQ, force=force, batch=2))
+    for account in accounts:
+        await accountQ.put(account)
+    await accountQ.join()
+    worker.cancel()
+    return await worker
+
+
+@pytest.mark.asyncio
+async def test_2_accounts_insert_worker(db: Backend) -> None:
+    """Accounts are inserted in batches and replaced with force=True"""
+    accounts: List[BSAccount] = [
+        BSAccount(id=account_id, region=Region.eu, last_battle_time=1700000000)
+        for account_id in ACCOUNT_IDS
+    ]
+    stats: EventCounter = await insert_accounts(db, accounts)
+    assert (
+        stats.get_value("added") == len(accounts)
+    ), f"{db.driver}: accounts not added: {stats.get_value('added')}"
+    stats = await insert_accounts(db, accounts)
+    assert (
+        stats.get_value("not added") == len(accounts)
+    ), f"{db.driver}: duplicate accounts added: {stats.get_value('added')}"
+
+    accounts[0].last_battle_time = 1700010000
+    stats = await insert_accounts(db, accounts, force=True)
+    written: int = sum(
+        stats.get_value(category) for category in ["added", "updated", "unchanged"]
+    )
+    assert written == len(accounts), f"{db.driver}: accounts not upserted: {written}"
+    res = await db.account_get(accounts[0].id)
+    assert (
+        res is not None and res.last_battle_time == 1700010000
+    ), f"{db.driver}: account not replaced: {res}"
+
+
+@pytest.mark.asyncio
+async def test_3_tank_stats(db: Backend, tank_stats: List[TankStat]) -> None:
+    added, not_added = await db.tank_stats_insert(tank_stats)
+    assert added == len(tank_stats), f"{db.driver}: tank stats not inserted: {added}"
+    assert not_added == 0, f"{db.driver}: tank stats not added: {not_added}"
+    added, not_added = await db.tank_stats_insert(tank_stats)
+    assert added == 0, f"{db.driver}: duplicate tank stats added: {added}"
+
+    release = BSBlitzRelease(release=RELEASE)
+    count: int = await db.tank_stats_count(release=release, regions={Region.eu})
+    assert count == len(tank_stats), f"{db.driver}: incorrect tank stat count: {count}"
+
+    res: List[TankStat] = [
+        ts async for ts in db.tank_stats_get(release=release, regions={Region.eu})
+    ]
+    assert sorted(res, key=tank_stat_key) == sorted(
+        tank_stats, key=tank_stat_key
+    ), f"{db.driver}: tank stats differ after round-trip"
+
+    res = [
+        ts
+        async for ts in db.tank_stats_get(
+            regions={Region.eu},
+            accounts=[BSAccount(id=ACCOUNT_IDS[0])],
+            tanks=[BSTank(tank_id=TANK_IDS[0])],
+            since=1700000001,
+        )
+    ]
+    assert (
+        len(res) == 1 and res[0].last_battle_time == 1700010000
+    ), f"{db.driver}: incorrect tank stats returned: {res}"
+
+    exported: int = 0
+    async for objs in db.tank_stats_export():
+        exported += len(objs)
+    assert exported == len(tank_stats), f"{db.driver}: incorrect export: {exported}"
+
+
+@pytest.mark.asyncio
+async def test_4_tank_stats_export_career(
+    db: Backend, tank_stats: List[TankStat]
+) -> None:
+    added, _ = await db.tank_stats_insert(tank_stats)
+    assert added > 0, f"{db.driver}: could not insert tank stats"
+
+    account = BSAccount(id=ACCOUNT_IDS[0], region=Region.eu)
+    release = BSBlitzRelease(release=RELEASE, cut_off=CUT_OFF)
+    res: List[TankStat] = list()
+    async for tank_stats in db.tank_stats_export_career(account, release):
+        res.extend(tank_stats)
+    assert (
+        sorted(ts.tank_id for ts in res) == TANK_IDS
+    ), f"{db.driver}: incorrect tanks in career stats: {res}"
+    for ts in res:
+        assert (
+            ts.last_battle_time == 1700000000
+        ), f"{db.driver}: stats after the cut-off returned: {ts}"
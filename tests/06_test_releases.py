@@ -0,0 +1,129 @@
+from typing import List
+
+import pyarrow as pa  # type: ignore
+from pydantic import BaseModel
+
+from blitzstats.models import BSBlitzRelease
+from blitzstats.releases import ReleaseIndex
+
+########################################################
+#
+# Tests for ReleaseIndex()
+#
+########################################################
+
+RELEASES: List[BSBlitzRelease] = [
+    BSBlitzRelease(release="10.1", cut_off=2000),
+    BSBlitzRelease(release="10.0", cut_off=1000),
+    BSBlitzRelease(release="10.2", cut_off=3000),
+]
+
+
+class _Stat(BaseModel):
+    last_battle_time: int
+    release: str | None = None
+
+
+def test_1_ReleaseIndex_cut_offs() -> None:
+    """Epochs map to the release with the next cut-off. An epoch equal to
+    a cut-off belongs to that release"""
+    index = ReleaseIndex(RELEASES)
+    assert len(index) == 3, f"incorrect number of releases: {len(index)}"
+    assert [r.release for r in index.releases] == [
+        "10.0",
+        "10.1",
+        "10.2",
+    ], "releases are not sorted by cut-off"
+    for epoch, release in [
+        (0, "10.0"),
+        (999, "10.0"),
+        (1000, "10.0"),
+        (1001, "10.1"),
+        (2000, "10.1"),
+        (2001, "10.2"),
+        (3000, "10.2"),
+        (3001, None),
+    ]:
+        res = index[epoch]
+        assert (
+            res.release if res is not None else None
+        ) == release, f"incorrect release for epoch {epoch}: {res}"
+    epochs: List[int] = [0, 1000, 1001, 3000, 3001]
+    assert index.map(epochs) == [
+        "10.0",
+        "10.0",
+        "10.1",
+        "10.2",
+        None,
+    ], f"incorrect releases: {index.map(epochs)}"
+
+
+def test_2_ReleaseIndex_duplicates() -> None:
+    index = ReleaseIndex(RELEASES + [BSBlitzRelease(release="9.9", cut_off=1000)])
+    assert len(index) == 3, f"duplicate cut-off stored: {index.releases}"
+    assert index.get("10.1") is not None, "release not found"
+    assert index.get("11.0") is None, "non-existent release found"
+    prev = index.previous(RELEASES[0])
+    assert (
+        prev is not None and prev.release == "10.0"
+    ), f"incorrect previous release: {prev}"
+    assert index.previous(RELEASES[1]) is None, "first release has a previous"
+
+
+def test_3_ReleaseIndex_empty() -> None:
+    index = ReleaseIndex([])
+    assert index[1000] is None, "release found in an empty index"
+    assert index.map([0, 1000]) == [None, None], "releases found in an empty index"
+
+
+def test_4_ReleaseIndex_map_objs() -> None:
+    index = ReleaseIndex(RELEASES)
+    objs = [_Stat(last_battle_time=lbt) for lbt in [500, 2000, 5000]]
+    mapped, not_mapped = index.map_objs(objs)
+    assert (mapped, not_mapped) == (2, 1), f"incorrect counts: {mapped}, {not_mapped}"
+    assert [obj.release for obj in objs] == [
+        "10.0",
+        "10.1",
+        None,
+    ], f"incorrect releases: {objs}"
+    assert "release" in objs[0].model_fields_set, "mapped field not marked as set"
+    assert index.map_objs([]) == (0, 0), "empty list mapped"
+
+
+def test_5_ReleaseIndex_arrow() -> None:
+    index = ReleaseIndex(RELEASES)
+    epochs = pa.chunked_array([[0, 1001], [None, 5000]], type=pa.int64())
+    res = index.arrow(epochs)
+    assert res.type == pa.string(), f"incorrect type: {res.type}"
+    assert res.to_pylist() == [
+        "10.0",
+        "10.1",
+        None,
+        None,
+    ], f"incorrect releases: {res}"
+    res = index.arrow(pa.array([2000]), type=pa.dictionary(pa.int32(), pa.string()))
+    assert pa.types.is_dictionary(res.type), f"incorrect type: {res.type}"
+    assert res.to_pylist() == ["10.1"], f"incorrect releases: {res}"
+    res = ReleaseIndex([]).arrow(pa.array([1000]))
+    assert res.to_pylist() == [None], "releases found in an empty index"
+
+
+def test_6_ReleaseIndex_set_column() -> None:
+    index = ReleaseIndex(RELEASES)
+    batch = pa.RecordBatch.from_pydict(
+        {"last_battle_time": [500, 2500], "release": ["9.9", None]}
+    )
+    res = index.set_column(batch)
+    assert isinstance(res, pa.RecordBatch), f"incorrect type: {type(res)}"
+    assert res.schema.equals(batch.schema), f"schema changed: {res.schema}"
+    assert res.column("release").to_pylist() == [
+        "10.0",
+        "10.2",
+    ], f"incorrect releases: {res.column('release')}"
+    table = pa.table({"last_battle_time": [1500]})
+    res = index.set_column(table)
+    assert res.column_names == [
+        "last_battle_time",
+        "release",
+    ], f"release column not appended: {res.column_names}"
+    assert res.column("release").to_pylist() == ["10.1"], "incorrect release"
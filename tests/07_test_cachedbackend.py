@@ -0,0 +1,111 @@
+import pytest  # type: ignore
+from typing import List
+from uuid import uuid4
+
+from blitzmodels import Region
+
+from blitzstats.cachedbackend import CachedBackend
+from blitzstats.memorybackend import MemoryBackend
+from blitzstats.models import BSAccount
+
+########################################################
+#
+# Tests for CachedBackend() wrapping MemoryBackend()
+#
+########################################################
+
+ACCOUNT_IDS: List[int] = [521458531, 521458532, 521458533]  # EU
+LAST_BATTLE_TIME: int = 1700000000
+
+
+async def mk_cached(
+    database: str, cache_size: int = 2, cache_ttl: float = 3600
+) -> CachedBackend:
+    """Create a cached memory backend with test accounts. Use a new database
+    for each test since memory backends share the data by database name"""
+    db = CachedBackend.wrap(
+        "memory", database=database, cache_size=cache_size, cache_ttl=cache_ttl
+    )
+    assert isinstance(db, CachedBackend), f"could not create cached backend: {db}"
+    assert isinstance(db, MemoryBackend), f"incorrect backend type: {type(db)}"
+    accounts: List[BSAccount] = [
+        BSAccount(id=account_id, region=Region.eu, last_battle_time=LAST_BATTLE_TIME)
+        for account_id in ACCOUNT_IDS
+    ]
+    added, _ = await db.accounts_insert(accounts)
+    assert added == len(accounts), f"could not insert test accounts: {added}"
+    return db
+
+
+def test_1_wrap_disabled() -> None:
+    db = CachedBackend.wrap("memory", database=f"pytest{uuid4().hex}", cache_size=0)
+    assert isinstance(db, MemoryBackend), f"incorrect backend type: {type(db)}"
+    assert not isinstance(db, CachedBackend), "cache not disabled with cache_size=0"
+
+
+@pytest.mark.asyncio
+async def test_2_cache_hits() -> None:
+    db = await mk_cached(f"pytest{uuid4().hex}")
+    account = await db.account_get(ACCOUNT_IDS[0])
+    assert account is not None, "account not found"
+    account.last_battle_time = 0  # changes to returned objects are not cached
+    account = await db.account_get(ACCOUNT_IDS[0])
+    assert account is not None, "account not found"
+    assert (
+        account.last_battle_time == LAST_BATTLE_TIME
+    ), f"cached account modified: {account}"
+    assert db.cache_stats.get_value("misses") == 1, "incorrect cache misses"
+    assert db.cache_stats.get_value("hits") == 1, "incorrect cache hits"
+
+
+@pytest.mark.asyncio
+async def test_3_cache_lru_eviction() -> None:
+    db = await mk_cached(f"pytest{uuid4().hex}", cache_size=2)
+    a, b, c = ACCOUNT_IDS
+    for account_id in [a, b, a, c]:  # 'c' evicts 'b', the least recently used
+        await db.account_get(account_id)
+    assert db.cache_stats.get_value("evictions") == 1, "incorrect evictions"
+    misses: int = db.cache_stats.get_value("misses")
+    await db.account_get(a)
+    await db.account_get(c)
+    assert db.cache_stats.get_value("misses") == misses, "recently used evicted"
+    await db.account_get(b)
+    assert db.cache_stats.get_value("misses") == misses + 1, "LRU entry not evicted"
+
+
+@pytest.mark.asyncio
+async def test_4_cache_ttl() -> None:
+    db = await mk_cached(f"pytest{uuid4().hex}", cache_ttl=0)
+    for _ in range(2):
+        assert await db.account_get(ACCOUNT_IDS[0]) is not None, "account not found"
+    assert db.cache_stats.get_value("hits") == 0, "expired entry returned"
+    assert db.cache_stats.get_value("expired") == 1, "entry did not expire"
+
+
+@pytest.mark.asyncio
+async def test_5_cache_invalidation() -> None:
+    database: str = f"pytest{uuid4().hex}"
+    db = await mk_cached(database)
+    plain = MemoryBackend(database=database)  # shares the data, not the cache
+    account_id: int = ACCOUNT_IDS[0]
+    await db.account_get(account_id)
+
+    await plain.accounts_update({account_id: {"last_battle_time": 1700010000}})
+    account = await db.account_get(account_id)
+    assert (
+        account is not None and account.last_battle_time == LAST_BATTLE_TIME
+    ), f"account not served from the cache: {account}"
+
+    await db.accounts_update({account_id: {"last_battle_time": 1700020000}})
+    assert db.cache_stats.get_value("invalidated") > 0, "cache entry not invalidated"
+    account = await db.account_get(account_id)
+    assert (
+        account is not None and account.last_battle_time == 1700020000
+    ), f"stale account returned after update: {account}"
+
+    db.cache_clear()
+    await plain.accounts_update({account_id: {"last_battle_time": 1700030000}})
+    account = await db.account_get(account_id)
+    assert (
+        account is not None and account.last_battle_time == 1700030000
+    ), f"stale account returned after cache_clear(): {account}"
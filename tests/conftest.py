@@ -0,0 +1,61 @@
+import pytest  # type: ignore
+from typing import Callable
+
+from blitzmodels.wg_api import TankStat
+
+########################################################
+#
+# Shared test fixtures
+#
+########################################################
+
+RELEASE: str = "10.0"
+
+
+def _mk_tank_stat(
+    account_id: int,
+    tank_id: int,
+    last_battle_time: int,
+    battles: int,
+    release: str = RELEASE,
+) -> TankStat:
+    """Create a TankStat as returned by WG API"""
+    return TankStat.model_validate(
+        {
+            "account_id": account_id,
+            "tank_id": tank_id,
+            "last_battle_time": last_battle_time,
+            "battle_life_time": battles * 300,
+            "mark_of_mastery": 0,
+            "max_frags": 3,
+            "max_xp": 1000,
+            "in_garage": True,
+            "all": {
+                "battles": battles,
+                "wins": battles // 2,
+                "losses": battles // 2,
+                "survived_battles": battles // 3,
+                "win_and_survived": battles // 4,
+                "damage_dealt": battles * 1000,
+                "damage_received": battles * 800,
+                "frags": battles,
+                "frags8p": 0,
+                "hits": battles * 5,
+                "shots": battles * 6,
+                "spotted": battles,
+                "xp": battles * 500,
+                "max_xp": 1000,
+                "max_frags": 3,
+                "capture_points": 0,
+                "dropped_capture_points": 0,
+            },
+            "release": release,
+        }
+    )
+
+
+@pytest.fixture
+def mk_tank_stat() -> Callable[..., TankStat]:
+    """Factory for test tank stats:
+    mk_tank_stat(account_id, tank_id, last_battle_time, battles, release="10.0")"""
+    return _mk_tank_stat